@@ -17,19 +17,16 @@ import logging
 import time
 from collections import OrderedDict
 
-from sqlalchemy import and_
-
-from mycodo.config import MYCODO_DB_PATH
 from mycodo.databases.models import Conversion
 from mycodo.databases.models import DeviceMeasurements
 from mycodo.databases.models import Input
-from mycodo.databases.models import InputChannel
 from mycodo.databases.models import Output
 from mycodo.databases.models import OutputChannel
-from mycodo.databases.utils import session_scope
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import get_last_measurement
+from mycodo.utils.influx import get_last_measurements
 from mycodo.utils.influx import get_past_measurements
+from mycodo.utils.option_store import option_stores
 
 
 class AbstractBaseController(object):
@@ -411,120 +408,47 @@ class AbstractBaseController(object):
 
     def _delete_custom_option(self, controller, unique_id, option):
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
-                mod_function = new_session.query(controller).filter(
-                    controller.unique_id == unique_id).first()
-                try:
-                    dict_custom_options = json.loads(mod_function.custom_options)
-                except:
-                    dict_custom_options = {}
-                if option in dict_custom_options:
-                    dict_custom_options.pop(option)
-                    mod_function.custom_options = json.dumps(dict_custom_options)
-                    new_session.commit()
+            option_stores.delete_option(controller, unique_id, option)
         except Exception:
             self.logger.exception("delete_custom_option")
 
     def _set_custom_option(self, controller, unique_id, option, value):
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
-                mod_function = new_session.query(controller).filter(
-                    controller.unique_id == unique_id).first()
-                try:
-                    dict_custom_options = json.loads(mod_function.custom_options)
-                except:
-                    dict_custom_options = {}
-                dict_custom_options[option] = value
-                mod_function.custom_options = json.dumps(dict_custom_options)
-                new_session.commit()
-            return value
+            if option_stores.set_option(controller, unique_id, option, value):
+                return value
         except Exception:
             self.logger.exception("set_custom_option")
 
     def _get_custom_option(self, controller, unique_id, option, default_return=None):
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
-                read_function = new_session.query(controller).filter(
-                    controller.unique_id == unique_id).first()
-                new_session.expunge_all()
-                try:
-                    dict_custom_options = json.loads(read_function.custom_options)
-                except:
-                    dict_custom_options = {}
-                if option in dict_custom_options:
-                    return dict_custom_options[option]
+            return option_stores.get_option(
+                controller, unique_id, option, default_return=default_return)
         except Exception:
             self.logger.exception("get_custom_option")
         return default_return
 
     def _delete_custom_channel_option(self, controller, unique_id, channel, option):
+        if controller not in [Output, Input]:
+            return "controller doesn't represent Output or Input"
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
-                if controller == Output:
-                    channel = new_session.query(OutputChannel).filter(and_(
-                        OutputChannel.output_id == unique_id,
-                        OutputChannel.channel == channel)).first()
-                elif controller == Input:
-                    channel = new_session.query(InputChannel).filter(and_(
-                        InputChannel.input_id == unique_id,
-                        InputChannel.channel == channel)).first()
-                else:
-                    return "controller doesn't represent Output or Input"
-                try:
-                    dict_custom_options = json.loads(channel.custom_options)
-                except:
-                    dict_custom_options = {}
-                if option in dict_custom_options:
-                    dict_custom_options.pop(option)
-                    channel.custom_options = json.dumps(dict_custom_options)
-                    new_session.commit()
+            option_stores.delete_option(controller, unique_id, option, channel=channel)
         except Exception:
             self.logger.exception("delete_custom_option")
 
     def _set_custom_channel_option(self, controller, unique_id, channel, option, value):
+        if controller not in [Output, Input]:
+            return "controller doesn't represent Output or Input"
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
-                if controller == Output:
-                    channel = new_session.query(OutputChannel).filter(and_(
-                        OutputChannel.output_id == unique_id,
-                        OutputChannel.channel == channel)).first()
-                elif controller == Input:
-                    channel = new_session.query(InputChannel).filter(and_(
-                        InputChannel.input_id == unique_id,
-                        InputChannel.channel == channel)).first()
-                else:
-                    return "controller doesn't represent Output or Input"
-                try:
-                    dict_custom_options = json.loads(channel.custom_options)
-                except:
-                    dict_custom_options = {}
-                dict_custom_options[option] = value
-                channel.custom_options = json.dumps(dict_custom_options)
-                new_session.commit()
-            return value
+            if option_stores.set_option(controller, unique_id, option, value, channel=channel):
+                return value
         except Exception:
             self.logger.exception("set_custom_option")
 
     def _get_custom_channel_option(self, controller, unique_id, channel, option):
+        if controller not in [Output, Input]:
+            return "controller doesn't represent Output or Input"
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
-                if controller == Output:
-                    channel = new_session.query(OutputChannel).filter(and_(
-                        OutputChannel.output_id == unique_id,
-                        OutputChannel.channel == channel)).first()
-                elif controller == Input:
-                    channel = new_session.query(InputChannel).filter(and_(
-                        InputChannel.input_id == unique_id,
-                        InputChannel.channel == channel)).first()
-                else:
-                    return "controller doesn't represent Output or Input"
-                new_session.expunge_all()
-                try:
-                    dict_custom_options = json.loads(channel.custom_options)
-                except:
-                    dict_custom_options = {}
-                if option in dict_custom_options:
-                    return dict_custom_options[option]
+            return option_stores.get_option(controller, unique_id, option, channel=channel)
         except Exception:
             self.logger.exception("get_custom_option")
 
@@ -532,6 +456,10 @@ class AbstractBaseController(object):
     def get_last_measurement(device_id, measurement_id, max_age=None):
         return get_last_measurement(device_id, measurement_id, max_age=max_age)
 
+    @staticmethod
+    def get_last_measurements(measurements):
+        return get_last_measurements(measurements)
+
     @staticmethod
     def get_past_measurements(device_id, measurement_id, max_age=None):
         return get_past_measurements(device_id, measurement_id, max_age=max_age)
@@ -5,6 +5,7 @@ from mycodo.databases.models import Actions
 from mycodo.actions.base_action import AbstractFunctionAction
 from mycodo.utils.constraints_pass import constraints_pass_positive_or_zero_value
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.mqtt_publish import mqtt_publish
 from mycodo.utils.utils import random_alphanumeric
 
 ACTION_INFORMATION = {
@@ -156,8 +157,7 @@ class ActionModule(AbstractFunctionAction):
             self.try_initialize()
 
     def initialize(self):
-        import paho.mqtt.publish as publish
-        self.publish = publish
+        self.publish = mqtt_publish
         self.action_setup = True
 
     def run_action(self, dict_vars):
@@ -195,7 +195,7 @@ class ActionModule(AbstractFunctionAction):
                     "username": self.username,
                     "password": self.password
                 }
-            self.publish.single(
+            self.publish(
                 topic,
                 payload,
                 hostname=self.hostname,
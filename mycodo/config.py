@@ -60,6 +60,8 @@ PATH_ACTIONS_CUSTOM = os.path.join(PATH_ACTIONS, 'custom_actions')
 PATH_INPUTS_CUSTOM = os.path.join(PATH_INPUTS, 'custom_inputs')
 PATH_OUTPUTS_CUSTOM = os.path.join(PATH_OUTPUTS, 'custom_outputs')
 PATH_WIDGETS_CUSTOM = os.path.join(PATH_WIDGETS, 'custom_widgets')
+PATH_CACHE = os.path.join(INSTALL_DIRECTORY, '.cache')  # Files generated at runtime, safe to delete
+PATH_MODULE_REGISTRY = os.path.join(PATH_CACHE, 'module_registry.pickle')
 PATH_TEMPLATE = os.path.join(INSTALL_DIRECTORY, 'mycodo/mycodo_flask/templates')
 PATH_TEMPLATE_LAYOUT = os.path.join(PATH_TEMPLATE, 'layout.html')
 PATH_TEMPLATE_LAYOUT_DEFAULT = os.path.join(PATH_TEMPLATE, 'layout_default.html')
@@ -71,6 +73,8 @@ PATH_FONTS_USER = os.path.join(PATH_STATIC, 'fonts/user_fonts')
 PATH_USER_SCRIPTS = os.path.join(INSTALL_DIRECTORY, 'mycodo/user_scripts')
 PATH_PYTHON_CODE_USER = os.path.join(INSTALL_DIRECTORY, 'mycodo/user_python_code')
 PATH_MEASUREMENTS_BACKUP = os.path.join(INSTALL_DIRECTORY, 'mycodo/backup_measurements')
+PATH_MEASUREMENTS_SPOOL = os.path.join(INSTALL_DIRECTORY, 'mycodo/spool_measurements')
+PATH_MEASUREMENTS_EXPORT = os.path.join(INSTALL_DIRECTORY, 'mycodo/export_measurements')
 PATH_SETTINGS_BACKUP = os.path.join(INSTALL_DIRECTORY, 'mycodo/backup_settings')
 USAGE_REPORTS_PATH = os.path.join(INSTALL_DIRECTORY, 'output_usage_reports')
 DEPENDENCY_INIT_FILE = os.path.join(INSTALL_DIRECTORY, '.dependency')
@@ -117,6 +121,9 @@ if DOCKER_CONTAINER:
     PYRO_URI = 'PYRO:mycodo.pyro_server@mycodo_daemon:9080'
 else:
     PYRO_URI = 'PYRO:mycodo.pyro_server@127.0.0.1:9080'
+PYRO_POOL_SIZE = 6  # Connected proxies kept by each process, one for each frontend thread
+PYRO_POOL_IDLE_SEC = 60  # Close a pooled connection not used for this many seconds
+PYRO_LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000]
 
 # Anonymous statistics
 STATS_INTERVAL = 86400
@@ -135,6 +142,115 @@ LOGIN_BAN_SECONDS = 600  # 10 minutes
 # Check for upgrade every 2 days (if enabled)
 UPGRADE_CHECK_INTERVAL = 172800
 
+# Controller scheduler
+# The loop() of each controller is run when it's next due by a pool of worker
+# threads for its type, so slow sensors can't delay PIDs or Functions. Set a
+# type to 0 workers to run each of its controllers in its own thread.
+CONTROLLER_SCHEDULER_WORKERS = {
+    'Conditional': 4,
+    'Function': 4,
+    'Input': 8,
+    'Output': 1,
+    'PID': 4,
+    'Trigger': 4,
+    'Widget': 1
+}
+# Longest a controller waits between runs, even if it isn't due for longer,
+# so a change to the system clock (e.g. from NTP) can't delay it further
+CONTROLLER_SCHEDULER_MAX_WAIT = 60
+
+# Controller startup and shutdown
+# Controllers are started in tiers, each after all controllers of the previous
+# tier are ready, and stopped in the reverse order. The Output controller is
+# started before, and the Widget controller after, all tiers.
+CONTROLLER_TIERS = [
+    ['Input', 'Function'],
+    ['PID', 'Conditional', 'Trigger']
+]
+CONTROLLER_STARTUP_WORKERS = 8  # Controllers of a tier started at the same time
+CONTROLLER_STARTUP_TIMEOUT = 60  # Seconds to wait for a controller to be ready before moving on
+CONTROLLER_SHUTDOWN_TIMEOUT = 15  # Seconds to wait for the controllers of a tier to stop
+
+# Measurement database write queue
+# Points are coalesced and written in batches of up to INFLUXDB_WRITE_BATCH_SIZE
+# points, or after INFLUXDB_WRITE_FLUSH_SEC seconds, whichever occurs first
+INFLUXDB_WRITE_BATCH_SIZE = 500
+INFLUXDB_WRITE_FLUSH_SEC = 1.0
+INFLUXDB_WRITE_QUEUE_MAX = 20000  # Points waiting to be written, above which points are spooled to disk
+INFLUXDB_WRITE_RETRIES = 5  # Attempts to write a batch before it is spooled to disk
+
+# Measurement spool
+# Measurements that cannot be written to the measurement database are appended
+# to segment files in PATH_MEASUREMENTS_SPOOL and written when it's available
+INFLUXDB_SPOOL_SEGMENT_BYTES = 1048576  # Size at which a new segment file is started (1 MB)
+INFLUXDB_SPOOL_MAX_BYTES = 104857600  # Oldest segments are deleted above this size (100 MB)
+INFLUXDB_SPOOL_FSYNC_SEC = 5  # Maximum seconds between fsync of the current segment
+INFLUXDB_SPOOL_REPLAY_SEC = 30  # Seconds between attempts to write spooled measurements
+
+# Maximum number of series requested at once from /measurements_batch
+MEASUREMENTS_BATCH_MAX = 500
+
+# Recent measurements held in memory by the daemon, to answer incremental
+# ("since") requests of live graphs without querying the measurement database
+RECENT_MEASUREMENTS_MAX_POINTS = 1000  # Points kept for each measurement
+RECENT_MEASUREMENTS_MAX_SEC = 3600  # Points older than this are discarded
+
+# Threads of the web server, as --threads of gunicorn in
+# install/mycodoflask.service and docker/docker-compose.yml
+WEB_SERVER_THREADS = 8
+
+# Live measurement push (/measurements_live, server-sent events)
+# Each stream (and each live log tail) holds a thread of the web server until
+# it ends, so at most half of them are used for streams
+LIVE_STREAMS_MAX = WEB_SERVER_THREADS // 2
+LIVE_STREAM_WAIT_SEC = 15  # Maximum seconds to wait for new measurements before a keepalive
+LIVE_STREAM_DURATION_SEC = 600  # Seconds before a stream is closed (the browser reconnects)
+
+# Bulk measurement ingest (/api/measurements/bulk)
+INGEST_MAX_POINTS = 50000  # Maximum measurements per request
+INGEST_UNITS_REFRESH_SEC = 60  # Seconds between reloading the set of valid units
+
+# Streamed measurements (/api/measurements/stream)
+STREAM_LIMIT_DEFAULT = 10000  # Measurements per page, if no limit is requested
+STREAM_LIMIT_MAX = 1000000  # Maximum measurements per page
+
+# Measurement export jobs
+# Jobs query one time slice of all their measurements at a time. The duration
+# of a slice starts at EXPORT_SLICE_SEC and is adjusted to contain about
+# EXPORT_SLICE_POINTS points.
+EXPORT_SLICE_SEC = 3600
+EXPORT_SLICE_SEC_MIN = 60
+EXPORT_SLICE_SEC_MAX = 2592000  # 30 days
+EXPORT_SLICE_POINTS = 50000
+
+# MQTT publish connections
+# The daemon keeps a connection to each MQTT server (and client ID) that
+# Actions and Outputs publish to, instead of connecting for every message
+MQTT_PUBLISH_CONNECT_TIMEOUT = 5  # Seconds to wait for a new connection before a message fails
+MQTT_PUBLISH_IDLE_SEC = 3600  # Connections unused for this long are closed
+MQTT_PUBLISH_QUEUE_MAX = 1000  # Maximum messages queued while disconnected (QoS 1 and 2)
+MQTT_RECONNECT_DELAY_MIN = 1  # Reconnect backoff, doubling up to MQTT_RECONNECT_DELAY_MAX seconds
+MQTT_RECONNECT_DELAY_MAX = 120
+
+# Log viewer
+# The daemon log is indexed in chunks of LOG_INDEX_CHUNK_BYTES, recording the
+# time range, levels, and loggers of the entries in each chunk, so only the
+# chunks that can contain the requested entries are read
+PATH_LOG_INDEX = os.path.join(LOG_PATH, '.index')
+LOG_INDEX_CHUNK_BYTES = 65536
+LOG_TAIL_INTERVAL = 1  # Seconds between checks of a followed log for new lines
+
+# Display Functions
+# Lines of a display are generated with one lookup of their measurements,
+# and displays only write the characters or pixel pages that changed
+DISPLAY_INFO_CACHE_SEC = 60  # Seconds to cache IP addresses and measurement names/units
+
+# Custom option store
+# The daemon keeps the custom options of running controllers in memory and
+# writes the changed options of each controller at most every
+# OPTION_STORE_FLUSH_SEC, and when the controller stops
+OPTION_STORE_FLUSH_SEC = 5
+
 TAGS_URL = 'https://api.github.com/repos/kizniche/Mycodo/git/refs/tags'
 
 LANGUAGES = {
@@ -8,15 +8,13 @@ Conditional.
 All Conditionals should inherit from this class and overwrite methods that raise
 NotImplementedErrors
 """
-import json
-
 from mycodo.config import MYCODO_DB_PATH
 from mycodo.databases.models import Actions
 from mycodo.databases.models import Conditional
 from mycodo.databases.models import ConditionalConditions
 from mycodo.databases.utils import session_scope
 from mycodo.mycodo_client import DaemonControl
-from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.option_store import option_stores
 
 
 class AbstractConditional:
@@ -102,25 +100,14 @@ class AbstractConditional:
 
     def set_custom_option(self, option, value):
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
-                mod_cond = new_session.query(Conditional).filter(
-                    Conditional.unique_id == self.function_id).first()
-                try:
-                    dict_custom_options = json.loads(mod_cond.custom_options)
-                except:
-                    dict_custom_options = {}
-                dict_custom_options[option] = value
-                mod_cond.custom_options = json.dumps(dict_custom_options)
-                new_session.commit()
+            option_stores.set_option(Conditional, self.function_id, option, value)
         except Exception:
             self.logger.exception("set_custom_option")
 
     def get_custom_option(self, option, default_return=None):
-        conditional = db_retrieve_table_daemon(Conditional, unique_id=self.function_id)
         try:
-            dict_custom_options = json.loads(conditional.custom_options)
-        except:
-            dict_custom_options = {}
-        if option in dict_custom_options:
-            return dict_custom_options[option]
+            return option_stores.get_option(
+                Conditional, self.function_id, option, default_return=default_return)
+        except Exception:
+            self.logger.exception("get_custom_option")
         return default_return
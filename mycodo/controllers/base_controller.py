@@ -9,12 +9,15 @@ All Controllers should inherit from this class and overwrite methods that raise
 NotImplementedErrors
 """
 import logging
+import threading
 import time
 import timeit
 
 import Pyro5
 
 from mycodo.abstract_base_controller import AbstractBaseController
+from mycodo.config import CONTROLLER_SCHEDULER_MAX_WAIT
+from mycodo.utils.option_store import option_store_release
 
 
 class AbstractController(AbstractBaseController):
@@ -32,6 +35,13 @@ class AbstractController(AbstractBaseController):
         self.unique_id = unique_id
         self.ready = ready
 
+        # If set before start(), loop() is run by this Scheduler instead of a thread of the controller
+        self.scheduler = None
+        self.scheduler_job = None
+        self.scheduler_thread = None
+        self.scheduler_initialized = False
+        self.stopped = threading.Event()
+
         logger_name = f"{name}"
         if self.unique_id:
             logger_name += f"_{unique_id.split('-')[0]}"
@@ -54,6 +64,15 @@ class AbstractController(AbstractBaseController):
             f"All subclasses of the AbstractController class are required to overwrite this method")
         raise NotImplementedError
 
+    def next_run(self):
+        """
+        Return the number of seconds until loop() is next due, when run by a scheduler
+
+        Controllers that know when they next have something to do return the
+        time until then, or math.inf if only when they're woken with wake().
+        """
+        return self.sample_rate
+
     def run_finally(self):
         """Executed after loop() has finished."""
         pass
@@ -68,35 +87,95 @@ class AbstractController(AbstractBaseController):
 
     def run(self):
         try:
-            try:
-                self.initialize_variables()
-            except Exception as except_msg:
-                self.logger.exception(f"initialize_variables() Exception: {except_msg}")
-
-            dur = (timeit.default_timer() - self.thread_startup_timer) * 1000
-            self.logger.info(f"Activated in {dur:.1f} ms")
-
+            self.run_initialize()
             while self.running:
-                try:
-                    self.loop()
-                except Pyro5.errors.TimeoutError:
-                    self.logger.exception("Pyro5 TimeoutError")
-                except Exception:
-                    self.logger.exception("loop() Error")
-                finally:
-                    time.sleep(self.sample_rate)
-
+                self.run_loop()
+                time.sleep(self.sample_rate)
         except Exception:
             self.logger.exception("Run Error")
             self.thread_shutdown_timer = timeit.default_timer()
         finally:
+            self.run_stop()
+
+    def run_initialize(self):
+        try:
+            self.initialize_variables()
+        except Exception as except_msg:
+            self.logger.exception(f"initialize_variables() Exception: {except_msg}")
+        finally:
+            # Don't leave the daemon waiting for a controller that failed to initialize
+            self.ready.set()
+
+        dur = (timeit.default_timer() - self.thread_startup_timer) * 1000
+        self.logger.info(f"Activated in {dur:.1f} ms")
+
+    def run_loop(self):
+        try:
+            self.loop()
+        except Pyro5.errors.TimeoutError:
+            self.logger.exception("Pyro5 TimeoutError")
+        except Exception:
+            self.logger.exception("loop() Error")
+
+    def run_stop(self):
+        try:
             self.run_finally()
+        finally:
+            # Write the custom options the controller changed since the last flush
+            option_store_release(self.unique_id)
             self.running = False
             if self.thread_shutdown_timer:
                 dur = (timeit.default_timer() - self.thread_shutdown_timer) * 1000
                 self.logger.info(f"Deactivated in {dur:.1f} ms")
             else:
                 self.logger.error("Deactivated unexpectedly")
+            self.stopped.set()
+
+    def run_scheduled(self):
+        """
+        Run by the scheduler: initialize the first time, then loop() until stopped
+
+        :return: seconds until the next run, or None when the controller has stopped
+        :rtype: float or None
+        """
+        self.scheduler_thread = threading.current_thread()
+        try:
+            if not self.scheduler_initialized:
+                self.scheduler_initialized = True
+                self.run_initialize()
+                if self.running:
+                    return 0
+            elif self.running:
+                self.run_loop()
+                if self.running:
+                    return min(max(self.next_run(), 0.0), CONTROLLER_SCHEDULER_MAX_WAIT)
+        except Exception:
+            self.logger.exception("Run Error")
+            self.thread_shutdown_timer = timeit.default_timer()
+        finally:
+            self.scheduler_thread = None
+        self.run_stop()
+        return None
+
+    def start(self):
+        """Start the controller on the scheduler if one was set, otherwise in its own thread."""
+        if self.scheduler is None:
+            return super().start()
+        self.scheduler_job = f"{type(self).__name__}_{self.unique_id}"
+        self.scheduler.add(self.scheduler_job, self.run_scheduled)
+
+    def wake(self):
+        """Run loop() now instead of when it's next due, if run by a scheduler."""
+        if self.scheduler is not None and self.scheduler_job:
+            self.scheduler.wake(self.scheduler_job)
+
+    def join(self, timeout=None):
+        """Wait for the controller to stop."""
+        if self.scheduler is None:
+            return super().join(timeout)
+        if self.scheduler_thread is threading.current_thread():
+            raise RuntimeError("cannot join current thread")
+        self.stopped.wait(timeout)
 
     def is_running(self):
         return self.running
@@ -105,6 +184,7 @@ class AbstractController(AbstractBaseController):
         self.thread_shutdown_timer = timeit.default_timer()
         self.pre_stop()
         self.running = False
+        self.wake()
 
     def set_log_level_debug(self, log_level_debug):
         if log_level_debug:
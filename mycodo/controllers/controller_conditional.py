@@ -23,6 +23,7 @@
 #
 import datetime
 import importlib.util
+import math
 import os
 import threading
 import time
@@ -89,6 +90,11 @@ class ConditionalController(AbstractController, threading.Thread):
 
             self.attempt_execute(self.check_conditionals)
 
+    def next_run(self):
+        if self.is_activated and self.timer_period:
+            return self.timer_period - time.time()
+        return math.inf
+
     def initialize_variables(self):
         """Define all settings."""
         cond = db_retrieve_table_daemon(
@@ -143,12 +149,13 @@ class ConditionalController(AbstractController, threading.Thread):
             self.logger.debug(
                 f"Run Python Code (post-replacement):\n{file.read()}")
 
-        self.ready.set()
         self.running = True
+        self.ready.set()
 
     def refresh_settings(self):
         """Signal to pause the main loop and wait for verification, the refresh settings."""
         self.pause_loop = True
+        self.wake()
         while not self.verify_pause_loop:
             time.sleep(0.1)
 
@@ -195,3 +202,4 @@ class ConditionalController(AbstractController, threading.Thread):
         except Exception:
             pass
         self.running = False
+        self.wake()
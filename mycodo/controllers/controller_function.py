@@ -21,6 +21,7 @@
 #
 #  Contact at kylegabriel.com
 #
+import math
 import threading
 import time
 
@@ -80,6 +81,11 @@ class FunctionController(AbstractController, threading.Thread):
             except Exception:
                 self.logger.exception("Exception while running loop()")
 
+    def next_run(self):
+        if self.has_loop:
+            return self.timer_loop - time.time()
+        return math.inf
+
     def run_finally(self):
         try:
             self.run_function.stop_function()
@@ -117,8 +123,8 @@ class FunctionController(AbstractController, threading.Thread):
             if function_loaded:
                 self.run_function = function_loaded.CustomModule(self.function)
 
-            self.ready.set()
             self.running = True
+            self.ready.set()
         else:
             self.ready.set()
             self.running = False
@@ -22,6 +22,7 @@
 #
 #  Contact at kylegabriel.com
 #
+import math
 import threading
 import time
 
@@ -237,6 +238,16 @@ class InputController(AbstractController, threading.Thread):
 
         self.trigger_cond = False
 
+    def next_run(self):
+        if not self.has_loop:
+            return math.inf
+        if self.get_new_measurement:
+            if self.pre_output_setup and self.pre_output_activated:
+                # Measure when the pre-output has finished
+                return self.pre_output_timer - time.time()
+            return self.sample_rate
+        return self.next_measurement - time.time()
+
     def run_finally(self):
         try:
             self.measure_input.stop_input()
@@ -317,8 +328,8 @@ class InputController(AbstractController, threading.Thread):
 
             if input_loaded:
                 self.measure_input = input_loaded.InputModule(self.input_dev)
-            self.ready.set()
             self.running = True
+            self.ready.set()
         else:
             self.device_recognized = False
             self.ready.set()
@@ -428,6 +439,7 @@ class InputController(AbstractController, threading.Thread):
     def force_measurements(self):
         """Signal that a measurement needs to be obtained."""
         self.next_measurement = time.time()
+        self.wake()
         return 0, "Input instructed to begin acquiring measurements"
 
     def call_module_function(self, button_id, args_dict, thread=True, return_from_function=False):
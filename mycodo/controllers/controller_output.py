@@ -21,6 +21,7 @@
 #
 #  Contact at kylegabriel.com
 import datetime
+import math
 import threading
 import time
 import timeit
@@ -32,6 +33,7 @@ from mycodo.databases.models import SMTP
 from mycodo.mycodo_client import DaemonControl
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.option_store import option_store_release
 from mycodo.utils.outputs import output_types
 from mycodo.utils.outputs import parse_output_information
 
@@ -76,8 +78,8 @@ class OutputController(AbstractController, threading.Thread):
             self.all_outputs_initialize(outputs)
             self.logger.debug("Outputs Initialized")
 
-            self.ready.set()
             self.running = True
+            self.ready.set()
         except Exception:
             self.logger.exception("Problem initializing outputs")
 
@@ -101,6 +103,20 @@ class OutputController(AbstractController, threading.Thread):
                         kwargs={'output_channel': each_channel})
                     turn_output_off.start()
 
+    def next_run(self):
+        """Return the seconds until the next output that's on for a duration is due to turn off."""
+        next_off = math.inf
+        now = datetime.datetime.now()
+        for output_id in self.output:
+            for each_channel in self.output_unique_id[output_id]:
+                if (self.output[output_id].output_setup and
+                        each_channel in self.output[output_id].output_on_until and
+                        self.output[output_id].output_on_duration[each_channel] and
+                        not self.output[output_id].output_off_triggered[each_channel]):
+                    next_off = min(
+                        next_off, (self.output[output_id].output_on_until[each_channel] - now).total_seconds())
+        return next_off
+
     def run_finally(self):
         """Run when the controller is shutting down."""
         # Turn all outputs to their shutdown state
@@ -108,6 +124,7 @@ class OutputController(AbstractController, threading.Thread):
             shutdown_timer = timeit.default_timer()
             # instruct each output to shut down
             self.output[each_output_id].shutdown(shutdown_timer)
+            option_store_release(each_output_id)
 
     def all_outputs_initialize(self, outputs):
         """Initialize all output variables and classes."""
@@ -186,6 +203,7 @@ class OutputController(AbstractController, threading.Thread):
                             self.output[output_id].stop_output()
                         except Exception:
                             self.logger.exception("Stopping output")
+                        option_store_release(output_id)
 
                     output_loaded, status = load_module_from_file(
                         self.dict_outputs[self.output_type[output_id]]['file_path'],
@@ -296,13 +314,17 @@ class OutputController(AbstractController, threading.Thread):
         #         self.logger.warning(msg)
         #         return 1, msg
 
-        return self.output[output_id].output_on_off(
-            state,
-            output_channel=output_channel,
-            output_type=output_type,
-            amount=amount,
-            min_off=min_off,
-            trigger_conditionals=trigger_conditionals)
+        try:
+            return self.output[output_id].output_on_off(
+                state,
+                output_channel=output_channel,
+                output_type=output_type,
+                amount=amount,
+                min_off=min_off,
+                trigger_conditionals=trigger_conditionals)
+        finally:
+            # Check when the output is next due to turn off
+            self.wake()
 
     def output_setup(self, action, output_id):
         """Add, delete, or modify a specific output."""
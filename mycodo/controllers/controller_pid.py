@@ -140,6 +140,9 @@ class PIDController(AbstractController, threading.Thread):
                 self.timer = self.timer + self.period
             self.attempt_execute(self.check_pid)
 
+    def next_run(self):
+        return self.timer - time.time()
+
     def run_finally(self):
         # Turn off output used in PID when the controller is deactivated
         if self.raise_output_id and self.PID_Controller.direction in ['raise', 'both']:
@@ -227,8 +230,8 @@ class PIDController(AbstractController, threading.Thread):
 
         self.logger.info(f"PID Settings: {self.pid_parameters_str()}")
 
-        self.ready.set()
         self.running = True
+        self.ready.set()
 
         return "success"
 
@@ -802,14 +805,13 @@ class PIDController(AbstractController, threading.Thread):
             return output_channel.channel
 
     def write_pid_output_influxdb(self, unit, measurement, channel, value):
-        write_pid_out_db = threading.Thread(
-            target=write_influxdb_value,
-            args=(self.unique_id,
-                  unit,
-                  value,),
-            kwargs={'measure': measurement,
-                    'channel': channel})
-        write_pid_out_db.start()
+        write_influxdb_value(
+            self.unique_id,
+            unit,
+            value,
+            measure=measurement,
+            channel=channel,
+            block=False)
 
     def pid_mod(self):
         if self.initialize_variables():
@@ -23,6 +23,7 @@
 #  Contact at kylegabriel.com
 #
 import datetime
+import math
 import threading
 import time
 
@@ -158,12 +159,18 @@ class TriggerController(AbstractController, threading.Thread):
                 self.logger.debug("Executing Trigger Actions")
                 self.attempt_execute(self.check_triggers)
 
+    def next_run(self):
+        if self.is_activated and self.timer_period:
+            return self.timer_period - time.time()
+        return math.inf
+
     def run_finally(self):
         pass
 
     def refresh_settings(self):
         """Signal to pause the main loop and wait for verification, the refresh settings."""
         self.pause_loop = True
+        self.wake()
         while not self.verify_pause_loop:
             time.sleep(0.1)
 
@@ -245,8 +252,8 @@ class TriggerController(AbstractController, threading.Thread):
                 self.trigger.latitude, self.trigger.longitude, self.trigger.date_offset_days,
                 self.trigger.time_offset_minutes, self.trigger.rise_or_set)
 
-        self.ready.set()
         self.running = True
+        self.ready.set()
 
     def set_next_daily_time_span_run(self, now):
         if not time_between_range(self.timer_start_time, self.timer_end_time):
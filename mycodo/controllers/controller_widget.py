@@ -67,8 +67,8 @@ class WidgetController(AbstractController, threading.Thread):
         except Exception:
             self.logger.exception("Problem initializing widgets")
 
-        self.ready.set()
         self.running = True
+        self.ready.set()
 
     def loop(self):
         for each_unique_id in self.widget_ready:
@@ -1,27 +1,76 @@
 # coding=utf-8
 import logging
+import os
+import threading
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 logger = logging.getLogger(__name__)
 
+# Engines and session factories, created once per database URI (per process)
+engines = {}
+session_factories = {}
+scoped_sessions = {}
+engines_lock = threading.Lock()
+
+
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """Allow concurrent readers while writing and wait for locks rather than failing."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def get_session_factory(db_uri):
+    """Return the session factory for db_uri, creating the engine the first time it's used."""
+    if db_uri not in session_factories:
+        with engines_lock:
+            if db_uri not in session_factories:
+                if db_uri.startswith('sqlite'):
+                    # File databases use a QueuePool of connections
+                    engine = create_engine(f"{db_uri}?check_same_thread=False")
+                    event.listen(engine, "connect", set_sqlite_pragma)
+                else:
+                    engine = create_engine(db_uri, pool_pre_ping=True)
+                engines[db_uri] = engine
+                session_factories[db_uri] = sessionmaker(bind=engine)
+                scoped_sessions[db_uri] = scoped_session(session_factories[db_uri])
+    return session_factories[db_uri]
 
-@contextmanager
-def session_scope(db_uri):
-    """Provide a transactional scope around a series of operations."""
 
-    # configure Session class with desired options
-    Session = sessionmaker()
+def get_scoped_session(db_uri):
+    """
+    Return the thread-local session for db_uri
 
-    # later, we create the engine
-    engine = create_engine(f"{db_uri}?check_same_thread=False")
+    The session is reused by every call from the same thread, so it must not
+    be held across calls that may themselves use it. Close it after use to
+    return its connection to the pool.
+    """
+    get_session_factory(db_uri)
+    return scoped_sessions[db_uri]()
 
-    # associate it with our custom Session class
-    Session.configure(bind=engine)
 
-    session = Session()
+def dispose_engines():
+    """Discard engines inherited from a parent process, since connections can't be shared across a fork."""
+    global engines_lock
+    engines_lock = threading.Lock()
+    for each_engine in engines.values():
+        each_engine.dispose(close=False)
+    engines.clear()
+    session_factories.clear()
+    scoped_sessions.clear()
+
+
+os.register_at_fork(after_in_child=dispose_engines)
+
+
+@contextmanager
+def session_scope(db_uri):
+    """Provide a transactional scope around a series of operations."""
+    session = get_session_factory(db_uri)()
     try:
         yield session
         session.commit()
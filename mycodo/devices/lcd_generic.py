@@ -4,6 +4,8 @@ import time
 
 from smbus2 import SMBus
 
+from mycodo.utils.display import CharacterFramebuffer
+
 logger = logging.getLogger("mycodo.device.lcd_generic")
 
 
@@ -49,6 +51,9 @@ class LCD_Generic:
 
         self.LCD_WIDTH = self.lcd_x_characters  # Max characters per line
 
+        # Characters shown, so only those that change are written
+        self.framebuffer = CharacterFramebuffer(self.lcd_x_characters, self.lcd_y_lines)
+
         # Setup I2C bus
         try:
             self.bus = SMBus(self.i2c_bus)
@@ -69,6 +74,7 @@ class LCD_Generic:
             self.lcd_byte(0x28, self.LCD_CMD)  # 101000 Data length, number of lines, font size
             self.lcd_byte(0x01, self.LCD_CMD)  # 000001 Clear display
             time.sleep(self.E_DELAY)
+            self.framebuffer.invalidate()
         except Exception as err:
             self.logger.error(
                 "Could not initialize LCD. Check your configuration and wiring. Error: {err}".format(err=err))
@@ -79,6 +85,7 @@ class LCD_Generic:
             self.lcd_byte(0x01, self.LCD_CMD, self.LCD_BACKLIGHT)
         else:
             self.lcd_byte(0x01, self.LCD_CMD, self.LCD_BACKLIGHT_OFF)
+        self.framebuffer.invalidate()  # The backlight is set with a clear display command
 
     def lcd_byte(self, bits, mode, backlight=None):
         """Send byte to data pins."""
@@ -112,12 +119,17 @@ class LCD_Generic:
         for i in range(self.LCD_WIDTH):
             self.lcd_byte(ord(message[i]), self.LCD_CHR)
 
+    def lcd_write_at(self, line, column, text):
+        """Send characters to a position of the display."""
+        self.lcd_byte(self.LCD_LINE[line] + column, self.LCD_CMD)
+        for each_character in text:
+            self.lcd_byte(ord(each_character), self.LCD_CHR)
+
     def lcd_write_lines(self, line_1, line_2, line_3, line_4):
-        if line_1 is not None:
-            self.lcd_string_write(line_1, 1)
-        if line_2 is not None:
-            self.lcd_string_write(line_2, 2)
-        if line_3 is not None:
-            self.lcd_string_write(line_3, 3)
-        if line_4 is not None:
-            self.lcd_string_write(line_4, 4)
+        """Send strings to display, only writing the characters that changed."""
+        try:
+            for line, column, text in self.framebuffer.update([line_1, line_2, line_3, line_4]):
+                self.lcd_write_at(line + 1, column, text)
+        except Exception:
+            self.framebuffer.invalidate()
+            raise
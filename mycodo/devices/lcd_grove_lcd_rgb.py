@@ -12,6 +12,8 @@ import logging
 import time
 from smbus2 import SMBus
 
+from mycodo.utils.display import CharacterFramebuffer
+
 class LCD_Grove_LCD_RGB:
     """Output to a Grove I2C LCD RGB display (16x2 LCD with RGB or monochrome backlight)"""
     def __init__(self, lcd_dev=None, lcd_settings_dict=None):
@@ -50,6 +52,9 @@ class LCD_Grove_LCD_RGB:
         self.LCD_WIDTH = self.lcd_x_characters  # Max characters per line
         self.I2C_ADDR = self.i2c_address
 
+        # Characters shown, so only those that change are written
+        self.framebuffer = CharacterFramebuffer(self.lcd_x_characters, self.lcd_y_lines)
+
         # Commands, etc
         self.LCD_CLEARDISPLAY = 0x01
         self.LCD_RETURNHOME = 0x02
@@ -138,6 +143,7 @@ class LCD_Grove_LCD_RGB:
     def clearDisplay(self):
         self.writeCommand(self.LCD_CLEARDISPLAY) # clear display
         time.sleep(0.002)
+        self.framebuffer.invalidate()
 
     def setCursor(self, col, row):
         if row == 0:
@@ -205,17 +211,17 @@ class LCD_Grove_LCD_RGB:
         for c in message:
             self.writeData(ord(c))
 
+    def lcd_write_at(self, line, column, text):
+        """Send characters to a position of the display."""
+        self.setCursor(column, line - 1)
+        for c in text:
+            self.writeData(ord(c))
+
     def lcd_write_lines(self, line_1, line_2, line_3, line_4):
-        msg = ""
-        if line_1 is not None:
-            msg += line_1
-        msg += "\n"
-        if line_2 is not None:
-            msg += line_2
-        msg += "\n"
-        if line_3 is not None:
-            msg += line_3
-        msg += "\n"
-        if line_4 is not None:
-            msg += line_4
-        self.setText(msg)
+        """Send strings to display, only writing the characters that changed."""
+        try:
+            for line, column, text in self.framebuffer.update([line_1, line_2, line_3, line_4]):
+                self.lcd_write_at(line + 1, column, text)
+        except Exception:
+            self.framebuffer.invalidate()
+            raise
@@ -8,6 +8,9 @@ from PIL import ImageDraw
 from PIL import ImageFont
 from adafruit_extended_bus import ExtendedI2C
 
+from mycodo.utils.display import PageFramebuffer
+from mycodo.utils.display import image_pages
+
 logger = logging.getLogger("mycodo.device.lcd_pioled_circuitpython")
 
 
@@ -15,6 +18,7 @@ class PiOLEDCircuitpython:
     """Output to the PiOLED."""
     def __init__(self, lcd_dev=None, lcd_settings_dict=None, font=None):
         self.disp = None
+        self.framebuffer = None
         self.font = font
         self.font_size = 10
 
@@ -87,12 +91,16 @@ class PiOLEDCircuitpython:
         if not self.disp:
             self.logger.error(
                 "Unable to set up display. Check the LCD settings.")
+        else:
+            # Pixels shown, so only the pages that change are written
+            self.framebuffer = PageFramebuffer(self.disp.width, self.disp.height)
 
     def lcd_init(self):
         """Initialize LCD display."""
         try:
             self.disp.fill(0)
             self.disp.show()
+            self.framebuffer.invalidate()
         except Exception as err:
             self.logger.error(
                 "Could not initialize LCD. "
@@ -140,10 +148,38 @@ class PiOLEDCircuitpython:
         if message_line_8 is not None:
             draw.text((x, top + self.line_y_dimensions[7]), message_line_8, font=font, fill=255)
 
-        self.disp.image(image)
-        self.disp.show()
+        buffer = image_pages(image)
+        regions = self.framebuffer.update(buffer)
+        if not regions:
+            return
+
+        try:
+            self.disp.buf[:] = buffer
+            for page, first, last in regions:
+                self.write_region(buffer, page, first, last)
+        except Exception:
+            self.framebuffer.invalidate()
+            raise
         time.sleep(0.1)
 
+    def write_region(self, buffer, page, first, last):
+        """Write the columns first to last of a page of the buffer."""
+        self.disp.write_cmd(adafruit_ssd1306.SET_COL_ADDR)
+        self.disp.write_cmd(first)
+        self.disp.write_cmd(last)
+        self.disp.write_cmd(adafruit_ssd1306.SET_PAGE_ADDR)
+        self.disp.write_cmd(page)
+        self.disp.write_cmd(page)
+
+        data = buffer[page * self.disp.width + first:page * self.disp.width + last + 1]
+        if self.interface == 'I2C':
+            with self.disp.i2c_device:
+                self.disp.i2c_device.write(bytes([0x40]) + data)  # Co = 0, D/C = 1
+        else:
+            self.disp.dc_pin.value = 1
+            with self.disp.spi_device as spi:
+                spi.write(data)
+
     def lcd_backlight(self, state):
         """backlight not supported."""
         pass
@@ -21,7 +21,6 @@
 #
 #  Contact at kylegabriel.com
 #
-import datetime
 import json
 import math
 import time
@@ -39,8 +38,7 @@ from mycodo.utils.constraints_pass import (
     constraints_pass_positive_or_zero_value, constraints_pass_positive_value)
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.functions import parse_function_information
-from mycodo.utils.lcd import format_measurement_line
-from mycodo.utils.system_pi import cmd_output
+from mycodo.utils.lcd import DisplayLines
 
 # Set to how many lines the LCD has
 lcd_lines = 4
@@ -349,8 +347,7 @@ class CustomModule(AbstractFunction):
         self.options_channels = {}
         self.device = None
         self.timer_loop = time.time()
-        self.line_sets = []
-        self.current_line_set = 0
+        self.display_lines = None
         self.line_y_dimensions = [0, 8, 16, 24]
         self.pad = -2
 
@@ -383,12 +380,9 @@ class CustomModule(AbstractFunction):
             self.options_channels = self.setup_custom_channel_options_json(
                 FUNCTION_INFORMATION['custom_channel_options'], function_channels)
 
-            for each_set in range(self.number_line_sets):
-                self.line_sets.append([])
-                for each_line in range(lcd_lines):
-                    self.line_sets[each_set].append(each_line)
-
-            self.logger.debug("Line sets: {}".format(self.line_sets))
+            self.display_lines = DisplayLines(
+                self.options_channels, lcd_lines, self.characters_x, self.number_line_sets,
+                logger=self.logger)
 
             lcd_settings_dict = {
                 "unique_id": self.unique_id,
@@ -424,85 +418,9 @@ class CustomModule(AbstractFunction):
             return
 
         # Generate lines to display
-        lines_display = {}
-        for line in range(lcd_lines):
-            lines_display[line] = ""
-
-        for current_line in self.line_sets[self.current_line_set]:
-            current_channel = (self.current_line_set * lcd_lines) + current_line
-            self.logger.debug("Channel: {}, Set: {} Line: {}, ".format(
-                current_channel, self.current_line_set, current_line))
-
-            try:
-                # Get measurement value and timestamp
-                if self.options_channels['line_display_type'][current_channel] in [
-                    'measurement_value', 'measurement_ts']:
-                    lines_display[current_line] = "NONE"
-                    measure_ts = None
-                    measure_value = None
-
-                    last_measurement = self.get_last_measurement(
-                        self.options_channels['select_measurement'][current_channel]['device_id'],
-                        self.options_channels['select_measurement'][current_channel]['measurement_id'],
-                        max_age=self.options_channels['measure_max_age'][current_channel])
-
-                    if last_measurement:
-                        measure_ts = last_measurement[0]
-                        measure_value = last_measurement[1]
-
-                    if self.options_channels['line_display_type'][current_channel] == 'measurement_value':
-                        if measure_value:
-                            if self.options_channels['measure_decimal'][current_channel] == 0:
-                                val_rounded = int(measure_value)
-                            else:
-                                val_rounded = round(
-                                    measure_value,
-                                    self.options_channels['measure_decimal'][current_channel])
-
-                            lines_display[current_line] = format_measurement_line(
-                                self.options_channels['select_measurement'][current_channel]['device_id'],
-                                self.options_channels['select_measurement'][current_channel]['measurement_id'],
-                                val_rounded,
-                                self.characters_x,
-                                display_unit=self.options_channels['display_unit'][current_channel],
-                                label=self.options_channels['measurement_label'][current_channel])
-
-                    elif self.options_channels['line_display_type'][current_channel] == 'measurement_ts':
-                        if measure_ts:
-                            # Convert UTC timestamp to local timezone
-                            lines_display[current_line] = str(datetime.datetime.fromtimestamp(measure_ts))
-
-                elif self.options_channels['line_display_type'][current_channel] == 'current_time':
-                    lines_display[current_line] = time.strftime('%Y-%m-%d %H:%M:%S')
-
-                elif self.options_channels['line_display_type'][current_channel] == 'text':
-                    lines_display[current_line] = self.options_channels['text'][current_channel]
-
-                elif self.options_channels['line_display_type'][current_channel] == 'blank_line':
-                    lines_display[current_line] = ""
-
-                elif self.options_channels['line_display_type'][current_channel] == 'ip_address':
-                    str_ip_cmd = "ip addr | " \
-                                 "grep 'state UP' -A2 | " \
-                                 "tail -n1 | " \
-                                 "awk '{print $2}' | " \
-                                 "cut -f1  -d'/'"
-                    ip_out, _, _ = cmd_output(str_ip_cmd)
-                    lines_display[current_line] = ip_out.rstrip().decode("utf-8")
-            except Exception as err:
-                # self.logger.exception("Generating line")
-                self.logger.error("Error generating channel {} line: {}".format(current_channel, err))
-                lines_display[current_line] = "ERROR"
-
-        if self.current_line_set == len(self.line_sets) - 1:
-            self.current_line_set = 0
-        else:
-            self.current_line_set += 1
-
-        self.logger.debug("Displaying: {}".format(lines_display))
+        lines_display = self.display_lines.generate()
 
         # Display lines
-        self.device.lcd_init()
         self.device.lcd_write_lines(
             lines_display[0],
             lines_display[1],
@@ -1,19 +1,29 @@
 # coding=utf-8
+import collections
 import datetime
+import threading
+import time
 
 from flask_babel import lazy_gettext
 
 from mycodo.config_translations import TRANSLATIONS
-from mycodo.databases.models import Conversion
 from mycodo.databases.models import InputChannel
 from mycodo.inputs.base_input import AbstractInput
 from mycodo.utils.actions import run_input_actions
 from mycodo.utils.constraints_pass import constraints_pass_positive_value
 from mycodo.utils.database import db_retrieve_table_daemon
-from mycodo.utils.influx import add_measurements_influxdb
+from mycodo.utils.influx import measurements_to_points, queue_points
 from mycodo.utils.inputs import parse_measurement
+from mycodo.utils.mqtt_subscribe import mqtt_subscribe, mqtt_unsubscribe
+from mycodo.utils.mqtt_topics import TopicTrie
 from mycodo.utils.utils import random_alphanumeric
 
+# Maximum number of messages waiting to be stored (the oldest are dropped)
+QUEUE_MAX = 100000
+
+# Seconds between logging the rate of received messages
+REPORT_SEC = 600
+
 # Measurements
 measurements_dict = {}
 
@@ -125,6 +135,15 @@ INPUT_INFORMATION = {
             'required': False,
             'name': 'Use Websockets',
             'phrase': 'Use websockets to connect to the server.'
+        },
+        {
+            'id': 'write_interval',
+            'type': 'float',
+            'default_value': 1.0,
+            'required': True,
+            'constraints_pass': constraints_pass_positive_value,
+            'name': 'Write Interval (Seconds)',
+            'phrase': 'Received measurements are stored in batches at this interval'
         }
     ],
 
@@ -143,7 +162,7 @@ INPUT_INFORMATION = {
             'default_value': '',
             'required': True,
             'name': 'Subscription Topic',
-            'phrase': 'The MQTT topic to subscribe to'
+            'phrase': 'The MQTT topic to subscribe to (may contain the + and # wildcards)'
         }
     ]
 }
@@ -156,11 +175,10 @@ class InputModule(AbstractInput):
         super().__init__(input_dev, testing=testing, name=__name__)
 
         self.log_level_debug = None
-        self.client = None
+        self.subscription = None
 
         self.mqtt_hostname = None
         self.mqtt_port = None
-        self.mqtt_channel = None
         self.mqtt_keepalive = None
         self.mqtt_clientid = None
         self.mqtt_login = None
@@ -168,6 +186,16 @@ class InputModule(AbstractInput):
         self.mqtt_username = None
         self.mqtt_password = None
         self.mqtt_use_websockets = None
+        self.write_interval = None
+
+        # Received measurements, stored by writer() in batches
+        self.topics = TopicTrie()
+        self.received = collections.deque(maxlen=QUEUE_MAX)
+        self.stop_event = threading.Event()
+        self.messages_received = 0
+        self.messages_dropped = 0
+        self.lag_max = 0
+        self.timer_report = time.monotonic()
 
         if not testing:
             self.setup_custom_options(
@@ -175,8 +203,6 @@ class InputModule(AbstractInput):
             self.try_initialize()
 
     def initialize(self):
-        import paho.mqtt.client as mqtt
-
         self.log_level_debug = self.input_dev.log_level_debug
 
         input_channels = db_retrieve_table_daemon(
@@ -184,72 +210,40 @@ class InputModule(AbstractInput):
         self.options_channels = self.setup_custom_channel_options_json(
             INPUT_INFORMATION['custom_channel_options'], input_channels)
 
-        self.client = mqtt.Client(
-            self.mqtt_clientid,
-            transport='websockets' if self.mqtt_use_websockets else 'tcp')
-        self.logger.debug(f"Client created with ID {self.mqtt_clientid}")
-        if self.mqtt_login:
-            if not self.mqtt_password:
-                self.mqtt_password = None
-            self.logger.debug("Sending username and password credentials")
-            self.client.username_pw_set(self.mqtt_username, self.mqtt_password)
-        if self.mqtt_use_tls:
-            self.client.tls_set()
+        for channel in self.channels_measurement:
+            self.topics.add(self.options_channels['subscribe_topic'][channel], channel)
 
     def listener(self):
         try:
-            self.callbacks_connect()
-            self.connect()
-            self.client.loop_start()
+            self.subscribe()
+            writer = threading.Thread(target=self.writer)
+            writer.daemon = True
+            writer.start()
         except:
             self.logger.exception("Input listener error")
 
-    def callbacks_connect(self):
-        """Connect the callback functions."""
-        try:
-            self.logger.debug("Connecting MQTT callback functions")
-            self.client.on_connect = self.on_connect
-            self.client.on_disconnect = self.on_disconnect
-            self.client.on_message = self.on_message
-            self.client.on_subscribe = self.on_subscribe
-            self.logger.debug("MQTT callback functions connected")
-        except:
-            self.logger.error("Unable to connect mqtt callback functions")
-
-    def connect(self):
-        """Set up the connection to the MQTT Server."""
-        try:
-            self.client.connect(
-                self.mqtt_hostname,
-                port=self.mqtt_port,
-                keepalive=self.mqtt_keepalive)
-            self.logger.info(f"Connected to {self.mqtt_hostname} as {self.mqtt_clientid}")
-        except:
-            self.logger.error(f"Could not connect to mqtt host: {self.mqtt_hostname}:{self.mqtt_port}")
-
     def subscribe(self):
-        """Set up the subscriptions to the proper MQTT channels to listen to."""
-        try:
-            for channel in self.channels_measurement:
-                self.logger.debug(f"Subscribing to MQTT topic '{self.channels_measurement[channel].name}'")
-                self.client.subscribe(self.options_channels['subscribe_topic'][channel])
-        except:
-            self.logger.error(f"Could not subscribe to MQTT channel '{self.mqtt_channel}'")
-
-    def on_connect(self, client, obj, flags, rc):
-        self.logger.debug(f"Connected: {rc}")
-        self.subscribe()
-
-    def on_disconnect(self, client, userdata, rc):
-        self.logger.debug(f"Disconnected: {rc}")
-
-    def on_subscribe(self, client, obj, mid, granted_qos):
-        self.logger.debug(f"Subscribed to mqtt topic: {self.mqtt_channel}, {mid}, {granted_qos}")
-
-    def on_log(self, mqttc, obj, level, string):
-        self.logger.info(f"Log: {string}")
+        """Subscribe to the topics of the channels over the daemon's shared connection to the server."""
+        auth = None
+        if self.mqtt_login:
+            self.logger.debug("Sending username and password credentials")
+            auth = {'username': self.mqtt_username, 'password': self.mqtt_password or None}
+
+        topics = self.topics.filters()
+        self.logger.debug(f"Subscribing to MQTT topics {topics}")
+        self.subscription = mqtt_subscribe(
+            topics,
+            self.on_message,
+            hostname=self.mqtt_hostname,
+            port=self.mqtt_port,
+            client_id=self.mqtt_clientid,
+            keepalive=self.mqtt_keepalive,
+            auth=auth,
+            transport='websockets' if self.mqtt_use_websockets else 'tcp',
+            tls=self.mqtt_use_tls)
 
     def on_message(self, client, userdata, msg):
+        """Queue the value of a message, to be stored by writer()."""
         try:
             payload = msg.payload.decode()
             self.logger.debug(f"Received message: topic: {msg.topic}, payload: {payload}")
@@ -257,58 +251,93 @@ class InputModule(AbstractInput):
             self.logger.error(f"Payload could not be decoded: {exc}")
             return
 
-        datetime_utc = datetime.datetime.utcnow()
-        measurement = {}
-        channel = None
-        for each_channel in self.channels_measurement:
-            if self.options_channels['subscribe_topic'][each_channel] == msg.topic:
-                self.logger.debug(f"Found channel {each_channel} with topic '{self.options_channels['subscribe_topic'][each_channel]}'")
-                channel = each_channel
-
-        if channel is None:
+        channels = self.topics.match(msg.topic)
+        if not channels:
             self.logger.error(f"Could not determine channel for topic '{msg.topic}'")
             return
 
         try:
             value = float(payload)
-            self.logger.debug(f"Payload represents a float: {value}")
-            measurement[channel] = {}
-            measurement[channel]['measurement'] = self.channels_measurement[channel].measurement
-            measurement[channel]['unit'] = self.channels_measurement[channel].unit
-            measurement[channel]['value'] = value
-            measurement[channel]['timestamp_utc'] = datetime_utc
-            measurement = self.check_conversion(channel, measurement)
-
-            if measurement:
-                message, measurement = run_input_actions(self.unique_id, "", measurement, self.log_level_debug)
-
-                self.logger.debug(f"Adding measurement to influxdb: {measurement}")
-                add_measurements_influxdb(
-                    self.unique_id,
-                    measurement,
-                    use_same_timestamp=INPUT_INFORMATION['measurements_use_same_timestamp'])
         except Exception as err:
             self.logger.error(f"Error processing message payload '{payload}': {err}")
+            return
+
+        self.messages_received += 1
+        if len(self.received) == self.received.maxlen:
+            self.messages_dropped += 1
+        self.received.append((channels, value, datetime.datetime.utcnow(), time.monotonic()))
+
+    def writer(self):
+        """Store the queued measurements every write_interval seconds."""
+        while not self.stop_event.wait(self.write_interval):
+            try:
+                self.write_received()
+            except:
+                self.logger.exception("Storing measurements")
+        self.write_received()
+
+    def write_received(self):
+        points = []
+        count = 0
+        lag_max = 0
+        while self.received:
+            channels, value, datetime_utc, time_received = self.received.popleft()
+            count += 1
+            lag_max = max(lag_max, time.monotonic() - time_received)
+            for channel in channels:
+                measurement = {
+                    channel: {
+                        'measurement': self.channels_measurement[channel].measurement,
+                        'unit': self.channels_measurement[channel].unit,
+                        'value': value,
+                        'timestamp_utc': datetime_utc
+                    }
+                }
+                measurement = self.check_conversion(channel, measurement)
+                message, measurement = run_input_actions(
+                    self.unique_id, "", measurement, self.log_level_debug)
+                points.extend(measurements_to_points(
+                    self.unique_id,
+                    measurement,
+                    use_same_timestamp=INPUT_INFORMATION['measurements_use_same_timestamp']))
+
+        if points:
+            queue_points(points)
+        if count:
+            self.logger.debug(f"Stored {len(points)} measurements of {count} messages, maximum lag {lag_max:.3f} s")
+        self.report(lag_max)
+
+    def report(self, lag_max):
+        """Log the rate of received messages every REPORT_SEC seconds."""
+        self.lag_max = max(self.lag_max, lag_max)
+        now = time.monotonic()
+        if now - self.timer_report < REPORT_SEC:
+            return
+        if self.messages_received:
+            self.logger.info(
+                f"Received {self.messages_received / (now - self.timer_report):.1f} messages/s, "
+                f"maximum lag {self.lag_max:.3f} s"
+                f"{f', dropped {self.messages_dropped} messages' if self.messages_dropped else ''}")
+        self.timer_report = now
+        self.messages_received = 0
+        self.messages_dropped = 0
+        self.lag_max = 0
 
     def check_conversion(self, channel, measurement):
         # Convert value/unit is conversion_id present and valid
         try:
-            if self.channels_conversion[channel]:
-                conversion = db_retrieve_table_daemon(
-                    Conversion,
-                    unique_id=self.channels_measurement[channel].conversion_id)
-                if conversion:
-                    meas = parse_measurement(
-                        self.channels_conversion[channel],
-                        self.channels_measurement[channel],
-                        measurement,
-                        channel,
-                        measurement[channel],
-                        timestamp=measurement[channel]['timestamp_utc'])
-
-                    measurement[channel]['measurement'] = meas[channel]['measurement']
-                    measurement[channel]['unit'] = meas[channel]['unit']
-                    measurement[channel]['value'] = meas[channel]['value']
+            if self.channels_conversion.get(channel):
+                meas = parse_measurement(
+                    self.channels_conversion[channel],
+                    self.channels_measurement[channel],
+                    measurement,
+                    channel,
+                    measurement[channel],
+                    timestamp=measurement[channel]['timestamp_utc'])
+
+                measurement[channel]['measurement'] = meas[channel]['measurement']
+                measurement[channel]['unit'] = meas[channel]['unit']
+                measurement[channel]['value'] = meas[channel]['value']
         except:
             self.logger.exception("Checking conversion")
 
@@ -317,5 +346,6 @@ class InputModule(AbstractInput):
     def stop_input(self):
         """Called when Input is deactivated."""
         self.running = False
-        self.client.loop_stop()
-        self.client.disconnect()
+        if self.subscription:
+            mqtt_unsubscribe(self.subscription)
+        self.stop_event.set()
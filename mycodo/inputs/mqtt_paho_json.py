@@ -1,6 +1,8 @@
 # coding=utf-8
+import collections
 import datetime
 import json
+import threading
 
 from flask_babel import lazy_gettext
 from mycodo.utils.actions import run_input_actions
@@ -10,10 +12,14 @@ from mycodo.databases.models import InputChannel
 from mycodo.inputs.base_input import AbstractInput
 from mycodo.utils.constraints_pass import constraints_pass_positive_value
 from mycodo.utils.database import db_retrieve_table_daemon
-from mycodo.utils.influx import add_measurements_influxdb
+from mycodo.utils.influx import measurements_to_points, queue_points
 from mycodo.utils.inputs import parse_measurement
+from mycodo.utils.mqtt_subscribe import mqtt_subscribe, mqtt_unsubscribe
 from mycodo.utils.utils import random_alphanumeric
 
+# Maximum number of messages waiting to be stored (the oldest are dropped)
+QUEUE_MAX = 100000
+
 # Measurements
 measurements_dict = {}
 
@@ -140,6 +146,15 @@ INPUT_INFORMATION = {
             'required': False,
             'name': 'Use Websockets',
             'phrase': 'Use websockets to connect to the server.'
+        },
+        {
+            'id': 'write_interval',
+            'type': 'float',
+            'default_value': 1.0,
+            'required': True,
+            'constraints_pass': constraints_pass_positive_value,
+            'name': 'Write Interval (Seconds)',
+            'phrase': 'Received measurements are stored in batches at this interval'
         }
     ],
 
@@ -171,7 +186,7 @@ class InputModule(AbstractInput):
         super().__init__(input_dev, testing=testing, name=__name__)
 
         self.log_level_debug = None
-        self.client = None
+        self.subscription = None
         self.jmespath = None
         self.options_channels = None
 
@@ -185,6 +200,12 @@ class InputModule(AbstractInput):
         self.mqtt_username = None
         self.mqtt_password = None
         self.mqtt_use_websockets = None
+        self.write_interval = None
+
+        # Received payloads, parsed and stored by writer() in batches, so
+        # the shared connection isn't held up by the Input
+        self.received = collections.deque(maxlen=QUEUE_MAX)
+        self.stop_event = threading.Event()
 
         if not testing:
             self.setup_custom_options(
@@ -192,7 +213,6 @@ class InputModule(AbstractInput):
             self.try_initialize()
 
     def initialize(self):
-        import paho.mqtt.client as mqtt
         import jmespath
 
         self.jmespath = jmespath
@@ -203,73 +223,37 @@ class InputModule(AbstractInput):
         self.options_channels = self.setup_custom_channel_options_json(
             INPUT_INFORMATION['custom_channel_options'], input_channels)
 
-        self.client = mqtt.Client(
-            self.mqtt_clientid,
-            transport='websockets' if self.mqtt_use_websockets else 'tcp')
-        self.logger.debug("Client created with ID {}".format(self.mqtt_clientid))
-        if self.mqtt_login:
-            if not self.mqtt_password:
-                self.mqtt_password = None
-            self.logger.debug("Sending username and password credentials")
-            self.client.username_pw_set(self.mqtt_username, self.mqtt_password)
-        if self.mqtt_use_tls:
-            self.client.tls_set()
-
     def listener(self):
-        self.callbacks_connect()
-        self.connect()
-        self.client.loop_start()
-
-    def callbacks_connect(self):
-        """Connect the callback functions."""
         try:
-            self.logger.debug("Connecting MQTT callback functions")
-            self.client.on_connect = self.on_connect
-            self.client.on_disconnect = self.on_disconnect
-            self.client.on_message = self.on_message
-            self.client.on_subscribe = self.on_subscribe
-            self.logger.debug("MQTT callback functions connected")
+            self.subscribe()
+            writer = threading.Thread(target=self.writer)
+            writer.daemon = True
+            writer.start()
         except:
-            self.logger.error("Unable to connect mqtt callback functions")
-
-    def connect(self):
-        """Set up the connection to the MQTT Server."""
-        try:
-            self.client.connect(
-                self.mqtt_hostname,
-                port=self.mqtt_port,
-                keepalive=self.mqtt_keepalive)
-            self.logger.info("Connected to {} as {}".format(
-                self.mqtt_hostname, self.mqtt_clientid))
-        except:
-            self.logger.error("Could not connect to mqtt host: {}:{}".format(
-                self.mqtt_hostname, self.mqtt_port))
+            self.logger.exception("Input listener error")
 
     def subscribe(self):
-        """Subscribe to the proper MQTT channel to listen to."""
-        try:
-            self.logger.debug("Subscribing to MQTT topic '{}'".format(
-                self.mqtt_channel))
-            self.client.subscribe(self.mqtt_channel)
-        except:
-            self.logger.error("Could not subscribe to MQTT channel '{}'".format(
-                self.mqtt_channel))
-
-    def on_connect(self, client, obj, flags, rc):
-        self.logger.debug(f"Connected: {rc}")
-        self.subscribe()
-
-    def on_disconnect(self, client, userdata, rc):
-        self.logger.debug(f"Disconnected: {rc}")
-
-    def on_subscribe(self, client, obj, mid, granted_qos):
-        self.logger.debug("Subscribed to mqtt topic: {}, {}, {}".format(
-            self.mqtt_channel, mid, granted_qos))
-
-    def on_log(self, mqttc, obj, level, string):
-        self.logger.info("Log: {}".format(string))
+        """Subscribe to the topic over the daemon's shared connection to the server."""
+        auth = None
+        if self.mqtt_login:
+            self.logger.debug("Sending username and password credentials")
+            auth = {'username': self.mqtt_username, 'password': self.mqtt_password or None}
+
+        self.logger.debug("Subscribing to MQTT topic '{}'".format(
+            self.mqtt_channel))
+        self.subscription = mqtt_subscribe(
+            [self.mqtt_channel],
+            self.on_message,
+            hostname=self.mqtt_hostname,
+            port=self.mqtt_port,
+            client_id=self.mqtt_clientid,
+            keepalive=self.mqtt_keepalive,
+            auth=auth,
+            transport='websockets' if self.mqtt_use_websockets else 'tcp',
+            tls=self.mqtt_use_tls)
 
     def on_message(self, client, userdata, msg):
+        """Queue the payload of a message, to be stored by writer()."""
         try:
             payload = msg.payload.decode()
             self.logger.debug(
@@ -280,15 +264,46 @@ class InputModule(AbstractInput):
                 "Payload could not be decoded: {}".format(exc))
             return
 
+        if len(self.received) == self.received.maxlen:
+            self.logger.error("Too many messages waiting to be stored: dropping the oldest")
+        self.received.append((payload, datetime.datetime.utcnow()))
+
+    def writer(self):
+        """Store the queued measurements every write_interval seconds."""
+        while not self.stop_event.wait(self.write_interval):
+            try:
+                self.write_received()
+            except:
+                self.logger.exception("Storing measurements")
+        self.write_received()
+
+    def write_received(self):
+        points = []
+        while self.received:
+            payload, datetime_utc = self.received.popleft()
+            measurement = self.parse_payload(payload, datetime_utc)
+            if measurement is None:
+                continue
+            message, measurement = run_input_actions(self.unique_id, "", measurement, self.log_level_debug)
+            self.logger.debug(f"Adding measurement to influxdb: {measurement}")
+            points.extend(measurements_to_points(
+                self.unique_id,
+                measurement,
+                use_same_timestamp=INPUT_INFORMATION['measurements_use_same_timestamp']))
+
+        if points:
+            queue_points(points)
+
+    def parse_payload(self, payload, datetime_utc):
+        """Return the measurements of the channels found in a JSON payload, or None if it isn't JSON."""
         try:
             json_values = json.loads(payload)
         except ValueError as err:
             self.logger.error(
                 "Error parsing payload '{}' as JSON: {} ".format(
-                    msg.payload.decode(), err))
-            return
+                    payload, err))
+            return None
 
-        datetime_utc = datetime.datetime.utcnow()
         measurement = {}
         for each_channel in self.channels_measurement:
             json_name = self.options_channels['json_name'][each_channel]
@@ -309,14 +324,7 @@ class InputModule(AbstractInput):
                 self.logger.error(
                     "Error in JSON '{}' finding '{}': {}".format(
                         json_values, json_name, err))
-
-        message, measurement = run_input_actions(self.unique_id, "", measurement, self.log_level_debug)
-
-        self.logger.debug(f"Adding measurement to influxdb: {measurement}")
-        add_measurements_influxdb(
-            self.unique_id,
-            measurement,
-            use_same_timestamp=INPUT_INFORMATION['measurements_use_same_timestamp'])
+        return measurement
 
     def check_conversion(self, channel, measurement):
         # Convert value/unit is conversion_id present and valid
@@ -345,5 +353,6 @@ class InputModule(AbstractInput):
     def stop_input(self):
         """Called when Input is deactivated."""
         self.running = False
-        self.client.loop_stop()
-        self.client.disconnect()
+        if self.subscription:
+            mqtt_unsubscribe(self.subscription)
+        self.stop_event.set()
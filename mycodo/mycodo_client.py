@@ -27,15 +27,20 @@ import logging
 import os
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 import Pyro5.errors
-from Pyro5.api import Proxy
+from Pyro5 import config as pyro_config
+from Pyro5.serializers import serializers as pyro_serializers
 
 sys.path.append(os.path.abspath(os.path.join(os.path.realpath(__file__), '../..')))
 
 from mycodo.config import PYRO_URI
 from mycodo.databases.models import SMTP, Misc
+from mycodo.utils.config_cache import config_changes_wait_sent
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.pyro_pool import pyro_proxy
 from mycodo.utils.send_data import send_email as send_email_notification
 from mycodo.utils.widget_generate_html import generate_widget_html
 
@@ -46,6 +51,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+local_server = None
+
+
+def set_local_server(server):
+    """
+    Register the Pyro server of the daemon running in this process
+
+    DaemonControl instances in the daemon process call the methods of the
+    registered server directly instead of connecting to it through Pyro.
+
+    :param server: PyroServer instance, or None to connect through Pyro
+    """
+    global local_server
+    local_server = server
+
+
+class LocalProxy:
+    """
+    Call the methods of a Pyro server in the same process as a Proxy would
+
+    Arguments and return values are passed through the Pyro serializer, so
+    the caller and server don't share objects and receive the same types as
+    they would over a connection. Calls are run by a pool of threads the
+    size of the Pyro server's, and Pyro5.errors.TimeoutError is raised if a
+    call doesn't return within _pyroTimeout seconds. The call is left to
+    finish, as it would be by the server if a remote client timed out.
+    """
+    executor = None
+
+    def __init__(self, server, timeout=None):
+        self._pyroServer = server
+        self._pyroTimeout = timeout
+        self._pyroSerializer = pyro_serializers[pyro_config.SERIALIZER]
+        if LocalProxy.executor is None:
+            LocalProxy.executor = ThreadPoolExecutor(
+                max_workers=pyro_config.THREADPOOL_SIZE, thread_name_prefix='local_proxy')
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self._pyroServer, name)
+
+        def call(*args, **kwargs):
+            return self._pyroCall(method, args, kwargs)
+        return call
+
+    def _pyroCall(self, method, args, kwargs):
+        serializer = self._pyroSerializer
+        args, kwargs = serializer.loads(serializer.dumps((args, kwargs)))
+        future = self.executor.submit(method, *args, **kwargs)
+        try:
+            result = future.result(timeout=self._pyroTimeout or None)
+        except FutureTimeoutError:
+            raise Pyro5.errors.TimeoutError("receiving: timeout")
+        return serializer.loads(serializer.dumps(result))
+
 
 class DaemonControl:
     """Communicate with the daemon to execute commands or retrieve information."""
@@ -63,16 +124,32 @@ class DaemonControl:
         self.uri= pyro_uri
 
     def proxy(self, timeout=None):
+        # Let the daemon refresh the configuration this process changed before acting on it
+        config_changes_wait_sent()
         try:
-            proxy = Proxy(self.uri)
-            if timeout:
-                proxy._pyroTimeout = timeout
-            else:
-                proxy._pyroTimeout = self.pyro_timeout
-            return proxy
+            if local_server is not None and self.uri == PYRO_URI:
+                return LocalProxy(local_server, timeout=timeout or self.pyro_timeout)
+            return pyro_proxy(self.uri, timeout=timeout or self.pyro_timeout)
         except Exception as e:
             logger.error(f"Pyro5 proxy error: {e}")
 
+    def call_many(self, calls, return_exceptions=False):
+        """
+        Call several methods of the daemon with one request
+
+        :param calls: list of (method, args) or (method, args, kwargs)
+        :param return_exceptions: return the exception raised by a call in
+            place of its result, instead of raising the first one
+        :return: the result of each call, in order
+        :rtype: list
+        """
+        results = []
+        for succeeded, result in self.proxy().call_many([list(each_call) for each_call in calls]):
+            if not succeeded and not return_exceptions:
+                raise result
+            results.append(result)
+        return results
+
     #
     # Status functions
     #
@@ -106,12 +183,24 @@ class DaemonControl:
         finally:
             proxy._pyroTimeout = old_timeout
 
+    def config_cache_stats(self):
+        return self.proxy().config_cache_stats()
+
+    def config_changed(self, table, ids=None):
+        return self.proxy().config_changed(table, ids)
+
     def controller_is_active(self, controller_id):
         return self.proxy().controller_is_active(controller_id)
 
     def daemon_status(self):
         return self.proxy().daemon_status()
 
+    def influxdb_client_stats(self):
+        return self.proxy().influxdb_client_stats()
+
+    def influxdb_write_queue_stats(self):
+        return self.proxy().influxdb_write_queue_stats()
+
     def is_in_virtualenv(self):
         return self.proxy().is_in_virtualenv()
 
@@ -192,6 +281,35 @@ class DaemonControl:
     def get_condition_measurement_dict(self, condition_id):
         return self.proxy().get_condition_measurement_dict(condition_id)
 
+    def last_measurement_cached(self, unique_id, unit, channel, measure=None, duration_sec=None):
+        return self.proxy().last_measurement_cached(
+            unique_id, unit, channel, measure=measure, duration_sec=duration_sec)
+
+    def last_measurements_cached(self, measurements):
+        return self.proxy().last_measurements_cached(measurements)
+
+    def last_measurement_cache_stats(self):
+        return self.proxy().last_measurement_cache_stats()
+
+    def last_measurement_cache_invalidate(self, unique_ids=None):
+        return self.proxy().last_measurement_cache_invalidate(unique_ids)
+
+    def mqtt_publisher_stats(self):
+        return self.proxy().mqtt_publisher_stats()
+
+    def mqtt_subscriber_stats(self):
+        return self.proxy().mqtt_subscriber_stats()
+
+    def startup_timeline(self):
+        return self.proxy().startup_timeline()
+
+    def scheduler_stats(self):
+        return self.proxy().scheduler_stats()
+
+    def recent_measurements(self, series, timeout=0):
+        return self.proxy(timeout=self.pyro_timeout + timeout).recent_measurements(
+            series, timeout=timeout)
+
     #
     # Output Controller
     #
@@ -36,11 +36,16 @@ import threading
 import time
 import timeit
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from logging import handlers
 
 from Pyro5.api import Proxy, expose, serve
 
-from mycodo.config import (DAEMON_LOG_FILE, DOCKER_CONTAINER, MYCODO_DB_PATH,
+from mycodo.config import (CONTROLLER_SCHEDULER_WORKERS,
+                           CONTROLLER_SHUTDOWN_TIMEOUT,
+                           CONTROLLER_STARTUP_TIMEOUT,
+                           CONTROLLER_STARTUP_WORKERS, CONTROLLER_TIERS,
+                           DAEMON_LOG_FILE, DOCKER_CONTAINER, MYCODO_DB_PATH,
                            MYCODO_VERSION, STATS_CSV, STATS_INTERVAL,
                            UPGRADE_CHECK_INTERVAL)
 from mycodo.controllers.controller_conditional import ConditionalController
@@ -54,12 +59,31 @@ from mycodo.databases.models import (PID, Camera, Conditional,
                                      CustomController, Input, Misc, Trigger)
 from mycodo.databases.utils import session_scope
 from mycodo.devices.camera import camera_record
+from mycodo.mycodo_client import set_local_server
 from mycodo.utils.actions import (get_condition_value,
                                   get_condition_value_dict,
                                   parse_action_information, trigger_action,
                                   trigger_controller_actions)
+from mycodo.utils.config_cache import (config_cache_enable,
+                                       config_cache_stats, config_changed)
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.github_release_info import MycodoRelease
+from mycodo.utils.influx import (influxdb_client_invalidate,
+                                 influxdb_client_stats,
+                                 influxdb_write_queue_start,
+                                 influxdb_write_queue_stats,
+                                 influxdb_write_queue_stop,
+                                 last_measurement_cache_enable,
+                                 last_measurement_cache_invalidate,
+                                 last_measurement_cache_stats,
+                                 last_measurement_cached,
+                                 last_measurements_cached,
+                                 recent_measurements,
+                                 recent_measurements_enable)
+from mycodo.utils.mqtt_publish import mqtt_publisher_stats, mqtt_publisher_stop
+from mycodo.utils.mqtt_subscribe import mqtt_subscriber_stats, mqtt_subscriber_stop
+from mycodo.utils.option_store import option_store_start, option_store_stop
+from mycodo.utils.scheduler import Scheduler
 from mycodo.utils.stats import (add_update_csv, recreate_stat_file,
                                 return_stat_file_dict, send_anonymous_stats)
 from mycodo.utils.tools import generate_output_usage_report, next_schedule
@@ -104,19 +128,27 @@ class DaemonController:
             'Function': {}
         }
 
-        # Controllers that may launch multiple threads
-        # Order matters for starting and shutting down
-        self.cont_types = [
-            'Conditional',
-            'Trigger',
-            'Input',
-            'PID',
-            'Function'
-        ]
-
         # Dashboard widgets
         self.dashboard_widget = {}
 
+        # Time each controller took to start, shown on the System Information page
+        self.startup_timeline = []
+
+        # Pools of threads that run the loop() of each type of controller when it's due
+        self.scheduler = {}
+        for cont_type, workers in CONTROLLER_SCHEDULER_WORKERS.items():
+            if workers:
+                self.scheduler[cont_type] = Scheduler(workers, name=cont_type)
+
+        # Keep the last value of each measurement written by the daemon in memory
+        last_measurement_cache_enable()
+
+        # Keep the recent points of each measurement written by the daemon in memory
+        recent_measurements_enable()
+
+        # Serve configuration tables from memory, refreshed when they're changed
+        config_cache_enable()
+
         self.thread_shutdown_timer = None
         self.start_time = time.time()
         self.timer_stats = time.time() + 120
@@ -139,6 +171,12 @@ class DaemonController:
     def run(self):
         self.load_actions()
 
+        # Start the measurement write queue (also writes any spooled measurements)
+        influxdb_write_queue_start()
+
+        # Keep the custom options of controllers in memory, written every OPTION_STORE_FLUSH_SEC
+        option_store_start()
+
         try:
             self.start_all_controllers()
         except Exception:
@@ -192,6 +230,19 @@ class DaemonController:
         # If the daemon errors or finishes, shut it down
         self.logger.debug("Stopping all running controllers")
         self.stop_all_controllers()
+        for each_scheduler in self.scheduler.values():
+            each_scheduler.stop()
+
+        # Close the connections Actions and Outputs published to MQTT servers with,
+        # and any subscriber connections left by Inputs that didn't stop
+        mqtt_publisher_stop()
+        mqtt_subscriber_stop()
+
+        # Write any custom options changed since the last flush
+        option_store_stop()
+
+        # Write any measurements remaining in the write queue
+        influxdb_write_queue_stop()
 
         timer = timeit.default_timer() - self.thread_shutdown_timer
         self.logger.info(f"Mycodo daemon terminated in {timer:.3f} seconds\n\n")
@@ -275,9 +326,7 @@ class DaemonController:
                 new_session.commit()
 
         self.controller[cont_type][cont_id] = controller_manage['function'](ready, cont_id)
-        self.controller[cont_type][cont_id].daemon = True
-        self.controller[cont_type][cont_id].start()
-        ready.wait()  # wait for thread to return ready
+        self.controller_start(cont_type, cont_id, self.controller[cont_type][cont_id], ready)
 
         message = f"{cont_type} controller with ID {cont_id} activated."
         self.logger.debug(message)
@@ -711,6 +760,9 @@ class DaemonController:
             self.output_usage_report_span = misc.output_usage_report_span
             self.output_usage_report_day = misc.output_usage_report_day
             self.output_usage_report_hour = misc.output_usage_report_hour
+
+            # Measurement database settings may have changed
+            influxdb_client_invalidate()
         except Exception:
             self.logger.exception("Could not refresh misc settings")
 
@@ -835,10 +887,53 @@ class DaemonController:
     def load_actions(self):
         self.actions = parse_action_information()
 
+    def controller_start(self, cont_type, cont_id, controller, ready, name=None,
+                         timeout=CONTROLLER_STARTUP_TIMEOUT):
+        """
+        Start a controller and wait for it to be ready, adding it to the startup timeline
+
+        :return: whether the controller became ready within timeout seconds
+        :rtype: bool
+        """
+        controller.daemon = True
+        controller.scheduler = self.scheduler.get(cont_type)
+        timer = timeit.default_timer()
+        controller.start()
+        is_ready = ready.wait(timeout)
+        init_ms = (timeit.default_timer() - timer) * 1000
+
+        if not is_ready:
+            status = 'timed out'
+            self.logger.error(
+                f"{cont_type} controller {cont_id} wasn't ready after {timeout} seconds. "
+                f"It will continue to start in the background.")
+        elif controller.is_running():
+            status = 'running'
+        else:
+            status = 'not running'
+
+        if self.startup_time is not None:
+            return is_ready  # Only controllers started with the daemon are in the timeline
+
+        self.startup_timeline.append({
+            'type': cont_type,
+            'unique_id': cont_id,
+            'name': name,
+            'start_ms': (timer - self.startup_timer) * 1000,
+            'init_ms': init_ms,
+            'status': status
+        })
+        return is_ready
+
     def start_all_controllers(self):
         """
         Start all activated controllers
 
+        Controllers are started in tiers (see CONTROLLER_TIERS): Output, then
+        Input and Function, then PID, Conditional, and Trigger, then Widget.
+        The controllers of a tier are started in parallel, and the next tier
+        is started when they're all ready (or have timed out).
+
         See the files named controller_[name].py for details of what each
         controller does.
         """
@@ -850,94 +945,91 @@ class DaemonController:
             'Trigger': db_retrieve_table_daemon(Trigger, entry='all'),
             'Function': db_retrieve_table_daemon(CustomController, entry='all')
         }
+        controller_classes = {
+            'Conditional': ConditionalController,
+            'Input': InputController,
+            'PID': PIDController,
+            'Trigger': TriggerController,
+            'Function': FunctionController
+        }
+        self.startup_timeline = []
 
         self.logger.debug("Starting Output Controller")
         ready = threading.Event()
         self.controller['Output'] = OutputController(ready, debug)
-        self.controller['Output'].daemon = True
-        self.controller['Output'].start()
-        ready.wait()  # wait for thread to return ready
-
-        # Ensure Output controller has started before continuing
-        time.sleep(0.5)
-        output_controller_timout = time.time() + 60
-        while not self.controller['Output'].is_running():
-            if time.time() > output_controller_timout:
-                self.logger.error("Output Controller timed out")
-                break
-            time.sleep(0.1)
-        self.logger.debug("Output Controller fully started")
+        if self.controller_start('Output', None, self.controller['Output'], ready, name='Output'):
+            self.logger.debug("Output Controller fully started")
 
-        for each_controller in self.cont_types:
-            self.logger.debug(f"Starting all activated {each_controller} controllers")
-            for each_entry in db_tables[each_controller]:
-                if each_entry.is_activated:
-                    try:
-                        self.controller_activate(each_entry.unique_id)
-                    except Exception as except_msg:
-                        message = f"Could not activate controller with ID {each_entry.unique_id}: {except_msg}"
-                        self.logger.exception(message)
-                        return 1, message
-            self.logger.info(f"All activated {each_controller} controllers started")
+        def start(cont_type, entry):
+            try:
+                ready = threading.Event()
+                self.controller[cont_type][entry.unique_id] = controller_classes[cont_type](ready, entry.unique_id)
+                self.controller_start(
+                    cont_type, entry.unique_id, self.controller[cont_type][entry.unique_id], ready,
+                    name=entry.name)
+            except Exception as except_msg:
+                self.logger.exception(f"Could not activate controller with ID {entry.unique_id}: {except_msg}")
+
+        for each_tier in CONTROLLER_TIERS:
+            timer = timeit.default_timer()
+            with ThreadPoolExecutor(max_workers=CONTROLLER_STARTUP_WORKERS) as executor:
+                for each_controller in each_tier:
+                    self.logger.debug(f"Starting all activated {each_controller} controllers")
+                    for each_entry in db_tables[each_controller]:
+                        if each_entry.is_activated:
+                            executor.submit(start, each_controller, each_entry)
+            self.logger.info(
+                f"All activated {', '.join(each_tier)} controllers started in "
+                f"{timeit.default_timer() - timer:.3f} seconds")
 
         self.logger.debug("Starting Widget Controller")
         ready = threading.Event()
         self.controller['Widget'] = WidgetController(ready, debug)
-        self.controller['Widget'].daemon = True
-        self.controller['Widget'].start()
-        ready.wait()  # wait for thread to return ready
-
-        # Ensure Widget controller has started before continuing
-        time.sleep(0.5)
-        widget_controller_timout = time.time() + 60
-        while not self.controller['Widget'].is_running():
-            if time.time() > widget_controller_timout:
-                self.logger.error("Widget Controller timed out")
-                break
-            time.sleep(0.1)
-        self.logger.debug("Widget Controller fully started")
-
-        time.sleep(0.5)
+        if self.controller_start('Widget', None, self.controller['Widget'], ready, name='Widget'):
+            self.logger.debug("Widget Controller fully started")
 
     def stop_all_controllers(self):
-        """Stop all running controllers."""
-        controller_running = {}
-
-        # Reverse the list to shut down each controller in the
-        # reverse order they were started in
-        for each_controller in list(reversed(self.cont_types)):
-            controller_running[each_controller] = []
-            for cont_id in self.controller[each_controller]:
-                try:
-                    if self.controller[each_controller][cont_id].is_running():
-                        self.controller[each_controller][cont_id].stop_controller()
-                        controller_running[each_controller].append(cont_id)
-                except Exception as err:
-                    self.logger.info(f"{each_controller} controller {cont_id} thread had an issue stopping: {err}")
-            time.sleep(2.5)  # Give time for each controller type to stop before stopping the next type
+        """Stop all running controllers, in the reverse order of the tiers they were started in."""
+        try:
+            self.controller['Widget'].stop_controller()
+            self.controller['Widget'].join(CONTROLLER_SHUTDOWN_TIMEOUT)
+            self.logger.info("Widget controller stopped")
+        except Exception as err:
+            self.logger.info(f"Widget controller had an issue stopping: {err}")
 
-        for each_controller in list(reversed(self.cont_types)):
-            for cont_id in controller_running[each_controller]:
+        for each_tier in reversed(CONTROLLER_TIERS):
+            timer = timeit.default_timer()
+            controller_running = []
+            for each_controller in each_tier:
+                for cont_id in self.controller[each_controller]:
+                    try:
+                        if self.controller[each_controller][cont_id].is_running():
+                            self.controller[each_controller][cont_id].stop_controller()
+                            controller_running.append((each_controller, cont_id))
+                    except Exception as err:
+                        self.logger.info(f"{each_controller} controller {cont_id} thread had an issue stopping: {err}")
+
+            # The controllers of a tier stop at the same time, so wait for them together
+            end = time.time() + CONTROLLER_SHUTDOWN_TIMEOUT
+            for each_controller, cont_id in controller_running:
                 try:
-                    self.controller[each_controller][cont_id].join()
+                    self.controller[each_controller][cont_id].join(max(0, end - time.time()))
+                    if self.controller[each_controller][cont_id].is_running():
+                        self.logger.error(f"{each_controller} controller {cont_id} didn't stop "
+                                          f"within {CONTROLLER_SHUTDOWN_TIMEOUT} seconds")
                 except Exception as err:
                     self.logger.info(f"{each_controller} controller {cont_id} thread had an issue being joined: {err}")
-            self.logger.info(f"All {each_controller} controllers stopped")
+            self.logger.info(
+                f"All {', '.join(each_tier)} controllers stopped in "
+                f"{timeit.default_timer() - timer:.3f} seconds")
 
         try:
             self.controller['Output'].stop_controller()
-            self.controller['Output'].join(15)  # Give each thread 15 seconds to stop
+            self.controller['Output'].join(CONTROLLER_SHUTDOWN_TIMEOUT)
             self.logger.info("Output controller stopped")
         except Exception as err:
             self.logger.info(f"Output controller had an issue stopping: {err}")
 
-        try:
-            self.controller['Widget'].stop_controller()
-            self.controller['Widget'].join(15)  # Give each thread 15 seconds to stop
-            self.logger.info("Widget controller stopped")
-        except Exception as err:
-            self.logger.info(f"Widget controller had an issue stopping: {err}")
-
     def trigger_action(self, action_id, value={}, debug=False):
         try:
             return trigger_action(
@@ -1092,6 +1184,27 @@ class PyroServer(object):
     def __init__(self, mycodo):
         self.mycodo = mycodo
 
+    def call_many(self, calls):
+        """
+        Call several of these methods with one request
+
+        :param calls: list of [method, args] or [method, args, kwargs]
+        :return: [succeeded, result or exception] of each call, in order
+        :rtype: list
+        """
+        results = []
+        for method, args, *kwargs in calls:
+            try:
+                if method.startswith('_') or method == 'call_many':
+                    raise AttributeError(f"'{method}' can't be called")
+                results.append([True, getattr(self, method)(*args, **(kwargs[0] if kwargs else {}))])
+            except Exception as err:
+                if type(err).__module__ not in ['builtins', 'Pyro5.errors']:
+                    # Only these can be deserialized by the client
+                    err = Exception(f"{type(err).__name__}: {err}")
+                results.append([False, err])
+        return results
+
     def lcd_reset(self, lcd_id):
         """Resets an LCD."""
         return self.mycodo.lcd_reset(lcd_id)
@@ -1274,6 +1387,73 @@ class PyroServer(object):
         """
         return 'alive'
 
+    @staticmethod
+    def config_changed(table, ids=None):
+        """Refresh the cached rows of a configuration table after they were changed."""
+        return config_changed(table, ids)
+
+    @staticmethod
+    def config_cache_stats():
+        """Return the row counts and hit rates of the configuration cache."""
+        return config_cache_stats()
+
+    @staticmethod
+    def influxdb_client_stats():
+        """Return the InfluxDB client connection counters of the daemon."""
+        return influxdb_client_stats()
+
+    @staticmethod
+    def last_measurement_cached(unique_id, unit, channel, measure=None, duration_sec=None):
+        """Return the last measurement held in memory by the daemon, or None if not held."""
+        return last_measurement_cached(
+            unique_id, unit, channel, measure=measure, duration_sec=duration_sec)
+
+    @staticmethod
+    def last_measurements_cached(measurements):
+        """Return several last measurements held in memory by the daemon."""
+        return last_measurements_cached(measurements)
+
+    @staticmethod
+    def last_measurement_cache_stats():
+        """Return the hit/miss counters of the last measurement cache."""
+        return last_measurement_cache_stats()
+
+    def startup_timeline(self):
+        """Return the time each controller took to start when the daemon started."""
+        return {
+            'startup_sec': self.mycodo.startup_time,
+            'controllers': sorted(self.mycodo.startup_timeline, key=lambda each: each['start_ms'])
+        }
+
+    def scheduler_stats(self):
+        """Return the workers, jobs, and lateness of each controller scheduler."""
+        return [self.mycodo.scheduler[cont_type].stats() for cont_type in sorted(self.mycodo.scheduler)]
+
+    @staticmethod
+    def last_measurement_cache_invalidate(unique_ids=None):
+        """Forget the last measurements of devices written by another process."""
+        return last_measurement_cache_invalidate(unique_ids)
+
+    @staticmethod
+    def mqtt_publisher_stats():
+        """Return the state and message counters of the pooled MQTT publish connections."""
+        return mqtt_publisher_stats()
+
+    @staticmethod
+    def mqtt_subscriber_stats():
+        """Return the state and counters of the shared MQTT subscriber connections."""
+        return mqtt_subscriber_stats()
+
+    @staticmethod
+    def recent_measurements(series, timeout=0):
+        """Return the points after a time held in memory by the daemon, waiting up to timeout for new points."""
+        return recent_measurements(series, timeout=timeout)
+
+    @staticmethod
+    def influxdb_write_queue_stats():
+        """Return the measurement write queue metrics of the daemon."""
+        return influxdb_write_queue_stats()
+
     @staticmethod
     def is_in_virtualenv():
         """Returns True if this script is running in a virtualenv."""
@@ -1299,12 +1479,16 @@ class PyroDaemon(threading.Thread):
 
         self.logger = logging.getLogger('mycodo.pyro_daemon')
         self.mycodo = mycodo
+        self.pyro_server = PyroServer(self.mycodo)
+
+        # Calls from DaemonControl in the daemon don't need to go through Pyro
+        set_local_server(self.pyro_server)
 
     def run(self):
         try:
             self.logger.info("Starting Pyro5 daemon")
             serve({
-                PyroServer(self.mycodo): 'mycodo.pyro_server',
+                self.pyro_server: 'mycodo.pyro_server',
             }, host="0.0.0.0", port=9080, use_ns=False)
         except Exception:
             self.logger.exception("PyroDaemon")
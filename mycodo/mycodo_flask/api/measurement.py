@@ -4,15 +4,25 @@ import logging
 import traceback
 
 import flask_login
+from flask import Response, request
 from flask_accept import accept
 from flask_restx import Resource, abort, fields
 
-from mycodo.databases.models import Unit
+from mycodo.config import (INGEST_MAX_POINTS, STREAM_LIMIT_DEFAULT,
+                           STREAM_LIMIT_MAX)
 from mycodo.mycodo_flask.api import api, default_responses
 from mycodo.mycodo_flask.utils import utils_general
-from mycodo.utils.influx import (read_influxdb_list, read_influxdb_single,
-                                 valid_date_str, write_influxdb_value)
-from mycodo.utils.system_pi import add_custom_units
+from mycodo.utils.influx import (WRITE_SPOOLED, epoch_to_rfc3339,
+                                 query_series_stream, read_influxdb_list,
+                                 read_influxdb_single, valid_date_str,
+                                 write_influxdb_points, write_influxdb_value)
+from mycodo.utils.measurement_ingest import (INGEST_FORMATS,
+                                             parse_measurements, unit_set,
+                                             validate_measurements)
+from mycodo.utils.measurement_stream import (STREAM_AGGREGATE_FUNCTIONS,
+                                             STREAM_ENCODERS, STREAM_FORMATS,
+                                             skip_received)
+from mycodo.utils.system_pi import str_is_float
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +47,19 @@ measurement_list_fields = ns_measurement.model('Measurement Fields List', {
     'measurements': fields.List(fields.Nested(measurement_fields)),
 })
 
+measurement_bulk_error_fields = ns_measurement.model('Measurement Bulk Error Fields', {
+    'index': fields.Integer(description='The index of the measurement in the request'),
+    'error': fields.String,
+})
+
+measurement_bulk_fields = ns_measurement.model('Measurement Bulk Fields', {
+    'message': fields.String,
+    'written': fields.Integer(description='The number of measurements written'),
+    'spooled': fields.Integer(
+        description='The number of measurements stored to be written when the database is available'),
+    'errors': fields.List(fields.Nested(measurement_bulk_error_fields)),
+})
+
 measurement_function_fields = ns_measurement.model('Measurement Function Fields', {
     'value': fields.Float,
 })
@@ -64,7 +87,7 @@ class MeasurementsCreate(Resource):
         if not utils_general.user_has_permission('edit_controllers'):
             abort(403)
 
-        if unit not in add_custom_units(Unit.query.all()):
+        if unit not in unit_set:
             abort(422, custom='Unit ID not found')
         if channel < 0:
             abort(422, custom='channel must be >= 0')
@@ -88,7 +111,10 @@ class MeasurementsCreate(Resource):
             return_ = write_influxdb_value(
                 unique_id, unit, value, channel=channel, timestamp=timestamp)
 
-            if return_:
+            if return_ == WRITE_SPOOLED:
+                return {'message': 'Spooled to disk, to be written when the '
+                                   'measurement database is available'}, 202
+            elif return_:
                 abort(500)
             else:
                 return {'message': 'Success'}, 200
@@ -98,6 +124,80 @@ class MeasurementsCreate(Resource):
                   error=traceback.format_exc())
 
 
+@ns_measurement.route('/bulk')
+@ns_measurement.doc(
+    security='apikey',
+    responses=default_responses,
+    params={
+        'format': 'The format of the request body: json (a list of measurements, or an object '
+                  'with the list as "measurements"), ndjson (one measurement per line), or line '
+                  '(InfluxDB line protocol, e.g. "C,device_id=abc,channel=0,measure=temperature '
+                  'value=23.5 1555351620392000000"). (Optional; determined from the Content-Type '
+                  'header if excluded)',
+        'precision': 'The precision of line protocol timestamps: ns, us, ms, or s. (Optional; default: ns)'
+    }
+)
+class MeasurementsBulk(Resource):
+    """Creates measurements in the measurement database."""
+
+    @accept('application/vnd.mycodo.v1+json')
+    @ns_measurement.marshal_with(measurement_bulk_fields)
+    @flask_login.login_required
+    def post(self):
+        """
+        Create multiple measurements
+
+        Each measurement has the keys unique_id, unit, channel, value, and
+        optionally measure and timestamp (epoch seconds or %Y-%m-%dT%H:%M:%S.%fZ).
+        Valid measurements are written in a single batch. The index and error of
+        each invalid measurement is returned.
+        """
+        if not utils_general.user_has_permission('edit_controllers'):
+            abort(403)
+
+        data_format = request.args.get('format')
+        if not data_format:
+            if request.mimetype in ['application/x-ndjson', 'application/jsonl']:
+                data_format = 'ndjson'
+            elif request.mimetype == 'text/plain':
+                data_format = 'line'
+            else:
+                data_format = 'json'
+        if data_format not in INGEST_FORMATS:
+            abort(422, custom=f"format must be one of {', '.join(INGEST_FORMATS)}")
+
+        try:
+            measurements = parse_measurements(
+                request.get_data(as_text=True),
+                data_format,
+                precision=request.args.get('precision', 'ns'))
+        except ValueError as err:
+            abort(422, custom=f'Could not parse measurements: {err}')
+
+        if len(measurements) > INGEST_MAX_POINTS:
+            abort(422, custom=f'Too many measurements (maximum: {INGEST_MAX_POINTS})')
+
+        valid, errors = validate_measurements(measurements)
+        dict_return = {
+            'written': 0,
+            'spooled': 0,
+            'errors': [{'index': index, 'error': error} for index, error in errors]
+        }
+        if not valid:
+            dict_return['message'] = 'No valid measurements'
+            return dict_return, 422
+
+        try:
+            dict_return['written'], dict_return['spooled'] = write_influxdb_points(valid)
+        except Exception:
+            abort(500,
+                  message='An exception occurred',
+                  error=traceback.format_exc())
+
+        dict_return['message'] = 'Success' if not errors else 'Partial success'
+        return dict_return, 200
+
+
 @ns_measurement.route('/historical/<string:unique_id>/<string:unit>/<int:channel>/<int:epoch_start>/<int:epoch_end>')
 @ns_measurement.doc(
     security='apikey',
@@ -123,7 +223,7 @@ class MeasurementsHistorical(Resource):
         if not utils_general.user_has_permission('view_settings'):
             abort(403)
 
-        if unit not in add_custom_units(Unit.query.all()):
+        if unit not in unit_set:
             abort(422, custom='Unit ID not found')
         if channel < 0:
             abort(422, custom='channel must be >= 0')
@@ -163,6 +263,110 @@ class MeasurementsHistorical(Resource):
                   error=traceback.format_exc())
 
 
+@ns_measurement.route('/stream/<string:unique_id>/<string:unit>/<int:channel>')
+@ns_measurement.doc(
+    security='apikey',
+    responses=default_responses,
+    params={
+        'unique_id': 'The unique ID of the device',
+        'unit': 'The unit of the measurement',
+        'channel': 'The channel of the measurement',
+        'measure': 'The measurement (e.g. temperature). (Optional)',
+        'start': 'The start time, as epoch. (Optional)',
+        'end': 'The end time, as epoch. (Optional)',
+        'past_seconds': 'How many seconds in the past to query, in place of start. (Optional)',
+        'after': 'Only return measurements from this time, as epoch. To request the next page, '
+                 'set to the time of the last measurement received ("next" of json). (Optional)',
+        'skip': 'The number of measurements at the time of after that were already received, '
+                'which are skipped ("skip" of json). (Optional; default: 1)',
+        'limit': f'The maximum number of measurements to return (default: {STREAM_LIMIT_DEFAULT}, '
+                 f'maximum: {STREAM_LIMIT_MAX}). If this many are returned, there may be another page.',
+        'window': 'Aggregate the measurements of each window of this many seconds. (Optional)',
+        'fn': f'The aggregate function of each window: {", ".join(STREAM_AGGREGATE_FUNCTIONS)} '
+              f'(default: mean)',
+        'format': 'json (default; {"measurements": [{"time", "value"}, ...], "next", "skip"}), '
+                  'ndjson, csv, or binary (frames of a uint32 count, count int64 epoch nanosecond '
+                  'times, and count float64 values, little-endian, ending with a count of 0). If '
+                  'reading the measurements fails, the stream ends with the error: "error" of json, '
+                  'a line {"error"} of ndjson, a row error,<message> of csv, or a binary count of '
+                  '4294967295 followed by the uint32 length of the UTF-8 message and the message.'
+    }
+)
+class MeasurementsStream(Resource):
+    """Streams measurements from the measurement database."""
+
+    @accept('application/vnd.mycodo.v1+json')
+    @flask_login.login_required
+    def get(self, unique_id, unit, channel):
+        """
+        Return measurements as a stream, in pages
+
+        The measurements are sent as they are received from the measurement
+        database, in ascending order of time. Errors reading the
+        measurements after the stream started end the stream with the error.
+        """
+        if not utils_general.user_has_permission('view_settings'):
+            abort(403)
+
+        if unit not in unit_set:
+            abort(422, custom='Unit ID not found')
+        if channel < 0:
+            abort(422, custom='channel must be >= 0')
+
+        args = request.args
+        for each_arg in ['start', 'end', 'past_seconds', 'after', 'skip', 'limit', 'window']:
+            if each_arg in args and (not str_is_float(args[each_arg]) or float(args[each_arg]) < 0):
+                abort(422, custom=f'{each_arg} must be a number >= 0')
+
+        data_format = args.get('format', 'json')
+        if data_format not in STREAM_FORMATS:
+            abort(422, custom=f"format must be one of {', '.join(STREAM_FORMATS)}")
+        fn = args.get('fn', 'mean')
+        if fn not in STREAM_AGGREGATE_FUNCTIONS:
+            abort(422, custom=f"fn must be one of {', '.join(STREAM_AGGREGATE_FUNCTIONS)}")
+        limit = int(float(args.get('limit', STREAM_LIMIT_DEFAULT)))
+        if not 0 < limit <= STREAM_LIMIT_MAX:
+            abort(422, custom=f'limit must be between 1 and {STREAM_LIMIT_MAX}')
+
+        start = None
+        if float(args.get('past_seconds', 0)):
+            start = datetime.datetime.now().timestamp() - float(args['past_seconds'])
+        elif float(args.get('start', 0)):
+            start = float(args['start'])
+        after = None
+        skip = 0
+        if float(args.get('after', 0)):
+            # Several points may have the microsecond of after, so query from
+            # it (inclusive) and skip the points at it that were received
+            after = float(args['after'])
+            skip = int(float(args.get('skip', 1)))
+            if skip > STREAM_LIMIT_MAX:
+                abort(422, custom=f'skip must be at most {STREAM_LIMIT_MAX}')
+            start = max(start or 0, after)
+        end = float(args.get('end', 0)) or None
+
+        try:
+            points = query_series_stream(
+                unit, unique_id,
+                channel=channel,
+                measure=args.get('measure'),
+                start_str=epoch_to_rfc3339(start) if start else None,
+                end_str=epoch_to_rfc3339(end) if end else None,
+                limit=limit + skip,
+                window_sec=float(args['window']) if float(args.get('window', 0)) else None,
+                fn=fn)
+        except Exception:
+            abort(500,
+                  message='An exception occurred',
+                  error=traceback.format_exc())
+        if after is not None:
+            points = skip_received(points, after, skip)
+
+        return Response(
+            STREAM_ENCODERS[data_format](points, limit=limit, after=after, skip=skip),
+            mimetype=STREAM_FORMATS[data_format])
+
+
 @ns_measurement.route('/last/<string:unique_id>/<string:unit>/<int:channel>/<int:past_seconds>')
 @ns_measurement.doc(
     security='apikey',
@@ -187,7 +391,7 @@ class MeasurementsLast(Resource):
         if not utils_general.user_has_permission('view_settings'):
             abort(403)
 
-        if unit not in add_custom_units(Unit.query.all()):
+        if unit not in unit_set:
             abort(422, custom='Unit ID not found')
         if channel < 0:
             abort(422, custom='channel must be >= 0')
@@ -231,7 +435,7 @@ class MeasurementsPast(Resource):
         if not utils_general.user_has_permission('view_settings'):
             abort(403)
 
-        if unit not in add_custom_units(Unit.query.all()):
+        if unit not in unit_set:
             abort(422, custom='Unit ID not found')
         if channel < 0:
             abort(422, custom='channel must be >= 0')
@@ -9,6 +9,7 @@ from wtforms import FileField
 from wtforms import HiddenField
 from wtforms import IntegerField
 from wtforms import SelectField
+from wtforms import SelectMultipleField
 from wtforms import StringField
 from wtforms import SubmitField
 from wtforms import validators
@@ -59,6 +60,16 @@ class ExportMeasurements(FlaskForm):
     export_data_csv = SubmitField(lazy_gettext('Export Data as CSV'))
 
 
+class ExportMeasurementsJob(FlaskForm):
+    measurements = SelectMultipleField(lazy_gettext('Measurements to Export'), validate_choice=False)
+    date_range = StringField(lazy_gettext('Time Range MM/DD/YYYY HH:MM'))
+    export_format = SelectField(
+        lazy_gettext('Format'),
+        choices=[('csv', 'CSV'), ('parquet', 'Parquet')],
+        validate_choice=False)
+    export_job_start = SubmitField(lazy_gettext('Start Export'))
+
+
 class ExportSettings(FlaskForm):
     export_settings_zip = SubmitField(lazy_gettext('Export Settings'))
 
@@ -90,6 +101,12 @@ class LogView(FlaskForm):
         lazy_gettext('Search'),
         render_kw={'placeholder': lazy_gettext('Search')},)
     log = StringField(lazy_gettext('Log'))
+    level = StringField(lazy_gettext('Level'))
+    logger_name = StringField(
+        lazy_gettext('Logger'),
+        render_kw={'placeholder': lazy_gettext('Logger')},)
+    time_start = StringField(lazy_gettext('Start Time'))
+    time_end = StringField(lazy_gettext('End Time'))
     log_view = SubmitField(lazy_gettext('View Log'))
 
 
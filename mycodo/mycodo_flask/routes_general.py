@@ -5,18 +5,22 @@ import json
 import logging
 import os
 import subprocess
+import threading
+import time
 from importlib import import_module
 from io import StringIO
 
 import flask_login
-from flask import (Response, flash, jsonify, redirect, send_file,
-                   send_from_directory, url_for)
+from flask import (Response, flash, jsonify, redirect, request, send_file,
+                   send_from_directory, stream_with_context, url_for)
 from flask.blueprints import Blueprint
 from flask_babel import gettext
 from flask_limiter import Limiter
 from sqlalchemy import and_
 
-from mycodo.config import (DOCKER_CONTAINER, INSTALL_DIRECTORY, LOG_PATH,
+from mycodo.config import (DOCKER_CONTAINER, INSTALL_DIRECTORY,
+                           LIVE_STREAM_DURATION_SEC, LIVE_STREAM_WAIT_SEC,
+                           LIVE_STREAMS_MAX, LOG_PATH, MEASUREMENTS_BATCH_MAX,
                            PATH_CAMERAS, PATH_NOTE_ATTACHMENTS)
 from mycodo.databases.models import (PID, Camera, Conversion, CustomController,
                                      DeviceMeasurements, Input, Misc, Notes,
@@ -25,10 +29,22 @@ from mycodo.mycodo_client import DaemonControl
 from mycodo.mycodo_flask.routes_authentication import clear_cookie_auth
 from mycodo.mycodo_flask.utils import utils_general
 from mycodo.mycodo_flask.utils.utils_general import get_ip_address
+from mycodo.mycodo_flask.utils.utils_measurement import measurements_query_info
 from mycodo.mycodo_flask.utils.utils_output import get_all_output_states
 from mycodo.utils.database import db_retrieve_table
+from mycodo.utils.downsample import (DOWNSAMPLE_METHODS,
+                                     DOWNSAMPLE_WIDTH_DEFAULT,
+                                     DOWNSAMPLE_WIDTH_MAX,
+                                     LTTB_PRESELECT_RATIO, bucket_ms, lttb,
+                                     series_to_binary, series_to_columns_json,
+                                     series_to_json)
+from mycodo.utils.export_jobs import EXPORT_FORMATS, export_jobs
 from mycodo.utils.influx import (influx_to_list, influxdb_get_count_points,
-                                 influxdb_get_first_point, query_string)
+                                 influxdb_get_first_point,
+                                 query_series_downsampled,
+                                 query_series_batch, query_series_first_time,
+                                 query_string)
+from mycodo.utils.measurement_ingest import timestamp_to_ns
 from mycodo.utils.system_pi import (assure_path_exists, is_int,
                                     return_measurement_info, str_is_float)
 
@@ -333,6 +349,17 @@ def last_data(unique_id, measure_type, measurement_id, period):
                 _, unit, measurement = return_measurement_info(setpoint_measurement, conversion)
 
     try:
+        # Use the last measurement held in memory by the daemon, if available
+        try:
+            control = DaemonControl(pyro_timeout=5)
+            cached = control.last_measurement_cached(
+                unique_id, unit, channel, measure=measurement,
+                duration_sec=float(period) if period != '0' else None)
+            if cached:
+                return Response(f"[{cached[0]},{cached[1]}]", mimetype='text/json')
+        except Exception:
+            logger.debug("Could not get last measurement from the daemon")
+
         if period != '0':
             data = query_string(
                 unit, unique_id,
@@ -360,6 +387,278 @@ def last_data(unique_id, measure_type, measurement_id, period):
         return '', 204
 
 
+def batch_series_query(each_series, info):
+    """
+    Return the measurement database query of a series of /measurements_batch
+
+    :param each_series: series of the request
+    :param info: {measurement_id: (device_id, channel, unit, measurement)} from measurements_query_info()
+    :return: query for query_series_batch(), or None if the series isn't valid
+    :rtype: dict or None
+    """
+    series_type = each_series.get('type')
+    period = each_series.get('period', each_series.get('past_seconds', 0))
+    if (series_type not in ['last', 'past', 'since'] or
+            not str_is_float(str(period)) or
+            each_series.get('measure_type') not in ['input', 'function', 'output', 'pid'] or
+            each_series.get('measurement_id') not in info):
+        return
+
+    since_ns = None
+    if series_type == 'since':
+        if str(each_series.get('since_ns')).isdigit():
+            since_ns = int(each_series['since_ns'])
+        elif str_is_float(str(each_series.get('since'))):
+            since_ns = timestamp_to_ns(float(each_series['since']))
+        else:
+            return
+
+    device_id, channel, unit, measurement = info[each_series['measurement_id']]
+    return {
+        'unique_id': device_id,
+        'unit': unit,
+        'channel': channel,
+        'measure': measurement,
+        'past_sec': float(period) if series_type != 'since' else None,
+        'since': since_ns / 1e9 if since_ns is not None else None,
+        'since_ns': since_ns,
+        'last': series_type == 'last'
+    }
+
+
+@blueprint.route('/measurements_batch', methods=['POST'])
+@flask_login.login_required
+def measurements_batch():
+    """
+    Return the data of several measurements, for dashboards
+
+    The request is a JSON object with a list of series, each with the keys
+    unique_id (device ID, only used for tags; measurements are queried for
+    the device they belong to), measure_type ('input', 'function', 'output',
+    'pid', or 'tag'), measurement_id, and type:
+        last: the most recent point, no older than period seconds (0 for any age)
+        past: the points of the past past_seconds
+        since: the points newer than the epoch since, or the epoch nanoseconds
+            since_ns (the cursor of a previous response)
+
+    Last values and the points since a recent time are held in memory by the
+    daemon, so refreshing a dashboard doesn't need to query the measurement
+    database. Other influxdb series are retrieved with a single query. The
+    response is a JSON object with a list of results, in the order of the
+    series: a [time, value] pair for last, a list of [time, value] pairs (or
+    [time, name, note] for tags) for past and since, or null if there is no
+    data, and a list of cursors: the time of the last point of each past and
+    since series, in epoch nanoseconds (as strings, since they exceed the
+    precision of JavaScript numbers), to request the following points with.
+    """
+    request_json = request.get_json(silent=True) or {}
+    series = request_json.get('series')
+    if not isinstance(series, list) or len(series) > MEASUREMENTS_BATCH_MAX:
+        return jsonify(error=f"Expected a list of up to {MEASUREMENTS_BATCH_MAX} series"), 400
+
+    results = [None] * len(series)
+    cursors = [None] * len(series)
+    queries = []  # (index of series, query of series)
+    tag_series = []
+
+    try:
+        info = measurements_query_info(
+            [each_series.get('measurement_id') for each_series in series
+             if isinstance(each_series, dict) and each_series.get('measure_type') != 'tag'])
+    except Exception as err:
+        logger.exception(f"URL for 'measurements_batch' raised and error: {err}")
+        return jsonify(results=results, cursors=cursors)
+
+    for index, each_series in enumerate(series):
+        if not isinstance(each_series, dict):
+            continue
+        if each_series.get('measure_type') == 'tag':
+            period = each_series.get('period', each_series.get('past_seconds', 0))
+            if (each_series.get('type') in ['past', 'since'] and str_is_float(str(period)) and
+                    (each_series['type'] == 'past' or str_is_float(str(each_series.get('since'))))):
+                tag_series.append((index, each_series))
+            continue
+        query = batch_series_query(each_series, info)
+        if query:
+            queries.append((index, query))
+            if query['since_ns'] is not None:
+                cursors[index] = str(query['since_ns'])
+
+    # Use the last measurements and recent points held in memory by the daemon, if available
+    last_queries = [(index, query) for index, query in queries if query['last']]
+    since_queries = [(index, query) for index, query in queries if query['since'] is not None]
+    answered = set()
+    if last_queries or since_queries:
+        try:
+            control = DaemonControl(pyro_timeout=5)
+            if last_queries:
+                cached = control.last_measurements_cached(
+                    [(query['unique_id'], query['unit'], query['channel'],
+                      query['measure'], query['past_sec'] or None)
+                     for _, query in last_queries])
+                for (index, _), each_cached in zip(last_queries, cached):
+                    if each_cached is not None:
+                        results[index] = each_cached
+                        answered.add(index)
+            if since_queries:
+                recent = control.recent_measurements(
+                    [(query['unique_id'], query['unit'], query['channel'],
+                      query['measure'], query['since_ns'])
+                     for _, query in since_queries])
+                for (index, _), points in zip(since_queries, recent):
+                    if points is not None:
+                        results[index] = points or None
+                        answered.add(index)
+            queries = [(index, query) for index, query in queries if index not in answered]
+        except Exception:
+            logger.debug("Could not get measurements from the daemon")
+
+    try:
+        if queries and Misc.query.first().measurement_db_name == 'influxdb':
+            data = query_series_batch([query for _, query in queries])
+            for (index, query), (times, values) in zip(queries, data):
+                if not times:
+                    continue
+                if query['last']:
+                    results[index] = [times[-1], values[-1]]
+                else:
+                    results[index] = list(zip(times, values))
+    except Exception as err:
+        logger.exception(f"URL for 'measurements_batch' raised and error: {err}")
+
+    for index, each_series in enumerate(series):
+        if (results[index] and isinstance(each_series, dict) and
+                each_series.get('type') in ['past', 'since'] and
+                each_series.get('measure_type') != 'tag'):
+            cursors[index] = str(timestamp_to_ns(results[index][-1][0]))
+
+    if tag_series:
+        now = time.time()
+        starts = [float(each_series['since']) if each_series['type'] == 'since'
+                  else now - float(each_series.get('period', each_series.get('past_seconds', 0)))
+                  for _, each_series in tag_series]
+        notes = Notes.query.filter(
+            Notes.date_time >= datetime.datetime.utcfromtimestamp(min(starts))).all()
+        for (index, each_series), start in zip(tag_series, starts):
+            notes_list = []
+            for each_note in notes:
+                timestamp = each_note.date_time.replace(tzinfo=datetime.timezone.utc).timestamp()
+                if (timestamp >= start and each_note.tags and
+                        each_series.get('unique_id') in each_note.tags.split(',')):
+                    notes_list.append([timestamp, each_note.name, each_note.note])
+            if notes_list:
+                results[index] = notes_list
+
+    return jsonify(results=results, cursors=cursors)
+
+
+live_streams = threading.BoundedSemaphore(LIVE_STREAMS_MAX)
+
+
+@blueprint.route('/measurements_live')
+@flask_login.login_required
+def measurements_live():
+    """
+    Push the new points of several measurements as server-sent events, for live graphs
+
+    The query parameter series is a JSON list of series with the keys
+    unique_id, measure_type, measurement_id, and since_ns (the cursor of
+    the last point received). The new points are received from the memory
+    of the daemon as they're written, waiting up to LIVE_STREAM_WAIT_SEC
+    between events, so an open dashboard doesn't query the measurement
+    database (unless its points aren't held in memory, e.g. after the
+    daemon restarts). Each event has the data {"results": [...],
+    "cursors": [...]}, as /measurements_batch with type 'since', and the
+    cursors as its ID, so a reconnecting browser continues after the last
+    event it received (Last-Event-ID). Streams end with the event "end"
+    after LIVE_STREAM_DURATION_SEC, to release the web server thread.
+    Only LIVE_STREAMS_MAX streams are served at once; other requests
+    receive the event "busy" and should poll /measurements_batch instead.
+    """
+    try:
+        series = json.loads(request.args.get('series', '[]'))
+        if not isinstance(series, list) or len(series) > MEASUREMENTS_BATCH_MAX:
+            raise ValueError
+    except ValueError:
+        return jsonify(error=f"Expected a JSON list of up to {MEASUREMENTS_BATCH_MAX} series"), 400
+
+    cursors = [None] * len(series)
+    last_event_id = request.headers.get('Last-Event-ID', '').split(',')
+    if len(last_event_id) == len(series):
+        cursors = [int(each) if each.isdigit() else None for each in last_event_id]
+
+    def live_events():
+        if not live_streams.acquire(blocking=False):
+            yield 'event: busy\ndata: {}\n\n'
+            return
+        try:
+            info = measurements_query_info(
+                [each_series.get('measurement_id') for each_series in series
+                 if isinstance(each_series, dict)])
+            queries = []
+            for index, each_series in enumerate(series):
+                if not isinstance(each_series, dict):
+                    continue
+                if cursors[index] is None:
+                    if str(each_series.get('since_ns')).isdigit():
+                        cursors[index] = int(each_series['since_ns'])
+                    else:
+                        cursors[index] = time.time_ns()
+                query = batch_series_query(
+                    dict(each_series, type='since', since_ns=cursors[index]), info)
+                if query:
+                    queries.append((index, query))
+            measurement_db_influx = Misc.query.first().measurement_db_name == 'influxdb'
+
+            control = DaemonControl(pyro_timeout=5)
+            timeout = 0  # Send the points since the cursors immediately
+            end = time.time() + LIVE_STREAM_DURATION_SEC
+            while time.time() < end:
+                results = [None] * len(series)
+                recent = control.recent_measurements(
+                    [(query['unique_id'], query['unit'], query['channel'],
+                      query['measure'], cursors[index])
+                     for index, query in queries], timeout=timeout)
+                timeout = LIVE_STREAM_WAIT_SEC
+
+                # Query the series with points that aren't held in memory by the daemon
+                uncovered = [(index, query) for (index, query), points in zip(queries, recent)
+                             if points is None]
+                if uncovered and measurement_db_influx:
+                    data = query_series_batch(
+                        [dict(query, since=cursors[index] / 1e9) for index, query in uncovered])
+                    for (index, _), (times, values) in zip(uncovered, data):
+                        if times:
+                            results[index] = list(zip(times, values))
+                for (index, _), points in zip(queries, recent):
+                    if points:
+                        results[index] = points
+
+                for index, points in enumerate(results):
+                    if points:
+                        cursors[index] = timestamp_to_ns(points[-1][0])
+                if any(results):
+                    cursors_str = [str(each) if each is not None else None for each in cursors]
+                    yield (f"id: {','.join(str(each) for each in cursors)}\n"
+                           f"data: {json.dumps({'results': results, 'cursors': cursors_str})}\n\n")
+                else:
+                    yield ': keepalive\n\n'
+            yield 'event: end\ndata: {}\n\n'
+        except Exception:
+            logger.exception("URL for 'measurements_live'")
+            yield 'event: error\ndata: {}\n\n'
+        finally:
+            live_streams.release()
+
+    return Response(
+        stream_with_context(live_events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Don't let nginx buffer the events
+        })
+
+
 @blueprint.route('/export_data/<unique_id>/<measurement_id>/<start_seconds>/<end_seconds>')
 @flask_login.login_required
 def export_data(unique_id, measurement_id, start_seconds, end_seconds):
@@ -430,16 +729,59 @@ def export_data(unique_id, measurement_id, start_seconds, end_seconds):
     return response
 
 
+@blueprint.route('/export_jobs')
+@flask_login.login_required
+def export_jobs_status():
+    """Return the state and progress of measurement export jobs."""
+    return jsonify(export_jobs.jobs())
+
+
+@blueprint.route('/export_job/<job_id>/<action>')
+@flask_login.login_required
+def export_job_action(job_id, action):
+    """Resume, cancel, delete, or download a measurement export job."""
+    job = export_jobs.load(job_id)
+    if job is None:
+        return 'Export not found', 404
+
+    if action == 'download':
+        if job['status'] != 'complete':
+            return 'Export not complete', 409
+        start = datetime.datetime.fromtimestamp(job['start']).strftime('%Y-%m-%d_%H-%M')
+        end = datetime.datetime.fromtimestamp(job['end']).strftime('%Y-%m-%d_%H-%M')
+        return send_file(
+            export_jobs.path_output(job),
+            mimetype=EXPORT_FORMATS[job['format']],
+            as_attachment=True,
+            download_name=f"Mycodo_Measurements_{start}_{end}.{job['format']}")
+
+    if not utils_general.user_has_permission('edit_controllers'):
+        return 'Insufficient permissions', 403
+    if action == 'resume':
+        export_jobs.start(job_id)
+    elif action == 'cancel':
+        export_jobs.cancel(job_id)
+    elif action == 'delete':
+        export_jobs.delete(job_id)
+    else:
+        return 'Unknown action', 400
+    return jsonify(success=True)
+
+
 @blueprint.route('/async/<device_id>/<device_type>/<measurement_id>/<start_seconds>/<end_seconds>')
 @flask_login.login_required
 def async_data(device_id, device_type, measurement_id, start_seconds, end_seconds):
     """
     Return data from start_seconds to end_seconds from influxdb.
     Used for asynchronous graph display of many points (up to millions).
-    """
-    count_points = None
-    first_point = None
 
+    The series is downsampled by the measurement database to the graph width
+    with the optional query parameters:
+        width: number of points (default 700)
+        method: 'mean' (default), 'minmax', or 'lttb'
+        format: 'json' (default, [[timestamp, value], ...]), 'columns'
+            ({"t": [...], "v": [...]}), or 'binary' (float64 timestamp, value pairs)
+    """
     settings = Misc.query.first()
 
     if device_type == 'tag':
@@ -481,166 +823,62 @@ def async_data(device_id, device_type, measurement_id, start_seconds, end_second
     channel, unit, measurement = return_measurement_info(
         measure, conversion)
 
-    # Get all data if start/end not specified
-    if start_seconds == '0' and end_seconds == '0':
-        # Get how many points there are
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            value='COUNT')
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            count_points = influxdb_get_count_points(data)
-
-        # Get the timestamp of the first point
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            limit=1)
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            first_point = influxdb_get_first_point(data)
-
-        end = datetime.datetime.utcnow()
-        end_str = end.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-
-    # Set the time frame to the past start epoch to now
-    elif start_seconds != '0' and end_seconds == '0':
-        start = datetime.datetime.utcfromtimestamp(float(start_seconds))
-        start_str = start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-        end = datetime.datetime.utcnow()
-        end_str = end.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            value='COUNT')
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            count_points = influxdb_get_count_points(data)
-
-        # Get the timestamp of the first point in the past year
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            limit=1)
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            first_point = influxdb_get_first_point(data)
-    else:
-        start = datetime.datetime.utcfromtimestamp(float(start_seconds))
-        start_str = start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-        end = datetime.datetime.utcfromtimestamp(float(end_seconds))
-        end_str = end.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    if settings.measurement_db_name != 'influxdb':
+        return '', 204
 
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            value='COUNT')
+    # Reduce the series to about as many points as the graph is wide
+    method = request.args.get('method', 'mean')
+    if method not in DOWNSAMPLE_METHODS:
+        method = 'mean'
+    width = min(max(request.args.get('width', DOWNSAMPLE_WIDTH_DEFAULT, type=int), 10),
+                DOWNSAMPLE_WIDTH_MAX)
+    output_format = request.args.get('format', 'json')
 
-        if not data:
-            return '', 204
+    try:
+        if end_seconds == '0':
+            end_epoch = time.time()
+        else:
+            end_epoch = float(end_seconds)
+        end_str = datetime.datetime.utcfromtimestamp(end_epoch).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+        if start_seconds == '0':
+            # Get all data: start at the first point
+            start_epoch = query_series_first_time(
+                unit, device_id, measure=measurement, channel=channel, end_str=end_str)
+            if start_epoch is None:
+                return '', 204
+        else:
+            start_epoch = float(start_seconds)
+        start_str = datetime.datetime.utcfromtimestamp(start_epoch).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
 
-        if settings.measurement_db_name == 'influxdb':
-            count_points = influxdb_get_count_points(data)
+        if method == 'lttb':
+            buckets = width * LTTB_PRESELECT_RATIO
+        else:
+            buckets = width
 
-        # Get the timestamp of the first point in the past year
-        data = query_string(
-            unit, device_id,
+        times, values = query_series_downsampled(
+            unit, device_id, start_str, end_str,
+            bucket_ms(start_epoch, end_epoch, buckets),
             measure=measurement,
             channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            limit=1)
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            first_point = influxdb_get_first_point(data)
+            method='mean' if method == 'mean' else 'minmax')
 
-    if not first_point:
-        logger.error("No first point")
+        if method == 'lttb':
+            times, values = lttb(times, values, width)
+    except Exception as err:
+        logger.error(f"URL for 'async_data' raised and error: {err}")
         return '', 204
 
-    start_str = first_point.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    logger.debug(f"async_data: {len(times)} points, {method}, width {width}, {start_str} to {end_str}")
 
-    logger.debug(f'Count = {count_points}')
-    logger.debug(f'Start = {first_point}')
-    logger.debug(f'End   = {end}')
-
-    # How many seconds between the start and end period
-    time_difference_seconds = end.timestamp() - first_point.timestamp()
-    logger.debug(f'Difference seconds = {time_difference_seconds}')
-
-    # If there are more than 700 points in the time frame, we need to group
-    # data points into 700 groups with points averaged in each group.
-    if count_points > 700:
-        # Average period between input reads
-        seconds_per_point = time_difference_seconds / count_points
-        logger.debug(f'Seconds per point = {seconds_per_point}')
-
-        # How many seconds to group data points in
-        group_seconds = int(time_difference_seconds / 700)
-        logger.debug(f'Group seconds = {group_seconds}')
-
-        try:
-            data = query_string(
-                unit, device_id,
-                measure=measurement,
-                channel=channel,
-                start_str=start_str,
-                end_str=end_str,
-                group_sec=group_seconds)
-
-            if not data:
-                return '', 204
-
-            if settings.measurement_db_name == 'influxdb':
-                return jsonify(influx_to_list(data))
-        except Exception as err:
-            logger.error(f"URL for 'async_data' raised and error: {err}")
-            return '', 204
-    else:
-        try:
-            data = query_string(
-                unit, device_id,
-                measure=measurement,
-                channel=channel,
-                start_str=start_str,
-                end_str=end_str)
-
-            if not data:
-                return '', 204
+    if not times:
+        return '', 204
 
-            if settings.measurement_db_name == 'influxdb':
-                return jsonify(influx_to_list(data))
-        except Exception as err:
-            logger.error(f"URL for 'async_data' raised and error: {err}")
-            return '', 204
+    if output_format == 'binary':
+        return Response(series_to_binary(times, values), mimetype='application/octet-stream')
+    elif output_format == 'columns':
+        return Response(series_to_columns_json(times, values), mimetype='application/json')
+    return Response(series_to_json(times, values), mimetype='application/json')
 
 
 @blueprint.route('/async_usage/<device_id>/<unit>/<channel>/<start_seconds>/<end_seconds>')
@@ -14,8 +14,9 @@ from collections import OrderedDict
 from importlib import import_module
 
 import flask_login
-from flask import (current_app, flash, jsonify, redirect, render_template,
-                   request, send_file, url_for)
+from flask import (Response, current_app, flash, jsonify, redirect,
+                   render_template, request, send_file, stream_with_context,
+                   url_for)
 from flask.blueprints import Blueprint
 from flask_babel import gettext
 from sqlalchemy import and_
@@ -25,9 +26,10 @@ from mycodo.config import (ALEMBIC_VERSION, BACKUP_LOG_FILE, CAMERA_INFO,
                            DEPENDENCY_LOG_FILE, DOCKER_CONTAINER,
                            FRONTEND_PID_FILE, HTTP_ACCESS_LOG_FILE,
                            HTTP_ERROR_LOG_FILE, IMPORT_LOG_FILE,
-                           KEEPUP_LOG_FILE, LOGIN_LOG_FILE, MYCODO_DB_PATH,
-                           MYCODO_VERSION, RESTORE_LOG_FILE, THEMES_DARK,
-                           UPGRADE_LOG_FILE)
+                           KEEPUP_LOG_FILE, LIVE_STREAM_DURATION_SEC,
+                           LIVE_STREAM_WAIT_SEC, LOG_TAIL_INTERVAL,
+                           LOGIN_LOG_FILE, MYCODO_DB_PATH, MYCODO_VERSION,
+                           RESTORE_LOG_FILE, THEMES_DARK, UPGRADE_LOG_FILE)
 from mycodo.config_devices_units import MEASUREMENTS
 from mycodo.databases.models import (PID, AlembicVersion, Camera, Conversion,
                                      CustomController, DeviceMeasurements,
@@ -38,15 +40,20 @@ from mycodo.devices.camera import camera_record
 from mycodo.mycodo_client import DaemonControl, daemon_active
 from mycodo.mycodo_flask.extensions import db
 from mycodo.mycodo_flask.forms import forms_camera, forms_misc, forms_notes
+from mycodo.mycodo_flask.routes_general import live_streams
 from mycodo.mycodo_flask.routes_static import inject_variables
 from mycodo.mycodo_flask.utils import (utils_camera, utils_dashboard,
                                        utils_export, utils_general, utils_misc,
                                        utils_notes)
 from mycodo.mycodo_flask.utils.utils_general import return_dependencies
 from mycodo.utils.functions import parse_function_information
+from mycodo.utils.influx_spool import spool_status
+from mycodo.utils.log_reader import (DAEMON_LOG_PATTERN, LogFilter,
+                                     LogFollower, LogReader)
 from mycodo.utils.inputs import (list_analog_to_digital_converters,
                                  parse_input_information)
 from mycodo.utils.outputs import output_types, parse_output_information
+from mycodo.utils.pyro_pool import pyro_pool_stats
 from mycodo.utils.system_pi import (
     add_custom_measurements, add_custom_units, csv_to_list_of_str,
     parse_custom_option_values,
@@ -61,6 +68,21 @@ blueprint = Blueprint('routes_page',
                       static_folder='../static',
                       template_folder='../templates')
 
+# Log files that can be viewed, by the value of the log field of the log view form
+LOG_FILES = {
+    'log_daemon': DAEMON_LOG_FILE,
+    'log_pid_settings': DAEMON_LOG_FILE,
+    'log_keepup': KEEPUP_LOG_FILE,
+    'log_dependency': DEPENDENCY_LOG_FILE,
+    'log_import': IMPORT_LOG_FILE,
+    'log_backup': BACKUP_LOG_FILE,
+    'log_restore': RESTORE_LOG_FILE,
+    'log_upgrade': UPGRADE_LOG_FILE,
+    'log_http_access': HTTP_ACCESS_LOG_FILE,
+    'log_http_error': HTTP_ERROR_LOG_FILE,
+    'log_login': LOGIN_LOG_FILE
+}
+
 
 @blueprint.context_processor
 @flask_login.login_required
@@ -425,6 +447,7 @@ def page_export():
     Export/Import measurement and settings data
     """
     form_export_measurements = forms_misc.ExportMeasurements()
+    form_export_measurements_job = forms_misc.ExportMeasurementsJob()
     form_export_settings = forms_misc.ExportSettings()
     form_import_settings = forms_misc.ImportSettings()
     form_export_influxdb = forms_misc.ExportInfluxdb()
@@ -454,6 +477,9 @@ def page_export():
             url = utils_export.export_measurements(form_export_measurements)
             if url:
                 return redirect(url)
+        elif form_export_measurements_job.export_job_start.data:
+            utils_export.export_measurements_job(form_export_measurements_job)
+            return redirect(url_for('routes_page.page_export'))
         elif form_export_settings.export_settings_zip.data:
             file_send = utils_export.export_settings()
             if file_send:
@@ -486,6 +512,7 @@ def page_export():
                            end_picker=end_picker,
                            form_export_influxdb=form_export_influxdb,
                            form_export_measurements=form_export_measurements,
+                           form_export_measurements_job=form_export_measurements_job,
                            form_export_settings=form_export_settings,
                            form_import_settings=form_import_settings,
                            choices_function=choices_function,
@@ -698,13 +725,43 @@ def page_info():
     else:
         daemon_up = False
 
+    write_queue_stats = None
+    config_cache_stats = None
+    mqtt_publisher_stats = None
+    mqtt_subscriber_stats = None
+    scheduler_stats = None
+    startup_timeline = None
     if daemon_up is True:
         control = DaemonControl()
-        ram_use_daemon = control.ram_use()
-        virtualenv_daemon = control.is_in_virtualenv()
+        # Get all daemon information with one request
+        stats_calls = [
+            ('ram_use', "Getting daemon RAM use"),
+            ('is_in_virtualenv', "Getting daemon virtualenv"),
+            ('influxdb_write_queue_stats', "Getting measurement write queue statistics"),
+            ('config_cache_stats', "Getting configuration cache statistics"),
+            ('mqtt_publisher_stats', "Getting MQTT publish connection statistics"),
+            ('mqtt_subscriber_stats', "Getting MQTT subscriber connection statistics"),
+            ('scheduler_stats', "Getting controller scheduler statistics"),
+            ('startup_timeline', "Getting daemon startup timeline")
+        ]
+        results = control.call_many(
+            [(method, []) for method, _ in stats_calls], return_exceptions=True)
+        for (_, message), result in zip(stats_calls, results):
+            if isinstance(result, Exception):
+                logger.error(f"{message}: {result}")
+        results = [None if isinstance(result, Exception) else result for result in results]
+        (ram_use_daemon, virtualenv_daemon, write_queue_stats, config_cache_stats,
+         mqtt_publisher_stats, mqtt_subscriber_stats, scheduler_stats, startup_timeline) = results
     else:
         ram_use_daemon = 0
 
+    pyro_stats = pyro_pool_stats()
+
+    measurement_spool = spool_status()
+    if measurement_spool['oldest']:
+        measurement_spool['oldest'] = datetime.datetime.fromtimestamp(
+            measurement_spool['oldest']).strftime('%Y-%m-%d %H:%M:%S')
+
     if os.path.exists(FRONTEND_PID_FILE):
         with open(FRONTEND_PID_FILE, 'r') as pid_file:
             frontend_pid = int(pid_file.read())
@@ -726,19 +783,27 @@ def page_info():
                            df=df_output,
                            dmesg_output=dmesg_output,
                            free=free_output,
+                           config_cache_stats=config_cache_stats,
                            frontend_pid=frontend_pid,
                            i2c_devices_sorted=i2c_devices_sorted,
                            ifconfig=ifconfig_output,
+                           measurement_spool=measurement_spool,
+                           mqtt_publisher_stats=mqtt_publisher_stats,
+                           mqtt_subscriber_stats=mqtt_subscriber_stats,
                            pstree_frontend=pstree_frontend_output,
+                           pyro_stats=pyro_stats,
                            python_version=python_version,
                            ram_use_daemon=ram_use_daemon,
                            ram_use_flask=ram_use_flask,
+                           scheduler_stats=scheduler_stats,
+                           startup_timeline=startup_timeline,
                            top_daemon=top_daemon_output,
                            top_frontend=top_frontend_output,
                            uname=uname_output,
                            uptime=uptime_output,
                            virtualenv_daemon=virtualenv_daemon,
-                           virtualenv_flask=virtualenv_flask)
+                           virtualenv_flask=virtualenv_flask,
+                           write_queue_stats=write_queue_stats)
 
 
 @blueprint.route('/ram')
@@ -834,8 +899,13 @@ def page_logview():
 
     form_log_view = forms_misc.LogView()
     log_output = None
+    log_position = None
     lines = 30
     search = ''
+    level = ''
+    logger_name = ''
+    time_start = ''
+    time_end = ''
     logfile = ''
     log_field = None
     command = None
@@ -846,89 +916,147 @@ def page_logview():
     if form_log_view.search.data:
         search = form_log_view.search.data
 
+    if form_log_view.level.data:
+        level = form_log_view.level.data
+
+    if form_log_view.logger_name.data:
+        logger_name = form_log_view.logger_name.data.strip()
+
+    if form_log_view.time_start.data:
+        time_start = form_log_view.time_start.data
+
+    if form_log_view.time_end.data:
+        time_end = form_log_view.time_end.data
+
     if form_log_view.log.data:
         log_field = form_log_view.log.data
 
-    # Find which log file was requested, generate command to execute
+    # Find which log was requested
     if form_log_view.log.data == 'log_nginx':
         if DOCKER_CONTAINER:
-            command = f'docker logs -n {lines} mycodo_nginx'
-            if search:
-                command += f' 2>&1 | grep "{search}"'
+            command = ['docker', 'logs', '-n', str(lines), 'mycodo_nginx']
         else:
-            command = f'journalctl -u nginx -n {lines} --no-pager'
-            if search:
-                command += f' | grep "{search}"'
+            command = ['journalctl', '-u', 'nginx', '-n', str(lines), '--no-pager']
     elif form_log_view.log.data == 'log_flask':
         if DOCKER_CONTAINER:
-            command = f'docker logs -n {lines} mycodo_flask'
-            if search:
-                command += f' 2>&1 | grep "{search}"'
-        else:
-            command = f'journalctl -u mycodoflask -n {lines} --no-pager'
-            if search:
-                command += f' | grep "{search}"'
-    elif form_log_view.log.data == 'log_pid_settings':
-        logfile = DAEMON_LOG_FILE
-        logrotate_file = logfile + '.1'
-        if (logrotate_file and os.path.exists(logrotate_file) and
-                logfile and os.path.isfile(logfile)):
-            command = f'cat {logrotate_file} {logfile} | grep -a "PID Settings" | tail -n {lines}'
+            command = ['docker', 'logs', '-n', str(lines), 'mycodo_flask']
         else:
-            command = f'grep -a "PID Settings" {logfile} | tail -n {lines}'
+            command = ['journalctl', '-u', 'mycodoflask', '-n', str(lines), '--no-pager']
     else:
-        if form_log_view.log.data == 'log_login':
-            logfile = LOGIN_LOG_FILE
-        elif form_log_view.log.data == 'log_http_access':
-            logfile = HTTP_ACCESS_LOG_FILE
-        elif form_log_view.log.data == 'log_http_error':
-            logfile = HTTP_ERROR_LOG_FILE
-        elif form_log_view.log.data == 'log_daemon':
-            logfile = DAEMON_LOG_FILE
-        elif form_log_view.log.data == 'log_dependency':
-            logfile = DEPENDENCY_LOG_FILE
-        elif form_log_view.log.data == 'log_import':
-            logfile = IMPORT_LOG_FILE
-        elif form_log_view.log.data == 'log_keepup':
-            logfile = KEEPUP_LOG_FILE
-        elif form_log_view.log.data == 'log_backup':
-            logfile = BACKUP_LOG_FILE
-        elif form_log_view.log.data == 'log_restore':
-            logfile = RESTORE_LOG_FILE
-        elif form_log_view.log.data == 'log_upgrade':
-            logfile = UPGRADE_LOG_FILE
-        else:
-            logfile = DAEMON_LOG_FILE  # Default
-
-        logrotate_file = logfile + '.1'
-        if (logrotate_file and os.path.exists(logrotate_file) and
-                logfile and os.path.isfile(logfile)):
-            command = f'cat {logrotate_file} {logfile} | tail -n {lines}'
-            if search:
-                command += f' | grep "{search}"'
-        elif os.path.isfile(logfile):
-            command = f'tail -n {lines} {logfile}'
-            if search:
-                command += f' | grep "{search}"'
-
-    # Execute command and generate the output to display to the user
+        logfile = LOG_FILES.get(form_log_view.log.data, DAEMON_LOG_FILE)
+
     if command:
-        log = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
-        (log_output, _) = log.communicate()
-        log.wait()
-        log_output = str(log_output, 'latin-1')
+        log = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        log_output = str(log.stdout, 'latin-1')
+        if search:
+            log_output = '\n'.join(
+                each_line for each_line in log_output.splitlines() if search in each_line)
+    elif os.path.isfile(logfile):
+        try:
+            log_filter = LogFilter(
+                search='PID Settings' if log_field == 'log_pid_settings' else search,
+                level=level,
+                logger_name=logger_name,
+                start=log_view_time(time_start),
+                end=log_view_time(time_end))
+        except ValueError:
+            flash(gettext("Invalid time range"), "error")
+        else:
+            pattern = log_pattern(logfile)
+            log_position = LogFollower(logfile, pattern=pattern).position()
+            log_output = LogReader(logfile, pattern=pattern).read(lines, log_filter)
     else:
         log_output = 404
 
     return render_template('tools/logview.html',
                            form_log_view=form_log_view,
+                           level=level,
                            lines=lines,
                            log_field=log_field,
+                           log_position=log_position,
                            logfile=logfile,
+                           logger_name=logger_name,
                            log_output=log_output,
-                           search=search)
+                           search=search,
+                           time_end=time_end,
+                           time_start=time_start)
+
+
+@blueprint.route('/logview_tail')
+@flask_login.login_required
+def page_logview_tail():
+    """
+    Push the entries added to a log as server-sent events, for a live tail
+
+    The query parameters are log (as the log field of the log view form),
+    search, level, logger_name, and position (returned with the last log
+    view). Each event has the text of the new entries as its data and the
+    position after them as its ID, so a reconnecting browser continues
+    after the last event it received (Last-Event-ID). Streams end with the
+    event "end" after LIVE_STREAM_DURATION_SEC. Each stream holds a thread
+    of the web server until it ends, so tails share the limit of
+    LIVE_STREAMS_MAX streams (half of WEB_SERVER_THREADS) with
+    /measurements_live, and receive the event "busy" when it's reached.
+    """
+    if not utils_general.user_has_permission('view_logs'):
+        return 'Insufficient permissions', 403
+
+    log_field = request.args.get('log')
+    if log_field not in LOG_FILES:
+        return 'Unknown log', 404
+    logfile = LOG_FILES[log_field]
+    log_filter = LogFilter(
+        search='PID Settings' if log_field == 'log_pid_settings' else request.args.get('search'),
+        level=request.args.get('level'),
+        logger_name=request.args.get('logger_name', '').strip())
+    follower = LogFollower(
+        logfile, pattern=log_pattern(logfile), log_filter=log_filter,
+        position=request.headers.get('Last-Event-ID') or request.args.get('position'))
+
+    def log_events():
+        if not live_streams.acquire(blocking=False):
+            yield 'event: busy\ndata: \n\n'
+            return
+        try:
+            end = time.time() + LIVE_STREAM_DURATION_SEC
+            keepalive = time.time() + LIVE_STREAM_WAIT_SEC
+            while time.time() < end:
+                text = follower.read()
+                if text:
+                    data = ''.join(f'data: {each_line}\n' for each_line in text.split('\n'))
+                    yield f'id: {follower.position()}\n{data}\n'
+                    keepalive = time.time() + LIVE_STREAM_WAIT_SEC
+                elif time.time() > keepalive:
+                    yield ': keepalive\n\n'
+                    keepalive = time.time() + LIVE_STREAM_WAIT_SEC
+                time.sleep(LOG_TAIL_INTERVAL)
+            yield f'event: end\ndata: {follower.position()}\n\n'
+        except Exception:
+            logger.exception("URL for 'logview_tail'")
+            yield 'event: error\ndata: \n\n'
+        finally:
+            live_streams.release()
+
+    return Response(
+        stream_with_context(log_events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Don't let nginx buffer the events
+        })
+
+
+def log_pattern(logfile):
+    """Return the pattern of the start of entries of a log, if it's the daemon log."""
+    if logfile == DAEMON_LOG_FILE:
+        return DAEMON_LOG_PATTERN
+
+
+def log_view_time(value):
+    """Return the epoch of the time of an input of type datetime-local, or None if empty."""
+    if not value:
+        return None
+    return time.mktime(datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M').timetuple())
 
 
 @blueprint.route('/energy_usage_input_amp', methods=('GET', 'POST'))
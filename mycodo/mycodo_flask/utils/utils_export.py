@@ -21,9 +21,12 @@ from mycodo.config import (ALEMBIC_VERSION, DATABASE_NAME, DOCKER_CONTAINER, IMP
                            PATH_USER_SCRIPTS, PATH_WIDGETS_CUSTOM,
                            SQL_DATABASE_MYCODO, DATABASE_PATH)
 from mycodo.config_translations import TRANSLATIONS
+from mycodo.databases.models import PID, CustomController, Input, Output
 from mycodo.mycodo_flask.utils.utils_general import (flash_form_errors,
                                                      flash_success_errors)
+from mycodo.mycodo_flask.utils.utils_measurement import measurements_query_info
 from mycodo.scripts.measurement_db import get_influxdb_info
+from mycodo.utils.export_jobs import export_jobs
 from mycodo.utils.system_pi import assure_path_exists, cmd_output
 from mycodo.utils.tools import (create_measurements_export,
                                 create_settings_export)
@@ -73,6 +76,59 @@ def export_measurements(form):
     flash_success_errors(error, action, url_for('routes_page.page_export'))
 
 
+def export_measurements_job(form):
+    """
+    Start a background job to export the measurements of several devices to a single file
+    """
+    action = '{action} {controller}'.format(
+        action=TRANSLATIONS['export']['title'],
+        controller=TRANSLATIONS['measurement']['title'])
+    error = []
+
+    if not form.validate():
+        flash_form_errors(form)
+        return
+
+    try:
+        start_time, end_time = form.date_range.data.split(' - ')
+        start_seconds = int(time.mktime(time.strptime(start_time, '%m/%d/%Y %H:%M')))
+        end_seconds = int(time.mktime(time.strptime(end_time, '%m/%d/%Y %H:%M')))
+
+        selections = [each_selection.split(',') for each_selection in form.measurements.data
+                      if len(each_selection.split(',')) == 2]
+        info = measurements_query_info([measurement_id for _, measurement_id in selections])
+
+        device_names = {}
+        for each_table in [Input, Output, CustomController, PID]:
+            for each_device in each_table.query.filter(
+                    each_table.unique_id.in_([device_id for device_id, _ in selections])).all():
+                device_names[each_device.unique_id] = each_device.name
+
+        series = []
+        for _, measurement_id in selections:
+            if measurement_id not in info:
+                error.append(f"Measurement not found: {measurement_id}")
+                continue
+            device_id, channel, unit, measurement = info[measurement_id]
+            series.append({
+                'unique_id': device_id,
+                'unit': unit,
+                'channel': channel,
+                'measure': measurement,
+                'name': f'{device_names.get(device_id, "")} CH{channel} {measurement} ({unit}) ({device_id})'
+            })
+
+        if not error:
+            export_jobs.create(
+                series, start_seconds, end_seconds, data_format=form.export_format.data)
+    except ImportError:
+        error.append("Parquet export requires the pyarrow package to be installed")
+    except Exception as err:
+        error.append(f"Error: {err}")
+
+    flash_success_errors(error, action, url_for('routes_page.page_export'))
+
+
 def export_settings():
     """
     Save the Mycodo settings database (mycodo.db) to a zip file and serve it
@@ -3,6 +3,8 @@ import logging
 
 from flask_babel import gettext
 
+from mycodo.databases.models import PID
+from mycodo.databases.models import Conversion
 from mycodo.databases.models import CustomController
 from mycodo.databases.models import DeviceMeasurements
 from mycodo.databases.models import Input
@@ -10,6 +12,7 @@ from mycodo.mycodo_flask.extensions import db
 from mycodo.mycodo_flask.utils.utils_misc import determine_controller_type
 from mycodo.utils.functions import parse_function_information
 from mycodo.utils.inputs import parse_input_information
+from mycodo.utils.system_pi import return_measurement_info
 
 logger = logging.getLogger(__name__)
 
@@ -141,3 +144,55 @@ def measurement_mod_form(messages, page_refresh, form):
             messages["error"].append(str(except_msg))
 
     return messages, page_refresh
+
+
+def measurements_query_info(measurement_ids):
+    """
+    Return the device ID, channel, unit, and measurement to query for each measurement ID
+
+    The device ID is that of the measurement, so it doesn't need to be
+    trusted from a request. The measurements, conversions, and PIDs are each retrieved with one query.
+    The setpoint measurement of a PID is queried with the unit and measurement
+    of the PID's input measurement.
+
+    :param measurement_ids: list of DeviceMeasurements unique IDs
+    :return: measurement unique ID: (device_id, channel, unit, measurement)
+    :rtype: dict
+    """
+    measurement_ids = set(measurement_ids)
+    measures = {each_measure.unique_id: each_measure for each_measure in
+                DeviceMeasurements.query.filter(DeviceMeasurements.unique_id.in_(measurement_ids)).all()}
+
+    setpoint_pids = {}
+    setpoint_pid_ids = [each_measure.device_id for each_measure in measures.values()
+                        if each_measure.measurement_type == 'setpoint']
+    if setpoint_pid_ids:
+        for each_pid in PID.query.filter(PID.unique_id.in_(setpoint_pid_ids)).all():
+            if each_pid.measurement and ',' in each_pid.measurement:
+                setpoint_pids[each_pid.unique_id] = each_pid.measurement.split(',')[1]
+        missing_ids = set(setpoint_pids.values()) - set(measures)
+        if missing_ids:
+            for each_measure in DeviceMeasurements.query.filter(
+                    DeviceMeasurements.unique_id.in_(missing_ids)).all():
+                measures[each_measure.unique_id] = each_measure
+
+    conversion_ids = {each_measure.conversion_id for each_measure in measures.values()
+                      if each_measure.conversion_id}
+    conversions = {}
+    if conversion_ids:
+        conversions = {each_conversion.unique_id: each_conversion for each_conversion in
+                       Conversion.query.filter(Conversion.unique_id.in_(conversion_ids)).all()}
+
+    info = {}
+    for each_id in measurement_ids:
+        measure = measures.get(each_id)
+        if not measure:
+            continue
+        channel, unit, measurement = return_measurement_info(
+            measure, conversions.get(measure.conversion_id))
+        if measure.measurement_type == 'setpoint' and setpoint_pids.get(measure.device_id) in measures:
+            setpoint_measurement = measures[setpoint_pids[measure.device_id]]
+            _, unit, measurement = return_measurement_info(
+                setpoint_measurement, conversions.get(setpoint_measurement.conversion_id))
+        info[each_id] = (measure.device_id, channel, unit, measurement)
+    return info
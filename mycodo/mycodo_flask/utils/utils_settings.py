@@ -65,6 +65,7 @@ from mycodo.mycodo_flask.utils.utils_general import flash_success_errors
 from mycodo.utils.actions import parse_action_information
 from mycodo.utils.database import db_retrieve_table
 from mycodo.utils.functions import parse_function_information
+from mycodo.utils.influx import influxdb_client_invalidate
 from mycodo.utils.inputs import parse_input_information
 from mycodo.utils.layouts import update_layout
 from mycodo.utils.modules import load_module_from_file
@@ -462,6 +463,7 @@ def settings_general_mod(form):
                 mod_user.language = form.language.data
 
                 db.session.commit()
+                influxdb_client_invalidate()
                 control = DaemonControl()
                 control.refresh_daemon_misc_settings()
                 messages["success"].append('{action} {controller}'.format(
@@ -10,23 +10,42 @@ NotImplementedErrors
 """
 import datetime
 import logging
-import threading
 import time
 import timeit
 
-from sqlalchemy import and_
-from sqlalchemy import or_
-
 from mycodo.abstract_base_controller import AbstractBaseController
 from mycodo.databases.models import Output
 from mycodo.databases.models import OutputChannel
 from mycodo.databases.models import Trigger
 from mycodo.mycodo_client import DaemonControl
-from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.config_cache import config_cache
 from mycodo.utils.influx import write_influxdb_value
 from mycodo.utils.outputs import output_types
 
 
+def output_on_trigger_matches(output_state, output_duration, amount):
+    """Return whether an Output Trigger's state matches an output turning on for amount."""
+    if output_state == 'on_duration_none':
+        return amount == 0.0
+    elif output_state == 'on_duration_any':
+        return bool(amount)
+    elif output_state == 'on_duration_none_any':
+        return True
+    elif amount is None or output_duration is None:
+        return False
+    elif output_state == 'on_duration_equal':
+        return output_duration == amount
+    elif output_state == 'on_duration_greater_than':
+        return amount > output_duration
+    elif output_state == 'on_duration_equal_greater_than':
+        return amount >= output_duration
+    elif output_state == 'on_duration_less_than':
+        return amount < output_duration
+    elif output_state == 'on_duration_equal_less_than':
+        return amount <= output_duration
+    return False
+
+
 class AbstractOutput(AbstractBaseController):
     """
     Base Output class that ensures certain methods and values are present
@@ -314,15 +333,14 @@ class AbstractOutput(AbstractBaseController):
                             duration_on = float(time_on)
                         timestamp = datetime.datetime.utcnow() - datetime.timedelta(seconds=abs(duration_on))
 
-                        write_db = threading.Thread(
-                            target=write_influxdb_value,
-                            args=(self.unique_id,
-                                  's',
-                                  duration_on,),
-                            kwargs={'measure': 'duration_time',
-                                    'channel': output_channel,
-                                    'timestamp': timestamp})
-                        write_db.start()
+                        write_influxdb_value(
+                            self.unique_id,
+                            's',
+                            duration_on,
+                            measure='duration_time',
+                            channel=output_channel,
+                            timestamp=timestamp,
+                            block=False)
 
                     return 0, msg
 
@@ -433,15 +451,14 @@ class AbstractOutput(AbstractBaseController):
                             measurement_channel = each_measure_channel
                             break
 
-                write_db = threading.Thread(
-                    target=write_influxdb_value,
-                    args=(self.unique_id,
-                          's',
-                          duration_sec,),
-                    kwargs={'measure': 'duration_time',
-                            'channel': measurement_channel,
-                            'timestamp': timestamp})
-                write_db.start()
+                write_influxdb_value(
+                    self.unique_id,
+                    's',
+                    duration_sec,
+                    measure='duration_time',
+                    channel=measurement_channel,
+                    timestamp=timestamp,
+                    block=False)
 
             self.output_off_triggered[output_channel] = False
 
@@ -459,80 +476,37 @@ class AbstractOutput(AbstractBaseController):
         This function is executed whenever an output is turned on or off
         It is responsible for executing Output Triggers
         """
-        output_channel_dev = db_retrieve_table_daemon(OutputChannel).filter(
-            and_(OutputChannel.output_id == output_id, OutputChannel.channel == output_channel)).first()
-        if output_channel_dev is None:
+        output_channel_dev = config_cache.filter_by(
+            OutputChannel, output_id=output_id, channel=output_channel)
+        if not output_channel_dev:
             self.logger.error("Could not find channel in database")
             return
+        output_channel_dev = output_channel_dev[0]
 
         #
         # Check On/Off Outputs
         #
-        trigger_output = db_retrieve_table_daemon(Trigger)
-        trigger_output = trigger_output.filter(Trigger.trigger_type == 'trigger_output')
-        trigger_output = trigger_output.filter(Trigger.unique_id_1 == output_id)
-        trigger_output = trigger_output.filter(Trigger.unique_id_2 == output_channel_dev.unique_id)
-        trigger_output = trigger_output.filter(Trigger.is_activated.is_(True))
+        trigger_output = config_cache.filter_by(
+            Trigger,
+            trigger_type='trigger_output',
+            unique_id_1=output_id,
+            unique_id_2=output_channel_dev.unique_id,
+            is_activated=True)
 
         # Find any Output Triggers with the output_id of the output that
         # just changed its state
         if self.is_on(output_channel):
-            trigger_output = trigger_output.filter(
-                or_(Trigger.output_state == 'on_duration_none',
-                    Trigger.output_state == 'on_duration_any',
-                    Trigger.output_state == 'on_duration_none_any',
-                    Trigger.output_state == 'on_duration_equal',
-                    Trigger.output_state == 'on_duration_greater_than',
-                    Trigger.output_state == 'on_duration_equal_greater_than',
-                    Trigger.output_state == 'on_duration_less_than',
-                    Trigger.output_state == 'on_duration_equal_less_than'))
-
-            on_duration_none = and_(
-                Trigger.output_state == 'on_duration_none',
-                amount == 0.0)
-
-            on_duration_any = and_(
-                Trigger.output_state == 'on_duration_any',
-                bool(amount))
-
-            on_duration_none_any = Trigger.output_state == 'on_duration_none_any'
-
-            on_duration_equal = and_(
-                Trigger.output_state == 'on_duration_equal',
-                Trigger.output_duration == amount)
-
-            on_duration_greater_than = and_(
-                Trigger.output_state == 'on_duration_greater_than',
-                amount > Trigger.output_duration)
-
-            on_duration_equal_greater_than = and_(
-                Trigger.output_state == 'on_duration_equal_greater_than',
-                amount >= Trigger.output_duration)
-
-            on_duration_less_than = and_(
-                Trigger.output_state == 'on_duration_less_than',
-                amount < Trigger.output_duration)
-
-            on_duration_equal_less_than = and_(
-                Trigger.output_state == 'on_duration_equal_less_than',
-                amount <= Trigger.output_duration)
-
-            trigger_output = trigger_output.filter(
-                or_(on_duration_none,
-                    on_duration_any,
-                    on_duration_none_any,
-                    on_duration_equal,
-                    on_duration_greater_than,
-                    on_duration_equal_greater_than,
-                    on_duration_less_than,
-                    on_duration_equal_less_than))
+            trigger_output = [
+                each_trigger for each_trigger in trigger_output
+                if output_on_trigger_matches(each_trigger.output_state, each_trigger.output_duration, amount)]
         else:
-            trigger_output = trigger_output.filter(
-                Trigger.output_state == 'off')
+            trigger_output = [
+                each_trigger for each_trigger in trigger_output
+                if each_trigger.output_state == 'off']
 
         # Execute the Trigger Actions for each Output Trigger
         # for this particular Output device
-        for each_trigger in trigger_output.all():
+        for each_trigger in trigger_output:
             timestamp = datetime.datetime.fromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S')
             message = f"{timestamp}\n[Trigger {each_trigger.unique_id.split('-')[0]} ({each_trigger.name})] " \
                       f"Output {output_id} CH{output_channel} {each_trigger.output_state}"
@@ -543,15 +517,16 @@ class AbstractOutput(AbstractBaseController):
         #
         # Check PWM Outputs
         #
-        trigger_output_pwm = db_retrieve_table_daemon(Trigger)
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.trigger_type == 'trigger_output_pwm')
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.unique_id_1 == output_id)
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.unique_id_2 == output_channel_dev.unique_id)
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.is_activated.is_(True))
+        trigger_output_pwm = config_cache.filter_by(
+            Trigger,
+            trigger_type='trigger_output_pwm',
+            unique_id_1=output_id,
+            unique_id_2=output_channel_dev.unique_id,
+            is_activated=True)
 
         # Execute the Trigger Actions for each Output Trigger
         # for this particular Output device
-        for each_trigger in trigger_output_pwm.all():
+        for each_trigger in trigger_output_pwm:
             trigger_trigger = False
             duty_cycle = self.output_state(output_channel)
 
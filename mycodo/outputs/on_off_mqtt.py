@@ -8,6 +8,7 @@ from mycodo.databases.models import OutputChannel
 from mycodo.outputs.base_output import AbstractOutput
 from mycodo.utils.constraints_pass import constraints_pass_positive_or_zero_value
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.mqtt_publish import mqtt_publish
 from mycodo.utils.utils import random_alphanumeric
 
 measurements_dict = {
@@ -201,9 +202,7 @@ class OutputModule(AbstractOutput):
             OUTPUT_INFORMATION['custom_channel_options'], output_channels)
 
     def initialize(self):
-        import paho.mqtt.publish as publish
-
-        self.publish = publish
+        self.publish = mqtt_publish
 
         self.setup_output_variables(OUTPUT_INFORMATION)
         self.output_setup = True
@@ -233,7 +232,7 @@ class OutputModule(AbstractOutput):
                 }
 
             if state == 'on':
-                self.publish.single(
+                self.publish(
                     self.options_channels['topic'][0],
                     self.options_channels['payload_on'][0],
                     hostname=self.options_channels['hostname'][0],
@@ -244,7 +243,7 @@ class OutputModule(AbstractOutput):
                     transport='websockets' if self.options_channels['mqtt_use_websockets'][0] else 'tcp')
                 self.output_states[output_channel] = True
             elif state == 'off':
-                self.publish.single(
+                self.publish(
                     self.options_channels['topic'][0],
                     payload=self.options_channels['payload_off'][0],
                     hostname=self.options_channels['hostname'][0],
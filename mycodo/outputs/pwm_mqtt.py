@@ -15,6 +15,7 @@ from mycodo.utils.constraints_pass import constraints_pass_positive_or_zero_valu
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import add_measurements_influxdb
 from mycodo.utils.influx import read_influxdb_single
+from mycodo.utils.mqtt_publish import mqtt_publish
 from mycodo.utils.system_pi import return_measurement_info
 from mycodo.utils.utils import random_alphanumeric
 
@@ -235,9 +236,7 @@ class OutputModule(AbstractOutput):
             OUTPUT_INFORMATION['custom_channel_options'], output_channels)
 
     def initialize(self):
-        import paho.mqtt.publish as publish
-
-        self.publish = publish
+        self.publish = mqtt_publish
 
         self.setup_output_variables(OUTPUT_INFORMATION)
         self.output_setup = True
@@ -309,7 +308,7 @@ class OutputModule(AbstractOutput):
             elif self.options_channels['round_integer'][0] == "down":
                 amount = int(math.floor(amount))
 
-            self.publish.single(
+            self.publish(
                 self.options_channels['topic'][0],
                 amount,
                 hostname=self.options_channels['hostname'][0],
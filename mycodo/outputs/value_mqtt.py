@@ -11,6 +11,7 @@ from mycodo.outputs.base_output import AbstractOutput
 from mycodo.utils.constraints_pass import constraints_pass_positive_or_zero_value
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import add_measurements_influxdb
+from mycodo.utils.mqtt_publish import mqtt_publish
 from mycodo.utils.utils import random_alphanumeric
 
 measurements_dict = {
@@ -146,9 +147,7 @@ class OutputModule(AbstractOutput):
             OUTPUT_INFORMATION['custom_channel_options'], output_channels)
 
     def initialize(self):
-        import paho.mqtt.publish as publish
-
-        self.publish = publish
+        self.publish = mqtt_publish
 
         self.setup_output_variables(OUTPUT_INFORMATION)
         self.output_setup = True
@@ -167,7 +166,7 @@ class OutputModule(AbstractOutput):
                 }
 
             if state == 'on' and amount is not None:
-                self.publish.single(
+                self.publish(
                     self.options_channels['topic'][0],
                     amount,
                     hostname=self.options_channels['hostname'][0],
@@ -179,7 +178,7 @@ class OutputModule(AbstractOutput):
                 self.output_states[output_channel] = amount
                 measure_dict[0]['value'] = amount
             elif state == 'off':
-                self.publish.single(
+                self.publish(
                     self.options_channels['topic'][0],
                     payload=self.options_channels['off_value'][0],
                     hostname=self.options_channels['hostname'][0],
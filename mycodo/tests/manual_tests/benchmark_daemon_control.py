@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Benchmark of the latency of DaemonControl calls.
+#
+# Compares the latency of output_state() and trigger_action() through a
+# new Pyro5 connection over the loopback interface for each call (as calls
+# were made before), through pooled connections (as calls from the
+# frontend are made), and as the direct calls made when the server is in
+# the same process. The server only returns what the daemon would, so the
+# times are the overhead of the call itself.
+#
+# Usage: python benchmark_daemon_control.py [calls]
+#
+import os
+import statistics
+import sys
+import threading
+import time
+
+from Pyro5.api import Daemon, Proxy, expose
+
+sys.path.append(os.path.abspath(os.path.join(os.path.realpath(__file__), '../../../..')))
+
+from mycodo import mycodo_client
+from mycodo.mycodo_client import DaemonControl
+
+
+@expose
+class BenchmarkServer:
+    def output_state(self, output_id, output_channel):
+        return 'off'
+
+    def trigger_action(self, action_id, value={}, debug=False):
+        return {'message': f"[Action {action_id}]: Done.", 'value': value}
+
+
+def benchmark(name, func, calls):
+    times = []
+    for _ in range(calls):
+        timer = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - timer) * 1e6)
+    times.sort()
+    print(f"{name:<32} median {statistics.median(times):8.1f} us, "
+          f"p99 {times[int(len(times) * 0.99)]:8.1f} us")
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    server = BenchmarkServer()
+
+    daemon = Daemon(host='127.0.0.1', port=0)
+    uri = daemon.register(server, 'mycodo.pyro_server')
+    thread = threading.Thread(target=daemon.requestLoop, daemon=True)
+    thread.start()
+
+    # Before: a new Proxy and connection for each call
+    def new_proxy():
+        proxy = Proxy(uri)
+        proxy._pyroTimeout = 30
+        return proxy
+    benchmark("output_state (Pyro)", lambda: new_proxy().output_state('id', 0), calls)
+    benchmark("trigger_action (Pyro)", lambda: new_proxy().trigger_action('id', value={'a': 1}), calls)
+
+    # Pooled connections
+    remote = DaemonControl(pyro_uri=str(uri), pyro_timeout=30)
+    benchmark("output_state (Pyro, pooled)", lambda: remote.output_state('id', 0), calls)
+    benchmark("trigger_action (Pyro, pooled)", lambda: remote.trigger_action('id', value={'a': 1}), calls)
+
+    # After: the server is registered as being in the same process
+    mycodo_client.set_local_server(server)
+    local = DaemonControl(pyro_timeout=30)
+    benchmark("output_state (in-process)", lambda: local.output_state('id', 0), calls)
+    benchmark("trigger_action (in-process)", lambda: local.trigger_action('id', value={'a': 1}), calls)
+
+    daemon.shutdown()
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Benchmark of daemon database lookups: creating an engine and session for
+# every lookup (previous session_scope behavior) vs. the shared engine and
+# thread-local session used by db_retrieve_table_daemon().
+#
+# Usage: python benchmark_database_lookups.py [lookups]
+#
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.realpath(__file__), '../../../..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from mycodo.databases.models import Misc
+from mycodo.databases.utils import get_scoped_session, get_session_factory
+from mycodo.mycodo_flask.extensions import db
+
+
+def lookup_new_engine(db_uri):
+    session = sessionmaker(bind=create_engine(f"{db_uri}?check_same_thread=False"))()
+    try:
+        misc = session.query(Misc).first()
+        session.expunge_all()
+        return misc
+    finally:
+        session.close()
+
+
+def lookup_shared_engine(db_uri):
+    session = get_scoped_session(db_uri)
+    try:
+        misc = session.query(Misc).first()
+        session.expunge_all()
+        return misc
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    db_dir = tempfile.mkdtemp()
+    uri = f'sqlite:///{os.path.join(db_dir, "benchmark.db")}'
+
+    engine = get_session_factory(uri)().get_bind()
+    db.metadata.create_all(engine, tables=[Misc.__table__])
+    with get_session_factory(uri)() as new_session:
+        new_session.add(Misc())
+        new_session.commit()
+
+    for name, func in [("New engine per lookup", lookup_new_engine),
+                       ("Shared engine, scoped session", lookup_shared_engine)]:
+        func(uri)  # warm up
+        duration = timeit.timeit(lambda: func(uri), number=lookups)
+        print(f"{name}: {lookups / duration:.0f} lookups/sec ({duration / lookups * 1000:.3f} ms/lookup)")
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Benchmark of the bytes written to the bus of displays for each refresh.
+#
+# Displays a clock line that changes every refresh, a measurement that
+# changes every other refresh, and lines that don't change, on headless
+# character and pixel displays. Before, every line of a character display
+# was written each refresh (4 lines, even on 2 line displays), and pixel
+# displays were cleared and then written entirely. After, only the
+# characters or pixel pages that changed are written.
+#
+# Pixel displays use a made up 5x8 font, since only the number of
+# changed pixel columns matters, drawn 2 pixels up like the Functions.
+#
+# Usage: python benchmark_display.py [refreshes]
+#
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.realpath(__file__), '../../../..')))
+
+from mycodo.tests.mock_displays import MockCharacterDisplay, MockPageDisplay
+
+
+def display_lines(refresh, count):
+    lines = [
+        "12:00:{:02d}".format(refresh % 60),
+        "Temp {:.1f} C".format(21 + (refresh // 2) * 0.1),
+        "192.168.0.10",
+        "Greenhouse"
+    ]
+    return (lines + ["Line {}".format(index) for index in range(4, count)])[:count]
+
+
+def render(lines, width, height):
+    buffer = bytearray(width * (height // 8))
+    for index, text in enumerate(lines):
+        top = -2 + index * 8
+        for position, character in enumerate(text):
+            for column in range(6):
+                x = position * 6 + column
+                if x >= width or character == ' ' or column == 5:
+                    continue
+                bits = ((ord(character) * 2654435761) >> (column * 5)) & 0x7F
+                for bit in range(8):
+                    y = top + bit
+                    if bits & (1 << bit) and 0 <= y < height:
+                        buffer[(y // 8) * width + x] |= 1 << (y % 8)
+    return buffer
+
+
+def benchmark_characters(name, columns, lines, refreshes):
+    before = MockCharacterDisplay(columns, 4, full_refresh=True)
+    after = MockCharacterDisplay(columns, lines)
+    for refresh in range(refreshes):
+        before.lcd_write_lines(*display_lines(refresh, lines))
+        after.lcd_write_lines(*display_lines(refresh, lines))
+    print_result(name, before.bus_bytes, after.bus_bytes, refreshes)
+
+
+def benchmark_pixels(name, width, height, lines, refreshes):
+    before = MockPageDisplay(width, height, full_refresh=True)
+    after = MockPageDisplay(width, height)
+    for refresh in range(refreshes):
+        buffer = render(display_lines(refresh, lines), width, height)
+        before.lcd_init()
+        before.write_buffer(buffer)
+        after.write_buffer(buffer)
+    print_result(name, before.bus_bytes, after.bus_bytes, refreshes)
+
+
+def print_result(name, bytes_before, bytes_after, refreshes):
+    print(f"{name:<24} before {bytes_before / refreshes:8.1f} bytes/refresh, "
+          f"after {bytes_after / refreshes:8.1f} bytes/refresh "
+          f"({bytes_before / max(bytes_after, 1):.1f}x fewer)")
+
+
+if __name__ == '__main__':
+    refreshes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    benchmark_characters("LCD 16x2 (I2C)", 16, 2, refreshes)
+    benchmark_characters("LCD 20x4 (I2C)", 20, 4, refreshes)
+    benchmark_pixels("SSD1306 128x32 (I2C)", 128, 32, 4, refreshes)
+    benchmark_pixels("SSD1306 128x64 (I2C)", 128, 64, 8, refreshes)
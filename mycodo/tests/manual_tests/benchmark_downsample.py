@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Benchmark of downsampling synthetic series for the /async graph endpoint.
+#
+# The measurement database performs the mean and min/max reduction of each
+# bucket, so the min/max reduction is done in Python here only to produce the
+# points LTTB is applied to. Compared are LTTB over every point, LTTB over the
+# min/max preselected points, and the JSON/binary encodings of the result.
+#
+# Usage: python benchmark_downsample.py [points] [width]
+#
+import json
+import math
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.realpath(__file__), '../../../..')))
+
+from mycodo.utils.downsample import (LTTB_PRESELECT_RATIO, lttb,
+                                     series_to_binary, series_to_columns_json,
+                                     series_to_json)
+
+
+def synthetic_series(points, period_sec=15):
+    """Temperature-like series: daily cycle, noise, and occasional spikes."""
+    start = 1600000000
+    times = [start + i * period_sec for i in range(points)]
+    values = []
+    for i, each_time in enumerate(times):
+        value = 20 + 5 * math.sin(each_time / 86400 * 2 * math.pi) + random.gauss(0, 0.3)
+        if i % 50000 == 0:
+            value += 15
+        values.append(value)
+    return times, values
+
+
+def minmax_buckets(times, values, buckets):
+    """The points with the lowest and highest value in each bucket, in time order."""
+    start = times[0]
+    width = (times[-1] - start) / buckets or 1
+    selected = {}
+    for i, each_time in enumerate(times):
+        bucket = min(int((each_time - start) / width), buckets - 1)
+        if bucket not in selected:
+            selected[bucket] = [i, i]
+        else:
+            if values[i] < values[selected[bucket][0]]:
+                selected[bucket][0] = i
+            if values[i] > values[selected[bucket][1]]:
+                selected[bucket][1] = i
+    indexes = sorted({i for each_pair in selected.values() for i in each_pair})
+    return [times[i] for i in indexes], [values[i] for i in indexes]
+
+
+def timed(name, func, number=1):
+    duration = timeit.timeit(func, number=number) / number
+    print(f"{name:<50} {duration * 1000:10.1f} ms")
+    return func()
+
+
+if __name__ == '__main__':
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 700
+
+    print(f"Generating {points} points...")
+    times, values = synthetic_series(points)
+    max_value = max(values)
+
+    lttb_all = timed(f"LTTB over all {points} points", lambda: lttb(times, values, width))
+    preselected = timed(
+        f"Min/max of {width * LTTB_PRESELECT_RATIO} buckets (database)",
+        lambda: minmax_buckets(times, values, width * LTTB_PRESELECT_RATIO))
+    lttb_preselected = timed(
+        f"LTTB over {len(preselected[0])} preselected points",
+        lambda: lttb(*preselected, width), number=20)
+    print(f"Spike kept: LTTB over all points {max(lttb_all[1]) == max_value}, "
+          f"preselected {max(lttb_preselected[1]) == max_value}")
+
+    print()
+    for count in [width, len(preselected[0]), points]:
+        sub_times, sub_values = times[:count], values[:count]
+        pairs = list(zip(sub_times, sub_values))
+        number = 5 if count < 100000 else 1
+        timed(f"Encode {count} points: json.dumps of tuples",
+              lambda: json.dumps(pairs), number=number)
+        timed(f"Encode {count} points: series_to_json()",
+              lambda: ''.join(series_to_json(sub_times, sub_values)), number=number)
+        timed(f"Encode {count} points: series_to_columns_json()",
+              lambda: series_to_columns_json(sub_times, sub_values), number=number)
+        timed(f"Encode {count} points: series_to_binary()",
+              lambda: series_to_binary(sub_times, sub_values), number=number)
+        print(f"{'':<50} sizes: json {len(''.join(series_to_json(sub_times, sub_values)))} B, "
+              f"columns {len(series_to_columns_json(sub_times, sub_values))} B, "
+              f"binary {len(series_to_binary(sub_times, sub_values))} B")
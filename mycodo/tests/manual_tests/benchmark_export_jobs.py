@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Benchmark of measurement export jobs with synthetic series.
+#
+# A job queries one time slice of all its series at a time and appends the
+# joined rows to the output file, so the peak memory use should stay about
+# the same as the time range (and size of the file) grows.
+#
+# Usage: python benchmark_export_jobs.py [series] [period_sec]
+#
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.realpath(__file__), '../../../..')))
+
+from mycodo.utils.export_jobs import ExportJobs
+
+
+def synthetic_query(period_sec):
+    """Return a query function with a point every period_sec seconds for each series."""
+    def query(series):
+        data = []
+        for index, each_series in enumerate(series):
+            start = math.ceil(each_series['start'] / period_sec) * period_sec
+            times = list(range(int(start), int(each_series['end']), period_sec))
+            data.append((times, [20 + index + math.sin(each_time / 3600) for each_time in times]))
+        return data
+    return query
+
+
+if __name__ == '__main__':
+    count_series = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    period_sec = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    series = [{'unique_id': f'device_{i}', 'unit': 'C', 'channel': i,
+               'measure': 'temperature', 'name': f'Series {i}'}
+              for i in range(count_series)]
+
+    with tempfile.TemporaryDirectory() as path:
+        jobs = ExportJobs(path=path, query_func=synthetic_query(period_sec))
+        for days in [1, 30, 365]:
+            job_id = jobs.create(series, 1600000000, 1600000000 + days * 86400, start_thread=False)
+            jobs.cancel_events[job_id] = threading.Event()
+
+            tracemalloc.start()
+            timer = time.perf_counter()
+            jobs.run(job_id)
+            duration = time.perf_counter() - timer
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            job = jobs.load(job_id)
+            size = os.path.getsize(jobs.path_output(job))
+            print(f"{days:>4} days, {count_series} series: {job['rows']:>9} rows, "
+                  f"{size / 1e6:8.1f} MB file, {duration:7.1f} s, "
+                  f"peak memory {peak / 1e6:6.1f} MB")
+            jobs.delete(job_id)
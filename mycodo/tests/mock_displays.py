@@ -0,0 +1,77 @@
+# coding=utf-8
+"""Displays without hardware, for the display tests and benchmarks."""
+from mycodo.utils.display import CharacterFramebuffer, PageFramebuffer
+
+
+class MockCharacterDisplay:
+    """
+    A character display without hardware
+
+    Has the methods of the LCD devices and keeps the text shown, counting
+    the bytes an HD44780 with an I2C backpack would receive (each byte is
+    sent as two 4-bit halves, each written three times to toggle enable).
+    """
+    BUS_BYTES_PER_BYTE = 6
+
+    def __init__(self, columns=16, lines=2, full_refresh=False):
+        self.columns = columns
+        self.lines = lines
+        self.full_refresh = full_refresh
+        self.framebuffer = CharacterFramebuffer(columns, lines)
+        self.screen = [" " * columns for _ in range(lines)]
+        self.bus_bytes = 0
+
+    def lcd_init(self):
+        self.bus_bytes += 6 * self.BUS_BYTES_PER_BYTE
+        self.screen = [" " * self.columns for _ in range(self.lines)]
+        self.framebuffer.invalidate()
+
+    def lcd_backlight(self, state):
+        self.bus_bytes += self.BUS_BYTES_PER_BYTE
+
+    def lcd_write_at(self, line, column, text):
+        self.bus_bytes += (1 + len(text)) * self.BUS_BYTES_PER_BYTE
+        row = self.screen[line - 1]
+        self.screen[line - 1] = (row[:column] + text + row[column + len(text):])[:self.columns]
+
+    def lcd_write_lines(self, *lines):
+        if self.full_refresh:
+            self.framebuffer.invalidate()
+        for line, column, text in self.framebuffer.update(lines):
+            self.lcd_write_at(line + 1, column, text)
+
+
+class MockPageDisplay:
+    """
+    A pixel display without hardware
+
+    Keeps the pages shown, counting the bytes an SSD1306 on an I2C bus
+    would receive (6 addressing commands of 2 bytes, then a control byte
+    and the data, for each region).
+    """
+    BUS_BYTES_PER_REGION = 13
+
+    def __init__(self, width=128, height=64, full_refresh=False):
+        self.width = width
+        self.height = height
+        self.full_refresh = full_refresh
+        self.framebuffer = PageFramebuffer(width, height)
+        self.buffer = bytearray(width * (height // 8))
+        self.bus_bytes = 0
+
+    def lcd_init(self):
+        """Clear the display, writing every page."""
+        self.write_buffer(bytes(len(self.buffer)), full_refresh=True)
+
+    def write_buffer(self, buffer, full_refresh=False):
+        if full_refresh or self.full_refresh:
+            # Write the whole buffer as one region
+            self.framebuffer.update(buffer)
+            self.buffer[:] = buffer
+            self.bus_bytes += self.BUS_BYTES_PER_REGION + len(buffer)
+            return
+        for page, first, last in self.framebuffer.update(buffer):
+            start = page * self.width + first
+            end = page * self.width + last + 1
+            self.buffer[start:end] = buffer[start:end]
+            self.bus_bytes += self.BUS_BYTES_PER_REGION + end - start
@@ -0,0 +1,45 @@
+# coding=utf-8
+"""Tests for the shared InfluxDB clients."""
+import threading
+import time
+
+from mycodo.utils.influx import InfluxDBClientManager
+
+
+class FakeClient:
+    def query_api(self):
+        return object()
+
+    def close(self):
+        pass
+
+
+def test_client_manager_shared_client(monkeypatch):
+    """Verify threads requesting an API at the same time share one client."""
+    print("\nTest: test_client_manager_shared_client")
+    manager = InfluxDBClientManager()
+    created = []
+
+    def create_client(timeout):
+        time.sleep(0.05)  # Give other threads the chance to request a client
+        created.append(FakeClient())
+        return created[-1], 'mycodo_db', '2'
+
+    monkeypatch.setattr(manager, '_create_client', create_client)
+
+    apis = []
+    threads = [threading.Thread(target=lambda: apis.append(manager.get_query_api()[0]))
+               for _ in range(5)]
+    for each_thread in threads:
+        each_thread.start()
+    for each_thread in threads:
+        each_thread.join()
+
+    assert len(created) == 1
+    assert len(set(map(id, apis))) == 1
+    assert manager.stats() == {'clients_open': 1, 'connections_created': 1, 'connections_reused': 4}
+
+    manager.invalidate()
+    manager.get_query_api()
+    assert len(created) == 2
+    assert manager.stats()['connections_reused'] == 4
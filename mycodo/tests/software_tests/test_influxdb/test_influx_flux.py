@@ -0,0 +1,12 @@
+# coding=utf-8
+"""Tests for building Flux queries."""
+from mycodo.utils.influx import flux_series_filter
+
+
+def test_flux_series_filter_escaped():
+    """Verify quotes, backslashes, and interpolation can't end the string literals of a filter."""
+    print("\nTest: test_flux_series_filter_escaped")
+    query = flux_series_filter('C', 'id") |> drop(columns: ["x"]) //', measure='tem\\p${x}', channel=0)
+    assert 'r["device_id"] == "id\\") |> drop(columns: [\\"x\\"]) //")' in query
+    assert 'r["measure"] == "tem\\\\p\\${x}")' in query
+    assert 'r["channel"] == "0")' in query
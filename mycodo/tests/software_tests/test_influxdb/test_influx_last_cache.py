@@ -0,0 +1,51 @@
+# coding=utf-8
+"""Tests for the last measurements held in memory by the daemon."""
+from mycodo.utils import influx
+from mycodo.utils.influx import LastMeasurementCache, invalidate_daemon_last_cache
+
+
+def test_last_cache_invalidate():
+    """Verify the values of invalidated devices are no longer returned."""
+    print("\nTest: test_last_cache_invalidate")
+    cache = LastMeasurementCache()
+    cache.enabled = True
+    cache.update('a', 'C', 21.5, channel=0)
+    cache.update('b', 'C', 22.5, channel=0)
+
+    cache.invalidate(['a'])
+    assert cache.get('a', 'C', 0) is None
+    assert cache.get('b', 'C', 0)[1] == 22.5
+
+    cache.invalidate()
+    assert cache.get('b', 'C', 0) is None
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_last_cache_timestamp_offset():
+    """Verify timestamps with an offset keep it, and those without one are UTC."""
+    print("\nTest: test_last_cache_timestamp_offset")
+    assert LastMeasurementCache.to_epoch('2024-01-01T02:00:00+02:00') == 1704067200
+    assert LastMeasurementCache.to_epoch('2024-01-01T00:00:00') == 1704067200
+    assert LastMeasurementCache.to_epoch(1704067200 * 10 ** 9) == 1704067200
+
+
+def test_invalidate_daemon_last_cache(monkeypatch):
+    """Verify other processes notify the daemon of the devices they wrote."""
+    print("\nTest: test_invalidate_daemon_last_cache")
+    invalidated = []
+
+    class DaemonControl:
+        def __init__(self, pyro_timeout=None):
+            pass
+
+        def last_measurement_cache_invalidate(self, unique_ids):
+            invalidated.append(unique_ids)
+
+    monkeypatch.setattr(influx, 'DaemonControl', DaemonControl)
+    invalidate_daemon_last_cache(['b', 'a', 'b'])
+    assert invalidated == [['a', 'b']]
+
+    # The daemon updates its own cache
+    monkeypatch.setattr(influx.influxdb_last_cache, 'enabled', True)
+    invalidate_daemon_last_cache(['a'])
+    assert len(invalidated) == 1
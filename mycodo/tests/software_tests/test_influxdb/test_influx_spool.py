@@ -0,0 +1,72 @@
+# coding=utf-8
+"""Tests for the measurement spool."""
+import os
+
+from mycodo.utils.influx_spool import InfluxDBSpool, spool_status
+
+
+def test_spool_append_replay(tmp_path):
+    """Verify spooled measurements are rotated, replayed in order, and removed."""
+    print("\nTest: test_spool_append_replay")
+    spool = InfluxDBSpool(path=str(tmp_path), segment_bytes=100, keep_open=True)
+    lines = [f'C,device_id=ID_ASDF,channel=0 value={i} {i}' for i in range(10)]
+
+    for each_line in lines:
+        spool.append([each_line])
+
+    status = spool_status(str(tmp_path))
+    assert status['bytes'] == sum(len(each_line) + 1 for each_line in lines)
+    assert 1 < status['segments'] < 10
+
+    written = []
+    assert spool.replay(written.extend) == 10
+    assert written == lines
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_spool_replay_failure(tmp_path):
+    """Verify unwritten measurements remain in the spool when a write fails."""
+    print("\nTest: test_spool_replay_failure")
+    spool = InfluxDBSpool(path=str(tmp_path))
+    lines = [f'C,device_id=ID_ASDF,channel=0 value={i} {i}' for i in range(10)]
+    spool.append(lines)
+
+    written = []
+
+    def write_fail(batch):
+        if written:
+            raise Exception("Database unavailable")
+        written.extend(batch)
+
+    assert spool.replay(write_fail, batch_size=4) == 4
+    assert spool_status(str(tmp_path))['bytes'] == sum(len(each_line) + 1 for each_line in lines[4:])
+
+    written = []
+    assert spool.replay(written.extend) == 6
+    assert written == lines[4:]
+
+
+def test_spool_max_bytes(tmp_path):
+    """Verify the oldest segments are deleted when the spool exceeds its size cap."""
+    print("\nTest: test_spool_max_bytes")
+    spool = InfluxDBSpool(path=str(tmp_path), segment_bytes=50, max_bytes=200)
+
+    for i in range(50):
+        spool.append([f'C,device_id=ID_ASDF,channel=0 value={i} {i}'])
+
+    assert spool_status(str(tmp_path))['bytes'] <= 200 + 50
+    assert spool.points_dropped > 0
+
+
+def test_spool_closed_after_append(tmp_path):
+    """Verify measurements spooled by a process that doesn't replay may be replayed by another."""
+    print("\nTest: test_spool_closed_after_append")
+    spool_flask = InfluxDBSpool(path=str(tmp_path))
+    spool_daemon = InfluxDBSpool(path=str(tmp_path), keep_open=True)
+    spool_flask.append(['C,device_id=ID_ASDF,channel=0 value=1 1'])
+    spool_flask.append(['C,device_id=ID_ASDF,channel=0 value=2 2'])
+    assert len(spool_flask.segments()) == 2
+
+    written = []
+    assert spool_daemon.replay(written.extend) == 2
+    assert spool_status(str(tmp_path))['segments'] == 0
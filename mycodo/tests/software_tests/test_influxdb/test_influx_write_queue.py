@@ -0,0 +1,48 @@
+# coding=utf-8
+"""Tests for the measurement write queue."""
+import timeit
+
+from mycodo.utils import influx
+from mycodo.utils.influx import (WRITE_SPOOLED, InfluxDBWriteQueue,
+                                 measurements_to_points, points_to_lines,
+                                 write_influxdb_value)
+from mycodo.utils.influx_spool import InfluxDBSpool
+
+
+def test_write_queue_full(tmp_path, monkeypatch):
+    """Verify points are spooled without waiting when the queue is full."""
+    print("\nTest: test_write_queue_full")
+    spool = InfluxDBSpool(path=str(tmp_path))
+    monkeypatch.setattr(influx, 'influxdb_spool', spool)
+    write_queue = InfluxDBWriteQueue(max_size=2)
+    monkeypatch.setattr(write_queue, 'start', lambda: None)  # No writer thread
+
+    measurements = {i: {'measurement': 'temperature', 'unit': 'C', 'value': float(i)} for i in range(5)}
+    lines = points_to_lines(measurements_to_points('ID_ASDF', measurements))
+    assert all(each_line.rsplit(' ', 1)[1].isdigit() for each_line in lines)  # Have timestamps
+
+    timer = timeit.default_timer()
+    assert write_queue.put(lines) == 3
+    assert timeit.default_timer() - timer < 0.5
+
+    assert spool.points_spooled == 3
+    stats = write_queue.stats()
+    assert stats['queue_depth'] == 2
+    assert stats['points_queued'] == 2
+    assert stats['points_overflowed'] == 3
+    assert stats['points_spooled'] == 3
+
+
+def test_write_spooled(tmp_path, monkeypatch):
+    """Verify a blocking write that was spooled isn't reported as written."""
+    print("\nTest: test_write_spooled")
+    spool = InfluxDBSpool(path=str(tmp_path))
+    monkeypatch.setattr(influx, 'influxdb_spool', spool)
+
+    class WriteApi:
+        def write(self, bucket, record):
+            raise Exception("Database unavailable")
+
+    monkeypatch.setattr(influx.influxdb_client_manager, 'get_write_api', lambda: (WriteApi(), 'mycodo_db'))
+    assert write_influxdb_value('ID_ASDF', 'C', 21.5, channel=0) == WRITE_SPOOLED
+    assert spool.points_spooled == 1
@@ -0,0 +1,45 @@
+# coding=utf-8
+"""Tests for reusing the objects of Action modules."""
+from types import SimpleNamespace
+
+from mycodo.utils import actions
+from mycodo.utils.config_cache import config_cache
+
+
+def write_action_module(tmp_path):
+    path = tmp_path / 'action_test_objects.py'
+    path.write_text(
+        "class ActionModule:\n"
+        "    def __init__(self, action):\n"
+        "        self.action = action\n")
+    return str(path)
+
+
+def test_action_objects_evicted(tmp_path, monkeypatch):
+    """Verify Action objects are reused until the Action's row changes."""
+    print("\nTest: test_action_objects_evicted")
+    monkeypatch.setattr(config_cache, 'enabled', True)
+    monkeypatch.setattr(actions, 'action_objects', {})
+    file_path = write_action_module(tmp_path)
+    action = SimpleNamespace(id=1, unique_id='action_1')
+
+    action_object = actions.get_action_object(action, file_path)
+    assert actions.get_action_object(action, file_path) is action_object
+
+    config_cache.invalidate('function_actions', [1])
+    assert 'action_1' not in actions.action_objects
+    assert actions.get_action_object(action, file_path) is not action_object
+
+
+def test_action_objects_uncached(tmp_path, monkeypatch):
+    """Verify Action objects aren't kept if changes to Actions aren't reported to the process."""
+    print("\nTest: test_action_objects_uncached")
+    monkeypatch.setattr(config_cache, 'enabled', False)
+    monkeypatch.setattr(actions, 'action_objects', {})
+    file_path = write_action_module(tmp_path)
+    action = SimpleNamespace(id=1, unique_id='action_1')
+
+    action_object = actions.get_action_object(action, file_path)
+    assert action_object.action is action
+    assert actions.get_action_object(action, file_path) is not action_object
+    assert not actions.action_objects
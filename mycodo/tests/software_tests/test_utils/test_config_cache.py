@@ -0,0 +1,72 @@
+# coding=utf-8
+"""Tests for the configuration cache."""
+import threading
+import time
+
+from mycodo.databases.models import Trigger
+from mycodo.databases.utils import get_session_factory, session_scope
+from mycodo.mycodo_flask.extensions import db
+from mycodo.utils import config_cache as config_cache_module
+from mycodo.utils.config_cache import ChangeNotifier, ConfigCache
+
+
+def test_config_cache_invalidation(tmp_path, monkeypatch):
+    """Verify cached rows are indexed and refreshed when a session commits a change."""
+    print("\nTest: test_config_cache_invalidation")
+    uri = f'sqlite:///{tmp_path / "config.db"}'
+    db.metadata.create_all(get_session_factory(uri)().get_bind(), tables=[Trigger.__table__])
+    monkeypatch.setattr(config_cache_module, 'MYCODO_DB_PATH', uri)
+    cache = ConfigCache()
+    cache.enabled = True
+    monkeypatch.setattr(config_cache_module, 'config_cache', cache)
+
+    with session_scope(uri) as new_session:
+        new_session.add(Trigger(unique_id='trigger_1', trigger_type='trigger_output', is_activated=True))
+        new_session.add(Trigger(unique_id='trigger_2', trigger_type='trigger_output', is_activated=False))
+
+    assert [each.unique_id for each in cache.filter_by(
+        Trigger, trigger_type='trigger_output', is_activated=True)] == ['trigger_1']
+    assert cache.get(Trigger, 'trigger_2').is_activated is False
+
+    with session_scope(uri) as new_session:
+        new_session.query(Trigger).filter(Trigger.unique_id == 'trigger_2').first().is_activated = True
+
+    assert [each.unique_id for each in cache.filter_by(
+        Trigger, trigger_type='trigger_output', is_activated=True)] == ['trigger_1', 'trigger_2']
+
+    with session_scope(uri) as new_session:
+        new_session.query(Trigger).filter(Trigger.unique_id == 'trigger_1').delete()
+
+    assert cache.get(Trigger, 'trigger_1') is None
+    stats = cache.stats()['trigger']
+    assert stats['rows'] == 1
+    assert stats['invalidations'] == 3
+    assert stats['misses'] == 2
+
+
+def test_config_change_notifier(monkeypatch):
+    """Verify changes are sent to the daemon in the background, merged while it's busy."""
+    print("\nTest: test_config_change_notifier")
+    sent = []
+    busy = threading.Event()
+
+    class DaemonControl:
+        def __init__(self, pyro_timeout=None):
+            pass
+
+        def config_changed(self, table, ids=None):
+            busy.wait(5)
+            sent.append((table, ids))
+
+    monkeypatch.setattr('mycodo.mycodo_client.DaemonControl', DaemonControl)
+    notifier = ChangeNotifier()
+    timer = time.monotonic()
+    notifier.queue('trigger', [1])
+    time.sleep(0.05)  # Being sent
+    notifier.queue('trigger', [2])
+    notifier.queue('trigger', [3])
+    notifier.queue('misc')
+    assert time.monotonic() - timer < 1
+    busy.set()
+    notifier.wait_sent()
+    assert sent == [('trigger', [1]), ('trigger', [2, 3]), ('misc', None)]
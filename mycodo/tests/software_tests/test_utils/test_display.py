@@ -0,0 +1,86 @@
+# coding=utf-8
+"""Tests for the line generation and framebuffers of display Functions."""
+from mycodo.tests.mock_displays import MockCharacterDisplay, MockPageDisplay
+from mycodo.utils import lcd
+from mycodo.utils.lcd import DisplayLines
+
+
+def test_character_display():
+    """Verify only the characters that change are written, and the display shows the lines."""
+    print("\nTest: test_character_display")
+    display = MockCharacterDisplay(columns=16, lines=2)
+
+    display.lcd_write_lines("Temp 21.5 C", "Hum 40.1 %", "", "")
+    assert display.screen == ["Temp 21.5 C     ", "Hum 40.1 %      "]
+    assert display.bus_bytes == 2 * 17 * display.BUS_BYTES_PER_BYTE
+
+    display.bus_bytes = 0
+    display.lcd_write_lines("Temp 21.7 C", "Hum 40.1 %", "", "")
+    assert display.screen == ["Temp 21.7 C     ", "Hum 40.1 %      "]
+    assert display.bus_bytes == 2 * display.BUS_BYTES_PER_BYTE  # Position and one character
+
+    display.bus_bytes = 0
+    display.lcd_write_lines("Temp 21.7 C", "Hum 40.1 %", "", "")
+    assert display.bus_bytes == 0
+
+    # Changes separated by one character are written together, None leaves a line
+    display.lcd_write_lines("Temp 19.8 C", None)
+    assert display.screen == ["Temp 19.8 C     ", "Hum 40.1 %      "]
+    assert display.framebuffer.update(["Temp 20.9 C", "Humidity"]) == [
+        (0, 5, "20.9"), (1, 3, "idity  ")]
+
+    # A cleared display is written entirely
+    display.lcd_init()
+    display.lcd_write_lines("Temp 19.8 C", "Hum 40.1 %")
+    assert display.screen == ["Temp 19.8 C     ", "Hum 40.1 %      "]
+
+
+def test_page_display():
+    """Verify only the changed columns of each page of a pixel display are written."""
+    print("\nTest: test_page_display")
+    display = MockPageDisplay(width=128, height=32)
+    buffer = bytearray(128 * 4)
+    buffer[0:10] = b'\xff' * 10
+    display.write_buffer(buffer)
+    assert display.buffer == buffer
+    assert display.bus_bytes == 4 * (display.BUS_BYTES_PER_REGION + 128)
+
+    display.bus_bytes = 0
+    buffer[128 * 2 + 40:128 * 2 + 44] = b'\x0f' * 4
+    display.write_buffer(buffer)
+    assert display.buffer == buffer
+    assert display.framebuffer.update(buffer) == []
+    assert display.bus_bytes == display.BUS_BYTES_PER_REGION + 4
+
+
+def test_display_lines(monkeypatch):
+    """Verify the measurements of a line set are retrieved with one lookup."""
+    print("\nTest: test_display_lines")
+    lookups = []
+
+    def get_last_measurements(measurements):
+        lookups.append(measurements)
+        return [[1700000000, 21.456], [None, None]]
+
+    monkeypatch.setattr(lcd, 'get_last_measurements', get_last_measurements)
+    monkeypatch.setattr(lcd, 'get_measurement_info', lambda device_id, measurement_id: ('C', 1, 'Temp'))
+    monkeypatch.setattr(lcd, 'info_cache', {'ip_address': (float('inf'), '192.0.2.10')})
+
+    options_channels = {
+        'line_display_type': {0: 'measurement_value', 1: 'measurement_value', 2: 'ip_address', 3: 'text'},
+        'select_measurement': {
+            0: {'device_id': 'input_1', 'measurement_id': 'measurement_1'},
+            1: {'device_id': 'input_2', 'measurement_id': 'measurement_2'}},
+        'measure_max_age': {0: 360, 1: 360},
+        'measure_decimal': {0: 1, 1: 1},
+        'display_unit': {0: True, 1: True},
+        'measurement_label': {0: '', 1: ''},
+        'text': {3: 'Greenhouse'}
+    }
+    display_lines = DisplayLines(options_channels, 2, 16, 2)
+
+    assert display_lines.generate() == ["Temp      21.5 C", "NONE"]
+    assert lookups == [[('input_1', 'measurement_1', 360), ('input_2', 'measurement_2', 360)]]
+    assert display_lines.generate() == ["192.0.2.10", "Greenhouse"]
+    assert len(lookups) == 1
+    assert display_lines.current_line_set == 0
@@ -0,0 +1,38 @@
+# coding=utf-8
+"""Tests for downsampling graph series."""
+import json
+import struct
+
+from mycodo.utils.downsample import (bucket_ms, lttb, series_to_binary,
+                                     series_to_columns_json, series_to_json)
+
+
+def test_lttb():
+    """Verify LTTB keeps the end points and peaks, and returns the requested number of points."""
+    print("\nTest: test_lttb")
+    times = list(range(1000))
+    values = [0.0] * 1000
+    values[500] = 100.0
+
+    sampled_times, sampled_values = lttb(times, values, 50)
+    assert len(sampled_times) == 50
+    assert sampled_times[0] == 0 and sampled_times[-1] == 999
+    assert 100.0 in sampled_values
+    assert sampled_times == sorted(sampled_times)
+
+    # Series shorter than the threshold are returned unchanged
+    assert lttb(times[:10], values[:10], 50) == (times[:10], values[:10])
+
+
+def test_series_encoding():
+    """Verify the JSON and binary encodings of a series."""
+    print("\nTest: test_series_encoding")
+    times = [1600000000.5, 1600000015.0, 1600000030.25]
+    values = [20.1, 20.2, 19.9]
+
+    assert json.loads(''.join(series_to_json(times, values, chunk_points=2))) == [
+        [1600000000.5, 20.1], [1600000015.0, 20.2], [1600000030.25, 19.9]]
+    assert json.loads(series_to_columns_json(times, values)) == {'t': times, 'v': values}
+    assert struct.unpack('<6d', series_to_binary(times, values)) == (
+        1600000000.5, 20.1, 1600000015.0, 20.2, 1600000030.25, 19.9)
+    assert bucket_ms(0, 700, 700) == 1000
@@ -0,0 +1,55 @@
+# coding=utf-8
+"""Tests for measurement export jobs."""
+import csv
+import threading
+
+from mycodo.utils.export_jobs import ExportJobs, join_series
+
+
+def fake_query(series):
+    """A point every 10 seconds for the first series, every 20 seconds for the second."""
+    data = []
+    for index, each_series in enumerate(series):
+        period = 10 * (index + 1)
+        first = each_series['start'] + (-each_series['start'] % period)
+        times = list(range(int(first), int(each_series['end']), period))
+        data.append((times, [each_time / 10 for each_time in times]))
+    return data
+
+
+def test_join_series():
+    """Verify series are outer joined on their timestamps."""
+    print("\nTest: test_join_series")
+    assert join_series([([1, 2], [10, 20]), ([2, 3], [200, 300])]) == [
+        [1, 10, None], [2, 20, 200], [3, None, 300]]
+
+
+def test_export_csv(tmp_path):
+    """Verify a CSV export spanning several slices, and resuming it from a position."""
+    print("\nTest: test_export_csv")
+    jobs = ExportJobs(path=str(tmp_path), query_func=fake_query)
+    series = [
+        {'unique_id': 'a', 'unit': 'C', 'channel': 0, 'measure': 'temperature', 'name': 'A'},
+        {'unique_id': 'b', 'unit': 'percent', 'channel': 1, 'measure': 'humidity', 'name': 'B'}
+    ]
+    job_id = jobs.create(series, 0, 10000, start_thread=False)
+    job = jobs.load(job_id)
+    job['slice_sec'] = 1000
+    jobs.save(job)
+
+    jobs.cancel_events[job_id] = threading.Event()
+    jobs.run(job_id)
+    job = jobs.load(job_id)
+    assert job['status'] == 'complete'
+    assert job['rows'] == 1000
+
+    with open(jobs.path_output(job), newline='') as output_file:
+        rows = list(csv.reader(output_file))
+    assert rows[0] == ['timestamp (UTC)', 'A', 'B']
+    assert len(rows) == 1001
+    assert rows[1] == ['0', '0.0', '0.0']
+    assert rows[2] == ['10', '1.0', '']
+    assert jobs.jobs()[0]['progress'] == 100
+
+    jobs.delete(job_id)
+    assert jobs.jobs() == []
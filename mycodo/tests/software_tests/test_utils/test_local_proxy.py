@@ -0,0 +1,49 @@
+# coding=utf-8
+"""Tests for calls to the daemon from inside the daemon process."""
+import time
+
+import Pyro5.errors
+import pytest
+
+from mycodo import mycodo_client
+from mycodo.mycodo_client import DaemonControl, LocalProxy
+
+
+class FakeServer:
+    """Stands in for the PyroServer of the daemon."""
+    def __init__(self):
+        self.received = None
+
+    def trigger_action(self, action_id, value={}, debug=False):
+        self.received = value
+        return {'message': 'Done.', 'value': value}
+
+    def output_state(self, output_id, output_channel):
+        time.sleep(0.5)
+        return 'off'
+
+
+def test_local_proxy():
+    """Verify calls are made to the server in the process, without sharing objects."""
+    print("\nTest: test_local_proxy")
+    server = FakeServer()
+    mycodo_client.set_local_server(server)
+    try:
+        control = DaemonControl(pyro_timeout=0.1)
+        assert isinstance(control.proxy(), LocalProxy)
+
+        value = {'a': 1}
+        result = control.trigger_action('action_id', value=value)
+        assert result == {'message': 'Done.', 'value': {'a': 1}}
+        assert server.received == value
+        assert server.received is not value
+        assert result['value'] is not server.received
+
+        with pytest.raises(Pyro5.errors.TimeoutError):
+            control.output_state('output_id', 0)
+
+        # Other daemons are still reached through Pyro
+        remote = DaemonControl(pyro_uri='PYRO:mycodo.pyro_server@192.0.2.1:9080', pyro_timeout=1)
+        assert not isinstance(remote.proxy(), LocalProxy)
+    finally:
+        mycodo_client.set_local_server(None)
@@ -0,0 +1,77 @@
+# coding=utf-8
+"""Tests for reading and following logs."""
+import os
+import time
+
+from mycodo.utils.log_reader import LogFilter, LogFollower, LogReader
+
+
+def write_entries(path, first, count, mode='a'):
+    start = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+    with open(path, mode) as log_file:
+        for index in range(first, first + count):
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start + index))
+            name = 'mycodo.controllers.controller_pid_1' if index % 100 == 50 else 'mycodo.inputs.input_1'
+            level = 'ERROR' if index % 10 == 0 else 'INFO'
+            log_file.write(f"{timestamp},000 - {level} - {name} - Entry {index}\n")
+            if level == 'ERROR':
+                log_file.write("Traceback (most recent call last):\nValueError\n")
+    return start
+
+
+def test_log_reader(tmp_path):
+    """Verify the newest matching entries are read from the log and its rotated file."""
+    print("\nTest: test_log_reader")
+    path = str(tmp_path / 'mycodo.log')
+    start = write_entries(path, 0, 500, mode='w')
+    os.rename(path, f'{path}.1')
+    write_entries(path, 500, 500, mode='w')
+    reader = LogReader(path, index_path=str(tmp_path / 'index'), chunk_bytes=1024)
+
+    assert reader.read(1).endswith('Entry 999')
+    entries = reader.read(600).splitlines()
+    assert entries[0].endswith('Entry 400')
+    assert len(entries) == 600 + 2 * 60
+
+    entries = reader.read(100, LogFilter(logger_name='mycodo.controllers'))
+    assert [line.rsplit(' ', 1)[-1] for line in entries.splitlines() if 'Entry' in line] == [
+        str(index) for index in range(50, 1000, 100)]
+
+    entries = reader.read(2, LogFilter(level='ERROR'))
+    assert entries.splitlines()[0].endswith('Entry 980')
+    assert entries.splitlines()[-1] == 'ValueError'
+
+    entries = reader.read(100, LogFilter(start=start + 495, end=start + 504))
+    assert entries.splitlines()[0].endswith('Entry 495')
+    assert entries.splitlines()[-1].endswith('Entry 504')
+
+    assert reader.read(5, LogFilter(search='Entry 123\n')) == ''
+    assert reader.read(5, LogFilter(search='Entry 123')).endswith('Entry 123')
+
+    # The index of the rotated file is kept after it's rotated again
+    assert len(os.listdir(tmp_path / 'index')) == 2
+
+
+def test_log_follower(tmp_path):
+    """Verify new entries are followed across a rotation of the log."""
+    print("\nTest: test_log_follower")
+    path = str(tmp_path / 'mycodo.log')
+    write_entries(path, 0, 10, mode='w')
+    follower = LogFollower(path, log_filter=LogFilter(level='ERROR'))
+    assert follower.read() == ''
+
+    write_entries(path, 10, 10)
+    assert follower.read().splitlines() == [
+        '2024-01-01 00:00:10,000 - ERROR - mycodo.inputs.input_1 - Entry 10',
+        'Traceback (most recent call last):', 'ValueError']
+
+    write_entries(path, 20, 1)
+    os.rename(path, f'{path}.1')
+    write_entries(path, 30, 1, mode='w')
+    assert follower.read().startswith('2024-01-01 00:00:20,000')
+    assert follower.read().startswith('2024-01-01 00:00:30,000')
+
+    # Continue from a position, e.g. when a browser reconnects
+    position = follower.position()
+    write_entries(path, 40, 1)
+    assert LogFollower(path, position=position).read().startswith('2024-01-01 00:00:40,000')
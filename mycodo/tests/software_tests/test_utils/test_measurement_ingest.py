@@ -0,0 +1,46 @@
+# coding=utf-8
+"""Tests for parsing and validating bulk measurements."""
+from mycodo.utils.measurement_ingest import (parse_measurements,
+                                             validate_measurements)
+
+UNITS = {'C', 'percent'}
+
+
+def test_parse_formats():
+    """Verify the same measurements are parsed from each format."""
+    print("\nTest: test_parse_formats")
+    expected = [
+        {'unique_id': 'abc', 'unit': 'C', 'value': 23.5, 'measure': 'temperature',
+         'channel': 0, 'timestamp': 1555351620392000000},
+        {'unique_id': 'a b', 'unit': 'percent', 'value': 40.0, 'measure': None,
+         'channel': 1, 'timestamp': None}
+    ]
+
+    json_text = ('[{"unique_id": "abc", "unit": "C", "channel": 0, "value": 23.5, '
+                 '"measure": "temperature", "timestamp": "2019-04-15T18:07:00.392Z"}, '
+                 '{"unique_id": "a b", "unit": "percent", "channel": 1, "value": "40"}]')
+    ndjson_text = ('{"unique_id": "abc", "unit": "C", "channel": 0, "value": 23.5, '
+                   '"measure": "temperature", "timestamp": 1555351620.392}\n\n'
+                   '{"device_id": "a b", "unit": "percent", "channel": 1, "value": 40}\n')
+    line_text = ('C,device_id=abc,channel=0,measure=temperature value=23.5 1555351620392\n'
+                 'percent,device_id=a\\ b,channel=1 value=40i\n')
+
+    for text, data_format in [(json_text, 'json'), (ndjson_text, 'ndjson'), (line_text, 'line')]:
+        valid, errors = validate_measurements(
+            parse_measurements(text, data_format, precision='ms'), units=UNITS)
+        assert errors == [], data_format
+        assert valid == expected, data_format
+
+
+def test_validate_errors():
+    """Verify the indexes of invalid measurements are returned."""
+    print("\nTest: test_validate_errors")
+    text = ('{"unique_id": "abc", "unit": "C", "channel": 0, "value": 1}\n'
+            '{"unique_id": "abc", "unit": "unknown", "channel": 0, "value": 1}\n'
+            'not json\n'
+            '{"unique_id": "abc", "unit": "C", "channel": -1, "value": 1}\n'
+            '{"unique_id": "abc", "unit": "C", "channel": 0, "value": "nan"}\n'
+            '{"unique_id": "abc", "unit": "C", "channel": 0, "value": 2}\n')
+    valid, errors = validate_measurements(parse_measurements(text, 'ndjson'), units=UNITS)
+    assert [each_measurement['value'] for each_measurement in valid] == [1.0, 2.0]
+    assert [index for index, _ in errors] == [1, 2, 3, 4]
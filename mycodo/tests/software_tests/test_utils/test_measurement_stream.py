@@ -0,0 +1,80 @@
+# coding=utf-8
+"""Tests for streaming measurements."""
+import csv
+import io
+import json
+
+import pytest
+
+from mycodo.utils.measurement_stream import (read_binary_frames, skip_received,
+                                             stream_binary, stream_csv,
+                                             stream_json, stream_ndjson)
+
+
+def test_stream_formats():
+    """Verify each format encodes every point, across several chunks."""
+    print("\nTest: test_stream_formats")
+    points = [(1600000000.000001 + i * 10, i / 3) for i in range(2500)]
+
+    data = json.loads(''.join(stream_json(iter(points), limit=2500)))
+    assert [(each['time'], each['value']) for each in data['measurements']] == points
+    assert data['next'] == points[-1][0]
+    assert data['skip'] == 1
+    assert json.loads(''.join(stream_json(iter(points), limit=5000)))['next'] is None
+
+    lines = ''.join(stream_ndjson(iter(points))).splitlines()
+    assert [(json.loads(each)['time'], json.loads(each)['value']) for each in lines] == points
+
+    rows = list(csv.reader(io.StringIO(''.join(stream_csv(iter(points))))))
+    assert rows[0] == ['time', 'value']
+    assert [(float(each[0]), float(each[1])) for each in rows[1:]] == points
+
+    times, values = read_binary_frames(b''.join(stream_binary(iter(points))))
+    assert times == [int(round(each[0] * 1e6)) * 1000 for each in points]
+    assert values == [each[1] for each in points]
+
+
+def test_stream_pages_same_time():
+    """Verify paging returns every point when several points have the time of the cursor."""
+    print("\nTest: test_stream_pages_same_time")
+    points = [(1600000000.5, 0), (1600000001.5, 1), (1600000001.5, 2), (1600000001.5, 3), (1600000002.5, 4)]
+
+    def query(after=None, skip=0, limit=2):
+        """Query from after (inclusive), as the measurement database would."""
+        return [each for each in points if after is None or each[0] >= after][:limit + skip]
+
+    received = []
+    after, skip = None, 0
+    while True:
+        page = query(after, skip)
+        if after is not None:
+            page = skip_received(iter(page), after, skip)
+        data = json.loads(''.join(stream_json(page, limit=2, after=after, skip=skip)))
+        received += [(each['time'], each['value']) for each in data['measurements']]
+        if data['next'] is None:
+            break
+        after, skip = data['next'], data['skip']
+    assert received == points
+
+
+def test_stream_error():
+    """Verify an error reading the points ends each format with the error."""
+    print("\nTest: test_stream_error")
+
+    def points():
+        yield 1600000000.0, 1.0
+        raise ConnectionError("Connection lost")
+
+    data = json.loads(''.join(stream_json(points(), limit=10)))
+    assert data['measurements'] == [{'time': 1600000000.0, 'value': 1.0}]
+    assert data['error'] == "Connection lost"
+    assert data['next'] is None
+
+    lines = ''.join(stream_ndjson(points())).splitlines()
+    assert json.loads(lines[-1]) == {'error': "Connection lost"}
+
+    rows = list(csv.reader(io.StringIO(''.join(stream_csv(points())))))
+    assert rows[-1] == ['error', 'Connection lost']
+
+    with pytest.raises(ValueError, match="Connection lost"):
+        read_binary_frames(b''.join(stream_binary(points())))
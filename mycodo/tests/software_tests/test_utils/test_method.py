@@ -0,0 +1,102 @@
+# coding=utf-8
+"""Tests for the setpoints of compiled methods."""
+import datetime
+from types import SimpleNamespace
+
+from mycodo.utils import method as method_module
+from mycodo.utils.method import create_method_handler
+
+
+class RowsQuery:
+    """Stands in for the query of method data rows."""
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *args):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+
+def row(**kwargs):
+    columns = ['time_start', 'time_end', 'duration_sec', 'duration_end', 'setpoint_start',
+               'setpoint_end', 'linked_method_id']
+    return SimpleNamespace(**dict({each: None for each in columns}, **kwargs))
+
+
+def handler(unique_id, method_type, rows):
+    method = SimpleNamespace(unique_id=unique_id, method_type=method_type, name=unique_id)
+    return create_method_handler(method, RowsQuery(rows))
+
+
+def test_date_method():
+    """Verify the setpoint of sorted and overlapping date segments."""
+    print("\nTest: test_date_method")
+    date = handler('date', 'Date', [
+        row(time_start='2024-01-01 12:00:00', time_end='2024-01-01 13:00:00',
+            setpoint_start=30, setpoint_end=20),
+        row(time_start='2024-01-01 00:00:00', time_end='2024-01-01 12:00:00',
+            setpoint_start=10, setpoint_end=30)
+    ])
+    assert date.segments_sorted
+    assert date.calculate_setpoint(datetime.datetime(2024, 1, 1, 6)) == (20, False)
+    assert date.calculate_setpoint(datetime.datetime(2024, 1, 1, 12, 30)) == (25, False)
+    assert date.calculate_setpoint(datetime.datetime(2024, 1, 1, 12)) == (None, False)
+    assert date.calculate_setpoint(datetime.datetime(2024, 1, 2)) == (None, False)
+
+    # Overlapping segments are searched in the order of the rows
+    overlapping = handler('overlapping', 'Date', [
+        row(time_start='2024-01-01 06:00:00', time_end='2024-01-01 18:00:00', setpoint_start=50),
+        row(time_start='2024-01-01 00:00:00', time_end='2024-01-02 00:00:00', setpoint_start=10)
+    ])
+    assert not overlapping.segments_sorted
+    assert overlapping.calculate_setpoint(datetime.datetime(2024, 1, 1, 12)) == (50, False)
+    assert overlapping.calculate_setpoint(datetime.datetime(2024, 1, 1, 20)) == (10, False)
+
+    daily = handler('daily', 'Daily', [
+        row(time_start='00:00:00', time_end='12:00:00', setpoint_start=0, setpoint_end=12)])
+    assert daily.calculate_setpoint(datetime.datetime(2024, 5, 5, 3, 0, 0, 500000)) == (3, False)
+
+
+def test_duration_method():
+    """Verify the setpoint of duration rows, repeating, and ending."""
+    print("\nTest: test_duration_method")
+    start = datetime.datetime(2024, 1, 1)
+    rows = [
+        row(duration_sec=60, setpoint_start=10, setpoint_end=20),
+        row(duration_sec=30, setpoint_start=20)
+    ]
+    once = handler('once', 'Duration', rows)
+    assert once.calculate_setpoint(start + datetime.timedelta(seconds=30), str(start)) == (15, False)
+    assert once.calculate_setpoint(start + datetime.timedelta(seconds=75), str(start)) == (20, False)
+    assert once.calculate_setpoint(start + datetime.timedelta(seconds=90), str(start)) == (None, True)
+    assert once.determine_end_time(str(start)) == start + datetime.timedelta(seconds=90)
+
+    repeat = handler('repeat', 'Duration', rows + [row(duration_sec=0, duration_end=200)])
+    assert repeat.calculate_setpoint(start + datetime.timedelta(seconds=120), str(start)) == (15, False)
+    assert repeat.calculate_setpoint(start + datetime.timedelta(seconds=200), str(start)) == (None, True)
+
+
+def test_cascade_method(monkeypatch):
+    """Verify cascade methods multiply their expanded linked methods, ignoring loops."""
+    print("\nTest: test_cascade_method")
+    handlers = {
+        'half': handler('half', 'Duration', [row(duration_sec=100, setpoint_start=50)]),
+        'quarter': handler('quarter', 'Duration', [row(duration_sec=100, setpoint_start=25)]),
+    }
+    handlers['inner'] = handler('inner', 'Cascade', [
+        row(linked_method_id='quarter'), row(linked_method_id='outer')])
+    handlers['outer'] = handler('outer', 'Cascade', [
+        row(linked_method_id='half'), row(linked_method_id='inner'), row(linked_method_id='missing')])
+    monkeypatch.setattr(method_module, 'query_method_handler',
+                        lambda method_id, logger=None: handlers.get(method_id))
+
+    start = datetime.datetime(2024, 1, 1)
+    outer = handlers['outer']
+    assert outer.calculate_setpoint(start + datetime.timedelta(seconds=10), str(start)) == (12.5, False)
+    assert [each_id for each_id, _ in outer.expanded['linked_methods']] == ['half', 'quarter']
+    assert outer.calculate_setpoint(start + datetime.timedelta(seconds=100), str(start)) == (None, True)
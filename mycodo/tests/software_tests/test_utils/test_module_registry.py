@@ -0,0 +1,70 @@
+# coding=utf-8
+"""Tests for the module information registry."""
+import os
+
+from mycodo.utils import modules
+from mycodo.utils.modules import ModuleRegistry
+
+MODULE_SOURCE = """
+import random
+
+import hardware_library_not_installed
+
+NAME = 'Test Input'
+
+INPUT_INFORMATION = {
+    'input_name_unique': 'TEST_INPUT',
+    'input_name': NAME,
+    'port': PORT
+}
+
+
+class InputModule(hardware_library_not_installed.Sensor):
+    pass
+"""
+
+
+def test_module_registry(tmp_path):
+    """Verify module information is read without importing libraries, stored, and revalidated."""
+    print("\nTest: test_module_registry")
+    path_module = str(tmp_path / 'test_input.py')
+    path_registry = str(tmp_path / 'cache' / 'module_registry.pickle')  # Directory is created
+    with open(path_module, 'w') as module_file:
+        module_file.write(MODULE_SOURCE.replace('PORT', '8080'))
+
+    registry = ModuleRegistry(path=path_registry)
+    information = registry.information(path_module, 'inputs', 'INPUT_INFORMATION')
+    assert information == {'input_name_unique': 'TEST_INPUT', 'input_name': 'Test Input', 'port': 8080}
+    registry.save()
+    assert os.path.exists(path_registry)
+
+    # Read from the registry file, without executing the module
+    registry = ModuleRegistry(path=path_registry)
+    assert registry.information(path_module, 'inputs', 'INPUT_INFORMATION')['port'] == 8080
+    assert registry.stats()['files_read'] == 0
+
+    # Changed modules are read again
+    with open(path_module, 'w') as module_file:
+        module_file.write(MODULE_SOURCE.replace('PORT', '9090'))
+    assert registry.information(path_module, 'inputs', 'INPUT_INFORMATION')['port'] == 9090
+
+    # Information generated when the module is executed is read every time
+    with open(path_module, 'w') as module_file:
+        module_file.write(MODULE_SOURCE.replace('PORT', 'random.random()'))
+    assert (registry.information(path_module, 'inputs', 'INPUT_INFORMATION')['port'] !=
+            registry.information(path_module, 'inputs', 'INPUT_INFORMATION')['port'])
+
+
+def test_stdlib_modules_without_names(monkeypatch):
+    """Verify standard library modules are found without sys.stdlib_module_names (Python < 3.10)."""
+    print("\nTest: test_stdlib_modules_without_names")
+    monkeypatch.setattr(modules, 'STDLIB_MODULE_NAMES', None)
+    modules.is_stdlib_module.cache_clear()
+    try:
+        for each_module in ['sys', 'os', 'json', 'xml.etree', 'datetime', 'collections.abc']:
+            assert modules.is_allowed_import(each_module), each_module
+        for each_module in ['pytest', 'sqlalchemy', 'hardware_library_not_installed']:
+            assert not modules.is_allowed_import(each_module), each_module
+        assert modules.is_allowed_import('mycodo.config')
+    finally:
+        modules.is_stdlib_module.cache_clear()
@@ -0,0 +1,100 @@
+# coding=utf-8
+"""Tests for the pooled MQTT publish connections."""
+import time
+from types import SimpleNamespace
+
+import paho.mqtt.client as mqtt
+
+from mycodo.utils.mqtt_publish import MQTTPublisher
+
+
+class FakeClient:
+    """Stands in for a paho client that connects when its loop is started."""
+    instances = []
+
+    def __init__(self, client_id='', transport='tcp'):
+        self.client_id = client_id
+        self.published = []
+        self.auth = None
+        self.disconnected = False
+        FakeClient.instances.append(self)
+
+    def username_pw_set(self, username, password=None):
+        self.auth = (username, password)
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        pass
+
+    def max_queued_messages_set(self, queue_size):
+        pass
+
+    def connect_async(self, hostname, port=1883, keepalive=60):
+        pass
+
+    def loop_start(self):
+        self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.disconnected = True
+        self.on_disconnect(self, None, 0)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload, qos, retain))
+        self.on_publish(self, None, len(self.published))
+        return SimpleNamespace(rc=mqtt.MQTT_ERR_SUCCESS, mid=len(self.published))
+
+
+def test_mqtt_publish_pool():
+    """Verify connections are reused for the same settings, and replaced for a client ID with other settings."""
+    print("\nTest: test_mqtt_publish_pool")
+    FakeClient.instances = []
+    publisher = MQTTPublisher(client_factory=FakeClient)
+
+    for value in range(3):
+        publisher.publish_multiple([{'topic': 'a', 'payload': value}], hostname='server', client_id='one')
+    publisher.publish_multiple([{'topic': 'b', 'payload': 1}, {'topic': 'c', 'payload': 2, 'qos': 1}],
+                               hostname='server', client_id='one',
+                               auth={'username': 'user', 'password': 'pass'})
+
+    assert len(FakeClient.instances) == 2
+    assert FakeClient.instances[0].published == [('a', 0, 0, False), ('a', 1, 0, False), ('a', 2, 0, False)]
+    assert FakeClient.instances[0].disconnected
+    assert FakeClient.instances[1].auth == ('user', 'pass')
+
+    # Another keepalive is another connection, and clients without an ID are assigned one by the server
+    publisher.publish_multiple([{'topic': 'd'}], hostname='server', client_id='one', keepalive=30,
+                               auth={'username': 'user', 'password': 'pass'})
+    assert FakeClient.instances[1].disconnected
+    publisher.publish_multiple([{'topic': 'e'}], hostname='server')
+    publisher.publish_multiple([{'topic': 'e'}], hostname='server', keepalive=30)
+    assert len(FakeClient.instances) == 5
+
+    stats = publisher.stats()
+    assert [each['sent'] for each in stats] == [1, 1, 1]
+    assert all(each['connected'] and each['pending'] == 0 for each in stats)
+
+    publisher.stop()
+    assert publisher.stats() == []
+
+
+def test_mqtt_publish_idle():
+    """Verify idle connections are closed in the background, but not while they're being used."""
+    print("\nTest: test_mqtt_publish_idle")
+    FakeClient.instances = []
+    publisher = MQTTPublisher(idle_sec=0.05, client_factory=FakeClient)
+
+    publisher.publish_multiple([{'topic': 'a'}], hostname='server', client_id='one')
+    connection = publisher.connection('server', 1883, 'two', 60, None, 'tcp')
+    time.sleep(0.3)
+    assert FakeClient.instances[0].disconnected
+    assert not FakeClient.instances[1].disconnected
+    assert len(publisher.stats()) == 1
+
+    publisher.release(connection)
+    time.sleep(0.3)
+    assert FakeClient.instances[1].disconnected
+    assert publisher.stats() == []
+    publisher.stop()
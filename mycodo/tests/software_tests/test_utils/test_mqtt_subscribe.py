@@ -0,0 +1,79 @@
+# coding=utf-8
+"""Tests for the shared MQTT subscriber connections."""
+from types import SimpleNamespace
+
+from mycodo.utils.mqtt_subscribe import MQTTSubscriberHub
+
+
+class FakeClient:
+    """Stands in for a paho client that connects when its loop is started."""
+    instances = []
+
+    def __init__(self, client_id='', transport='tcp'):
+        self.client_id = client_id
+        self.subscribed = []
+        self.unsubscribed = []
+        self.stopped = False
+        FakeClient.instances.append(self)
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def tls_set(self):
+        pass
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        pass
+
+    def connect_async(self, hostname, port=1883, keepalive=60):
+        pass
+
+    def loop_start(self):
+        self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        self.stopped = True
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, topic):
+        self.subscribed.append(topic)
+
+    def unsubscribe(self, topic):
+        self.unsubscribed.append(topic)
+
+    def receive(self, topic):
+        self.on_message(self, None, SimpleNamespace(topic=topic, payload=b'1'))
+
+
+def test_mqtt_subscriber_hub():
+    """Verify subscribers to a server share one connection and receive their topics."""
+    print("\nTest: test_mqtt_subscriber_hub")
+    FakeClient.instances = []
+    hub = MQTTSubscriberHub(client_factory=FakeClient)
+    received = {'one': [], 'two': []}
+
+    def callback(name):
+        return lambda client, userdata, msg: received[name].append(msg.topic)
+
+    one = hub.subscribe(['a/+', 'a/b'], callback('one'), hostname='server', client_id='one')
+    two = hub.subscribe(['c'], callback('two'), hostname='server', client_id='two')
+
+    assert len(FakeClient.instances) == 1
+    client = FakeClient.instances[0]
+    assert client.client_id == 'one'
+    assert client.subscribed == [[('a/+', 0), ('a/b', 0)], 'c']
+
+    # A message matching several filters of a subscriber is received once
+    for topic in ['a/b', 'a/c', 'c', 'd']:
+        client.receive(topic)
+    assert received == {'one': ['a/b', 'a/c'], 'two': ['c']}
+
+    hub.unsubscribe(one)
+    assert sorted(client.unsubscribed) == ['a/+', 'a/b']
+    assert hub.stats()[0]['subscribers'] == 1
+
+    hub.unsubscribe(two)
+    assert client.stopped
+    assert hub.stats() == []
@@ -0,0 +1,24 @@
+# coding=utf-8
+"""Tests for matching MQTT topics to topic filters."""
+from mycodo.utils.mqtt_topics import TopicTrie
+
+
+def test_topic_trie():
+    """Verify exact and wildcard filters match topics as MQTT servers do."""
+    print("\nTest: test_topic_trie")
+    topics = TopicTrie()
+    topics.add('home/kitchen/temperature', 0)
+    topics.add('home/+/temperature', 1)
+    topics.add('home/#', 2)
+    topics.add('#', 3)
+
+    assert sorted(topics.match('home/kitchen/temperature')) == [0, 1, 2, 3]
+    assert sorted(topics.match('home/garage/temperature')) == [1, 2, 3]
+    assert sorted(topics.match('home')) == [2, 3]
+    assert topics.match('garden/humidity') == [3]
+    assert topics.match('$SYS/uptime') == []
+
+    assert topics.remove('home/#', 2)
+    assert not topics.remove('home/#', 2)
+    assert sorted(topics.match('home/garage/temperature')) == [1, 3]
+    assert sorted(topics.filters()) == ['#', 'home/+/temperature', 'home/kitchen/temperature']
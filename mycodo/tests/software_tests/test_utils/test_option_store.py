@@ -0,0 +1,109 @@
+# coding=utf-8
+"""Tests for the write-behind store of custom options."""
+import json
+
+from sqlalchemy import event
+
+from mycodo.databases.models import CustomController, Output, OutputChannel
+from mycodo.databases.utils import get_session_factory, session_scope
+from mycodo.mycodo_flask.extensions import db
+from mycodo.utils import option_store as option_store_module
+from mycodo.utils.option_store import OptionStores
+
+
+def read_options(uri, model, unique_id):
+    with session_scope(uri) as new_session:
+        return json.loads(new_session.query(model).filter(model.unique_id == unique_id).first().custom_options)
+
+
+def test_option_store(tmp_path, monkeypatch):
+    """Verify options are read and written in memory, and written to the database together."""
+    print("\nTest: test_option_store")
+    uri = f'sqlite:///{tmp_path / "options.db"}'
+    engine = get_session_factory(uri)().get_bind()
+    db.metadata.create_all(engine, tables=[
+        CustomController.__table__, Output.__table__, OutputChannel.__table__])
+    monkeypatch.setattr(option_store_module, 'MYCODO_DB_PATH', uri)
+
+    updates = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: updates.append(statement)
+                 if statement.startswith('UPDATE') else None)
+
+    with session_scope(uri) as new_session:
+        new_session.add(CustomController(unique_id='function_1', custom_options=json.dumps({'period': 10})))
+        new_session.add(OutputChannel(output_id='output_1', channel=0, custom_options='{}'))
+
+    stores = OptionStores(flush_sec=3600)
+    stores.running = True  # Write behind, without the thread
+
+    for index in range(100):
+        stores.set_option(CustomController, 'function_1', 'total', index)
+    stores.set_option(CustomController, 'function_1', 'history', [1, 2])
+    stores.get_option(CustomController, 'function_1', 'history').append(3)
+    stores.set_option(Output, 'output_1', 'state', 'on', channel=0)
+    assert stores.get_option(CustomController, 'function_1', 'total') == 99
+    assert stores.get_option(CustomController, 'function_1', 'period') == 10
+    assert stores.get_option(CustomController, 'function_1', 'history') == [1, 2]
+    assert not updates
+
+    # Options changed by another process are kept
+    with session_scope(uri) as new_session:
+        new_session.query(CustomController).first().custom_options = json.dumps({'period': 20})
+    updates.clear()
+
+    stores.delete_option(CustomController, 'function_1', 'history')
+    stores.flush()
+    assert len(updates) == 2  # One for each row
+    assert read_options(uri, CustomController, 'function_1') == {'period': 20, 'total': 99}
+    assert stores.get_option(CustomController, 'function_1', 'period') == 20
+    assert stores.stats()['pending'] == 0
+
+    # Once released, options are read again from the database
+    stores.set_option(CustomController, 'function_1', 'total', 100)
+    stores.release('function_1')
+    assert read_options(uri, CustomController, 'function_1')['total'] == 100
+    assert stores.stats()['stores'] == 1
+
+    # A store released while a controller still holds it sends its changes to a new store
+    store = stores.get(CustomController, 'function_1')
+    stores.release('function_1')
+    assert not store.set('total', 102)
+    stores.set_option(CustomController, 'function_1', 'total', 102)
+    assert stores.stats()['pending'] == 1
+    assert stores.get_option(CustomController, 'function_1', 'total') == 102
+
+    # A store changed after the flush of release() is kept until it's written
+    store = stores.get(CustomController, 'function_1')
+    with monkeypatch.context() as patch:
+        patch.setattr(stores, 'flush', lambda unique_id=None: None)  # Set between the flush and the removal
+        stores.release('function_1')
+    assert not store.released
+    assert stores.stats()['stores'] == 2
+    stores.release('function_1')
+    assert read_options(uri, CustomController, 'function_1')['total'] == 102
+    assert stores.stats()['stores'] == 1
+
+    # When not started, options are written when they're set
+    stores.running = False
+    stores.set_option(CustomController, 'function_1', 'total', 101)
+    assert read_options(uri, CustomController, 'function_1')['total'] == 101
+    assert stores.get_option(Output, 'output_1', 'state', channel=0) == 'on'
+
+
+def test_option_store_load_after_boot(tmp_path, monkeypatch):
+    """Verify options set before they're first read are merged into the database's, right after boot."""
+    print("\nTest: test_option_store_load_after_boot")
+    uri = f'sqlite:///{tmp_path / "options.db"}'
+    db.metadata.create_all(get_session_factory(uri)().get_bind(), tables=[CustomController.__table__])
+    monkeypatch.setattr(option_store_module, 'MYCODO_DB_PATH', uri)
+    monkeypatch.setattr(option_store_module.time, 'monotonic', lambda: 1.0)  # Seconds since boot
+
+    with session_scope(uri) as new_session:
+        new_session.add(CustomController(unique_id='function_1', custom_options=json.dumps({'period': 10})))
+
+    stores = OptionStores(flush_sec=5)
+    stores.running = True
+    stores.set_option(CustomController, 'function_1', 'total', 1)
+    assert stores.get_option(CustomController, 'function_1', 'period') == 10
+    assert stores.get_option(CustomController, 'function_1', 'total') == 1
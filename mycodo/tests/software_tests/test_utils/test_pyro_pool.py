@@ -0,0 +1,73 @@
+# coding=utf-8
+"""Tests for the pooled Pyro proxies of DaemonControl."""
+import socket
+import threading
+
+import pytest
+from Pyro5.api import Daemon, expose
+
+from mycodo.mycodo_client import DaemonControl
+from mycodo.utils.pyro_pool import ProxyPool, PooledProxy
+
+
+@expose
+class FakeServer:
+    """Stands in for the PyroServer of the daemon."""
+    def output_state(self, output_id, output_channel):
+        return 'on' if output_channel else 'off'
+
+    def call_many(self, calls):
+        results = []
+        for method, args, *kwargs in calls:
+            try:
+                results.append([True, getattr(self, method)(*args, **(kwargs[0] if kwargs else {}))])
+            except Exception as err:
+                results.append([False, err])
+        return results
+
+
+def start_server(port=0):
+    daemon = Daemon(host='127.0.0.1', port=port)
+    uri = daemon.register(FakeServer(), 'mycodo.pyro_server')
+    threading.Thread(target=daemon.requestLoop, daemon=True).start()
+    return daemon, uri
+
+
+def test_proxy_pool():
+    """Verify connections are reused, and replaced when the server closes them."""
+    print("\nTest: test_proxy_pool")
+    daemon, uri = start_server()
+    pool = ProxyPool(str(uri), size=2)
+    proxy = PooledProxy(pool, timeout=5)
+
+    for _ in range(5):
+        assert proxy.output_state('output_id', 1) == 'on'
+    stats = pool.stats()
+    assert stats['connections_opened'] == 1
+    assert stats['connections_reused'] == 4
+    assert stats['latency']['output_state']['calls'] == 5
+
+    # The server closes the pooled connection (e.g. when the daemon is restarted)
+    pool.idle[0][0]._pyroConnection.sock.shutdown(socket.SHUT_RD)
+    assert not ProxyPool.connected(pool.idle[0][0])
+    assert proxy.output_state('output_id', 0) == 'off'
+    assert pool.stats()['connections_opened'] == 2
+    daemon.shutdown()
+
+
+def test_call_many():
+    """Verify several calls are made with one request."""
+    print("\nTest: test_call_many")
+    daemon, uri = start_server()
+    control = DaemonControl(pyro_uri=str(uri), pyro_timeout=5)
+
+    calls = [('output_state', ['output_id', 0]),
+             ('output_state', [], {'output_id': 'output_id', 'output_channel': 1}),
+             ('output_state', [])]
+    results = control.call_many(calls, return_exceptions=True)
+    assert results[:2] == ['off', 'on']
+    assert isinstance(results[2], TypeError)
+
+    with pytest.raises(TypeError):
+        control.call_many(calls)
+    daemon.shutdown()
@@ -0,0 +1,57 @@
+# coding=utf-8
+"""Tests for the recent measurements held in memory for live graphs."""
+import threading
+import time
+
+from mycodo.utils.influx import RecentMeasurementBuffer
+
+
+def test_recent_measurements_since():
+    """Verify the points after a time are returned only if none may be missing."""
+    print("\nTest: test_recent_measurements_since")
+    buffer = RecentMeasurementBuffer(max_points=3, max_sec=3600)
+    assert buffer.since('a', 'C', 0, 'temperature', 0) is None
+
+    buffer.enable()
+    now_us = int(time.time() * 1e6)
+    for index in range(3):
+        buffer.update('a', 'C', index, measure='temperature', channel=0,
+                      timestamp=(now_us + index) * 1000)
+    assert buffer.since('a', 'C', 0, 'temperature', now_us) == [(now_us + 1, 1), (now_us + 2, 2)]
+    assert buffer.since('a', 'C', 0, 'temperature', now_us + 2) == []
+    assert buffer.since('a', 'C', 0, 'temperature', buffer.time_enabled_us - 1) is None
+
+    # Measurements never written by this process, or written by it only after since, are queried
+    assert buffer.since('b', 'C', 0, 'temperature', now_us) is None
+    buffer.update('b', 'C', 1, measure='temperature', channel=0, timestamp=(now_us + 5) * 1000)
+    assert buffer.since('b', 'C', 0, 'temperature', now_us) is None
+    assert buffer.since('b', 'C', 0, 'temperature', now_us + 5) == []
+
+    # Points of devices written by another process are forgotten
+    buffer.invalidate(['b'])
+    assert buffer.since('b', 'C', 0, 'temperature', now_us + 5) is None
+
+    # The same timestamp overwrites the point, and the oldest point is discarded above max_points
+    buffer.update('a', 'C', 10, measure='temperature', channel=0, timestamp=(now_us + 1) * 1000)
+    buffer.update('a', 'C', 3, measure='temperature', channel=0, timestamp=(now_us + 3) * 1000)
+    assert buffer.since('a', 'C', 0, 'temperature', now_us - 1) is None
+    assert buffer.since('a', 'C', 0, 'temperature', now_us) == [
+        (now_us + 1, 10), (now_us + 2, 2), (now_us + 3, 3)]
+
+
+def test_recent_measurements_wait():
+    """Verify waiting returns when a point is added."""
+    print("\nTest: test_recent_measurements_wait")
+    buffer = RecentMeasurementBuffer()
+    buffer.enable()
+    since_us = int(time.time() * 1e6)
+    for each_id in ['a', 'b']:
+        buffer.update(each_id, 'C', 1.0, channel=0, timestamp=since_us * 1000)
+
+    timer = threading.Timer(0.1, buffer.update, args=('a', 'C', 1.5), kwargs={'channel': 0})
+    timer.start()
+    start = time.time()
+    results = buffer.wait([('a', 'C', 0, None, since_us), ('b', 'C', 0, None, since_us)], timeout=5)
+    assert time.time() - start < 2
+    assert [each_value for _, each_value in results[0]] == [1.5]
+    assert results[1] == []
@@ -0,0 +1,120 @@
+# coding=utf-8
+"""Tests for running controllers on the scheduler."""
+import math
+import threading
+import time
+
+from mycodo.controllers.base_controller import AbstractController
+from mycodo.utils.scheduler import Scheduler
+
+
+class CountingController(AbstractController, threading.Thread):
+    """A controller that counts its loops and stops itself after five."""
+    def __init__(self, ready):
+        threading.Thread.__init__(self)
+        super().__init__(ready, unique_id=None, name=__name__)
+        self.loops = 0
+        self.finished = False
+
+    def initialize_variables(self):
+        self.sample_rate = 0.01
+        self.running = True
+        self.ready.set()
+
+    def loop(self):
+        self.loops += 1
+        if self.loops == 5:
+            self.running = False
+
+    def run_finally(self):
+        self.finished = True
+
+
+class WaitingController(CountingController):
+    """A controller that's only run when it's woken."""
+    def next_run(self):
+        return math.inf
+
+
+def test_scheduler_job():
+    """Verify a job is run again after the delay it returns, until it returns None."""
+    print("\nTest: test_scheduler_job")
+    scheduler = Scheduler(2)
+    runs = []
+
+    def job():
+        runs.append(time.monotonic())
+        return 0.02 if len(runs) < 3 else None
+
+    scheduler.add('job', job)
+    time.sleep(0.3)
+    assert len(runs) == 3
+    assert runs[2] - runs[1] >= 0.02
+    assert scheduler.stats()['jobs'] == 0
+    scheduler.stop()
+
+
+def test_scheduled_controller():
+    """Verify a controller is initialized, looped, and stopped by the scheduler."""
+    print("\nTest: test_scheduled_controller")
+    scheduler = Scheduler(2)
+    ready = threading.Event()
+    controller = CountingController(ready)
+    controller.scheduler = scheduler
+    controller.start()
+    assert ready.wait(5)
+    controller.join(5)
+    assert controller.loops == 5
+    assert controller.finished
+    assert not controller.is_running()
+
+    stats = scheduler.stats()
+    assert stats['jobs'] == 0
+    assert stats['workers'] == 2
+    scheduler.stop()
+
+
+def test_scheduler_wake():
+    """Verify a job is run early when woken, and again after it returns if woken while running."""
+    print("\nTest: test_scheduler_wake")
+    scheduler = Scheduler(1)
+    runs = []
+    woken = threading.Event()
+
+    def job():
+        runs.append(time.monotonic())
+        if len(runs) == 2:
+            scheduler.wake('job')
+            woken.set()
+        return 60 if len(runs) < 3 else None
+
+    scheduler.add('job', job)
+    time.sleep(0.1)
+    assert len(runs) == 1
+    scheduler.wake('job')
+    assert woken.wait(5)
+    time.sleep(0.1)
+    assert len(runs) == 3
+    assert scheduler.stats()['jobs'] == 0
+    scheduler.stop()
+
+
+def test_scheduled_controller_wake():
+    """Verify a controller that's waiting is run when woken, and stops promptly."""
+    print("\nTest: test_scheduled_controller_wake")
+    scheduler = Scheduler(1)
+    ready = threading.Event()
+    controller = WaitingController(ready)
+    controller.scheduler = scheduler
+    controller.start()
+    assert ready.wait(5)
+    time.sleep(0.1)
+    assert controller.loops == 1
+    controller.wake()
+    time.sleep(0.1)
+    assert controller.loops == 2
+    controller.stop_controller()
+    controller.join(5)
+    assert controller.finished
+    assert controller.loops == 2
+    scheduler.stop()
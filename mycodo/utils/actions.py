@@ -1,6 +1,7 @@
 # coding=utf-8
 import logging
 import os
+import threading
 import time
 import traceback
 
@@ -23,15 +24,24 @@ from mycodo.databases.models import Trigger
 from mycodo.databases.utils import session_scope
 from mycodo.devices.camera import camera_record
 from mycodo.mycodo_client import DaemonControl
+from mycodo.utils.config_cache import config_cache
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import get_last_measurement
 from mycodo.utils.influx import get_past_measurements
 from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.modules import load_module_information
+from mycodo.utils.modules import module_registry_cached
 from mycodo.utils.system_pi import return_measurement_info
 
 logger = logging.getLogger("mycodo.actions")
 
+# Loaded Action modules, keyed by file path, and Action objects, keyed by Action unique_id
+action_modules = {}
+action_objects = {}
+action_objects_lock = threading.Lock()
 
+
+@module_registry_cached(PATH_ACTIONS, PATH_ACTIONS_CUSTOM)
 def parse_action_information(exclude_custom=False):
     """Parses the variables assigned in each Function Action and return a dictionary of IDs and values."""
     def dict_has_value(dict_inp, action, key, force_type=None):
@@ -71,7 +81,7 @@ def parse_action_information(exclude_custom=False):
                 continue
 
             full_path = "{}/{}".format(real_path, each_file)
-            function_action, status = load_module_from_file(full_path, 'actions')
+            function_action, status = load_module_information(full_path, 'actions', 'ACTION_INFORMATION')
 
             if not function_action or not hasattr(function_action, 'ACTION_INFORMATION'):
                 continue
@@ -331,6 +341,56 @@ def action_video(cond_action, message):
         return message, None
 
 
+def get_action_object(action, file_path):
+    """
+    Return the ActionModule object of an Action
+
+    Action modules are loaded once per file. Where Actions are served from
+    the configuration cache (the daemon), ActionModule objects are reused
+    until the Action's row is refreshed (i.e. the Action was edited or
+    deleted) or the module file changes. Elsewhere, rows are read from the
+    database each time and changes aren't reported, so a new object is
+    created for each call.
+
+    :param action: Actions table row
+    :param file_path: path to the Action module file
+    :return: ActionModule object, or None if the module could not be loaded
+    """
+    mtime = os.path.getmtime(file_path)
+    reuse = config_cache.cached(Actions)
+
+    with action_objects_lock:
+        if reuse and action.unique_id in action_objects:
+            cached_action, cached_mtime, action_object = action_objects[action.unique_id]
+            # Refreshed rows are new objects, so the same row means the Action is unchanged
+            if cached_action is action and cached_mtime == mtime:
+                return action_object
+
+        if file_path not in action_modules or action_modules[file_path][0] != mtime:
+            action_loaded, status = load_module_from_file(file_path, 'action')
+            if not action_loaded:
+                return None
+            action_modules[file_path] = (mtime, action_loaded)
+
+        action_object = action_modules[file_path][1].ActionModule(action)
+        if reuse:
+            action_objects[action.unique_id] = (action, mtime, action_object)
+        return action_object
+
+
+def evict_action_objects(table, ids=None):
+    """Forget the ActionModule objects of Actions whose rows changed (ids None for all)."""
+    if ids is not None:
+        ids = {int(each_id) for each_id in ids}
+    with action_objects_lock:
+        for each_unique_id, (action, _, _) in list(action_objects.items()):
+            if ids is None or action.id in ids:
+                del action_objects[each_unique_id]
+
+
+config_cache.on_invalidate(Actions.__tablename__, evict_action_objects)
+
+
 def trigger_action(
         dict_actions,
         action_id,
@@ -371,10 +431,9 @@ def trigger_action(
             id=action.unique_id.split('-')[0],
             name=dict_actions[action.action_type]['name'])
         try:
-            action_loaded, status = load_module_from_file(
-                dict_actions[action.action_type]['file_path'], 'action')
-            if action_loaded:
-                run_function_action = action_loaded.ActionModule(action)
+            run_function_action = get_action_object(
+                action, dict_actions[action.action_type]['file_path'])
+            if run_function_action:
                 value = run_function_action.run_action(value)
 
                 if value and "message" in value:
@@ -388,13 +447,17 @@ def trigger_action(
 
 
 def run_input_actions(unique_id, message, measurements_dict, debug=False):
-    control = DaemonControl()
-    actions = db_retrieve_table_daemon(Actions).filter(
-        Actions.function_id == unique_id).all()
+    """Execute the Actions of an Input in the calling (daemon) process."""
+    actions = config_cache.filter_by(Actions, function_id=unique_id)
+    if not actions:
+        return message, measurements_dict
+
+    dict_actions = parse_action_information()
 
     for each_action in actions:
         try:
-            return_dict = control.trigger_action(
+            return_dict = trigger_action(
+                dict_actions,
                 each_action.unique_id,
                 value={"message": message, "measurements_dict": measurements_dict},
                 debug=debug)
@@ -430,10 +493,8 @@ def trigger_controller_actions(dict_actions, controller_id, message='', debug=Fa
     else:
         logger_actions.setLevel(logging.INFO)
 
-    actions = db_retrieve_table_daemon(Actions)
-    actions = actions.filter(
-        Actions.function_id == controller_id).all()
-    
+    actions = config_cache.filter_by(Actions, function_id=controller_id)
+
     dict_return = {'message': message}
 
     for each_action in actions:
@@ -0,0 +1,322 @@
+# coding=utf-8
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from mycodo.config import MYCODO_DB_PATH
+from mycodo.databases.utils import get_scoped_session
+
+logger = logging.getLogger("mycodo.config_cache")
+
+# Tables of mostly static configuration that the daemon caches in memory
+CACHED_TABLES = [
+    'conversion',
+    'device_measurements',
+    'function_actions',
+    'misc',
+    'output_channel',
+    'trigger'
+]
+
+# Tables that aren't cached, but whose changes are reported to the daemon,
+# which calls the functions registered with on_invalidate() (e.g. to
+# recompile methods)
+WATCHED_TABLES = [
+    'method',
+    'method_data'
+]
+
+
+class ConfigCache:
+    """
+    Read-through cache of configuration tables
+
+    Each table is loaded in full the first time it's used, and lookups by
+    column values are answered from indexes built on demand. Rows are
+    detached from their session and shared between threads, so they must
+    be treated as read-only. Tables are refreshed by invalidate(), which
+    is called whenever a session commits a change to a cached table.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.RLock()
+        self.models = {}
+        self.rows = {}
+        self.indexes = {}
+        self.hits = {}
+        self.misses = {}
+        self.invalidations = {}
+        self.callbacks = {}
+
+    def cached(self, model):
+        """Return whether lookups of model are served from the cache."""
+        return self.enabled and getattr(model, '__tablename__', None) in CACHED_TABLES
+
+    def _query(self, model, ids=None):
+        session = get_scoped_session(MYCODO_DB_PATH)
+        try:
+            query = session.query(model)
+            if ids is not None:
+                query = query.filter(model.id.in_(ids))
+            rows = query.order_by(model.id).all()
+            session.expunge_all()
+            return rows
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _table(self, model):
+        """Return the rows of model keyed by id, loading the table if it isn't cached."""
+        table = model.__tablename__
+        with self.lock:
+            if table in self.rows:
+                self.hits[table] = self.hits.get(table, 0) + 1
+                return self.rows[table]
+            self.misses[table] = self.misses.get(table, 0) + 1
+            self.models[table] = model
+            self.rows[table] = {each_row.id: each_row for each_row in self._query(model)}
+            return self.rows[table]
+
+    def all(self, model):
+        """Return all rows of model."""
+        if not self.cached(model):
+            return self._query(model)
+        return list(self._table(model).values())
+
+    def first(self, model):
+        rows = self.all(model)
+        return rows[0] if rows else None
+
+    def get_id(self, model, row_id):
+        """Return the row of model with the primary key row_id."""
+        if not self.cached(model):
+            rows = self._query(model, ids=[int(row_id)])
+            return rows[0] if rows else None
+        return self._table(model).get(int(row_id))
+
+    def get(self, model, unique_id):
+        """Return the row of model with unique_id."""
+        rows = self.filter_by(model, unique_id=unique_id)
+        return rows[0] if rows else None
+
+    def filter_by(self, model, **kwargs):
+        """
+        Return the rows of model with column values equal to kwargs
+
+        :return: matching rows, ordered by id
+        :rtype: list
+        """
+        if not self.cached(model):
+            return [each_row for each_row in self._query(model)
+                    if all(getattr(each_row, name) == value for name, value in kwargs.items())]
+
+        names = tuple(sorted(kwargs))
+        with self.lock:
+            rows = self._table(model)
+            index_key = (model.__tablename__, names)
+            if index_key not in self.indexes:
+                index = {}
+                for each_row in rows.values():
+                    index.setdefault(
+                        tuple(getattr(each_row, name) for name in names), []).append(each_row)
+                self.indexes[index_key] = index
+            return list(self.indexes[index_key].get(tuple(kwargs[name] for name in names), []))
+
+    def invalidate(self, table, ids=None):
+        """
+        Refresh cached rows of a table
+
+        :param table: table name
+        :param ids: primary keys of the rows that changed, or None to reload the whole table
+        """
+        for each_callback in self.callbacks.get(table, []):
+            try:
+                each_callback(table, ids)
+            except Exception:
+                logger.exception(f"Invalidation callback of {table}")
+        if table not in CACHED_TABLES:
+            return
+        with self.lock:
+            self.invalidations[table] = self.invalidations.get(table, 0) + 1
+            for each_key in [key for key in self.indexes if key[0] == table]:
+                del self.indexes[each_key]
+            if table not in self.rows:
+                return
+            if ids is None:
+                del self.rows[table]
+                return
+            try:
+                ids = [int(each_id) for each_id in ids]
+                rows = self.rows[table]
+                for each_id in ids:
+                    rows.pop(each_id, None)
+                for each_row in self._query(self.models[table], ids=ids):
+                    rows[each_row.id] = each_row
+                self.rows[table] = dict(sorted(rows.items()))
+            except Exception:
+                logger.exception(f"Could not refresh {table} rows {ids}. Reloading table.")
+                del self.rows[table]
+
+    def on_invalidate(self, table, callback):
+        """Call callback(table, ids) when rows of a cached or watched table change."""
+        self.callbacks.setdefault(table, []).append(callback)
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+            self.indexes.clear()
+
+    def stats(self):
+        """
+        Return the number of cached rows and the lookup hit rate of each table
+
+        :rtype: dict
+        """
+        stats = {}
+        with self.lock:
+            for each_table in CACHED_TABLES:
+                hits = self.hits.get(each_table, 0)
+                misses = self.misses.get(each_table, 0)
+                stats[each_table] = {
+                    'rows': len(self.rows.get(each_table, {})),
+                    'hits': hits,
+                    'misses': misses,
+                    'invalidations': self.invalidations.get(each_table, 0),
+                    'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+                }
+        return stats
+
+
+config_cache = ConfigCache()
+
+
+class ChangeNotifier:
+    """
+    Report changes to configuration tables to the daemon from a background thread
+
+    Commits only queue their changes, so they aren't delayed by a busy or
+    stopped daemon. Changes queued while others are being sent are merged
+    and sent together. Calls to the daemon first wait with wait_sent()
+    until the changes queued before them were sent, so the daemon doesn't
+    act on rows it hasn't refreshed.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = {}  # table: set of ids, or None for the whole table
+        self.sending = False
+        self.thread = None
+
+    def queue(self, table, ids=None):
+        with self.condition:
+            if ids is None or (table in self.pending and self.pending[table] is None):
+                self.pending[table] = None
+            else:
+                self.pending.setdefault(table, set()).update(ids)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='config_changed')
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify_all()
+
+    def run(self):
+        from mycodo.mycodo_client import DaemonControl
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                changes, self.pending = self.pending, {}
+                self.sending = True
+            try:
+                control = DaemonControl(pyro_timeout=5)
+                for each_table, ids in changes.items():
+                    try:
+                        control.config_changed(each_table, sorted(ids) if ids is not None else None)
+                    except Exception as err:
+                        logger.debug(f"Could not notify the daemon of changes to {each_table}: {err}")
+            finally:
+                with self.condition:
+                    self.sending = False
+                    self.condition.notify_all()
+
+    def wait_sent(self, timeout=5):
+        """Wait until the queued changes were sent (unless called while sending them)."""
+        if threading.current_thread() is self.thread:
+            return
+        with self.condition:
+            self.condition.wait_for(lambda: not self.pending and not self.sending, timeout)
+
+
+config_change_notifier = ChangeNotifier()
+
+
+def config_cache_enable():
+    """Serve lookups of configuration tables from memory (used by the daemon)."""
+    config_cache.enabled = True
+
+
+def config_cache_stats():
+    return config_cache.stats()
+
+
+def config_changed(table, ids=None):
+    """
+    Report a change to a configuration table
+
+    In the daemon, the cached rows are refreshed. In other processes, such
+    as the frontend, the daemon is notified in the background so it can
+    refresh its cache.
+    """
+    if config_cache.enabled:
+        config_cache.invalidate(table, ids)
+        return
+    config_change_notifier.queue(table, ids)
+
+
+def config_changes_wait_sent():
+    """Wait until the daemon was notified of the configuration changes made by this process."""
+    config_change_notifier.wait_sent()
+
+
+#
+# Track commits to cached tables
+#
+
+def record_changes(session, flush_context):
+    changes = session.info.setdefault('config_changed', {})
+    for each_obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(each_obj, '__tablename__', None)
+        if table in CACHED_TABLES + WATCHED_TABLES and changes.get(table, set()) is not None:
+            row_id = getattr(each_obj, 'id', None)
+            if row_id is None:
+                changes[table] = None
+            else:
+                changes.setdefault(table, set()).add(row_id)
+
+
+def record_bulk_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    table = getattr(mapper.class_, '__tablename__', None) if mapper is not None else None
+    if table in CACHED_TABLES + WATCHED_TABLES:
+        orm_execute_state.session.info.setdefault('config_changed', {})[table] = None
+
+
+def send_changes(session):
+    changes = session.info.pop('config_changed', None)
+    for each_table, ids in (changes or {}).items():
+        config_changed(each_table, sorted(ids) if ids is not None else None)
+
+
+def discard_changes(session, previous_transaction=None):
+    session.info.pop('config_changed', None)
+
+
+event.listen(Session, 'after_flush', record_changes)
+event.listen(Session, 'do_orm_execute', record_bulk_changes)
+event.listen(Session, 'after_commit', send_changes)
+event.listen(Session, 'after_rollback', discard_changes)
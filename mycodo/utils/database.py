@@ -6,7 +6,8 @@ from sqlite3 import OperationalError
 import sqlalchemy
 
 from mycodo.config import MYCODO_DB_PATH
-from mycodo.databases.utils import session_scope
+from mycodo.databases.utils import get_scoped_session, get_session_factory
+from mycodo.utils.config_cache import config_cache
 
 logger = logging.getLogger("mycodo.database")
 
@@ -49,11 +50,35 @@ def db_retrieve_table_daemon(
     If entry='all', all table entries are returned.
     If device_id is set, the first entry with that device ID is returned.
     Otherwise, the table object is returned.
+
+    Rows of configuration tables are returned from the config cache when it's
+    enabled (in the daemon), and must not be modified.
     """
+    if entry in ['first', 'all'] or device_id or unique_id:
+        if config_cache.cached(table):
+            if device_id:
+                return config_cache.get_id(table, device_id)
+            elif unique_id:
+                return config_cache.get(table, unique_id)
+            elif custom_name and custom_value:
+                return_table = config_cache.filter_by(table, **{custom_name: custom_value})
+            else:
+                return_table = config_cache.all(table)
+
+            if entry == 'first':
+                return return_table[0] if return_table else None
+            return return_table
+
     tries = 5
     while tries > 0:
         try:
-            with session_scope(MYCODO_DB_PATH) as new_session:
+            if entry in ['first', 'all'] or device_id or unique_id:
+                # Results are detached from the session, so the thread-local session may be reused
+                new_session = get_scoped_session(MYCODO_DB_PATH)
+            else:
+                # The query object is returned, so it needs a session of its own
+                new_session = get_session_factory(MYCODO_DB_PATH)()
+            try:
                 if device_id:
                     return_table = new_session.query(table).filter(
                         table.id == int(device_id))
@@ -72,6 +97,10 @@ def db_retrieve_table_daemon(
                     return_table = return_table.all()
 
                 new_session.expunge_all()
+            except Exception:
+                new_session.rollback()
+                raise
+            finally:
                 new_session.close()
             return return_table
         except OperationalError:
@@ -0,0 +1,120 @@
+# coding=utf-8
+"""Framebuffers of displays, so only the characters or pixels that changed are written."""
+
+
+class CharacterFramebuffer:
+    """
+    The characters shown on a character display (e.g. HD44780 16x2 and 20x4 LCDs)
+
+    update() compares the new lines to the shown lines and returns the
+    runs of characters that changed. Positioning the cursor costs as much
+    as writing a character, so runs separated by a single unchanged
+    character are joined.
+    """
+    def __init__(self, columns, lines):
+        self.columns = columns
+        self.lines = lines
+        self.shown = None
+
+    def invalidate(self):
+        """Write every line with the next update (e.g. after the display was cleared)."""
+        self.shown = None
+
+    def update(self, lines):
+        """
+        Set the lines of the display
+
+        :param lines: text of each line (extra lines are ignored, lines that are
+            None are left unchanged, and missing lines are blank)
+        :return: list of (line index, column, text) to write
+        :rtype: list
+        """
+        new_lines = []
+        for index in range(self.lines):
+            text = lines[index] if index < len(lines) else ""
+            if text is None:
+                text = self.shown[index] if self.shown else ""
+            new_lines.append(str(text).ljust(self.columns)[:self.columns])
+
+        changes = []
+        for index, text in enumerate(new_lines):
+            if self.shown is None:
+                changes.append((index, 0, text))
+                continue
+            changed = [column for column in range(self.columns)
+                       if text[column] != self.shown[index][column]]
+            if not changed:
+                continue
+            start = end = changed[0]
+            for column in changed[1:]:
+                if column - end > 2:
+                    changes.append((index, start, text[start:end + 1]))
+                    start = column
+                end = column
+            changes.append((index, start, text[start:end + 1]))
+
+        self.shown = new_lines
+        return changes
+
+
+class PageFramebuffer:
+    """
+    The pixels shown on a display with memory in pages of 8 rows (e.g. SSD1306 OLEDs)
+
+    A buffer is the bytes of each page in order, a byte being a column of
+    8 pixels with the top pixel in the least significant bit. update()
+    compares the new buffer to the shown buffer and returns the range of
+    columns that changed in each page.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.pages = height // 8
+        self.shown = None
+
+    def invalidate(self):
+        """Write every page with the next update."""
+        self.shown = None
+
+    def update(self, buffer):
+        """
+        Set the pixels of the display
+
+        :param buffer: bytes of the pages of the display
+        :return: list of (page, first column, last column) to write
+        :rtype: list
+        """
+        buffer = bytes(buffer)
+        regions = []
+        for page in range(self.pages):
+            offset = page * self.width
+            new_page = buffer[offset:offset + self.width]
+            if self.shown is None:
+                regions.append((page, 0, self.width - 1))
+                continue
+            old_page = self.shown[offset:offset + self.width]
+            if new_page == old_page:
+                continue
+            first = 0
+            while new_page[first] == old_page[first]:
+                first += 1
+            last = self.width - 1
+            while new_page[last] == old_page[last]:
+                last -= 1
+            regions.append((page, first, last))
+
+        self.shown = buffer
+        return regions
+
+
+def image_pages(image):
+    """
+    Return the buffer of pages of a 1-bit PIL image
+
+    Rotating the image clockwise makes each row of the rotated image one
+    column of the original, with one byte for each page, last page first.
+    """
+    from PIL import Image
+
+    pages = image.height // 8
+    data = image.transpose(Image.ROTATE_270).tobytes()
+    return b''.join(data[pages - 1 - page::pages] for page in range(pages))
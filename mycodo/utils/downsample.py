@@ -0,0 +1,110 @@
+# coding=utf-8
+import array
+import json
+import sys
+
+# Methods to reduce the points of a series to the width of a graph
+#   mean: average of each bucket (aggregateWindow in the measurement database)
+#   minmax: lowest and highest point of each bucket (preserves peaks)
+#   lttb: Largest-Triangle-Three-Buckets, selected from the minmax points
+DOWNSAMPLE_METHODS = ['mean', 'minmax', 'lttb']
+DOWNSAMPLE_WIDTH_DEFAULT = 700
+DOWNSAMPLE_WIDTH_MAX = 10000
+
+# Buckets per output point fetched from the database before applying LTTB
+LTTB_PRESELECT_RATIO = 4
+
+
+def bucket_ms(start_epoch, end_epoch, buckets):
+    """
+    Return the duration of each bucket, in milliseconds, to divide a time frame into
+
+    :param start_epoch: start of the time frame, in seconds
+    :param end_epoch: end of the time frame, in seconds
+    :param buckets: number of buckets
+    :rtype: int
+    """
+    return max(1, int((end_epoch - start_epoch) * 1000 / max(1, buckets)))
+
+
+def lttb(times, values, threshold):
+    """
+    Downsample a series with the Largest-Triangle-Three-Buckets algorithm
+
+    The first and last points are always kept, and one point is selected
+    from each bucket in between: the one forming the largest triangle with
+    the point selected from the previous bucket and the average of the next.
+
+    :param times: list of timestamps, in ascending order
+    :param values: list of values
+    :param threshold: number of points to return
+    :return: selected timestamps, selected values
+    :rtype: tuple
+    """
+    length = len(times)
+    if threshold >= length or threshold < 3:
+        return list(times), list(values)
+
+    sampled_times = [times[0]]
+    sampled_values = [values[0]]
+
+    every = (length - 2) / (threshold - 2)
+    index_a = 0
+
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, length)
+        avg_count = avg_end - avg_start
+        avg_time = sum(times[avg_start:avg_end]) / avg_count
+        avg_value = sum(values[avg_start:avg_end]) / avg_count
+
+        # Point of the current bucket forming the largest triangle
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        time_a = times[index_a]
+        value_a = values[index_a]
+        time_diff = time_a - avg_time
+        value_diff = avg_value - value_a
+
+        max_area = -1
+        index_max = range_start
+        for j in range(range_start, range_end):
+            area = abs(time_diff * (values[j] - value_a) - (time_a - times[j]) * value_diff)
+            if area > max_area:
+                max_area = area
+                index_max = j
+
+        sampled_times.append(times[index_max])
+        sampled_values.append(values[index_max])
+        index_a = index_max
+
+    sampled_times.append(times[-1])
+    sampled_values.append(values[-1])
+    return sampled_times, sampled_values
+
+
+def series_to_json(times, values, chunk_points=2000):
+    """Yield a series as a JSON list of [timestamp, value] pairs, in chunks."""
+    yield '['
+    for i in range(0, len(times), chunk_points):
+        chunk = json.dumps(
+            list(zip(times[i:i + chunk_points], values[i:i + chunk_points])),
+            separators=(',', ':'))[1:-1]
+        yield chunk if i == 0 else f',{chunk}'
+    yield ']'
+
+
+def series_to_columns_json(times, values):
+    """Return a series as a JSON object of timestamp and value lists."""
+    return json.dumps({'t': times, 'v': values}, separators=(',', ':'))
+
+
+def series_to_binary(times, values):
+    """Return a series as little-endian float64 timestamp, value pairs."""
+    data = array.array('d', [0.0]) * (len(times) * 2)
+    data[0::2] = array.array('d', times)
+    data[1::2] = array.array('d', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
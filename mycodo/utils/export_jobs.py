@@ -0,0 +1,290 @@
+# coding=utf-8
+import csv
+import glob
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from mycodo.config import (EXPORT_SLICE_POINTS, EXPORT_SLICE_SEC,
+                           EXPORT_SLICE_SEC_MAX, EXPORT_SLICE_SEC_MIN,
+                           PATH_MEASUREMENTS_EXPORT)
+from mycodo.databases import set_uuid
+from mycodo.utils.system_pi import assure_path_exists
+
+logger = logging.getLogger("mycodo.export_jobs")
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def query_export_slice(series):
+    """Query a time slice of the series of an export job with a single query."""
+    from mycodo.utils.influx import influxdb_client_manager, query_series_batch
+    if influxdb_client_manager.get_query_api()[0] is None:
+        raise Exception("Could not connect to the measurement database")
+    return query_series_batch(series)
+
+
+def join_series(data):
+    """
+    Outer join series on their timestamps
+
+    :param data: list of (times, values) of each series
+    :return: rows of a timestamp followed by the value of each series (None if it has no value at the timestamp)
+    :rtype: list
+    """
+    rows = {}
+    for index, (times, values) in enumerate(data):
+        for each_time, each_value in zip(times, values):
+            if each_time not in rows:
+                rows[each_time] = [None] * len(data)
+            rows[each_time][index] = each_value
+    return [[each_time] + rows[each_time] for each_time in sorted(rows)]
+
+
+class ExportJobs:
+    """
+    Background jobs that export the measurements of several series to a single file
+
+    Each job queries a time slice of all its series at a time, outer joins
+    them on their timestamps, and appends the rows to a CSV file (or, for
+    Parquet, writes them as a part file that's combined when the job
+    completes), so memory use depends on the size of a slice, not of the
+    time range. The duration of slices is adjusted to contain about
+    EXPORT_SLICE_POINTS points. The state of each job is saved to a JSON
+    file after every slice, so a job that failed, was cancelled, or was
+    interrupted by a restart can be resumed from the last complete slice.
+    """
+    def __init__(self, path=PATH_MEASUREMENTS_EXPORT, query_func=query_export_slice):
+        self.path = path
+        self.query_func = query_func
+        self.lock = threading.Lock()
+        self.threads = {}
+        self.cancel_events = {}
+
+    def path_state(self, job_id):
+        return os.path.join(self.path, f'{job_id}.json')
+
+    def path_output(self, job):
+        return os.path.join(self.path, f"{job['job_id']}.{job['format']}")
+
+    def path_parts(self, job):
+        return os.path.join(self.path, f"{job['job_id']}_parts")
+
+    def load(self, job_id):
+        try:
+            with open(self.path_state(job_id)) as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, job):
+        job['updated'] = time.time()
+        path_tmp = f"{self.path_state(job['job_id'])}.tmp"
+        with open(path_tmp, 'w') as state_file:
+            json.dump(job, state_file)
+        os.replace(path_tmp, self.path_state(job['job_id']))
+
+    def is_active(self, job_id):
+        thread = self.threads.get(job_id)
+        return thread is not None and thread.is_alive()
+
+    def create(self, series, start, end, data_format='csv', start_thread=True):
+        """
+        Create and start an export job
+
+        :param series: list of dicts with the keys unique_id, unit, channel, measure, and name (column header)
+        :param start: epoch start of the time range
+        :param end: epoch end of the time range
+        :param data_format: 'csv' or 'parquet'
+        :return: job ID
+        :rtype: str
+        """
+        if data_format not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        if data_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+            # Raise now, rather than in the job's thread
+            raise ImportError("Parquet export requires the pyarrow package")
+        if not series:
+            raise ValueError("No measurements selected")
+        if end <= start:
+            raise ValueError("The end of the time range must be after the start")
+
+        assure_path_exists(self.path)
+        job = {
+            'job_id': set_uuid(),
+            'status': 'queued',
+            'format': data_format,
+            'series': series,
+            'start': start,
+            'end': end,
+            'position': start,
+            'slice_sec': EXPORT_SLICE_SEC,
+            'rows': 0,
+            'file_offset': 0,
+            'parts': 0,
+            'error': None,
+            'created': time.time(),
+            'updated': time.time()
+        }
+        self.save(job)
+        if start_thread:
+            self.start(job['job_id'])
+        return job['job_id']
+
+    def start(self, job_id):
+        """Run a job in a background thread, starting from the last complete slice."""
+        with self.lock:
+            if self.is_active(job_id):
+                return
+            job = self.load(job_id)
+            if job is None or job['status'] == 'complete':
+                return
+            job['status'] = 'queued'
+            job['error'] = None
+            self.save(job)
+            self.cancel_events[job_id] = threading.Event()
+            self.threads[job_id] = threading.Thread(
+                target=self.run, args=(job_id,), name=f'export_{job_id}')
+            self.threads[job_id].daemon = True
+            self.threads[job_id].start()
+
+    def cancel(self, job_id):
+        """Stop a job after its current slice. It can be resumed later."""
+        if job_id in self.cancel_events:
+            self.cancel_events[job_id].set()
+
+    def delete(self, job_id):
+        """Cancel a job and delete its files."""
+        self.cancel(job_id)
+        thread = self.threads.get(job_id)
+        if thread:
+            thread.join(60)
+        job = self.load(job_id)
+        if job is None:
+            return
+        for each_path in [self.path_output(job), self.path_state(job_id)]:
+            if os.path.exists(each_path):
+                os.remove(each_path)
+        shutil.rmtree(self.path_parts(job), ignore_errors=True)
+
+    def jobs(self):
+        """
+        Return the state of all jobs, newest first
+
+        Jobs that were running when the process that ran them stopped have the status "interrupted".
+        """
+        jobs = []
+        for each_path in glob.glob(os.path.join(self.path, '*.json')):
+            job = self.load(os.path.basename(each_path)[:-5])
+            if job is None:
+                continue
+            if job['status'] in ['queued', 'running'] and not self.is_active(job['job_id']):
+                job['status'] = 'interrupted'
+            duration = job['end'] - job['start']
+            job['progress'] = 100 * (job['position'] - job['start']) / duration if duration else 100
+            jobs.append(job)
+        return sorted(jobs, key=lambda each_job: each_job['created'], reverse=True)
+
+    def run(self, job_id):
+        job = self.load(job_id)
+        cancel_event = self.cancel_events[job_id]
+        try:
+            job['status'] = 'running'
+            self.save(job)
+            while job['position'] < job['end']:
+                if cancel_event.is_set():
+                    job['status'] = 'cancelled'
+                    self.save(job)
+                    return
+                self.export_slice(job)
+                self.save(job)
+
+            if job['format'] == 'parquet':
+                self.combine_parts(job)
+            job['status'] = 'complete'
+            self.save(job)
+            logger.info(f"Export {job_id} complete: {job['rows']} rows")
+        except Exception as err:
+            logger.exception(f"Export {job_id}")
+            job['status'] = 'error'
+            job['error'] = str(err)
+            self.save(job)
+
+    def export_slice(self, job):
+        """Query, join, and write the next time slice of a job, and advance its position."""
+        slice_end = min(job['position'] + job['slice_sec'], job['end'])
+        data = self.query_func([
+            dict(each_series, start=job['position'], end=slice_end)
+            for each_series in job['series']])
+        rows = join_series(data)
+
+        if job['format'] == 'csv':
+            self.write_csv(job, rows)
+        else:
+            self.write_parquet_part(job, rows)
+
+        # Adjust the duration of the next slice to the density of the data
+        points = sum(len(times) for times, _ in data)
+        if points > EXPORT_SLICE_POINTS:
+            job['slice_sec'] = max(job['slice_sec'] / 2, EXPORT_SLICE_SEC_MIN)
+        elif points < EXPORT_SLICE_POINTS / 4:
+            job['slice_sec'] = min(job['slice_sec'] * 2, EXPORT_SLICE_SEC_MAX)
+
+        job['rows'] += len(rows)
+        job['position'] = slice_end
+
+    def headers(self, job):
+        return ['timestamp (UTC)'] + [each_series['name'] for each_series in job['series']]
+
+    def write_csv(self, job, rows):
+        with open(self.path_output(job), 'a+', newline='') as output_file:
+            # Discard anything written after the last complete slice (e.g. before a restart)
+            output_file.truncate(job['file_offset'])
+            output_file.seek(job['file_offset'])
+            writer = csv.writer(output_file)
+            if job['file_offset'] == 0:
+                writer.writerow(self.headers(job))
+            writer.writerows(rows)
+            output_file.flush()
+            os.fsync(output_file.fileno())
+            job['file_offset'] = output_file.tell()
+
+    def parquet_table(self, job, rows):
+        import pyarrow as pa
+        columns = list(zip(*rows)) if rows else [[] for _ in range(len(job['series']) + 1)]
+        return pa.table(
+            [pa.array([int(round(each_time * 1e6)) for each_time in columns[0]],
+                       type=pa.timestamp('us', tz='UTC'))] +
+            [pa.array(each_column, type=pa.float64()) for each_column in columns[1:]],
+            names=self.headers(job))
+
+    def write_parquet_part(self, job, rows):
+        import pyarrow.parquet as pq
+        if not rows:
+            return
+        assure_path_exists(self.path_parts(job))
+        path_part = os.path.join(self.path_parts(job), f"{job['parts']:08d}.parquet")
+        pq.write_table(self.parquet_table(job, rows), f'{path_part}.tmp')
+        os.replace(f'{path_part}.tmp', path_part)
+        job['parts'] += 1
+
+    def combine_parts(self, job):
+        """Combine the part files of a Parquet export into one file, one part at a time."""
+        import pyarrow.parquet as pq
+        path_tmp = f'{self.path_output(job)}.tmp'
+        with pq.ParquetWriter(path_tmp, self.parquet_table(job, []).schema) as writer:
+            for index in range(job['parts']):
+                writer.write_table(pq.read_table(
+                    os.path.join(self.path_parts(job), f'{index:08d}.parquet')))
+        os.replace(path_tmp, self.path_output(job))
+        shutil.rmtree(self.path_parts(job), ignore_errors=True)
+
+
+export_jobs = ExportJobs()
@@ -1,33 +1,733 @@
 # coding=utf-8
+import bisect
 import datetime
 import logging
+import queue
+import random
 import threading
 import time
+import timeit
 
 import requests
 
+from mycodo.config import (INFLUXDB_SPOOL_REPLAY_SEC,
+                           INFLUXDB_WRITE_BATCH_SIZE, INFLUXDB_WRITE_FLUSH_SEC,
+                           INFLUXDB_WRITE_QUEUE_MAX,
+                           INFLUXDB_WRITE_RETRIES, LIVE_STREAM_WAIT_SEC,
+                           RECENT_MEASUREMENTS_MAX_POINTS,
+                           RECENT_MEASUREMENTS_MAX_SEC)
 from mycodo.databases.models import (Conversion, DeviceMeasurements, Misc,
                                      Output)
 from mycodo.mycodo_client import DaemonControl
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.influx_spool import InfluxDBSpool
 from mycodo.utils.system_pi import return_measurement_info
 
 logger = logging.getLogger("mycodo.influx")
 
 
+class InfluxDBClientManager:
+    """
+    Process-wide manager of long-lived InfluxDB clients
+
+    A single client (and its pool of HTTP connections) is kept open for
+    writing and another for querying, rather than creating a new client for
+    every write or query. The clients are only recreated after invalidate()
+    is called, which should be done whenever the measurement database
+    settings change (e.g. refresh_daemon_misc_settings()).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.apis = {}
+        self.bucket = None
+        self.db_version = None
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def _create_client(self, timeout):
+        """Create a new client from the Misc measurement database settings."""
+        from influxdb_client import InfluxDBClient
+
+        settings = db_retrieve_table_daemon(Misc, entry='first')
+        influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
+
+        if settings.measurement_db_version == '1':
+            client = InfluxDBClient(
+                url=influxdb_url,
+                token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
+                org='mycodo',
+                timeout=timeout)
+            bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
+        elif settings.measurement_db_version == '2':
+            client = InfluxDBClient(
+                url=influxdb_url,
+                username=settings.measurement_db_user,
+                password=settings.measurement_db_password,
+                org='mycodo',
+                timeout=timeout)
+            bucket = settings.measurement_db_dbname
+        else:
+            logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
+            return None, None, None
+
+        return client, bucket, settings.measurement_db_version
+
+    def _get_api(self, purpose, timeout, create_api):
+        """
+        Return the API of a purpose, creating its client and API if there isn't one
+
+        The client and API are created while holding the lock, so threads that
+        request them at the same time share one client rather than each
+        creating one.
+        """
+        with self.lock:
+            if purpose in self.apis:
+                self.connections_reused += 1
+                return self.apis[purpose]
+
+            client, bucket, db_version = self._create_client(timeout)
+            if client is None:
+                return None
+
+            self.clients[purpose] = client
+            self.apis[purpose] = create_api(client)
+            self.bucket = bucket
+            self.db_version = db_version
+            self.connections_created += 1
+            logger.debug(f"Created new InfluxDB {purpose} client")
+            return self.apis[purpose]
+
+    def get_write_api(self):
+        """
+        Return the shared synchronous write API and bucket
+
+        :return: write API (or None on error) and bucket
+        :rtype: WriteApi, str
+        """
+        from influxdb_client.client.write_api import SYNCHRONOUS
+
+        write_api = self._get_api(
+            'write', 5000, lambda client: client.write_api(write_options=SYNCHRONOUS))
+        if write_api is None:
+            return None, None
+        return write_api, self.bucket
+
+    def get_query_api(self):
+        """
+        Return the shared query API, bucket, and database version
+
+        :return: query API (or None on error), bucket, and influxdb version
+        :rtype: QueryApi, str, str
+        """
+        query_api = self._get_api('query', 60000, lambda client: client.query_api())
+        if query_api is None:
+            return None, None, None
+        return query_api, self.bucket, self.db_version
+
+    def invalidate(self):
+        """Close all clients so they are recreated with the current settings on next use."""
+        with self.lock:
+            if 'write' in self.apis:
+                try:
+                    self.apis['write'].close()
+                except Exception:
+                    logger.exception("Closing InfluxDB write API")
+            for each_client in self.clients.values():
+                try:
+                    each_client.close()
+                except Exception:
+                    logger.exception("Closing InfluxDB client")
+            self.clients = {}
+            self.apis = {}
+            self.bucket = None
+            self.db_version = None
+        logger.debug("InfluxDB clients invalidated")
+
+    def stats(self):
+        """Return client usage counters."""
+        return {
+            'clients_open': len(self.clients),
+            'connections_created': self.connections_created,
+            'connections_reused': self.connections_reused
+        }
+
+
+influxdb_client_manager = InfluxDBClientManager()
+influxdb_spool = InfluxDBSpool()
+
+
+def influxdb_client_invalidate():
+    """Recreate the InfluxDB clients of this process (call when measurement database settings change)."""
+    influxdb_client_manager.invalidate()
+
+
+def influxdb_client_stats():
+    """Return the connection counters of the InfluxDB clients of this process."""
+    return influxdb_client_manager.stats()
+
+
+class InfluxDBWriteQueue:
+    """
+    Bounded queue that coalesces measurements into batched writes
+
+    Points from all controllers of a process are converted to line protocol
+    and placed on a single queue. A writer thread flushes them to the
+    measurement database in batches of up to batch_size points, or after
+    flush_sec seconds have passed since the first point of the batch was
+    queued. Producers never wait: when the queue is full, points are
+    appended to the on-disk spool instead of the queue. Failed writes are
+    retried with exponential backoff and random jitter, then appended to the
+    on-disk spool, which is written to the database once it's available.
+    """
+    def __init__(self,
+                 batch_size=INFLUXDB_WRITE_BATCH_SIZE,
+                 flush_sec=INFLUXDB_WRITE_FLUSH_SEC,
+                 max_size=INFLUXDB_WRITE_QUEUE_MAX,
+                 retries=INFLUXDB_WRITE_RETRIES,
+                 replay_sec=INFLUXDB_SPOOL_REPLAY_SEC):
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.retries = retries
+        self.replay_sec = replay_sec
+        self.timer_replay = time.time()
+        self.queue = queue.Queue(maxsize=max_size)
+        self.lock = threading.Lock()
+        self.lock_stats = threading.Lock()
+        self.thread = None
+        self.running = False
+
+        self.points_queued = 0
+        self.points_written = 0
+        self.points_overflowed = 0
+        self.points_spooled = 0
+        self.flushes = 0
+        self.retry_count = 0
+        self.flush_latency_last = 0
+        self.flush_latency_max = 0
+        self.flush_latency_total = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.running = True
+            # Spooled points are replayed by the writer thread of this process
+            influxdb_spool.keep_open = True
+            self.thread = threading.Thread(target=self.run, name='influxdb_write_queue')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the writer thread after writing all queued points."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout)
+
+    def put(self, lines):
+        """
+        Queue line protocol strings to be written
+
+        :return: number of lines spooled because the queue was full
+        :rtype: int
+        """
+        if not self.running:
+            self.start()
+
+        overflow = []
+        for each_line in lines:
+            try:
+                self.queue.put_nowait(each_line)
+            except queue.Full:
+                overflow.append(each_line)
+
+        if overflow:
+            influxdb_spool.append(overflow)
+            logger.error(f"Measurement write queue full: spooled {len(overflow)} point(s)")
+        with self.lock_stats:
+            self.points_queued += len(lines) - len(overflow)
+            self.points_overflowed += len(overflow)
+            self.points_spooled += len(overflow)
+        return len(overflow)
+
+    def run(self):
+        batch = []
+        flush_time = None
+        while self.running or not self.queue.empty():
+            if flush_time:
+                wait = max(flush_time - time.time(), 0)
+            else:
+                wait = self.flush_sec
+            try:
+                batch.append(self.queue.get(timeout=wait))
+                if flush_time is None:
+                    flush_time = time.time() + self.flush_sec
+            except queue.Empty:
+                pass
+
+            if batch and (len(batch) >= self.batch_size or
+                          not self.running or
+                          time.time() >= flush_time):
+                self.flush(batch)
+                batch = []
+                flush_time = None
+            elif not batch and self.running and time.time() > self.timer_replay:
+                self.timer_replay = time.time() + self.replay_sec
+                self.replay_spool()
+
+        if batch:
+            self.flush(batch)
+        influxdb_spool.close()
+
+    @staticmethod
+    def write_lines(lines):
+        write_api, bucket = influxdb_client_manager.get_write_api()
+        if write_api is None:
+            raise Exception("No InfluxDB client available")
+        write_api.write(bucket=bucket, record=lines)
+
+    def replay_spool(self):
+        """Write spooled measurements if there are any."""
+        try:
+            if (influxdb_spool.has_data() and
+                    influxdb_spool.replay(self.write_lines, batch_size=self.batch_size * 10)):
+                # Replayed points may be newer than, or between, the points in memory
+                last_measurement_cache_invalidate()
+        except Exception:
+            logger.exception("Replaying spooled measurements")
+
+    def flush(self, batch):
+        """Write a batch of line protocol strings, retrying with backoff and jitter."""
+        timer = timeit.default_timer()
+        for attempt in range(self.retries):
+            try:
+                self.write_lines(batch)
+                with self.lock_stats:
+                    self.points_written += len(batch)
+                write_success(None, f"{len(batch)} point(s)")
+                break
+            except Exception as err:
+                if attempt == self.retries - 1 or not self.running:
+                    logger.error(
+                        f"Failed to write {len(batch)} measurement(s) to influxdb after "
+                        f"{attempt + 1} attempt(s): {err}. Spooling to disk.")
+                    influxdb_spool.append(batch)
+                    with self.lock_stats:
+                        self.points_spooled += len(batch)
+                    # Wait before attempting to write spooled measurements
+                    self.timer_replay = time.time() + self.replay_sec
+                    break
+                with self.lock_stats:
+                    self.retry_count += 1
+                backoff = min(2 ** attempt, 30) * random.uniform(0.5, 1.5)
+                logger.debug(
+                    f"Failed to write {len(batch)} measurement(s) to influxdb: {err}. "
+                    f"Retrying in {backoff:.1f} seconds.")
+                time.sleep(backoff)
+
+        latency = timeit.default_timer() - timer
+        with self.lock_stats:
+            self.flushes += 1
+            self.flush_latency_last = latency
+            self.flush_latency_total += latency
+            if latency > self.flush_latency_max:
+                self.flush_latency_max = latency
+
+    def stats(self):
+        """Return queue depth, flush latency, and point counters."""
+        with self.lock_stats:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'points_queued': self.points_queued,
+                'points_written': self.points_written,
+                'points_overflowed': self.points_overflowed,
+                'points_spooled': self.points_spooled,
+                'points_replayed': influxdb_spool.points_replayed,
+                'points_spool_dropped': influxdb_spool.points_dropped,
+                'flushes': self.flushes,
+                'retries': self.retry_count,
+                'flush_latency_last_ms': self.flush_latency_last * 1000,
+                'flush_latency_max_ms': self.flush_latency_max * 1000,
+                'flush_latency_avg_ms': (
+                    self.flush_latency_total / self.flushes * 1000 if self.flushes else 0)
+            }
+
+
+influxdb_write_queue = InfluxDBWriteQueue()
+
+
+def influxdb_write_queue_start():
+    """Start the write queue of this process."""
+    influxdb_write_queue.start()
+
+
+def influxdb_write_queue_stop():
+    """Write all queued measurements and stop the write queue of this process."""
+    influxdb_write_queue.stop()
+
+
+def influxdb_write_queue_stats():
+    """Return the write queue metrics of this process."""
+    return influxdb_write_queue.stats()
+
+
+class LastMeasurementCache:
+    """
+    In-memory store of the latest value of each measurement written by this process
+
+    Values are keyed by (device_id, unit, channel, measure) and are updated
+    on the write path, so read_influxdb_single(value='LAST') can be answered
+    without querying the measurement database. The cache is only used when
+    enabled, which the daemon does at startup, since the daemon is the
+    process that produces nearly all measurements. Measurements written by
+    other processes (e.g. the REST API of the web UI) and replayed from the
+    spool invalidate the values of their devices, so they're queried.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.values = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(unique_id, unit, channel, measure):
+        return (unique_id,
+                unit,
+                str(channel) if channel is not None else None,
+                measure if measure else None)
+
+    @staticmethod
+    def to_epoch(timestamp):
+        """Convert a point timestamp to epoch seconds (naive datetimes and strings without an offset are UTC)."""
+        if timestamp is None:
+            return time.time()
+        elif isinstance(timestamp, str):
+            from dateutil import parser
+            timestamp = parser.isoparse(timestamp)
+        elif isinstance(timestamp, int):
+            return timestamp / 1e9
+
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+        return timestamp.timestamp()
+
+    def update(self, unique_id, unit, value, measure=None, channel=None, timestamp=None):
+        if not self.enabled or value is None:
+            return
+        try:
+            epoch = self.to_epoch(timestamp)
+        except Exception:
+            return
+        key = self.key(unique_id, unit, channel, measure)
+        with self.lock:
+            if key not in self.values or epoch >= self.values[key][0]:
+                self.values[key] = (epoch, value)
+
+    def get(self, unique_id, unit, channel, measure=None, duration_sec=None):
+        """
+        Return the last value if it's no older than duration_sec
+
+        :return: epoch time and value, or None if not found
+        :rtype: tuple or None
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            entry = self.values.get(self.key(unique_id, unit, channel, measure))
+            if entry is None or (duration_sec and time.time() - entry[0] > float(duration_sec)):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def invalidate(self, unique_ids=None):
+        """Forget the values of devices, or of all devices if unique_ids is None."""
+        with self.lock:
+            if unique_ids is None:
+                self.values = {}
+            else:
+                unique_ids = set(unique_ids)
+                self.values = {key: entry for key, entry in self.values.items()
+                               if key[0] not in unique_ids}
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'measurements': len(self.values),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+
+influxdb_last_cache = LastMeasurementCache()
+
+
+def last_measurement_cache_enable():
+    """Serve the last value of measurements written by this process from memory."""
+    influxdb_last_cache.enabled = True
+
+
+def last_measurement_cache_stats():
+    """Return the number of cached measurements and the hit/miss counters."""
+    return influxdb_last_cache.stats()
+
+
+def last_measurement_cache_invalidate(unique_ids=None):
+    """Forget the last values and recent points of devices, or of all devices if unique_ids is None."""
+    influxdb_last_cache.invalidate(unique_ids)
+    influxdb_recent_points.invalidate(unique_ids)
+
+
+def invalidate_daemon_last_cache(unique_ids):
+    """
+    Invalidate the daemon's last values of devices measurements were written for
+
+    Called after measurements are written by a process other than the
+    daemon, since only the daemon's own writes update its cache.
+    """
+    if influxdb_last_cache.enabled or not unique_ids:
+        return  # The daemon, which updates its cache when writing
+    try:
+        DaemonControl(pyro_timeout=5).last_measurement_cache_invalidate(sorted(set(unique_ids)))
+    except Exception as err:
+        logger.debug(f"Could not invalidate the last measurements of the daemon: {err}")
+
+
+def last_measurement_cached(unique_id, unit, channel, measure=None, duration_sec=None):
+    """
+    Return the last measurement from the cache of this process
+
+    :return: epoch time and value, or None if not cached
+    :rtype: list or None
+    """
+    entry = influxdb_last_cache.get(
+        unique_id, unit, channel, measure=measure, duration_sec=duration_sec)
+    if entry:
+        return list(entry)
+
+
+def last_measurements_cached(measurements):
+    """
+    Return several last measurements from the cache of this process
+
+    :param measurements: list of (unique_id, unit, channel, measure, duration_sec)
+    :return: epoch time and value, or None if not cached, for each measurement
+    :rtype: list
+    """
+    return [last_measurement_cached(
+                unique_id, unit, channel, measure=measure, duration_sec=duration_sec)
+            for unique_id, unit, channel, measure, duration_sec in measurements]
+
+
+class RecentMeasurementBuffer:
+    """
+    In-memory store of the recent points of each measurement written by this process
+
+    Points are keyed the same as LastMeasurementCache and are added on the
+    write path, so live graphs can request the points after their last
+    point ("since") without querying the measurement database, and the
+    points can be pushed to them as they're written (wait()). Up to
+    max_points points no older than max_sec seconds are kept for each
+    measurement. Points after a time can only be answered from memory if
+    this process wrote the measurement at or before that time (since the
+    buffer was enabled, which the daemon does at startup), and none of its
+    points after that time have been discarded. Other times, and
+    measurements this process never wrote, return None so the caller
+    queries the measurement database. Writes by other processes (e.g. the
+    REST API of the web UI) and spool replays invalidate the points of
+    their devices (see last_measurement_cache_invalidate()).
+    """
+    def __init__(self, max_points=RECENT_MEASUREMENTS_MAX_POINTS, max_sec=RECENT_MEASUREMENTS_MAX_SEC):
+        self.max_points = max_points
+        self.max_sec = max_sec
+        self.condition = threading.Condition()
+        self.enabled = False
+        self.time_enabled_us = None
+        self.points = {}  # Key: list of (epoch microseconds, value), in ascending order
+        self.first_us = {}  # Key: time of the first point written
+        self.discarded_us = {}  # Key: time of the newest discarded point
+
+    def enable(self):
+        with self.condition:
+            self.enabled = True
+            self.time_enabled_us = int(time.time() * 1e6)
+
+    def update(self, unique_id, unit, value, measure=None, channel=None, timestamp=None):
+        if not self.enabled or value is None:
+            return
+        try:
+            time_us = int(round(LastMeasurementCache.to_epoch(timestamp) * 1e6))
+        except Exception:
+            return
+        key = LastMeasurementCache.key(unique_id, unit, channel, measure)
+        with self.condition:
+            if key not in self.points:
+                self.points[key] = []
+                self.first_us[key] = time_us
+            points = self.points[key]
+            if not points or time_us > points[-1][0]:
+                points.append((time_us, value))
+            else:
+                # Points with the same timestamp overwrite each other in the measurement database
+                index = bisect.bisect_left(points, (time_us,))
+                if index < len(points) and points[index][0] == time_us:
+                    points[index] = (time_us, value)
+                else:
+                    points.insert(index, (time_us, value))
+
+            oldest_us = time.time() * 1e6 - self.max_sec * 1e6
+            discard = max(len(points) - self.max_points, 0)
+            while discard < len(points) and points[discard][0] < oldest_us:
+                discard += 1
+            if discard:
+                self.discarded_us[key] = max(
+                    self.discarded_us.get(key, 0), points[discard - 1][0])
+                del points[:discard]
+            self.condition.notify_all()
+
+    def since(self, unique_id, unit, channel, measure, since_us):
+        """
+        Return the points after since_us
+
+        :return: list of (epoch microseconds, value), or None if points after since_us may not be in memory
+        :rtype: list or None
+        """
+        key = LastMeasurementCache.key(unique_id, unit, channel, measure)
+        if (not self.enabled or key not in self.points or
+                since_us < max(self.time_enabled_us, self.first_us[key], self.discarded_us.get(key, 0))):
+            return None
+        points = self.points[key]
+        return points[bisect.bisect_right(points, (since_us, float('inf'))):]
+
+    def invalidate(self, unique_ids=None):
+        """Forget the points of devices, or of all devices if unique_ids is None."""
+        with self.condition:
+            for each_key in list(self.points):
+                if unique_ids is None or each_key[0] in unique_ids:
+                    del self.points[each_key]
+                    del self.first_us[each_key]
+                    self.discarded_us.pop(each_key, None)
+
+    def wait(self, series, timeout=0):
+        """
+        Return the points after the time of each series, waiting up to timeout seconds for any
+
+        :param series: list of (unique_id, unit, channel, measure, since_us)
+        :return: list of points (see since()) for each entry of series
+        :rtype: list
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                results = [self.since(*each_series) for each_series in series]
+                remaining = deadline - time.time()
+                if remaining <= 0 or any(results):
+                    return results
+                self.condition.wait(remaining)
+
+    def stats(self):
+        return {
+            'measurements': len(self.points),
+            'points': sum(len(each_points) for each_points in self.points.values())
+        }
+
+
+influxdb_recent_points = RecentMeasurementBuffer()
+
+
+def recent_measurements_enable():
+    """Keep the recent points of measurements written by this process in memory."""
+    influxdb_recent_points.enable()
+
+
+def recent_measurements(series, timeout=0):
+    """
+    Return the points of several measurements after a time, from the memory of this process
+
+    :param series: list of (unique_id, unit, channel, measure, since_ns)
+    :param timeout: seconds to wait for new points if there are none yet
+    :return: list of [epoch time, value] points for each measurement, or None
+        if its points after since_ns may not be in memory
+    :rtype: list
+    """
+    results = influxdb_recent_points.wait(
+        [(unique_id, unit, channel, measure, int(since_ns) // 1000)
+         for unique_id, unit, channel, measure, since_ns in series],
+        timeout=min(float(timeout), LIVE_STREAM_WAIT_SEC))
+    return [[[each_time / 1e6, each_value] for each_time, each_value in each_result]
+            if each_result is not None else None
+            for each_result in results]
+
+
+def record_point(unique_id, unit, value, measure=None, channel=None, timestamp=None):
+    """
+    Create an influxdb Point and add it to the caches of this process
+
+    Points without a timestamp are given the current time, since they may
+    not be written to the database until later (queued or spooled), and so
+    the points in memory have the same timestamps as in the database.
+    """
+    if timestamp is None:
+        timestamp = time.time_ns()
+    influxdb_last_cache.update(
+        unique_id, unit, value, measure=measure, channel=channel, timestamp=timestamp)
+    influxdb_recent_points.update(
+        unique_id, unit, value, measure=measure, channel=channel, timestamp=timestamp)
+    return create_point(
+        unique_id, unit, value, measure=measure, channel=channel, timestamp=timestamp)
+
+
+def create_point(unique_id, unit, value, measure=None, channel=None, timestamp=None):
+    """Create an influxdb Point from measurement information."""
+    from influxdb_client import Point
+
+    point = Point(unit).tag("device_id", unique_id)
+
+    if measure:
+        point = point.tag("measure", measure)
+    if channel is not None:
+        point = point.tag("channel", channel)
+    if timestamp:
+        point = point.time(timestamp)
+
+    return point.field("value", value)
+
+
+def points_to_lines(points):
+    """Convert points (with timestamps, as they may be written later) to line protocol."""
+    return [each_point.to_line_protocol() for each_point in points]
+
+
+def queue_points(points):
+    """Add points to the write queue."""
+    influxdb_write_queue.put(points_to_lines(points))
+
+
+def spool_points(points):
+    """Add points to the on-disk spool, to be written when the database is available."""
+    influxdb_spool.append(points_to_lines(points))
+
+
 #
 # Influxdb using Flux (influxdb versions 1.8+ and 2.x)
 #
 
-def write_influxdb_value(unique_id, unit, value, measure=None, channel=None, timestamp=None):
+WRITE_SPOOLED = 2  # Returned by write_influxdb_value() when the value was spooled to disk
+
+def write_influxdb_value(unique_id, unit, value, measure=None, channel=None, timestamp=None, block=True):
     """
     Write a value into an Influxdb database (flux edition, using influxdb_client)
 
     example:
         write_influxdb_value('00000001', 'C', 37.5)
 
-    :return: success (0) or failure (1)
-    :rtype: bool
+    :return: success (0), failure (1), or spooled to disk to be written
+        when the database is available (WRITE_SPOOLED)
+    :rtype: int
 
     :param unique_id: What unique_id tag to enter into the Influxdb database (ex. '00000001')
     :type unique_id: str
@@ -42,56 +742,103 @@ def write_influxdb_value(unique_id, unit, value, measure=None, channel=None, tim
     :type channel:
     :param timestamp: If supplied, this timestamp will be used in the influxdb
     :type timestamp: datetime object
+    :param block: wait until the value is written, otherwise add it to the write queue and return
+    :type block: bool
     """
-    from influxdb_client import InfluxDBClient, Point
+    point = record_point(
+        unique_id, unit, value, measure=measure, channel=channel, timestamp=timestamp)
 
-    settings = db_retrieve_table_daemon(Misc, entry='first')
-    influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
-
-    if settings.measurement_db_version == '1':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
-            org='mycodo',
-            timeout=5000)
-        bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
-    elif settings.measurement_db_version == '2':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            username=settings.measurement_db_user,
-            password=settings.measurement_db_password,
-            org='mycodo',
-            timeout=5000)
-        bucket = settings.measurement_db_dbname
-    else:
-        logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
-        return
-
-    with client.write_api(success_callback=write_success, error_callback=write_fail) as write_api:
-        point = Point(unit).tag("device_id", unique_id)
+    if not block:
+        queue_points([point])
+        invalidate_daemon_last_cache([unique_id])
+        return 0
 
-        if measure:
-            point = point.tag("measure", measure)
-        if channel is not None:
-            point = point.tag("channel", channel)
-        if timestamp:
-            point = point.time(timestamp)
+    try:
+        write_api, bucket = influxdb_client_manager.get_write_api()
+        if write_api is None:
+            return 1
+        write_api.write(bucket=bucket, record=point)
+        write_success(None, point)
+    except Exception as except_msg:
+        logger.debug(
+            f"Failed to write measurement to influxdb (Device ID: {unique_id}): {except_msg}. "
+            f"Spooling to disk.")
+        spool_points([point])
+        return WRITE_SPOOLED
+    finally:
+        invalidate_daemon_last_cache([unique_id])
+    return 0
+
+
+def write_influxdb_points(measurements):
+    """
+    Write a batch of measurements with a single request
 
-        point = point.field("value", value)
+    Measurements that can't be written are spooled to disk, to be written
+    when the database is available.
 
-        try:
-            write_api.write(bucket=bucket, record=point)
-            return 0
-        except Exception as except_msg:
-            logger.debug(f"Failed to write measurements to influxdb with ID {unique_id}. Retrying in 5 seconds.")
-            time.sleep(5)
-            try:
-                write_api.write(bucket=bucket, record=point)
-                return 0
-            except:
-                logger.debug(
-                    f"Failed to write measurement to influxdb (Device ID: {unique_id}): {except_msg}.")
-                return 1
+    :param measurements: list of dictionaries with the keys unique_id, unit,
+        value, measure, channel, and timestamp (epoch nanoseconds or None)
+    :return: number of measurements written, number spooled
+    :rtype: tuple
+    """
+    points = []
+    for each_measurement in measurements:
+        points.append(record_point(
+            each_measurement['unique_id'],
+            each_measurement['unit'],
+            each_measurement['value'],
+            measure=each_measurement.get('measure'),
+            channel=each_measurement.get('channel'),
+            timestamp=each_measurement.get('timestamp')))
+    if not points:
+        return 0, 0
+
+    lines = points_to_lines(points)
+    try:
+        write_api, bucket = influxdb_client_manager.get_write_api()
+        if write_api is None:
+            raise Exception("No InfluxDB client available")
+        write_api.write(bucket=bucket, record=lines)
+        write_success(None, f"{len(lines)} point(s)")
+        return len(lines), 0
+    except Exception as err:
+        logger.debug(f"Failed to write {len(lines)} measurement(s) to influxdb: {err}. Spooling to disk.")
+        influxdb_spool.append(lines)
+        return 0, len(lines)
+    finally:
+        invalidate_daemon_last_cache([each_measurement['unique_id'] for each_measurement in measurements])
+
+
+def measurements_to_points(unique_id, measurements, use_same_timestamp=True):
+    """
+    Parse a measurement dictionary into a list of influxdb Points
+    :param unique_id: Unique ID of device
+    :param measurements: dict of measurements
+    :param use_same_timestamp: Store all measurements with the current time, rather than the timestamp of each
+    :return: list of Points
+    """
+    points = []
+    time_now = time.time_ns()
+    for each_channel, each_measurement in measurements.items():
+        if 'value' not in each_measurement or each_measurement['value'] is None:
+            continue  # skip to next measurement to add
+
+        if use_same_timestamp:
+            # All measurements are stored with the current time
+            timestamp = time_now
+        else:
+            # Use timestamp stored with each measurement
+            timestamp = each_measurement['timestamp_utc']
+
+        points.append(record_point(
+            unique_id,
+            each_measurement['unit'],
+            each_measurement['value'],
+            measure=each_measurement['measurement'],
+            channel=each_channel,
+            timestamp=timestamp))
+    return points
 
 
 def add_measurements_influxdb_flux(unique_id, measurements, use_same_timestamp=True, block=False):
@@ -99,56 +846,25 @@ def add_measurements_influxdb_flux(unique_id, measurements, use_same_timestamp=T
     Parse measurement data into list to be input into influxdb (flux edition, using influxdb_client)
     :param unique_id: Unique ID of device
     :param measurements: dict of measurements
-    :param use_same_timestamp: Allow influxdb to create the timestamp upon storage
+    :param use_same_timestamp: Store all measurements with the current time, rather than the timestamp of each
     :return:
     """
-    from influxdb_client import InfluxDBClient, Point
-
-    settings = db_retrieve_table_daemon(Misc, entry='first')
-    influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
-
-    if settings.measurement_db_version == '1':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
-            org='mycodo',
-            timeout=5000)
-        bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
-    elif settings.measurement_db_version == '2':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            username=settings.measurement_db_user,
-            password=settings.measurement_db_password,
-            org='mycodo',
-            timeout=5000)
-        bucket = settings.measurement_db_dbname
-    else:
-        logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
+    points = measurements_to_points(
+        unique_id, measurements, use_same_timestamp=use_same_timestamp)
+    if not points:
         return
 
-    with client.write_api(success_callback=write_success, error_callback=write_fail) as write_api:
-        for each_channel, each_measurement in measurements.items():
-            if 'value' not in each_measurement or each_measurement['value'] is None:
-                continue  # skip to next measurement to add
-
-            if use_same_timestamp:
-                # influxdb will create the timestamp when the data is stored
-                timestamp = None
-            else:
-                # Use timestamp stored with each measurement
-                timestamp = each_measurement['timestamp_utc']
-
-            point = Point(each_measurement['unit']).tag("device_id", unique_id)
-
-            if each_measurement['measurement']:
-                point = point.tag("measure", each_measurement['measurement'])
-            if each_channel is not None:
-                point = point.tag("channel", each_channel)
-            if timestamp:
-                point = point.time(timestamp)
-
-            point = point.field("value", each_measurement['value'])
-            write_api.write(bucket=bucket, record=point)
+    try:
+        write_api, bucket = influxdb_client_manager.get_write_api()
+        if write_api is None:
+            return
+        write_api.write(bucket=bucket, record=points)
+        write_success(None, points)
+    except Exception as err:
+        write_fail(None, points, err)
+        spool_points(points)
+    finally:
+        invalidate_daemon_last_cache([unique_id])
 
 
 def write_fail(point_data, written_data, err):
@@ -161,20 +877,19 @@ def write_success(point_data, written_data):
 
 def add_measurements_influxdb(unique_id, measurements, use_same_timestamp=True, block=False):
     """
-    Parse measurement data into list to be input into influxdb (threaded so returns fast)
+    Parse measurement data into list to be input into influxdb (queued so returns fast)
     :param unique_id: Unique ID of device
     :param measurements: dict of measurements
-    :param use_same_timestamp: Allow influxdb to create the timestamp upon storage
+    :param use_same_timestamp: Store all measurements with the current time, rather than the timestamp of each
     :param block: wait until measurements are added before returning
     :return:
     """
     if block:
         add_measurements_influxdb_flux(unique_id, measurements, use_same_timestamp)
     else:
-        write_db = threading.Thread(
-            target=add_measurements_influxdb_flux,
-            args=(unique_id, measurements, use_same_timestamp,))
-        write_db.start()
+        queue_points(measurements_to_points(
+            unique_id, measurements, use_same_timestamp=use_same_timestamp))
+        invalidate_daemon_last_cache([unique_id])
 
 
 def query_flux(unit, unique_id,
@@ -182,28 +897,8 @@ def query_flux(unit, unique_id,
                start_str=None, end_str=None, min_value=None, max_value=None, past_sec=None, group_sec=None,
                limit=None):
     """Generate influxdb query string (flux edition, using influxdb_client)."""
-    from influxdb_client import InfluxDBClient
-
-    settings = db_retrieve_table_daemon(Misc, entry='first')
-    influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
-
-    if settings.measurement_db_version == '1':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
-            org='mycodo',
-            timeout=60000)
-        bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
-    elif settings.measurement_db_version == '2':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            username=settings.measurement_db_user,
-            password=settings.measurement_db_password,
-            org='mycodo',
-            timeout=60000)
-        bucket = settings.measurement_db_dbname
-    else:
-        logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
+    query_api, bucket, db_version = influxdb_client_manager.get_query_api()
+    if query_api is None:
         return
 
     query = f'from(bucket: "{bucket}")'
@@ -235,14 +930,14 @@ def query_flux(unit, unique_id,
         query += " AND time = '{ts}'".format(ts=ts_str)
 
     if group_sec:
-        if settings.measurement_db_version == '1':
+        if db_version == '1':
             # TODO: Change median to mean when issue is fixed
             # Bug in influxdb/Flux v1.8.10 due to mean
             # Error: panic: runtime error: invalid memory address or nil pointer dereference
             # https://github.com/influxdata/influxdb/issues/21649
             # https://github.com/influxdata/influxdb/pull/23520
             query += f' |> aggregateWindow(every: {group_sec}s, fn: median)'
-        elif settings.measurement_db_version == '2':
+        elif db_version == '2':
             query += f' |> aggregateWindow(every: {group_sec}s, fn: mean)'
 
     if limit:
@@ -260,7 +955,7 @@ def query_flux(unit, unique_id,
         elif value == "COUNT":
             query += ' |> count()'
         elif value == "SUM":
-            if settings.measurement_db_version == '1':
+            if db_version == '1':
                 # TODO: Change when issue is fixed
                 # Bug in influxdb/Flux v1.8.10 due to mean
                 # Error: panic: runtime error: invalid memory address or nil pointer dereference
@@ -268,27 +963,285 @@ def query_flux(unit, unique_id,
                 # https://github.com/influxdata/influxdb/pull/23520
                 logger.error("SUM cannot be used with influxdb 1.8.10 without causing an error. "
                              "Returning all measurements for period to manually sum.")
-            elif settings.measurement_db_version == '2':
+            elif db_version == '2':
                 query += ' |> sum(column: "_value")'
         elif value == "MEAN":
-            if settings.measurement_db_version == '1':
+            if db_version == '1':
                 # TODO: Change median to mean when issue is fixed
                 # Bug in influxdb/Flux v1.8.10 due to mean
                 # Error: panic: runtime error: invalid memory address or nil pointer dereference
                 # https://github.com/influxdata/influxdb/issues/21649
                 # https://github.com/influxdata/influxdb/pull/23520
                 query += ' |> median()'
-            elif settings.measurement_db_version == '2':
+            elif db_version == '2':
                 query += ' |> mean()'
 
     logger.debug(f"query_flux() query: '{query}'")
 
-    tables = client.query_api().query(query)
-    client.close()
+    tables = query_api.query(query)
 
     return tables
 
 
+def flux_string(value):
+    """Escape a value to be used inside a Flux string literal."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('${', '\\${')
+
+
+def flux_series_filter(unit, unique_id, measure=None, channel=None):
+    query = f' |> filter(fn: (r) => r["_measurement"] == "{flux_string(unit)}")'
+    query += f' |> filter(fn: (r) => r["device_id"] == "{flux_string(unique_id)}")'
+    if channel is not None:
+        query += f' |> filter(fn: (r) => r["channel"] == "{flux_string(channel)}")'
+    if measure:
+        query += f' |> filter(fn: (r) => r["measure"] == "{flux_string(measure)}")'
+    return query
+
+
+def query_series_first_time(unit, unique_id, measure=None, channel=None, start_str=None, end_str=None):
+    """
+    Return the timestamp of the first point of a series
+
+    :return: epoch of the first point, or None if there are no points
+    :rtype: float
+    """
+    query_api, bucket, db_version = influxdb_client_manager.get_query_api()
+    if query_api is None:
+        return
+
+    query = f'from(bucket: "{bucket}")'
+    query += f' |> range(start: {start_str or "-99999d"}{f", stop: {end_str}" if end_str else ""})'
+    query += flux_series_filter(unit, unique_id, measure=measure, channel=channel)
+    query += ' |> first() |> keep(columns: ["_time"])'
+
+    times, _ = flux_csv_to_series(query_api.query_csv(query), value_column=None)
+    return times[0] if times else None
+
+
+def query_series_downsampled(unit, unique_id, start_str, end_str, every_ms,
+                             measure=None, channel=None, method='mean'):
+    """
+    Return a series reduced to one or two points per bucket, with a single query
+
+    The reduction is performed by the measurement database. With the mean
+    method, the average of each bucket is returned. With the minmax (and
+    lttb) methods, the actual points with the lowest and highest values in
+    each bucket are returned, so buckets with a single point return the
+    point unchanged.
+
+    :param start_str: RFC3339 start of the time frame
+    :param end_str: RFC3339 end of the time frame
+    :param every_ms: duration of each bucket, in milliseconds
+    :param method: 'mean' or 'minmax'
+    :return: list of epoch timestamps, list of values, in ascending order
+    :rtype: tuple
+    """
+    query_api, bucket, db_version = influxdb_client_manager.get_query_api()
+    if query_api is None:
+        return [], []
+
+    query = f'data = from(bucket: "{bucket}")'
+    query += f' |> range(start: {start_str}, stop: {end_str})'
+    query += flux_series_filter(unit, unique_id, measure=measure, channel=channel)
+
+    if method == 'mean':
+        # Bug in influxdb/Flux v1.8.10 due to mean (see query_flux())
+        fn = 'median' if db_version == '1' else 'mean'
+        query += (f' data |> aggregateWindow(every: {every_ms}ms, fn: {fn}, createEmpty: false)'
+                  f' |> keep(columns: ["_time", "_value"])')
+    else:
+        query += (f' union(tables: ['
+                  f'data |> window(every: {every_ms}ms) |> min(), '
+                  f'data |> window(every: {every_ms}ms) |> max()])'
+                  f' |> keep(columns: ["_time", "_value"])'
+                  f' |> group() |> sort(columns: ["_time"])')
+
+    logger.debug(f"query_series_downsampled() query: '{query}'")
+
+    times, values = flux_csv_to_series(query_api.query_csv(query))
+    if method != 'mean':
+        times, values = remove_duplicate_points(times, values)
+    return times, values
+
+
+def query_series_stream(unit, unique_id, channel=None, measure=None,
+                        start_str=None, end_str=None, limit=None, window_sec=None, fn='mean'):
+    """
+    Return a generator of the points of a series, read as the query result is received
+
+    :param start_str: RFC3339 start of the time frame (inclusive), or None for all data
+    :param end_str: RFC3339 end of the time frame (exclusive), or None for the present
+    :param limit: maximum number of points to return, or None for all
+    :param window_sec: aggregate the points of each window of this many seconds with fn
+    :param fn: aggregate function (see STREAM_AGGREGATE_FUNCTIONS)
+    :return: generator of epoch timestamp, value tuples, in ascending order
+    """
+    query_api, bucket, db_version = influxdb_client_manager.get_query_api()
+    if query_api is None:
+        return iter(())
+
+    query = f'from(bucket: "{bucket}")'
+    query += f' |> range(start: {start_str or "-99999d"}{f", stop: {end_str}" if end_str else ""})'
+    query += flux_series_filter(unit, unique_id, measure=measure, channel=channel)
+
+    if window_sec:
+        if fn == 'mean' and db_version == '1':
+            # Bug in influxdb/Flux v1.8.10 due to mean (see query_flux())
+            fn = 'median'
+        query += f' |> aggregateWindow(every: {max(1, int(window_sec))}s, fn: {fn}, createEmpty: false)'
+
+    query += ' |> keep(columns: ["_time", "_value"])'
+    if limit:
+        query += f' |> limit(n: {int(limit)})'
+    if not measure:
+        # Each measure of the series is a separate table, so merge them in order of time
+        query += ' |> group() |> sort(columns: ["_time"])'
+        if limit:
+            query += f' |> limit(n: {int(limit)})'
+
+    logger.debug(f"query_series_stream() query: '{query}'")
+
+    return ((each_time, each_value) for _, each_time, each_value in flux_csv_points(
+        query_api.query_csv(query)))
+
+
+def flux_csv_points(csv_rows, value_column='_value', key_column=None):
+    """
+    Parse the CSV rows of a query into points
+
+    Parsing the CSV directly avoids creating a FluxRecord object for every point.
+
+    :param value_column: column of the values to return (None to only return times)
+    :param key_column: column of a value to return with each point (e.g. the series of a batch query)
+    :return: generator of (key, epoch timestamp, float value) tuples
+    """
+    from influxdb_client.client.util.date_utils import get_date_helper
+    date_helper = get_date_helper()
+    index_time = index_value = index_key = None
+
+    for each_row in csv_rows:
+        if not each_row or each_row[0].startswith('#'):
+            continue
+        if '_time' in each_row:
+            # Header row of a table
+            index_time = each_row.index('_time')
+            index_value = each_row.index(value_column) if value_column in each_row else None
+            index_key = each_row.index(key_column) if key_column in each_row else None
+            continue
+        if index_time is None or len(each_row) <= index_time or not each_row[index_time]:
+            continue
+        try:
+            value = float(each_row[index_value]) if index_value is not None else None
+        except ValueError:
+            continue
+        yield (each_row[index_key] if index_key is not None else None,
+               date_helper.parse_date(each_row[index_time]).timestamp(),
+               value)
+
+
+def flux_csv_to_series(csv_rows, value_column='_value'):
+    """Parse the CSV rows of a query into lists of epoch timestamps and float values."""
+    times = []
+    values = []
+    for _, each_time, each_value in flux_csv_points(csv_rows, value_column=value_column):
+        times.append(each_time)
+        values.append(each_value)
+    return times, values
+
+
+def remove_duplicate_points(times, values):
+    """Remove consecutive points with the same timestamp (e.g. a bucket's min and max are the same point)."""
+    if not times:
+        return times, values
+    unique_times = [times[0]]
+    unique_values = [values[0]]
+    for each_time, each_value in zip(times[1:], values[1:]):
+        if each_time != unique_times[-1]:
+            unique_times.append(each_time)
+            unique_values.append(each_value)
+    return unique_times, unique_values
+
+
+def epoch_to_rfc3339(epoch):
+    """Convert an epoch timestamp to an RFC3339 time with microsecond precision, for queries."""
+    return datetime.datetime.fromtimestamp(
+        float(epoch), tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def query_series_batch(series):
+    """
+    Query several series with a single query
+
+    Each series is queried as a separate stream that is tagged with its
+    index in series, and the streams are combined with union(), so a
+    dashboard can retrieve all its measurements in one round trip.
+
+    :param series: list of dicts with the keys unit, unique_id, measure, channel,
+        and optionally past_sec (only points from the past number of seconds),
+        since (only points newer than an epoch timestamp), start and end (only
+        points from the epoch start, inclusive, to the epoch end, exclusive),
+        and last (only the most recent point)
+    :return: list of (times, values) for each entry of series, in ascending order
+    :rtype: list
+    """
+    results = [([], []) for _ in series]
+    if not series:
+        return results
+
+    query_api, bucket, db_version = influxdb_client_manager.get_query_api()
+    if query_api is None:
+        return results
+
+    query = ''
+    for index, each_series in enumerate(series):
+        since = each_series.get('since')
+        if since is not None:
+            start = epoch_to_rfc3339(since)
+        elif each_series.get('start') is not None:
+            start = epoch_to_rfc3339(each_series['start'])
+        elif each_series.get('past_sec'):
+            start = f"-{int(float(each_series['past_sec']))}s"
+        else:
+            start = '-99999d'
+        if each_series.get('end') is not None:
+            start += f", stop: {epoch_to_rfc3339(each_series['end'])}"
+
+        query += f's{index} = from(bucket: "{bucket}") |> range(start: {start})'
+        query += flux_series_filter(
+            each_series['unit'], each_series['unique_id'],
+            measure=each_series.get('measure'), channel=each_series.get('channel'))
+        if since is not None:
+            # range() includes the start, but the point at since has already been received
+            query += f' |> filter(fn: (r) => r._time > {epoch_to_rfc3339(since)})'
+        if each_series.get('last'):
+            query += ' |> last()'
+        query += f' |> set(key: "series", value: "{index}") |> keep(columns: ["series", "_time", "_value"])\n'
+
+    if len(series) > 1:
+        query += f'union(tables: [{", ".join(f"s{index}" for index in range(len(series)))}])'
+    else:
+        query += 's0'
+
+    logger.debug(f"query_series_batch() query: '{query}'")
+
+    for each_key, each_time, each_value in flux_csv_points(
+            query_api.query_csv(query), key_column='series'):
+        try:
+            times, values = results[int(each_key)]
+        except (TypeError, ValueError, IndexError):
+            continue
+        times.append(each_time)
+        values.append(each_value)
+
+    for times, values in results:
+        if any(times[i] > times[i + 1] for i in range(len(times) - 1)):
+            points = sorted(zip(times, values))
+            times[:] = [each_point[0] for each_point in points]
+            values[:] = [each_point[1] for each_point in points]
+
+    return results
+
+
 def query_string(unit, unique_id,
                  value=None, measure=None, channel=None, ts_str=None,
                  start_str=None, end_str=None, min_value=None, max_value=None,
@@ -330,6 +1283,64 @@ def get_last_measurement(device_id, measurement_id, max_age=None):
     return last_measurement
 
 
+def get_last_measurements(measurements):
+    """
+    Return the last values of several measurements
+
+    Measurements in the cache of this process are returned from it, and
+    the others are retrieved with a single query.
+
+    :param measurements: list of (device_id, measurement_id, max_age)
+    :return: epoch time and value, or None and None, for each measurement
+    :rtype: list
+    """
+    results = [[None, None] for _ in measurements]
+    series = []
+    for index, (device_id, measurement_id, max_age) in enumerate(measurements):
+        device_measurement = db_retrieve_table_daemon(
+            DeviceMeasurements).filter(
+            DeviceMeasurements.unique_id == measurement_id).first()
+        if device_measurement:
+            conversion = db_retrieve_table_daemon(
+                Conversion, unique_id=device_measurement.conversion_id)
+        else:
+            conversion = None
+        channel, unit, measurement = return_measurement_info(
+            device_measurement, conversion)
+
+        cached = last_measurement_cached(
+            device_id, unit, channel, measure=measurement, duration_sec=max_age)
+        if cached:
+            results[index] = cached
+            continue
+
+        series.append((index, {
+            'unit': unit,
+            'unique_id': device_id,
+            'measure': measurement,
+            'channel': channel,
+            'past_sec': max_age,
+            'last': True
+        }))
+
+    if not series:
+        return results
+
+    try:
+        settings = db_retrieve_table_daemon(Misc, entry='first')
+        if settings.measurement_db_name == 'influxdb':
+            data = query_series_batch([each_series for _, each_series in series])
+            for (index, _), (times, values) in zip(series, data):
+                if times:
+                    results[index] = [times[-1], values[-1]]
+    except requests.exceptions.ConnectionError:
+        logger.debug("Failed to establish a new influxdb connection. Ensure influxdb is running.")
+    except Exception:
+        logger.exception("Error querying the last influx measurements")
+
+    return results
+
+
 def read_influxdb_single(unique_id, unit, channel,
                          measure=None,
                          duration_sec=None,
@@ -368,6 +1379,14 @@ def read_influxdb_single(unique_id, unit, channel,
     :param datetime_obj: return a datetime object as a time
     :type datetime_obj: bool
     """
+    if value == 'LAST' and not start_str and not end_str:
+        cached = last_measurement_cached(
+            unique_id, unit, channel, measure=measure, duration_sec=duration_sec)
+        if cached:
+            if datetime_obj:
+                cached[0] = datetime.datetime.fromtimestamp(cached[0], tz=datetime.timezone.utc)
+            return cached
+
     try:
         data = query_string(
             unit,
@@ -0,0 +1,266 @@
+# coding=utf-8
+import glob
+import logging
+import os
+import threading
+import time
+
+from mycodo.config import (INFLUXDB_SPOOL_FSYNC_SEC, INFLUXDB_SPOOL_MAX_BYTES,
+                           INFLUXDB_SPOOL_SEGMENT_BYTES,
+                           PATH_MEASUREMENTS_SPOOL)
+
+logger = logging.getLogger("mycodo.influx_spool")
+
+SEGMENT_OPEN_EXT = '.open'
+SEGMENT_CLOSED_EXT = '.lp'
+SEGMENT_REPLAY_EXT = '.replay'
+
+
+def pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class InfluxDBSpool:
+    """
+    Append-only, segment-rotated spool of line protocol measurements
+
+    Each process appends to its own segment file, named
+    <time_ns>_<pid>.open, which is renamed to .lp when it's rotated. Only
+    closed (.lp) segments are replayed, and a segment is claimed for replay
+    by renaming it, so several processes may share the spool directory.
+    Data is flushed on every append and fsync'd at most every fsync_sec
+    seconds, as well as whenever a segment is closed.
+
+    Unless keep_open is set, the segment is closed after each append, so
+    it may be replayed by another process. The process that replays the
+    spool (the one running the write queue) sets keep_open, as it closes
+    its own segment before each replay.
+    """
+    def __init__(self,
+                 path=PATH_MEASUREMENTS_SPOOL,
+                 segment_bytes=INFLUXDB_SPOOL_SEGMENT_BYTES,
+                 max_bytes=INFLUXDB_SPOOL_MAX_BYTES,
+                 fsync_sec=INFLUXDB_SPOOL_FSYNC_SEC,
+                 keep_open=False):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_sec = fsync_sec
+        self.keep_open = keep_open
+        self.lock = threading.Lock()
+
+        self.segment_file = None
+        self.segment_path = None
+        self.segment_size = 0
+        self.last_fsync = 0
+
+        self.points_spooled = 0
+        self.points_replayed = 0
+        self.points_dropped = 0
+
+    def append(self, lines):
+        """Append line protocol strings to the current segment."""
+        if not lines:
+            return
+
+        data = ''.join(f'{each_line}\n' for each_line in lines).encode('utf-8')
+
+        with self.lock:
+            try:
+                if self.segment_file is None:
+                    self._open_segment()
+
+                self.segment_file.write(data)
+                self.segment_file.flush()
+                self.segment_size += len(data)
+                self.points_spooled += len(lines)
+
+                now = time.time()
+                if now - self.last_fsync > self.fsync_sec:
+                    os.fsync(self.segment_file.fileno())
+                    self.last_fsync = now
+
+                if self.segment_size >= self.segment_bytes or not self.keep_open:
+                    self._close_segment()
+            except Exception:
+                self.points_dropped += len(lines)
+                logger.exception(f"Could not spool {len(lines)} measurement(s)")
+                return
+
+        self._enforce_max_bytes()
+
+    def _open_segment(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.segment_path = os.path.join(
+            self.path, f'{time.time_ns()}_{os.getpid()}{SEGMENT_OPEN_EXT}')
+        self.segment_file = open(self.segment_path, 'ab')
+        self.segment_size = 0
+        self.last_fsync = time.time()
+
+    def _close_segment(self):
+        if self.segment_file is None:
+            return
+        self.segment_file.flush()
+        os.fsync(self.segment_file.fileno())
+        self.segment_file.close()
+        os.rename(self.segment_path, self.segment_path[:-len(SEGMENT_OPEN_EXT)] + SEGMENT_CLOSED_EXT)
+        self.segment_file = None
+        self.segment_path = None
+        self.segment_size = 0
+
+    def close(self):
+        """Close the current segment so it may be replayed."""
+        with self.lock:
+            try:
+                self._close_segment()
+            except Exception:
+                logger.exception("Could not close spool segment")
+
+    def recover(self):
+        """Close segments left open by processes that are no longer running."""
+        for each_path in glob.glob(os.path.join(self.path, f'*{SEGMENT_OPEN_EXT}')):
+            try:
+                pid = int(os.path.basename(each_path).split('.')[0].split('_')[1])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and not pid_running(pid):
+                os.rename(each_path, each_path[:-len(SEGMENT_OPEN_EXT)] + SEGMENT_CLOSED_EXT)
+        for each_path in glob.glob(os.path.join(self.path, f'*{SEGMENT_REPLAY_EXT}_*')):
+            try:
+                pid = int(each_path.rsplit('_', 1)[1])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and not pid_running(pid):
+                os.rename(each_path, each_path.split(SEGMENT_REPLAY_EXT)[0] + SEGMENT_CLOSED_EXT)
+
+    def segments(self):
+        """Return the paths of closed segments, oldest first."""
+        return sorted(glob.glob(os.path.join(self.path, f'*{SEGMENT_CLOSED_EXT}')))
+
+    def has_data(self):
+        return bool(self.segment_size or self.segments())
+
+    def replay(self, write_func, batch_size=5000):
+        """
+        Write spooled measurements, oldest first
+
+        Each closed segment is passed to write_func in lists of up to
+        batch_size lines and deleted once all lines were written. If
+        write_func raises an exception, the segment is returned to the spool
+        and replay stops.
+
+        :return: number of points replayed
+        :rtype: int
+        """
+        self.close()
+        self.recover()
+
+        replayed = 0
+        for each_segment in self.segments():
+            claimed = f'{each_segment[:-len(SEGMENT_CLOSED_EXT)]}{SEGMENT_REPLAY_EXT}_{os.getpid()}'
+            try:
+                os.rename(each_segment, claimed)
+            except OSError:
+                continue  # Claimed by another process
+
+            try:
+                with open(claimed, 'rb') as segment_file:
+                    lines = [each_line.decode('utf-8') for each_line in segment_file.read().splitlines() if each_line]
+            except Exception:
+                logger.exception(f"Could not read spool segment {claimed}. Deleting.")
+                os.remove(claimed)
+                continue
+
+            written = 0
+            try:
+                for i in range(0, len(lines), batch_size):
+                    write_func(lines[i:i + batch_size])
+                    written = i + len(lines[i:i + batch_size])
+            except Exception as err:
+                # Keep the lines not yet written for the next replay
+                logger.debug(f"Stopped replaying spooled measurements: {err}")
+                remaining = lines[written:]
+                with open(claimed, 'wb') as segment_file:
+                    segment_file.write(''.join(f'{each_line}\n' for each_line in remaining).encode('utf-8'))
+                    segment_file.flush()
+                    os.fsync(segment_file.fileno())
+                os.rename(claimed, each_segment)
+                replayed += written
+                self.points_replayed += written
+                break
+
+            os.remove(claimed)
+            replayed += len(lines)
+            self.points_replayed += len(lines)
+
+        if replayed:
+            logger.info(f"Wrote {replayed} spooled measurement(s) to the measurement database")
+        return replayed
+
+    def _enforce_max_bytes(self):
+        """Delete the oldest closed segments while the spool is larger than max_bytes."""
+        segments = self.segments()
+        sizes = {}
+        for each_path in segments:
+            try:
+                sizes[each_path] = os.path.getsize(each_path)
+            except OSError:
+                sizes[each_path] = 0
+        total = sum(sizes.values()) + self.segment_size
+
+        while total > self.max_bytes and segments:
+            oldest = segments.pop(0)
+            try:
+                with open(oldest, 'rb') as segment_file:
+                    dropped = sum(1 for _ in segment_file)
+                os.remove(oldest)
+            except OSError:
+                continue
+            total -= sizes[oldest]
+            self.points_dropped += dropped
+            logger.error(
+                f"Measurement spool exceeded {self.max_bytes} bytes: "
+                f"deleted {dropped} measurement(s) from the oldest segment")
+
+    def stats(self):
+        """Return the counters of this process."""
+        return {
+            'points_spooled': self.points_spooled,
+            'points_replayed': self.points_replayed,
+            'points_dropped': self.points_dropped
+        }
+
+
+def spool_status(path=PATH_MEASUREMENTS_SPOOL):
+    """
+    Return information about the segments in the spool directory
+
+    Only the sizes of the segments are read, as the spool may hold up to
+    INFLUXDB_SPOOL_MAX_BYTES of measurements.
+
+    :return: segment count, total bytes, and oldest segment timestamp
+    :rtype: dict
+    """
+    status = {
+        'segments': 0,
+        'bytes': 0,
+        'oldest': None
+    }
+    for each_path in sorted(glob.glob(os.path.join(path, '*_*.*'))):
+        try:
+            status['bytes'] += os.path.getsize(each_path)
+        except OSError:
+            continue
+        status['segments'] += 1
+        if status['oldest'] is None:
+            try:
+                status['oldest'] = int(os.path.basename(each_path).split('_')[0]) / 1e9
+            except ValueError:
+                pass
+    return status
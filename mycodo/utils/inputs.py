@@ -26,7 +26,8 @@ import os
 from mycodo.config import PATH_INPUTS
 from mycodo.config import PATH_INPUTS_CUSTOM
 from mycodo.inputs.sensorutils import convert_units
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.modules import load_module_information
+from mycodo.utils.modules import module_registry_cached
 
 logger = logging.getLogger("mycodo.utils.inputs")
 
@@ -160,6 +161,7 @@ def list_analog_to_digital_converters():
     return list_adc
 
 
+@module_registry_cached(PATH_INPUTS, PATH_INPUTS_CUSTOM)
 def parse_input_information(exclude_custom=False):
     """Parses the variables assigned in each Input and return a dictionary of IDs and values."""
     def dict_has_value(dict_inp, input_cus, key, force_type=None):
@@ -199,7 +201,7 @@ def parse_input_information(exclude_custom=False):
                 continue
 
             full_path = "{}/{}".format(real_path, each_file)
-            input_custom, status = load_module_from_file(full_path, 'inputs')
+            input_custom, status = load_module_information(full_path, 'inputs', 'INPUT_INFORMATION')
 
             if not input_custom or not hasattr(input_custom, 'INPUT_INFORMATION'):
                 continue
@@ -20,8 +20,12 @@
 #  along with Mycodo. If not, see <http://www.gnu.org/licenses/>.
 #
 #  Contact at kylegabriel.com
+import datetime
 import logging
+import socket
+import time
 
+from mycodo.config import DISPLAY_INFO_CACHE_SEC
 from mycodo.databases.models import Conversion
 from mycodo.databases.models import Function
 from mycodo.databases.models import Input
@@ -29,6 +33,7 @@ from mycodo.databases.models import Output
 from mycodo.databases.models import PID
 from mycodo.databases.models import Unit
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.influx import get_last_measurements
 from mycodo.utils.system_pi import add_custom_units
 from mycodo.utils.system_pi import get_measurement
 from mycodo.utils.system_pi import return_measurement_info
@@ -36,8 +41,12 @@ from mycodo.utils.system_pi import return_measurement_info
 logger = logging.getLogger("mycodo.utils.lcd")
 
 
-def format_measurement_line(device_id, measure_id, val_rounded, lcd_x_characters, display_unit=True, label=None):
-    unit_display, unit_length, name = get_measurement_info(device_id, measure_id)
+def format_measurement_line(device_id, measure_id, val_rounded, lcd_x_characters,
+                            display_unit=True, label=None, measurement_info=None):
+    if measurement_info:
+        unit_display, unit_length, name = measurement_info
+    else:
+        unit_display, unit_length, name = get_measurement_info(device_id, measure_id)
 
     if unit_length:
         value_length = len(str(val_rounded))
@@ -69,6 +78,7 @@ def format_measurement_line(device_id, measure_id, val_rounded, lcd_x_characters
 
     return line_display
 
+
 def get_measurement_info(device_id, measurement_id):
     unit_display = ""
     name = ""
@@ -102,3 +112,122 @@ def get_measurement_info(device_id, measurement_id):
             break
 
     return unit_display, unit_length, name
+
+
+info_cache = {}
+
+
+def cached_info(key, func, *args):
+    """Return the value of func(*args), calculated at most every DISPLAY_INFO_CACHE_SEC."""
+    now = time.monotonic()
+    if key not in info_cache or info_cache[key][0] < now:
+        info_cache[key] = (now + DISPLAY_INFO_CACHE_SEC, func(*args))
+    return info_cache[key][1]
+
+
+def ip_address():
+    """Return the IP address of the interface of the default route, or an empty string."""
+    def find_address():
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                # Connecting a UDP socket only selects a route, no packets are sent
+                sock.connect(('192.0.2.1', 9))
+                return sock.getsockname()[0]
+        except OSError:
+            return ""
+    return cached_info('ip_address', find_address)
+
+
+class DisplayLines:
+    """
+    Generate the lines of a display Function
+
+    Lines are displayed in sets of lines channels, cycling through
+    number_line_sets sets. The measurements of all lines of a set are
+    retrieved with one lookup, and the IP address and the names and units
+    of measurements, which rarely change, are cached.
+    """
+    def __init__(self, options_channels, lines, characters, number_line_sets, logger=logger):
+        self.options_channels = options_channels
+        self.lines = lines
+        self.characters = characters
+        self.number_line_sets = max(number_line_sets or 1, 1)
+        self.current_line_set = 0
+        self.logger = logger
+
+    def generate(self):
+        """Return the text of each line of the current line set and advance to the next set."""
+        first_channel = self.current_line_set * self.lines
+        channels = list(range(first_channel, first_channel + self.lines))
+        self.current_line_set = (self.current_line_set + 1) % self.number_line_sets
+
+        lookups = {}
+        for each_channel in channels:
+            try:
+                if self.options_channels['line_display_type'][each_channel] in [
+                        'measurement_value', 'measurement_ts']:
+                    lookups[each_channel] = (
+                        self.options_channels['select_measurement'][each_channel]['device_id'],
+                        self.options_channels['select_measurement'][each_channel]['measurement_id'],
+                        self.options_channels['measure_max_age'][each_channel])
+            except Exception:
+                pass  # The error is logged when the line is generated
+
+        last_measurements = {}
+        if lookups:
+            try:
+                last_measurements = dict(zip(
+                    lookups, get_last_measurements(list(lookups.values()))))
+            except Exception:
+                self.logger.exception("Getting the last measurements")
+
+        lines_display = []
+        for each_channel in channels:
+            try:
+                lines_display.append(self.line(
+                    each_channel, last_measurements.get(each_channel)))
+            except Exception as err:
+                self.logger.error("Error generating channel {} line: {}".format(each_channel, err))
+                lines_display.append("ERROR")
+
+        self.logger.debug("Displaying: {}".format(lines_display))
+        return lines_display
+
+    def line(self, channel, last_measurement=None):
+        """Return the text of the line of a channel."""
+        display_type = self.options_channels['line_display_type'][channel]
+
+        if display_type in ['measurement_value', 'measurement_ts']:
+            measure_ts, measure_value = last_measurement or (None, None)
+            if display_type == 'measurement_value' and measure_value is not None:
+                device_id = self.options_channels['select_measurement'][channel]['device_id']
+                measurement_id = self.options_channels['select_measurement'][channel]['measurement_id']
+                if self.options_channels['measure_decimal'][channel] == 0:
+                    val_rounded = int(measure_value)
+                else:
+                    val_rounded = round(
+                        measure_value, self.options_channels['measure_decimal'][channel])
+                return format_measurement_line(
+                    device_id,
+                    measurement_id,
+                    val_rounded,
+                    self.characters,
+                    display_unit=self.options_channels['display_unit'][channel],
+                    label=self.options_channels['measurement_label'][channel],
+                    measurement_info=cached_info(
+                        (device_id, measurement_id), get_measurement_info, device_id, measurement_id))
+            elif display_type == 'measurement_ts' and measure_ts:
+                # Convert UTC timestamp to local timezone
+                return str(datetime.datetime.fromtimestamp(measure_ts))
+            return "NONE"
+
+        elif display_type == 'current_time':
+            return time.strftime('%Y-%m-%d %H:%M:%S')
+
+        elif display_type == 'text':
+            return self.options_channels['text'][channel]
+
+        elif display_type == 'ip_address':
+            return ip_address()
+
+        return ""
@@ -0,0 +1,462 @@
+# coding=utf-8
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from mycodo.config import LOG_INDEX_CHUNK_BYTES, PATH_LOG_INDEX
+
+logger = logging.getLogger("mycodo.log_reader")
+
+# The line starting each entry of the daemon log, formatted with
+# '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+DAEMON_LOG_PATTERN = re.compile(
+    rb'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - ([A-Z]+) - (\S+) - ', re.MULTILINE)
+
+LOG_LEVELS = {
+    each_level: logging.getLevelName(each_level)
+    for each_level in ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+}
+
+INDEX_VERSION = 1
+FOLLOW_READ_MAX = 1048576  # Bytes read from a followed log at once
+
+
+def parse_log_time(text):
+    """Return the epoch of a local timestamp of a log entry (b'YYYY-MM-DD HH:MM:SS')."""
+    return time.mktime((int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                        int(text[11:13]), int(text[14:16]), int(text[17:19]), 0, 0, -1))
+
+
+def parse_entries(data, pattern=DAEMON_LOG_PATTERN):
+    """
+    Split the text of a log into entries
+
+    An entry is a line starting with pattern and the lines following it
+    that don't (e.g. a traceback). Lines before the first such line are
+    returned as an entry without a time, level, or logger. If pattern is
+    None, each line is an entry.
+
+    :param data: bytes of whole lines of the log
+    :param pattern: compiled pattern matching the start of an entry, with
+        the groups time, level, and logger
+    :return: (time, level, logger, text) of each entry
+    :rtype: list
+    """
+    if pattern is None:
+        return [(None, None, None, each_line) for each_line in data.splitlines()]
+
+    matches = list(pattern.finditer(data))
+    entries = []
+    lead_end = matches[0].start() if matches else len(data)
+    if lead_end:
+        entries.append((None, None, None, data[:lead_end].rstrip(b'\n')))
+    for index, each_match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(data)
+        entries.append((
+            parse_log_time(each_match.group(1)),
+            each_match.group(2).decode(),
+            each_match.group(3).decode(),
+            data[each_match.start():end].rstrip(b'\n')))
+    return entries
+
+
+class LogFilter:
+    """
+    The entries of a log to return
+
+    :param search: text the entry must contain
+    :param level: minimum level name (e.g. 'WARNING')
+    :param logger_name: logger of the entry, or of a parent of it (e.g. 'mycodo.controllers')
+    :param start: earliest time of the entry (epoch)
+    :param end: latest time of the entry (epoch)
+    """
+    def __init__(self, search=None, level=None, logger_name=None, start=None, end=None):
+        self.search = search.encode() if search else None
+        self.level = LOG_LEVELS.get(level.upper()) if level else None
+        self.logger_name = logger_name or None
+        self.start = start
+        self.end = end
+
+    @property
+    def structured(self):
+        """Whether only entries with a time, level, and logger can match."""
+        return (self.level is not None or self.logger_name is not None or
+                self.start is not None or self.end is not None)
+
+    def match_logger(self, name):
+        return name == self.logger_name or name.startswith(self.logger_name + '.')
+
+    def matches(self, entry):
+        entry_time, level, name, text = entry
+        if entry_time is None:
+            if self.structured:
+                return False
+        else:
+            if self.level is not None and LOG_LEVELS.get(level, 0) < self.level:
+                return False
+            if self.logger_name is not None and not self.match_logger(name):
+                return False
+            if self.start is not None and entry_time < self.start:
+                return False
+            if self.end is not None and entry_time > self.end:
+                return False
+        return self.search is None or self.search in text
+
+    def matches_chunk(self, chunk, loggers):
+        """Return whether a chunk of a LogIndex can contain matching entries."""
+        _, _, first_time, last_time, levels, logger_ids = chunk
+        if self.level is not None and not any(LOG_LEVELS.get(each, 0) >= self.level for each in levels):
+            return False
+        if self.logger_name is not None and not any(
+                self.match_logger(loggers[each_id]) for each_id in logger_ids):
+            return False
+        if first_time is not None:
+            if self.start is not None and last_time < self.start:
+                return False
+            if self.end is not None and first_time > self.end:
+                return False
+        return True
+
+
+class LogIndex:
+    """
+    Index of the entries of a log file, in chunks of about chunk_bytes
+
+    Each chunk starts with an entry and records its offset, end, the times
+    of its first and last entries, and the levels and loggers of its
+    entries. Entries added to the log are indexed when update() is called,
+    except for the last chunk, which isn't complete until a chunk_bytes
+    more have been written. The index is saved as JSON, and belongs to the
+    inode of the file, so it still applies after the file is rotated
+    (renamed). It's rebuilt if the file was truncated or replaced.
+    """
+    def __init__(self, path, index_file, pattern=DAEMON_LOG_PATTERN, chunk_bytes=LOG_INDEX_CHUNK_BYTES):
+        self.path = path
+        self.index_file = index_file
+        self.pattern = pattern
+        self.chunk_bytes = chunk_bytes
+        self.lock = threading.Lock()
+        self.inode = None
+        self.end = 0
+        self.chunks = []
+        self.loggers = []
+        self.logger_ids = {}
+        self.load()
+
+    def reset(self, inode):
+        self.inode = inode
+        self.end = 0
+        self.chunks = []
+        self.loggers = []
+        self.logger_ids = {}
+
+    def load(self):
+        try:
+            with open(self.index_file) as index_file:
+                index = json.load(index_file)
+            if index['version'] != INDEX_VERSION or index['chunk_bytes'] != self.chunk_bytes:
+                return
+            self.inode = index['inode']
+            self.end = index['end']
+            self.chunks = index['chunks']
+            self.loggers = index['loggers']
+            self.logger_ids = {name: each_id for each_id, name in enumerate(self.loggers)}
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.exception(f"Loading log index {self.index_file}")
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            path_tmp = f'{self.index_file}.tmp'
+            with open(path_tmp, 'w') as index_file:
+                json.dump({
+                    'version': INDEX_VERSION,
+                    'chunk_bytes': self.chunk_bytes,
+                    'inode': self.inode,
+                    'end': self.end,
+                    'chunks': self.chunks,
+                    'loggers': self.loggers
+                }, index_file)
+            os.replace(path_tmp, self.index_file)
+        except Exception as err:
+            logger.error(f"Could not save log index {self.index_file}: {err}")
+
+    def valid(self, log_file, stat):
+        """Return whether the index is of this file, as it was when indexed."""
+        if self.inode != stat.st_ino or stat.st_size < self.end:
+            return False
+        if self.end:
+            # The end of the index must still be the start of an entry
+            log_file.seek(self.end)
+            return self.pattern.match(log_file.read(1024)) is not None
+        return True
+
+    def add_chunk(self, offset, end, matches):
+        levels = set()
+        logger_ids = set()
+        for each_match in matches:
+            levels.add(each_match.group(2).decode())
+            name = each_match.group(3).decode()
+            if name not in self.logger_ids:
+                self.logger_ids[name] = len(self.loggers)
+                self.loggers.append(name)
+            logger_ids.add(self.logger_ids[name])
+        self.chunks.append([
+            offset,
+            end,
+            parse_log_time(matches[0].group(1)) if matches else None,
+            parse_log_time(matches[-1].group(1)) if matches else None,
+            sorted(levels),
+            sorted(logger_ids)
+        ])
+
+    def update(self, log_file, stat):
+        """Index the complete chunks added to the open log file since the last update."""
+        with self.lock:
+            if not self.valid(log_file, stat):
+                self.reset(stat.st_ino)
+            count_chunks = len(self.chunks)
+
+            offset = self.end
+            log_file.seek(offset)
+            data = log_file.read(self.chunk_bytes)
+            while len(data) >= self.chunk_bytes:
+                matches = list(self.pattern.finditer(data))
+                starts = [each_match.start() for each_match in matches if each_match.start()]
+                if not starts:
+                    # An entry longer than a chunk
+                    more = log_file.read(self.chunk_bytes)
+                    if not more:
+                        break
+                    data += more
+                    continue
+                boundary = starts[-1]
+                self.add_chunk(
+                    offset, offset + boundary,
+                    [each_match for each_match in matches if each_match.start() < boundary])
+                offset += boundary
+                data = data[boundary:]
+                data += log_file.read(max(0, self.chunk_bytes - len(data)))
+            self.end = offset
+
+            if len(self.chunks) != count_chunks:
+                self.save()
+            return list(self.chunks), list(self.loggers), self.end
+
+
+log_indexes = {}
+log_indexes_lock = threading.Lock()
+
+
+class LogReader:
+    """
+    Read the newest entries of a log and the file it was last rotated to
+
+    The files are read backwards, so only as much of them is read as is
+    needed for the requested number of entries. If the log has a pattern
+    (the daemon log), it's indexed with a LogIndex, and only the chunks
+    that can contain entries matching the filter are read, so finding
+    the entries of a logger, level, or time range doesn't require reading
+    the whole log.
+
+    :param path: path of the log
+    :param pattern: compiled pattern matching the start of an entry (see
+        parse_entries()), or None if each line is an entry
+    :param index_path: directory of the index files
+    """
+    def __init__(self, path, pattern=DAEMON_LOG_PATTERN, index_path=PATH_LOG_INDEX,
+                 chunk_bytes=LOG_INDEX_CHUNK_BYTES):
+        self.path = path
+        self.pattern = pattern
+        self.index_path = index_path
+        self.chunk_bytes = chunk_bytes
+
+    @property
+    def paths(self):
+        """The current and rotated log files, newest first."""
+        return [each_path for each_path in [self.path, f'{self.path}.1'] if os.path.isfile(each_path)]
+
+    def index(self, inode):
+        index_file = os.path.join(self.index_path, f'{os.path.basename(self.path)}.{inode}.json')
+        with log_indexes_lock:
+            if index_file not in log_indexes:
+                log_indexes[index_file] = LogIndex(
+                    self.path, index_file, pattern=self.pattern, chunk_bytes=self.chunk_bytes)
+            return log_indexes[index_file]
+
+    def remove_stale_indexes(self, inodes):
+        """Remove the index files of rotated logs that have since been removed."""
+        pattern = os.path.join(glob.escape(self.index_path), f'{glob.escape(os.path.basename(self.path))}.*.json')
+        for each_file in glob.glob(pattern):
+            inode = each_file[:-len('.json')].rsplit('.', 1)[-1]
+            if inode.isdigit() and int(inode) not in inodes:
+                try:
+                    os.remove(each_file)
+                except OSError:
+                    pass
+                with log_indexes_lock:
+                    log_indexes.pop(each_file, None)
+
+    def regions(self, log_file, stat, log_filter):
+        """Yield parts of the open log file that can contain matching entries, newest first."""
+        if self.pattern is None:
+            yield from self.blocks_reverse(log_file, stat.st_size)
+            return
+
+        chunks, loggers, end = self.index(stat.st_ino).update(log_file, stat)
+        if end < stat.st_size:
+            log_file.seek(end)
+            yield log_file.read(stat.st_size - end)
+        for offset, chunk_end, first_time, last_time, levels, logger_ids in reversed(chunks):
+            if (log_filter.start is not None and last_time is not None and
+                    last_time < log_filter.start):
+                return
+            if log_filter.matches_chunk((offset, chunk_end, first_time, last_time, levels, logger_ids), loggers):
+                log_file.seek(offset)
+                yield log_file.read(chunk_end - offset)
+
+    def blocks_reverse(self, log_file, size):
+        """Yield blocks of whole lines of the open log file, from the end."""
+        position = size
+        remainder = b''
+        while position > 0:
+            step = min(self.chunk_bytes, position)
+            position -= step
+            log_file.seek(position)
+            data = log_file.read(step) + remainder
+            if position > 0:
+                # The first line may continue in the previous block
+                newline = data.find(b'\n')
+                if newline == -1:
+                    remainder = data
+                    continue
+                remainder = data[:newline]
+                data = data[newline + 1:]
+            yield data
+
+    def read(self, count=30, log_filter=None):
+        """
+        Return the newest entries matching a filter
+
+        :param count: maximum number of entries
+        :param log_filter: LogFilter, or None for all entries
+        :return: text of the entries, oldest first
+        :rtype: str
+        """
+        log_filter = log_filter or LogFilter()
+        found = []
+        inodes = set()
+        for each_path in self.paths:
+            try:
+                log_file = open(each_path, 'rb')
+            except OSError:
+                continue
+            with log_file:
+                stat = os.fstat(log_file.fileno())
+                inodes.add(stat.st_ino)
+                for data in self.regions(log_file, stat, log_filter):
+                    if log_filter.search is not None and log_filter.search not in data:
+                        continue
+                    for entry in reversed(parse_entries(data, self.pattern)):
+                        if log_filter.matches(entry):
+                            found.append(entry[3])
+                            if len(found) >= count:
+                                return self.join(found)
+                        elif (log_filter.start is not None and entry[0] is not None and
+                                entry[0] < log_filter.start):
+                            return self.join(found)
+        if self.pattern is not None:
+            self.remove_stale_indexes(inodes)
+        return self.join(found)
+
+    @staticmethod
+    def join(entries):
+        return b'\n'.join(reversed(entries)).decode('latin-1')
+
+
+class LogFollower:
+    """
+    Return the entries added to a log since they were last read
+
+    The position is the inode and offset of the file, so a follower can
+    be continued from a position it returned (e.g. by a reconnecting
+    browser). If the log was rotated, the rest of the rotated file is read
+    before the new log.
+
+    :param path: path of the log
+    :param pattern: see LogReader
+    :param log_filter: LogFilter of the entries to return
+    :param position: position returned by position(), or None to start at the end of the log
+    """
+    def __init__(self, path, pattern=DAEMON_LOG_PATTERN, log_filter=None, position=None):
+        self.path = path
+        self.pattern = pattern
+        self.log_filter = log_filter or LogFilter()
+        self.last_matched = False
+        self.inode = None
+        self.offset = 0
+        try:
+            inode, offset = (int(each) for each in position.split(':'))
+            self.inode, self.offset = inode, offset
+        except (AttributeError, ValueError):
+            try:
+                stat = os.stat(self.path)
+                self.inode, self.offset = stat.st_ino, stat.st_size
+            except OSError:
+                pass
+
+    def position(self):
+        return f'{self.inode}:{self.offset}'
+
+    def read_file(self, path):
+        """Read the whole lines after the offset of the followed file."""
+        with open(path, 'rb') as log_file:
+            log_file.seek(self.offset)
+            data = log_file.read(FOLLOW_READ_MAX)
+        newline = data.rfind(b'\n')
+        if newline == -1:
+            return b''
+        data = data[:newline + 1]
+        self.offset += len(data)
+        return data
+
+    def read(self):
+        """
+        Return the entries matching the filter added since the last read
+
+        :return: text of the entries, oldest first
+        :rtype: str
+        """
+        data = b''
+        try:
+            stat = os.stat(self.path)
+            if stat.st_ino != self.inode:
+                rotated_path = f'{self.path}.1'
+                if os.path.isfile(rotated_path) and os.stat(rotated_path).st_ino == self.inode:
+                    data = self.read_file(rotated_path)
+                if not data:
+                    self.inode, self.offset = stat.st_ino, 0
+            elif stat.st_size < self.offset:
+                self.offset = 0  # Truncated
+            if not data and stat.st_size > self.offset:
+                data = self.read_file(self.path)
+        except OSError:
+            return ''
+
+        found = []
+        for entry in parse_entries(data, self.pattern):
+            if entry[0] is None and self.pattern is not None:
+                # Lines continuing the last entry read
+                matched = self.last_matched
+            else:
+                matched = self.log_filter.matches(entry)
+                self.last_matched = matched
+            if matched:
+                found.append(entry[3])
+        return b'\n'.join(found).decode('latin-1')
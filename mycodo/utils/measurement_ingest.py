@@ -0,0 +1,248 @@
+# coding=utf-8
+import datetime
+import json
+import logging
+import math
+import re
+import threading
+import time
+
+from mycodo.config import INGEST_UNITS_REFRESH_SEC
+from mycodo.databases.models import Unit
+from mycodo.utils.system_pi import add_custom_units
+
+logger = logging.getLogger("mycodo.measurement_ingest")
+
+# Formats accepted by parse_measurements()
+INGEST_FORMATS = ['json', 'ndjson', 'line']
+
+# Multipliers to convert line protocol timestamps to nanoseconds
+LINE_PRECISION_NS = {
+    'ns': 1,
+    'us': 1000,
+    'ms': 1000000,
+    's': 1000000000
+}
+
+# Separators of line protocol, unless escaped with a backslash
+RE_LINE_UNESCAPED_COMMA = re.compile(r'(?<!\\),')
+RE_LINE_UNESCAPED_EQUALS = re.compile(r'(?<!\\)=')
+RE_LINE_UNESCAPED_SPACE = re.compile(r'(?<!\\) ')
+RE_LINE_ESCAPE = re.compile(r'\\([,= "\\])')
+
+
+class UnitSet:
+    """
+    Set of valid unit IDs, including custom units (used by the frontend)
+
+    The set is reloaded every refresh_sec seconds, and when a unit isn't
+    found (at most once per second), so units added since the set was
+    loaded are accepted without querying the units table for every point.
+    """
+    def __init__(self, refresh_sec=INGEST_UNITS_REFRESH_SEC):
+        self.refresh_sec = refresh_sec
+        self.lock = threading.Lock()
+        self.units = frozenset()
+        self.time_loaded = 0
+
+    def load(self):
+        self.units = frozenset(add_custom_units(Unit.query.all()))
+        self.time_loaded = time.time()
+
+    def __contains__(self, unit):
+        with self.lock:
+            age = time.time() - self.time_loaded
+            if age > self.refresh_sec or (unit not in self.units and age > 1):
+                self.load()
+            return unit in self.units
+
+
+unit_set = UnitSet()
+
+
+def timestamp_to_ns(timestamp):
+    """
+    Convert a timestamp to epoch nanoseconds
+
+    :param timestamp: epoch seconds (int or float) or RFC3339 string (e.g. 2019-04-15T18:07:00.392Z)
+    :rtype: int
+    """
+    if isinstance(timestamp, bool):
+        raise ValueError("timestamp must be epoch seconds or an RFC3339 string")
+    if isinstance(timestamp, (int, float)):
+        if not math.isfinite(timestamp):
+            raise ValueError("timestamp must be finite")
+        return int(round(timestamp * 1e6)) * 1000
+    if isinstance(timestamp, str):
+        from dateutil import parser
+        date_time = parser.isoparse(timestamp)
+        if date_time.tzinfo is None:
+            date_time = date_time.replace(tzinfo=datetime.timezone.utc)
+        delta = date_time - datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        return (delta.days * 86400 + delta.seconds) * 1000000000 + delta.microseconds * 1000
+    raise ValueError("timestamp must be epoch seconds or an RFC3339 string")
+
+
+def parse_json_measurements(text):
+    """Parse a JSON list of measurement objects, or an object with the list as "measurements"."""
+    data = json.loads(text)
+    if isinstance(data, dict) and 'measurements' in data:
+        data = data['measurements']
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of measurements or {"measurements": [...]}')
+    return data
+
+
+def parse_ndjson_measurements(text):
+    """Parse newline-delimited JSON measurement objects. Lines that aren't valid JSON are returned as errors."""
+    measurements = []
+    for each_line in text.splitlines():
+        if not each_line.strip():
+            continue
+        try:
+            measurements.append(json.loads(each_line))
+        except ValueError as err:
+            measurements.append(ValueError(f"Invalid JSON: {err}"))
+    return measurements
+
+
+def parse_line(line, precision_ns=1):
+    """
+    Parse a line of line protocol into a measurement dictionary
+
+    The measurement name is the unit, the device_id, channel, and measure
+    tags are the unique ID, channel, and measurement, and the field
+    "value" is the value (e.g. "C,device_id=abc,channel=0 value=23.5 1555351620392000000").
+    """
+    parts = RE_LINE_UNESCAPED_SPACE.split(line.strip())
+    if len(parts) not in [2, 3]:
+        raise ValueError("Expected <unit>,<tags> <fields> [timestamp]")
+
+    series = RE_LINE_UNESCAPED_COMMA.split(parts[0])
+    measurement = {'unit': RE_LINE_ESCAPE.sub(r'\1', series[0])}
+    for each_tag in series[1:]:
+        key_value = RE_LINE_UNESCAPED_EQUALS.split(each_tag, maxsplit=1)
+        if len(key_value) != 2:
+            raise ValueError(f"Invalid tag: {each_tag}")
+        key, value = (RE_LINE_ESCAPE.sub(r'\1', each_part) for each_part in key_value)
+        measurement['unique_id' if key == 'device_id' else key] = value
+
+    for each_field in RE_LINE_UNESCAPED_COMMA.split(parts[1]):
+        key_value = RE_LINE_UNESCAPED_EQUALS.split(each_field, maxsplit=1)
+        if len(key_value) == 2 and key_value[0] == 'value':
+            measurement['value'] = key_value[1].rstrip('i')
+
+    if len(parts) == 3:
+        measurement['timestamp_ns'] = int(parts[2]) * precision_ns
+    return measurement
+
+
+def parse_line_protocol_measurements(text, precision='ns'):
+    """Parse InfluxDB line protocol. Lines that can't be parsed are returned as errors."""
+    if precision not in LINE_PRECISION_NS:
+        raise ValueError(f"precision must be one of {', '.join(LINE_PRECISION_NS)}")
+    measurements = []
+    for each_line in text.splitlines():
+        if not each_line.strip() or each_line.lstrip().startswith('#'):
+            continue
+        try:
+            measurements.append(parse_line(each_line, precision_ns=LINE_PRECISION_NS[precision]))
+        except ValueError as err:
+            measurements.append(err)
+    return measurements
+
+
+def parse_measurements(text, data_format, precision='ns'):
+    """
+    Parse a request body into a list of measurement dictionaries
+
+    :param text: request body
+    :param data_format: 'json', 'ndjson', or 'line'
+    :param precision: precision of line protocol timestamps ('ns', 'us', 'ms', or 's')
+    :return: list of measurement dictionaries, with exceptions in place of entries that couldn't be parsed
+    :rtype: list
+    """
+    if data_format == 'json':
+        return parse_json_measurements(text)
+    elif data_format == 'ndjson':
+        return parse_ndjson_measurements(text)
+    elif data_format == 'line':
+        return parse_line_protocol_measurements(text, precision=precision)
+    raise ValueError(f"format must be one of {', '.join(INGEST_FORMATS)}")
+
+
+def validate_measurement(measurement, units=unit_set):
+    """
+    Validate a measurement and convert it to the arguments of create_point()
+
+    :param measurement: dictionary with the keys unique_id (or device_id), unit,
+        channel, value, and optionally measure and timestamp
+    :param units: container of valid unit IDs
+    :return: dictionary of unique_id, unit, value, measure, channel, timestamp (epoch nanoseconds or None)
+    :rtype: dict
+    """
+    if isinstance(measurement, Exception):
+        raise measurement
+    if not isinstance(measurement, dict):
+        raise ValueError("Measurement must be an object")
+
+    unique_id = measurement.get('unique_id', measurement.get('device_id'))
+    if not unique_id or not isinstance(unique_id, str):
+        raise ValueError("unique_id must be a non-empty string")
+
+    unit = measurement.get('unit')
+    if not isinstance(unit, str) or unit not in units:
+        raise ValueError("Unit ID not found")
+
+    try:
+        channel = int(measurement.get('channel'))
+    except (TypeError, ValueError):
+        raise ValueError("channel must be an integer")
+    if channel < 0:
+        raise ValueError("channel must be >= 0")
+
+    try:
+        if isinstance(measurement.get('value'), bool):
+            raise ValueError
+        value = float(measurement.get('value'))
+    except (TypeError, ValueError):
+        raise ValueError("value does not represent a float")
+    if not math.isfinite(value):
+        raise ValueError("value must be finite")
+
+    measure = measurement.get('measure')
+    if measure is not None and not isinstance(measure, str):
+        raise ValueError("measure must be a string")
+
+    if measurement.get('timestamp_ns') is not None:
+        timestamp = int(measurement['timestamp_ns'])
+    elif measurement.get('timestamp') is not None:
+        timestamp = timestamp_to_ns(measurement['timestamp'])
+    else:
+        timestamp = None
+
+    return {
+        'unique_id': unique_id,
+        'unit': unit,
+        'value': value,
+        'measure': measure,
+        'channel': channel,
+        'timestamp': timestamp
+    }
+
+
+def validate_measurements(measurements, units=unit_set):
+    """
+    Validate a list of measurements
+
+    :return: valid measurements, list of (index, error message) of invalid measurements
+    :rtype: tuple
+    """
+    valid = []
+    errors = []
+    for index, each_measurement in enumerate(measurements):
+        try:
+            valid.append(validate_measurement(each_measurement, units=units))
+        except Exception as err:
+            errors.append((index, str(err)))
+    return valid, errors
@@ -0,0 +1,188 @@
+# coding=utf-8
+import array
+import json
+import logging
+import struct
+import sys
+
+logger = logging.getLogger("mycodo.measurement_stream")
+
+# Formats that a series of measurements can be streamed in
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'binary': 'application/octet-stream'
+}
+
+# Aggregate functions that can be applied to each window of a series
+STREAM_AGGREGATE_FUNCTIONS = [
+    'count', 'first', 'last', 'max', 'mean', 'median', 'min', 'spread', 'stddev', 'sum'
+]
+
+# Points encoded together in each chunk (and binary frame) of a stream
+STREAM_CHUNK_POINTS = 1000
+
+# Count of the binary frame that ends a stream with an error
+STREAM_ERROR_FRAME = 0xFFFFFFFF
+
+
+def same_time(time_a, time_b):
+    """Return whether two epoch times are the same microsecond (the resolution of streamed times)."""
+    return round(time_a * 1e6) == round(time_b * 1e6)
+
+
+def skip_received(points, after, skip):
+    """
+    Yield the points, without the first skip points at the time after
+
+    The next page is queried from the time of the last point received
+    (inclusive), since several points may have the same microsecond, so
+    the points at that time that were already received are skipped.
+    """
+    for each_point in points:
+        if skip and same_time(each_point[0], after):
+            skip -= 1
+            continue
+        yield each_point
+
+
+def chunked(points, errors, size=STREAM_CHUNK_POINTS):
+    """
+    Yield lists of up to size points from an iterator of points
+
+    If reading the points fails (e.g. the connection to the measurement
+    database is lost), the error is added to errors and the points read
+    so far are yielded, so the stream can be ended with the error.
+    """
+    chunk = []
+    try:
+        for each_point in points:
+            chunk.append(each_point)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    except Exception as err:
+        logger.exception("Streaming measurements")
+        errors.append(str(err) or err.__class__.__name__)
+    if chunk:
+        yield chunk
+
+
+def stream_json(points, limit=None, after=None, skip=0):
+    """
+    Yield a JSON object of the points, as {"measurements": [{"time": ..., "value": ...}, ...], "next": ...}
+
+    next is the time to request the next page after (the time of the last
+    point), and skip the number of points received at that time, or null
+    and 0 if the number of points is less than limit. If reading the points
+    failed, the object ends with "error" and next is null.
+    """
+    errors = []
+    count = 0
+    last_time = None
+    last_count = 0
+    yield '{"measurements":['
+    for each_chunk in chunked(points, errors):
+        text = json.dumps([{'time': each_time, 'value': each_value}
+                           for each_time, each_value in each_chunk], separators=(',', ':'))[1:-1]
+        yield text if count == 0 else f',{text}'
+        count += len(each_chunk)
+        for each_time, _ in each_chunk:
+            if last_time is not None and same_time(each_time, last_time):
+                last_count += 1
+            else:
+                last_time = each_time
+                last_count = 1
+    if errors:
+        yield f'],"next":null,"skip":0,"error":{json.dumps(errors[0])}}}'
+    elif limit and count >= limit:
+        if after is not None and same_time(last_time, after):
+            last_count += skip  # Every point of the page was at the time of the cursor
+        yield f'],"next":{json.dumps(last_time)},"skip":{last_count}}}'
+    else:
+        yield '],"next":null,"skip":0}'
+
+
+def stream_ndjson(points, **kwargs):
+    """Yield a JSON object of each point, one per line, ending with {"error": ...} if reading the points failed."""
+    errors = []
+    for each_chunk in chunked(points, errors):
+        yield ''.join(f'{{"time":{json.dumps(each_time)},"value":{json.dumps(each_value)}}}\n'
+                      for each_time, each_value in each_chunk)
+    if errors:
+        yield f'{{"error":{json.dumps(errors[0])}}}\n'
+
+
+def stream_csv(points, **kwargs):
+    """Yield CSV rows of time and value, with a header row, ending with error,<message> if reading the points failed."""
+    errors = []
+    yield 'time,value\n'
+    for each_chunk in chunked(points, errors):
+        yield ''.join(f'{each_time!r},{each_value!r}\n' for each_time, each_value in each_chunk)
+    if errors:
+        message = errors[0].replace('"', '""')
+        yield f'error,"{message}"\n'
+
+
+def stream_binary(points, **kwargs):
+    """
+    Yield frames of columnar binary data
+
+    Each frame is the number of points (uint32), followed by the times of
+    the points, in epoch nanoseconds (int64), then their values (float64),
+    all little-endian. The stream ends with a frame of zero points, or if
+    reading the points failed, with a count of STREAM_ERROR_FRAME followed
+    by the length (uint32) of a UTF-8 error message and the message.
+    """
+    errors = []
+    for each_chunk in chunked(points, errors):
+        times = array.array('q', (int(round(each_time * 1e6)) * 1000 for each_time, _ in each_chunk))
+        values = array.array('d', (each_value for _, each_value in each_chunk))
+        if sys.byteorder != 'little':
+            times.byteswap()
+            values.byteswap()
+        yield struct.pack('<I', len(each_chunk)) + times.tobytes() + values.tobytes()
+    if errors:
+        message = errors[0].encode('utf-8')
+        yield struct.pack('<II', STREAM_ERROR_FRAME, len(message)) + message
+    else:
+        yield struct.pack('<I', 0)
+
+
+def read_binary_frames(data):
+    """
+    Decode data from stream_binary()
+
+    :return: list of epoch nanoseconds, list of values
+    :rtype: tuple
+    :raises ValueError: if the stream ended with an error
+    """
+    times = array.array('q')
+    values = array.array('d')
+    offset = 0
+    while offset < len(data):
+        count = struct.unpack_from('<I', data, offset)[0]
+        offset += 4
+        if not count:
+            break
+        if count == STREAM_ERROR_FRAME:
+            length = struct.unpack_from('<I', data, offset)[0]
+            raise ValueError(data[offset + 4:offset + 4 + length].decode('utf-8'))
+        frame_times = array.array('q', data[offset:offset + count * 8])
+        frame_values = array.array('d', data[offset + count * 8:offset + count * 16])
+        if sys.byteorder != 'little':
+            frame_times.byteswap()
+            frame_values.byteswap()
+        times.extend(frame_times)
+        values.extend(frame_values)
+        offset += count * 16
+    return list(times), list(values)
+
+
+STREAM_ENCODERS = {
+    'json': stream_json,
+    'ndjson': stream_ndjson,
+    'csv': stream_csv,
+    'binary': stream_binary
+}
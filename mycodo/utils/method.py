@@ -1,11 +1,15 @@
 # coding=utf-8
+import bisect
+import copy
 import datetime
 import logging
+import threading
 import time
 from math import sin, radians
 
 from mycodo.databases.models import Method
 from mycodo.databases.models import MethodData
+from mycodo.utils.config_cache import config_cache
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.system_pi import get_sec
 
@@ -25,6 +29,10 @@ class AbstractMethod(object):
     value. A trigger can use this as condition or forward into a pwm output. Pid can use these values
     to allow setpoint tracking functionality.
     The config frontend also displays plots of the method. This class also calculates the necessary values.
+
+    The method data is compiled once, by compile(), into immutable tuples that
+    calculate_setpoint() looks up without parsing or querying, so a handler
+    can be cached and shared by the controllers using the method.
     """
 
     def __init__(self, method, method_data, logger=None):
@@ -47,6 +55,12 @@ class AbstractMethod(object):
         self.method_data_first = self.method_data.filter(MethodData.output_id.is_(None)).first()
         self.method_data_repeat = self.method_data.filter(MethodData.duration_sec == 0).first()
 
+        self.compile()
+
+    def compile(self):
+        """Convert the method data into the structures used to calculate setpoints."""
+        pass
+
     def determine_end_time(self, method_start_time):
         """
         Called to determine desired end time of this method
@@ -84,55 +98,81 @@ class DateMethod(AbstractMethod):
         """
         return False
 
+    def compile(self):
+        """
+        Compile the rows into segments of (start, end, setpoint start, setpoint end, start string, end string)
+
+        Start and end are datetimes, of 1900-01-01 if the date is ignored (as
+        strptime() parses times). If no segments overlap, they're sorted by start so
+        the segment of a time can be found by bisection; otherwise they're
+        kept in the order of the rows, which are searched in order.
+        """
+        time_format = '%H:%M:%S' if self.ignore_date() else '%Y-%m-%d %H:%M:%S'
+        segments = []
+        for each_method in self.method_data_all:
+            if each_method.time_start is None or each_method.time_end is None:
+                continue
+            start_time = datetime.datetime.strptime(each_method.time_start, time_format)
+            end_time = datetime.datetime.strptime(each_method.time_end, time_format)
+            if each_method.setpoint_end is not None:
+                setpoint_end = each_method.setpoint_end
+            else:
+                setpoint_end = each_method.setpoint_start
+            segments.append((
+                start_time, end_time,
+                each_method.setpoint_start, setpoint_end,
+                each_method.time_start, each_method.time_end))
+
+        sorted_segments = sorted(segments, key=lambda each_segment: each_segment[0])
+        self.segments_sorted = all(sorted_segments[i][1] <= sorted_segments[i + 1][0]
+                                   for i in range(len(sorted_segments) - 1))
+        self.segments = tuple(sorted_segments if self.segments_sorted else segments)
+        self.segment_starts = tuple(each_segment[0] for each_segment in self.segments)
+
+    def find_segment(self, now):
+        """Return the segment that now is within (exclusive of its start and end), or None."""
+        if self.segments_sorted:
+            index = bisect.bisect_left(self.segment_starts, now) - 1
+            if index >= 0 and now < self.segments[index][1]:
+                return self.segments[index]
+            return None
+        for each_segment in self.segments:
+            if each_segment[0] < now < each_segment[1]:
+                return each_segment
+        return None
+
     def calculate_setpoint(self, now, method_start_time=None):
         # Calculate where the current time/date is within the time/date method
 
         if self.ignore_date():
-            now = datetime.datetime.strptime(str(now.strftime('%H:%M:%S')), '%H:%M:%S')
+            now = datetime.datetime(1900, 1, 1, now.hour, now.minute, now.second)
 
-        for each_method in self.method_data_all:
-            if self.ignore_date():
-                start_time = datetime.datetime.strptime(each_method.time_start, '%H:%M:%S')
-                end_time = datetime.datetime.strptime(each_method.time_end, '%H:%M:%S')
-            else:
-                start_time = datetime.datetime.strptime(each_method.time_start, '%Y-%m-%d %H:%M:%S')
-                end_time = datetime.datetime.strptime(each_method.time_end, '%Y-%m-%d %H:%M:%S')
-
-            if start_time < now < end_time:
-                setpoint_start = each_method.setpoint_start
-                if each_method.setpoint_end is not None:
-                    setpoint_end = each_method.setpoint_end
-                else:
-                    setpoint_end = each_method.setpoint_start
-
-                setpoint_diff = abs(setpoint_end - setpoint_start)
-                total_seconds = (end_time - start_time).total_seconds()
-                part_seconds = (now - start_time).total_seconds()
-                percent_total = part_seconds / total_seconds
-
-                if setpoint_start < setpoint_end:
-                    new_setpoint = setpoint_start + (setpoint_diff * percent_total)
-                else:
-                    new_setpoint = setpoint_start - (setpoint_diff * percent_total)
+        segment = self.find_segment(now)
+        if segment is None:
+            # Setpoint not needing to be calculated, use default setpoint
+            return None, False
 
-                if self.logger:
-                    if self.ignore_date():
-                        self.logger.debug("[Method] Start: {start} End: {end}".format(
-                            start=start_time.strftime('%H:%M:%S'),
-                            end=end_time.strftime('%H:%M:%S')))
-                    else:
-                        self.logger.debug("[Method] Start: {start} End: {end}".format(
-                            start=start_time, end=end_time))
-                    self.logger.debug("[Method] Start: {start} End: {end}".format(
-                        start=setpoint_start, end=setpoint_end))
-                    self.logger.debug("[Method] Total: {tot} Part total: {par} ({per}%)".format(
-                        tot=total_seconds, par=part_seconds, per=percent_total))
-                    self.logger.debug("[Method] New Setpoint: {sp}".format(
-                        sp=new_setpoint))
-                return new_setpoint, False
-
-        # Setpoint not needing to be calculated, use default setpoint
-        return None, False
+        start_time, end_time, setpoint_start, setpoint_end, time_start, time_end = segment
+        setpoint_diff = abs(setpoint_end - setpoint_start)
+        total_seconds = (end_time - start_time).total_seconds()
+        part_seconds = (now - start_time).total_seconds()
+        percent_total = part_seconds / total_seconds
+
+        if setpoint_start < setpoint_end:
+            new_setpoint = setpoint_start + (setpoint_diff * percent_total)
+        else:
+            new_setpoint = setpoint_start - (setpoint_diff * percent_total)
+
+        if self.logger:
+            self.logger.debug("[Method] Start: {start} End: {end}".format(
+                start=time_start, end=time_end))
+            self.logger.debug("[Method] Start: {start} End: {end}".format(
+                start=setpoint_start, end=setpoint_end))
+            self.logger.debug("[Method] Total: {tot} Part total: {par} ({per}%)".format(
+                tot=total_seconds, par=part_seconds, per=percent_total))
+            self.logger.debug("[Method] New Setpoint: {sp}".format(
+                sp=new_setpoint))
+        return new_setpoint, False
 
     def get_plot(self, max_points_x=None):
         result = []
@@ -224,36 +264,47 @@ class DailySineMethod(AbstractDailyFormulaMethod):
     C is the angle shift, and D is the y-axis shift. This method will repeat daily.
     """
 
+    def compile(self):
+        self.params = None
+        if self.method_data_first:
+            self.params = (self.method_data_first.amplitude,
+                           self.method_data_first.frequency,
+                           self.method_data_first.shift_angle,
+                           self.method_data_first.shift_y)
+
     def calculate_setpoint(self, now, method_start_time=None):
         # Calculate sine y-axis value from the x-axis (seconds of the day)
+        if self.params is None:
+            return None, False
         dt = datetime.timedelta(hours=now.hour,
                                 minutes=now.minute,
                                 seconds=now.second)
         secs_per_day = 24 * 60 * 60
         angle = dt.total_seconds() / secs_per_day * 360
-        new_setpoint = sine_wave_y_out(self.method_data_first.amplitude,
-                                       self.method_data_first.frequency,
-                                       self.method_data_first.shift_angle,
-                                       self.method_data_first.shift_y,
-                                       angle)
+        new_setpoint = sine_wave_y_out(*self.params, angle)
         return new_setpoint, False
 
 
 class DailyBezierMethod(AbstractDailyFormulaMethod):
+    def compile(self):
+        self.params = None
+        if self.method_data_first:
+            self.params = (self.method_data_first.shift_angle,
+                           (self.method_data_first.x0, self.method_data_first.y0),
+                           (self.method_data_first.x1, self.method_data_first.y1),
+                           (self.method_data_first.x2, self.method_data_first.y2),
+                           (self.method_data_first.x3, self.method_data_first.y3))
+
     def calculate_setpoint(self, now, method_start_time=None):
         # Calculate Bezier curve y-axis value from the x-axis (seconds of the day)
+        if self.params is None:
+            return None, False
 
         dt = datetime.timedelta(hours=now.hour,
                                 minutes=now.minute,
                                 seconds=now.second)
 
-        new_setpoint = bezier_curve_y_out(
-            self.method_data_first.shift_angle,
-            (self.method_data_first.x0, self.method_data_first.y0),
-            (self.method_data_first.x1, self.method_data_first.y1),
-            (self.method_data_first.x2, self.method_data_first.y2),
-            (self.method_data_first.x3, self.method_data_first.y3),
-            dt.total_seconds())
+        new_setpoint = bezier_curve_y_out(*self.params, dt.total_seconds())
 
         return new_setpoint, False
 
@@ -265,6 +316,31 @@ class DurationMethod(AbstractMethod):
     24-hour period and this method will repeat daily.
     """
 
+    def compile(self):
+        """
+        Compile the rows into the cumulative end (seconds from the start of the cycle)
+        and the (start, duration, setpoint start, setpoint end) of each row with a duration
+        """
+        ends = []
+        segments = []
+        total_sec = 0
+        self.repeat_sec = None
+        for each_method in self.method_data_all:
+            if each_method.duration_sec == 0 and self.repeat_sec is None:
+                self.repeat_sec = each_method.duration_end or 0
+            if not each_method.duration_sec or each_method.duration_sec < 0:
+                continue
+            if each_method.setpoint_end is not None:
+                setpoint_end = each_method.setpoint_end
+            else:
+                setpoint_end = each_method.setpoint_start
+            segments.append((total_sec, each_method.duration_sec, each_method.setpoint_start, setpoint_end))
+            total_sec += each_method.duration_sec
+            ends.append(total_sec)
+        self.cycle_sec = total_sec
+        self.segment_ends = tuple(ends)
+        self.segments = tuple(segments)
+
     def calculate_setpoint(self, now, method_start_time=None):
         # Calculate the duration in the method based on self.method_start_time
 
@@ -285,54 +361,38 @@ class DurationMethod(AbstractMethod):
                 # still repeated
                 seconds_from_start = seconds_from_start % duration_in_seconds
 
-        total_sec = 0
-        previous_total_sec = 0
-        for each_method in self.method_data_all:
-            total_sec += each_method.duration_sec
-            if previous_total_sec <= seconds_from_start < total_sec:
-                row_since_start_sec = seconds_from_start - previous_total_sec
-                percent_row = row_since_start_sec / each_method.duration_sec
-
-                setpoint_start = each_method.setpoint_start
-                if each_method.setpoint_end is not None:
-                    setpoint_end = each_method.setpoint_end
-                else:
-                    setpoint_end = each_method.setpoint_start
-                setpoint_diff = abs(setpoint_end - setpoint_start)
-                if setpoint_start < setpoint_end:
-                    new_setpoint = setpoint_start + (setpoint_diff * percent_row)
-                else:
-                    new_setpoint = setpoint_start - (setpoint_diff * percent_row)
-
-                if self.logger:
-                    self.logger.debug(
-                        "[Method] {sec_method:.1f}s/{sec_cycle:.1f}s/{sec_row:.1f}s "
-                        "since start of method/cycle/row".format(
-                            sec_method=(now - start_time).total_seconds(),
-                            sec_cycle=seconds_from_start,
-                            sec_row=row_since_start_sec))
-                    self.logger.debug(
-                        "[Method] Percent of row: {per:.2f}, new Setpoint {sp:.2f}".format(
-                            per=percent_row, sp=new_setpoint))
-                return new_setpoint, False
+        # The row with the first end after seconds_from_start
+        index = bisect.bisect_right(self.segment_ends, seconds_from_start)
+        if seconds_from_start < 0 or index == len(self.segments):
+            return self.cycle_sec, False
 
-            previous_total_sec = total_sec
+        previous_total_sec, duration_sec, setpoint_start, setpoint_end = self.segments[index]
+        row_since_start_sec = seconds_from_start - previous_total_sec
+        percent_row = row_since_start_sec / duration_sec
 
-        return previous_total_sec, False
+        setpoint_diff = abs(setpoint_end - setpoint_start)
+        if setpoint_start < setpoint_end:
+            new_setpoint = setpoint_start + (setpoint_diff * percent_row)
+        else:
+            new_setpoint = setpoint_start - (setpoint_diff * percent_row)
+
+        if self.logger:
+            self.logger.debug(
+                "[Method] {sec_method:.1f}s/{sec_cycle:.1f}s/{sec_row:.1f}s "
+                "since start of method/cycle/row".format(
+                    sec_method=(now - start_time).total_seconds(),
+                    sec_cycle=seconds_from_start,
+                    sec_row=row_since_start_sec))
+            self.logger.debug(
+                "[Method] Percent of row: {per:.2f}, new Setpoint {sp:.2f}".format(
+                    per=percent_row, sp=new_setpoint))
+        return new_setpoint, False
 
     def cycle_duration(self):
-        total_sec = 0
-        for each_method in self.method_data_all:
-            total_sec += each_method.duration_sec
-
-        return total_sec
+        return self.cycle_sec
 
     def repeat_duration(self):
-        for each_method in self.method_data_all:
-            if each_method.duration_sec == 0:
-                return each_method.duration_end or 0
-
-        return None
+        return self.repeat_sec
 
     def determine_end_time(self, method_start_time):
         method_start_time = parse_db_time(method_start_time, datetime.datetime.min)
@@ -379,39 +439,62 @@ class DurationMethod(AbstractMethod):
 
 
 class CascadeMethod(AbstractMethod):
+    """
+    A cascade method multiplies the setpoints of its linked methods, as percentages.
+    The methods linked by linked cascade methods are expanded into a single list of
+    methods when the first setpoint is calculated, and reused for later setpoints.
+    """
 
-    def calculate_setpoint(self, now, method_start_time=None, blacklist=None):
-        setpoint = 1.
-        # blacklist is passed into cascaded cascade methods to avoid endless loops
-        if blacklist is None:
-            blacklist = set()
+    def compile(self):
+        self.linked_method_ids = tuple(
+            each_method.linked_method_id for each_method in self.method_data_all)
+        # Shared by the copies of a cached handler (see load_method_handler())
+        self.expanded = {}
 
-        if self.unique_id in blacklist:
-            if self.logger:
-                self.logger.error("Recursive method invocation. Stopping here.")
-                return None, False
+    def expand_linked_methods(self, blacklist=None):
+        """
+        Return the non-cascade methods linked by this method and its linked cascade methods
 
+        :param blacklist: IDs of the cascade methods already expanded, to avoid endless loops
+        :return: list of (linked method ID, method handler)
+        :rtype: list
+        """
+        if blacklist is None:
+            blacklist = set()
         blacklist.add(self.unique_id)
 
-        for each_method in self.method_data_all:
-            if not each_method.linked_method_id:
+        linked_methods = []
+        for each_linked_method_id in self.linked_method_ids:
+            if not each_linked_method_id:
                 if self.logger:
                     self.logger.warning("Method data does not contain linked_method_id")
                 continue
 
-            linked_method = load_method_handler(each_method.linked_method_id, self.logger)
+            linked_method = load_method_handler(each_linked_method_id, self.logger)
 
             if not linked_method:
                 if self.logger:
-                    self.logger.warning("Linked method {} not found".format(each_method.linked_method_id))
+                    self.logger.warning("Linked method {} not found".format(each_linked_method_id))
                 continue
 
             if isinstance(linked_method, CascadeMethod):
-                linked_method_setpoint, linked_method_ended = linked_method.calculate_setpoint(
-                    now, method_start_time, blacklist)
+                if linked_method.unique_id in blacklist:
+                    if self.logger:
+                        self.logger.error("Recursive method invocation. Stopping here.")
+                    continue
+                linked_methods.extend(linked_method.expand_linked_methods(blacklist))
             else:
-                linked_method_setpoint, linked_method_ended = linked_method.calculate_setpoint(
-                    now, method_start_time)
+                linked_methods.append((each_linked_method_id, linked_method))
+        return linked_methods
+
+    def calculate_setpoint(self, now, method_start_time=None):
+        if 'linked_methods' not in self.expanded:
+            self.expanded['linked_methods'] = tuple(self.expand_linked_methods())
+
+        setpoint = 1.
+        for each_linked_method_id, linked_method in self.expanded['linked_methods']:
+            linked_method_setpoint, linked_method_ended = linked_method.calculate_setpoint(
+                now, method_start_time)
 
             if linked_method_setpoint is not None:
                 setpoint *= linked_method_setpoint / 100.
@@ -420,7 +503,7 @@ class CascadeMethod(AbstractMethod):
 
             if self.logger:
                 self.logger.debug("Linked method: {} {} returned {}, {}; current product is {}".format(
-                    each_method.linked_method_id, linked_method.method_name,
+                    each_linked_method_id, linked_method.method_name,
                     linked_method_setpoint, linked_method_ended,
                     setpoint * 100.))
 
@@ -441,18 +524,86 @@ def create_method_handler(method, method_data, logger=None):
     return method_class(method, method_data, logger)
 
 
+class MethodHandlerCache:
+    """
+    Compiled method handlers of the daemon, by method ID
+
+    Handlers are compiled the first time a method is loaded and shared by
+    the controllers using it. The cache is cleared when the frontend
+    changes any method or method data (reported through the config cache),
+    since cascade methods depend on the methods they link.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handlers = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, method_id):
+        with self.lock:
+            handler = self.handlers.get(method_id)
+            if handler is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return handler
+
+    def set(self, method_id, handler):
+        with self.lock:
+            self.handlers[method_id] = handler
+
+    def clear(self, table=None, ids=None):
+        with self.lock:
+            self.handlers.clear()
+
+    def stats(self):
+        return {
+            'methods': len(self.handlers),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+method_handler_cache = MethodHandlerCache()
+config_cache.on_invalidate('method', method_handler_cache.clear)
+config_cache.on_invalidate('method_data', method_handler_cache.clear)
+
+
 def load_method_handler(method_id, logger=None):
     """
     Loads method type and data from database for the given method_id. Then uses method_by_type to create an instance.
+
+    In the daemon, compiled handlers are cached until a method is changed,
+    and a copy of the cached handler is returned if it uses another logger.
     """
+    if not config_cache.enabled:
+        return query_method_handler(method_id, logger)
 
+    handler = method_handler_cache.get(method_id)
+    if handler is None:
+        handler = query_method_handler(method_id, logger)
+        if handler is None:
+            return None
+        method_handler_cache.set(method_id, handler)
+
+    if handler.logger is not logger:
+        handler = copy.copy(handler)
+        handler.logger = logger
+    return handler
+
+
+def query_method_handler(method_id, logger=None):
+    """Load a method and its data from the database and compile its handler."""
     method = db_retrieve_table_daemon(Method).filter(Method.unique_id == method_id).first()
     if not method:
         return None
 
     method_data = db_retrieve_table_daemon(MethodData).filter(MethodData.method_id == method_id)
-
-    return create_method_handler(method, method_data, logger)
+    try:
+        return create_method_handler(method, method_data, logger)
+    finally:
+        # The handler may be cached, so don't keep the session of its rows open
+        method_data.session.close()
 
 
 def sine_wave_y_out(amplitude, frequency, shift_angle,
@@ -1,11 +1,62 @@
 # coding=utf-8
+import ast
+import functools
+import hashlib
 import importlib.util
 import logging
 import os
+import pickle
+import re
+import sys
+import sysconfig
+import threading
 import traceback
+import types
+
+from mycodo.config import PATH_MODULE_REGISTRY
 
 logger = logging.getLogger("mycodo.modules")
 
+# Modules outside the standard library that may be imported when reading a
+# module's information without executing it
+REGISTRY_ALLOWED_IMPORTS = {'flask', 'flask_babel', 'mycodo'}
+
+# Names of the standard library modules (Python 3.10+)
+STDLIB_MODULE_NAMES = getattr(sys, 'stdlib_module_names', None)
+
+# Increment when the format of the module registry file changes
+REGISTRY_VERSION = 1
+
+
+@functools.lru_cache(maxsize=None)
+def is_stdlib_module(name):
+    """Return whether a top-level module is part of the standard library."""
+    if STDLIB_MODULE_NAMES is not None:
+        return name in STDLIB_MODULE_NAMES
+    if name in sys.builtin_module_names:
+        return True
+
+    # Before Python 3.10, find where the module would be imported from
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return False
+    if spec is None or not spec.origin:
+        return False
+    if spec.origin in ('built-in', 'frozen'):
+        return True
+    path_stdlib = os.path.realpath(sysconfig.get_paths()['stdlib'])
+    path_origin = os.path.realpath(spec.origin)
+    return (path_origin.startswith(path_stdlib + os.sep) and
+            not any(each_dir in path_origin.split(os.sep)
+                    for each_dir in ('site-packages', 'dist-packages')))
+
+
+def is_allowed_import(name):
+    """Return whether a module may be imported when reading a module's information."""
+    name = name.split('.')[0]
+    return name in REGISTRY_ALLOWED_IMPORTS or is_stdlib_module(name)
+
 
 def load_module_from_file(path_file, module_type):
     try:
@@ -19,3 +70,306 @@ def load_module_from_file(path_file, module_type):
         logger.error(f"Path: {path_file}, Type: {module_type}")
         logger.error(f"Could not load module: {traceback.format_exc()}")
         return None, traceback.format_exc()
+
+
+class InformationOnlyTransformer(ast.NodeTransformer):
+    """Remove class definitions and imports of third-party (e.g. hardware) libraries from a module."""
+    def visit_ClassDef(self, node):
+        return None
+
+    def visit_FunctionDef(self, node):
+        return node
+
+    def visit_AsyncFunctionDef(self, node):
+        return node
+
+    def visit_Import(self, node):
+        node.names = [each_name for each_name in node.names
+                      if is_allowed_import(each_name.name)]
+        return node if node.names else ast.Pass()
+
+    def visit_ImportFrom(self, node):
+        if node.level or not is_allowed_import(node.module or ''):
+            return ast.Pass()
+        return node
+
+
+def information_repr(information):
+    """Return a representation of module information to compare, without object addresses."""
+    return re.sub(r' at 0x[0-9a-fA-F]+', '', repr(information))
+
+
+def compile_module_information(source, path_file, variable):
+    """
+    Compile the parts of a module needed to read its information variable
+
+    Only the module-level statements are kept, without its classes and
+    imports of libraries outside of the standard library and Mycodo, so
+    hardware libraries aren't imported.
+
+    :return: code object, or None if the module doesn't assign variable
+    """
+    tree = ast.parse(source, path_file)
+    if not any(isinstance(each_node, ast.Assign) and
+               any(isinstance(each_target, ast.Name) and each_target.id == variable
+                   for each_target in each_node.targets)
+               for each_node in tree.body):
+        return None
+
+    tree = ast.fix_missing_locations(InformationOnlyTransformer().visit(tree))
+    return compile(tree, path_file, 'exec')
+
+
+def exec_module_information(code, path_file, variable):
+    """Return the value of variable after executing code from compile_module_information()."""
+    if code is None:
+        return None
+    namespace = {'__name__': 'mycodo_module_information', '__file__': path_file}
+    exec(code, namespace)
+    return namespace[variable]
+
+
+class ModuleRegistry:
+    """
+    Cache of the information dictionaries of Input, Output, Function, Action, and Widget modules
+
+    Information is read from each module file once and stored in a pickle
+    file, keyed by file path and validated by modification time, size, and
+    SHA-1 hash of the file, so the modules don't need to be executed again
+    by later calls or processes. Information that refers to functions
+    defined in the module itself can't be stored, so those modules are
+    loaded normally and their information is only kept in memory.
+    Information that changes every time the module is executed (e.g. a
+    randomly generated default value) is read again on every call.
+    """
+    def __init__(self, path=PATH_MODULE_REGISTRY):
+        self.path = path
+        self.lock = threading.RLock()
+        self.entries = None
+        self.modified = False
+        self.parsed = {}
+        self.code = {}
+        self.volatile_read = set()
+
+        self.files_read = 0
+        self.files_loaded = 0
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(self.path, 'rb') as registry_file:
+                registry = pickle.load(registry_file)
+            if registry.get('version') == REGISTRY_VERSION:
+                self.entries = registry['entries']
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.exception(f"Could not read module registry {self.path}. Rebuilding.")
+
+    def save(self):
+        """Write the stored information to the registry file, if it changed."""
+        with self.lock:
+            if not self.modified:
+                return
+            entries = {}
+            for path_file, entry in self.entries.items():
+                entries[path_file] = dict(entry)
+                if not entry['stored'] or entry['volatile']:
+                    entries[path_file]['information'] = None
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                path_tmp = f'{self.path}.{os.getpid()}.tmp'
+                with open(path_tmp, 'wb') as registry_file:
+                    pickle.dump({'version': REGISTRY_VERSION, 'entries': entries},
+                                registry_file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(path_tmp, self.path)
+                self.modified = False
+            except Exception as err:
+                logger.error(f"Could not write module registry {self.path}: {err}")
+
+    def _entry_information(self, entry, path_file, module_type):
+        if entry['volatile']:
+            self.volatile_read.add(path_file)
+            if path_file not in self.code:
+                with open(path_file, 'rb') as module_file:
+                    self.code[path_file] = compile_module_information(
+                        module_file.read(), path_file, entry['variable'])
+            return exec_module_information(self.code[path_file], path_file, entry['variable'])
+        if entry['information'] is None and not entry['stored']:
+            # Stored by another process, without the information
+            module_custom, status = load_module_from_file(path_file, module_type)
+            entry['information'] = getattr(module_custom, entry['variable'], None)
+            self.files_loaded += 1
+        return entry['information']
+
+    def information(self, path_file, module_type, variable):
+        """
+        Return the information dictionary assigned to variable in a module file
+
+        :param path_file: path to the module file
+        :param module_type: 'inputs', 'outputs', 'functions', 'actions', or 'widgets'
+        :param variable: name of the information dictionary (e.g. 'INPUT_INFORMATION')
+        :return: information dictionary, or None if the module doesn't have one
+        """
+        try:
+            stat = os.stat(path_file)
+        except OSError:
+            return None
+
+        with self.lock:
+            self._load()
+            entry = self.entries.get(path_file)
+            if (entry and entry['variable'] == variable and
+                    entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size):
+                return self._entry_information(entry, path_file, module_type)
+
+            with open(path_file, 'rb') as module_file:
+                source = module_file.read()
+            sha1 = hashlib.sha1(source).hexdigest()
+
+            if entry and entry['variable'] == variable and entry['sha1'] == sha1:
+                # Modification time changed, but the content is the same
+                entry['mtime_ns'] = stat.st_mtime_ns
+                self.modified = True
+                return self._entry_information(entry, path_file, module_type)
+
+            entry = {
+                'variable': variable,
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'sha1': sha1,
+                'information': None,
+                'stored': True,
+                'volatile': False
+            }
+            try:
+                code = compile_module_information(source, path_file, variable)
+                entry['information'] = exec_module_information(code, path_file, variable)
+                if information_repr(entry['information']) != information_repr(
+                        exec_module_information(code, path_file, variable)):
+                    # Information is generated when the module is loaded (e.g. random default values)
+                    entry['volatile'] = True
+                    self.code[path_file] = code
+                else:
+                    pickle.dumps(entry['information'])
+                self.files_read += 1
+            except Exception as err:
+                logger.debug(f"Loading {path_file} to read {variable}: {err}")
+                entry['stored'] = False
+
+            if not entry['stored']:
+                module_custom, status = load_module_from_file(path_file, module_type)
+                entry['information'] = getattr(module_custom, variable, None)
+                self.files_loaded += 1
+
+            self.entries[path_file] = entry
+            self.modified = True
+            if entry['volatile']:
+                self.volatile_read.add(path_file)
+            return entry['information']
+
+    def clear(self):
+        """Forget all stored information and parsed results."""
+        with self.lock:
+            self.entries = {}
+            self.parsed.clear()
+            self.code.clear()
+            self.modified = True
+
+    def refresh_volatile(self, parsed, paths):
+        """
+        Return a copy of a parse_*_information() result with the entries of
+        volatile modules built from newly generated information
+        """
+        parsed = dict(parsed)
+        for name_unique, each_entry in list(parsed.items()):
+            path_file = each_entry.get('file_path')
+            if path_file not in paths or path_file not in self.entries:
+                continue
+            entry = self.entries[path_file]
+            information = self._entry_information(entry, path_file, None)
+            refreshed = {}
+            for key, value in each_entry.items():
+                if key in information and key != 'file_path':
+                    new_value = information[key]
+                    if isinstance(value, list) and not isinstance(new_value, list):
+                        new_value = [new_value]
+                    refreshed[key] = new_value
+                else:
+                    refreshed[key] = value
+            parsed[name_unique] = refreshed
+        return parsed
+
+    def stats(self):
+        with self.lock:
+            self._load()
+            return {
+                'files': len(self.entries),
+                'files_read': self.files_read,
+                'files_loaded': self.files_loaded
+            }
+
+
+module_registry = ModuleRegistry()
+
+
+def load_module_information(path_file, module_type, variable):
+    """
+    Return an object with the information dictionary of a module file as its only attribute
+
+    This is used in place of load_module_from_file() where only the
+    information dictionary is needed, and is served from the module registry.
+
+    :return: module information object (or None), status
+    """
+    if not path_file.endswith('.py'):
+        return None, "not a module"
+    try:
+        information = module_registry.information(path_file, module_type, variable)
+    except Exception:
+        logger.error(f"Could not read module information: {traceback.format_exc()}")
+        return None, traceback.format_exc()
+    if information is None:
+        return None, "no information"
+    return types.SimpleNamespace(**{variable: information}), "success"
+
+
+def directories_signature(paths):
+    signature = []
+    for each_path in paths:
+        try:
+            signature.append((each_path, os.stat(os.path.realpath(each_path)).st_mtime_ns))
+        except OSError:
+            signature.append((each_path, None))
+    return tuple(signature)
+
+
+def module_registry_cached(path, path_custom):
+    """
+    Decorator to reuse the result of a parse_*_information() function
+
+    The result is reused until a file is added to, removed from, or replaced
+    in one of the module directories, and must not be modified by callers.
+    Entries of modules with volatile information are rebuilt on every call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(exclude_custom=False):
+            paths = [path] if exclude_custom else [path, path_custom]
+            signature = directories_signature(paths)
+            key = (func.__name__, exclude_custom)
+            with module_registry.lock:
+                if key in module_registry.parsed and module_registry.parsed[key][0] == signature:
+                    signature, result, volatile_paths = module_registry.parsed[key]
+                    if volatile_paths:
+                        result = module_registry.refresh_volatile(result, volatile_paths)
+                    return result
+                module_registry.volatile_read = set()
+                result = func(exclude_custom=exclude_custom)
+                module_registry.parsed[key] = (signature, result, module_registry.volatile_read)
+                module_registry.save()
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,275 @@
+# coding=utf-8
+import logging
+import threading
+import time
+
+from mycodo.config import (MQTT_PUBLISH_CONNECT_TIMEOUT,
+                           MQTT_PUBLISH_IDLE_SEC, MQTT_PUBLISH_QUEUE_MAX,
+                           MQTT_RECONNECT_DELAY_MAX, MQTT_RECONNECT_DELAY_MIN)
+
+logger = logging.getLogger("mycodo.mqtt_publish")
+
+
+def mqtt_client(client_id='', transport='tcp'):
+    """Return a new paho MQTT client."""
+    import paho.mqtt.client as mqtt
+    if hasattr(mqtt, 'CallbackAPIVersion'):  # paho-mqtt >= 2.0
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id, transport=transport)
+    return mqtt.Client(client_id=client_id, transport=transport)
+
+
+class MQTTConnection:
+    """
+    Persistent connection to an MQTT server
+
+    The client runs its network loop in its own thread, which reconnects
+    with a backoff if the connection is lost. Messages are handed to the
+    loop without waiting for them to be sent, so messages published in
+    quick succession are written together. Messages with QoS 1 or 2 that
+    are published while disconnected are queued and sent when reconnected.
+    """
+    def __init__(self, hostname, port, client_id, keepalive=60, auth=None,
+                 transport='tcp', client_factory=mqtt_client):
+        self.hostname = hostname
+        self.port = port
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.auth = auth
+        self.transport = transport
+        self.client_factory = client_factory
+        self.client = None
+        self.connected = threading.Event()
+        self.lock = threading.Lock()
+
+        self.time_started = None
+        self.last_used = time.monotonic()
+        self.users = 0  # Threads publishing with the connection, counted by MQTTPublisher
+        self.connects = 0
+        self.sent = 0
+        self.acknowledged = 0
+        self.failed = 0
+
+    def start(self):
+        self.client = self.client_factory(client_id=self.client_id, transport=self.transport)
+        if self.auth:
+            self.client.username_pw_set(self.auth.get('username'), self.auth.get('password'))
+        self.client.reconnect_delay_set(
+            min_delay=MQTT_RECONNECT_DELAY_MIN, max_delay=MQTT_RECONNECT_DELAY_MAX)
+        self.client.max_queued_messages_set(MQTT_PUBLISH_QUEUE_MAX)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_publish = self.on_publish
+        self.time_started = time.monotonic()
+        self.client.connect_async(self.hostname, port=self.port, keepalive=self.keepalive)
+        self.client.loop_start()
+
+    def stop(self):
+        if self.client is None:
+            return
+        try:
+            self.client.disconnect()
+            self.client.loop_stop()
+        except Exception:
+            logger.exception(f"Disconnecting from {self.hostname}:{self.port}")
+        self.connected.clear()
+
+    def on_connect(self, client, userdata, flags, rc, *args):
+        if rc == 0:
+            self.connects += 1
+            if self.connects > 1:
+                logger.info(f"Reconnected to {self.hostname}:{self.port} as '{self.client_id}'")
+            self.connected.set()
+        else:
+            logger.error(f"Could not connect to {self.hostname}:{self.port} as '{self.client_id}': {rc}")
+
+    def on_disconnect(self, client, userdata, *args):
+        if self.connected.is_set():
+            logger.debug(f"Disconnected from {self.hostname}:{self.port}")
+        self.connected.clear()
+
+    def on_publish(self, client, userdata, mid, *args):
+        with self.lock:
+            self.acknowledged += 1
+
+    def publish(self, msgs):
+        """
+        Publish messages
+
+        :param msgs: list of dicts with the keys topic, and optionally payload, qos, and retain
+        :return: the paho MQTTMessageInfo of each message
+        :rtype: list
+        """
+        import paho.mqtt.client as mqtt
+
+        self.last_used = time.monotonic()
+
+        # Wait for the first connection to complete, but not for reconnects
+        wait_sec = self.time_started + MQTT_PUBLISH_CONNECT_TIMEOUT - time.monotonic()
+        if not self.connected.is_set() and wait_sec > 0:
+            self.connected.wait(wait_sec)
+
+        infos = []
+        for each_msg in msgs:
+            qos = each_msg.get('qos', 0)
+            info = self.client.publish(
+                each_msg['topic'], each_msg.get('payload'), qos=qos, retain=each_msg.get('retain', False))
+            queued = qos > 0 and info.rc == mqtt.MQTT_ERR_NO_CONN
+            with self.lock:
+                if info.rc == mqtt.MQTT_ERR_SUCCESS or queued:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+            if info.rc != mqtt.MQTT_ERR_SUCCESS and not queued:
+                raise Exception(
+                    f"Could not publish to {self.hostname}:{self.port}: {mqtt.error_string(info.rc)}")
+            infos.append(info)
+        return infos
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hostname': self.hostname,
+                'port': self.port,
+                'client_id': self.client_id,
+                'transport': self.transport,
+                'connected': self.connected.is_set(),
+                'reconnects': max(0, self.connects - 1),
+                'sent': self.sent,
+                'acknowledged': self.acknowledged,
+                'pending': self.sent - self.acknowledged,
+                'failed': self.failed,
+                'idle_sec': time.monotonic() - self.last_used
+            }
+
+
+class MQTTPublisher:
+    """
+    Pool of MQTT connections, keyed by server, client ID, credentials, transport, and keepalive
+
+    A connection is opened the first time it's published to, and closed by
+    a background thread after it hasn't been used for idle_sec seconds
+    (e.g. after the settings of the Action that used it were changed), unless
+    a thread is publishing with it. A server disconnects clients
+    with the ID of a client that connects, so when a client ID is requested
+    with other settings, the connection with that ID is replaced.
+    """
+    def __init__(self, idle_sec=MQTT_PUBLISH_IDLE_SEC, client_factory=mqtt_client):
+        self.idle_sec = idle_sec
+        self.client_factory = client_factory
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.idle_thread = None
+        self.stopped = threading.Event()
+
+    def connection(self, hostname, port, client_id, keepalive, auth, transport):
+        """Return the connection to a server, opening it if it isn't open, to be released with release()."""
+        username = password = None
+        if auth:
+            username = auth.get('username')
+            password = auth.get('password')
+        key = (hostname, port, client_id, username, password, transport, keepalive)
+
+        with self.lock:
+            if self.idle_thread is None or not self.idle_thread.is_alive():
+                self.stopped.clear()
+                self.idle_thread = threading.Thread(target=self.run_idle, name='mqtt_publish_idle')
+                self.idle_thread.daemon = True
+                self.idle_thread.start()
+            if key not in self.connections and client_id:
+                for each_key in [each_key for each_key in self.connections
+                                 if each_key[:3] == key[:3]]:
+                    logger.debug(f"Replacing connection to {hostname}:{port} as '{client_id}'")
+                    self.connections.pop(each_key).stop()
+            if key not in self.connections:
+                logger.debug(f"Connecting to {hostname}:{port} as '{client_id}'")
+                connection = MQTTConnection(
+                    hostname, port, client_id, keepalive=keepalive, auth=auth,
+                    transport=transport, client_factory=self.client_factory)
+                connection.start()
+                self.connections[key] = connection
+            self.connections[key].users += 1
+            return self.connections[key]
+
+    def release(self, connection):
+        with self.lock:
+            connection.users -= 1
+            connection.last_used = time.monotonic()
+
+    def run_idle(self):
+        while not self.stopped.wait(min(60, self.idle_sec)):
+            self.close_idle()
+
+    def close_idle(self):
+        """Close connections that haven't been used for idle_sec and aren't being used."""
+        now = time.monotonic()
+        with self.lock:
+            idle = [key for key, each_connection in self.connections.items()
+                    if not each_connection.users and now - each_connection.last_used > self.idle_sec]
+            idle = [self.connections.pop(key) for key in idle]
+        for each_connection in idle:
+            logger.debug(f"Closing idle connection to {each_connection.hostname}:{each_connection.port}")
+            each_connection.stop()
+
+    def publish_multiple(self, msgs, hostname='localhost', port=1883, client_id='',
+                         keepalive=60, auth=None, transport='tcp'):
+        """
+        Publish several messages to a server, with the arguments of paho.mqtt.publish.multiple()
+
+        :return: the paho MQTTMessageInfo of each message
+        :rtype: list
+        """
+        connection = self.connection(hostname, port, client_id, keepalive, auth, transport)
+        try:
+            return connection.publish(msgs)
+        finally:
+            self.release(connection)
+
+    def stop(self):
+        """Close all connections."""
+        self.stopped.set()
+        with self.lock:
+            for each_connection in self.connections.values():
+                each_connection.stop()
+            self.connections = {}
+
+    def stats(self):
+        with self.lock:
+            return [each_connection.stats() for each_connection in self.connections.values()]
+
+
+mqtt_publisher = MQTTPublisher()
+
+
+def mqtt_publish(topic, payload=None, qos=0, retain=False, hostname='localhost', port=1883,
+                 client_id='', keepalive=60, auth=None, transport='tcp'):
+    """
+    Publish a message over a pooled connection, with the arguments of paho.mqtt.publish.single()
+
+    The message is sent in the background, and an exception is raised only
+    if it couldn't be handed to the connection (e.g. the server can't be
+    reached and the message has QoS 0).
+
+    :return: paho MQTTMessageInfo, which may be used to wait for the message to be sent
+    """
+    return mqtt_publisher.publish_multiple(
+        [{'topic': topic, 'payload': payload, 'qos': qos, 'retain': retain}],
+        hostname=hostname, port=port, client_id=client_id, keepalive=keepalive,
+        auth=auth, transport=transport)[0]
+
+
+def mqtt_publish_multiple(msgs, hostname='localhost', port=1883, client_id='',
+                          keepalive=60, auth=None, transport='tcp'):
+    """Publish several messages over a pooled connection, with the arguments of paho.mqtt.publish.multiple()."""
+    return mqtt_publisher.publish_multiple(
+        msgs, hostname=hostname, port=port, client_id=client_id,
+        keepalive=keepalive, auth=auth, transport=transport)
+
+
+def mqtt_publisher_stats():
+    """Return the state and message counters of each pooled MQTT connection."""
+    return mqtt_publisher.stats()
+
+
+def mqtt_publisher_stop():
+    """Close all pooled MQTT connections."""
+    mqtt_publisher.stop()
@@ -0,0 +1,217 @@
+# coding=utf-8
+import logging
+import threading
+
+from mycodo.config import MQTT_RECONNECT_DELAY_MAX, MQTT_RECONNECT_DELAY_MIN
+from mycodo.utils.mqtt_publish import mqtt_client
+from mycodo.utils.mqtt_topics import TopicTrie
+
+logger = logging.getLogger("mycodo.mqtt_subscribe")
+
+
+class MQTTSubscriberConnection:
+    """
+    Connection to an MQTT server shared by all subscribers to it
+
+    Messages are received by the network loop thread of the client and
+    passed to the callback of each subscriber with a matching topic filter.
+    All topic filters are subscribed to again whenever the connection is
+    (re)established.
+    """
+    def __init__(self, hostname, port, client_id, keepalive=60, auth=None,
+                 transport='tcp', tls=False, client_factory=mqtt_client):
+        self.hostname = hostname
+        self.port = port
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.auth = auth
+        self.transport = transport
+        self.tls = tls
+        self.client_factory = client_factory
+        self.client = None
+        self.connected = False
+        self.lock = threading.Lock()
+
+        self.topics = TopicTrie()
+        self.filter_counts = {}
+        self.connects = 0
+        self.messages = 0
+
+    def start(self):
+        self.client = self.client_factory(client_id=self.client_id, transport=self.transport)
+        if self.auth:
+            self.client.username_pw_set(self.auth.get('username'), self.auth.get('password'))
+        if self.tls:
+            self.client.tls_set()
+        self.client.reconnect_delay_set(
+            min_delay=MQTT_RECONNECT_DELAY_MIN, max_delay=MQTT_RECONNECT_DELAY_MAX)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+        self.client.connect_async(self.hostname, port=self.port, keepalive=self.keepalive)
+        self.client.loop_start()
+
+    def stop(self):
+        try:
+            self.client.disconnect()
+            self.client.loop_stop()
+        except Exception:
+            logger.exception(f"Disconnecting from {self.hostname}:{self.port}")
+        self.connected = False
+
+    def on_connect(self, client, userdata, flags, rc, *args):
+        if rc != 0:
+            logger.error(f"Could not connect to {self.hostname}:{self.port} as '{self.client_id}': {rc}")
+            return
+        self.connects += 1
+        logger.info(f"Connected to {self.hostname}:{self.port} as '{self.client_id}'")
+        with self.lock:
+            self.connected = True
+            topic_filters = list(self.filter_counts)
+        if topic_filters:
+            logger.debug(f"Subscribing to MQTT topics {topic_filters}")
+            client.subscribe([(each_filter, 0) for each_filter in topic_filters])
+
+    def on_disconnect(self, client, userdata, *args):
+        if self.connected:
+            logger.info(f"Disconnected from {self.hostname}:{self.port}")
+        self.connected = False
+
+    def on_message(self, client, userdata, msg):
+        self.messages += 1
+        # A subscriber with several filters matching the topic receives the message once
+        for callback in dict.fromkeys(self.topics.match(msg.topic)):
+            try:
+                callback(client, userdata, msg)
+            except Exception:
+                logger.exception(f"Processing message with topic '{msg.topic}'")
+
+    def add(self, topic_filter, callback):
+        """Pass messages matching topic_filter to callback."""
+        with self.lock:
+            self.topics.add(topic_filter, callback)
+            self.filter_counts[topic_filter] = self.filter_counts.get(topic_filter, 0) + 1
+            subscribe = self.connected and self.filter_counts[topic_filter] == 1
+        if subscribe:
+            self.client.subscribe(topic_filter)
+
+    def remove(self, topic_filter, callback):
+        """Stop passing messages matching topic_filter to callback."""
+        with self.lock:
+            if not self.topics.remove(topic_filter, callback):
+                return
+            self.filter_counts[topic_filter] -= 1
+            unsubscribe = not self.filter_counts[topic_filter]
+            if unsubscribe:
+                del self.filter_counts[topic_filter]
+        if unsubscribe and self.connected:
+            self.client.unsubscribe(topic_filter)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hostname': self.hostname,
+                'port': self.port,
+                'client_id': self.client_id,
+                'transport': self.transport,
+                'connected': self.connected,
+                'reconnects': max(0, self.connects - 1),
+                'topic_filters': len(self.filter_counts),
+                'subscribers': sum(self.filter_counts.values()),
+                'messages': self.messages
+            }
+
+
+class MQTTSubscriberHub:
+    """
+    Shared connections of the daemon to the MQTT servers that Inputs subscribe to
+
+    Subscribers to the same server with the same credentials, transport,
+    and TLS setting share one connection, which uses the client ID of the
+    first subscriber. A connection is closed when its last subscriber
+    unsubscribes.
+    """
+    def __init__(self, client_factory=mqtt_client):
+        self.client_factory = client_factory
+        self.lock = threading.Lock()
+        self.connections = {}
+
+    def subscribe(self, topic_filters, callback, hostname='localhost', port=1883, client_id='',
+                  keepalive=60, auth=None, transport='tcp', tls=False):
+        """
+        Pass the messages of topics matching any of topic_filters to callback
+
+        :param topic_filters: list of topic filters, which may contain the + and # wildcards
+        :param callback: function called with the paho arguments (client, userdata, message)
+        :return: subscription, to pass to unsubscribe()
+        :rtype: tuple
+        """
+        username = password = None
+        if auth:
+            username = auth.get('username')
+            password = auth.get('password')
+        key = (hostname, port, username, password, transport, tls)
+
+        with self.lock:
+            connection = self.connections.get(key)
+            if connection is None:
+                connection = MQTTSubscriberConnection(
+                    hostname, port, client_id, keepalive=keepalive, auth=auth,
+                    transport=transport, tls=tls, client_factory=self.client_factory)
+                self.connections[key] = connection
+                start = True
+            else:
+                logger.debug(f"Sharing the connection to {hostname}:{port} as '{connection.client_id}'")
+                start = False
+            for each_filter in topic_filters:
+                connection.add(each_filter, callback)
+            if start:
+                connection.start()
+        return key, list(topic_filters), callback
+
+    def unsubscribe(self, subscription):
+        """Stop passing messages to the callback of a subscription returned by subscribe()."""
+        key, topic_filters, callback = subscription
+        with self.lock:
+            connection = self.connections.get(key)
+            if connection is None:
+                return
+            for each_filter in topic_filters:
+                connection.remove(each_filter, callback)
+            if not connection.filter_counts:
+                connection.stop()
+                del self.connections[key]
+
+    def stop(self):
+        """Close all connections."""
+        with self.lock:
+            for each_connection in self.connections.values():
+                each_connection.stop()
+            self.connections = {}
+
+    def stats(self):
+        with self.lock:
+            return [each_connection.stats() for each_connection in self.connections.values()]
+
+
+mqtt_subscriber_hub = MQTTSubscriberHub()
+
+
+def mqtt_subscribe(topic_filters, callback, **kwargs):
+    """Subscribe to topics over the shared connection to a server. See MQTTSubscriberHub.subscribe()."""
+    return mqtt_subscriber_hub.subscribe(topic_filters, callback, **kwargs)
+
+
+def mqtt_unsubscribe(subscription):
+    """Stop a subscription returned by mqtt_subscribe()."""
+    mqtt_subscriber_hub.unsubscribe(subscription)
+
+
+def mqtt_subscriber_stats():
+    """Return the state and counters of each shared MQTT subscriber connection."""
+    return mqtt_subscriber_hub.stats()
+
+
+def mqtt_subscriber_stop():
+    """Close all shared MQTT subscriber connections."""
+    mqtt_subscriber_hub.stop()
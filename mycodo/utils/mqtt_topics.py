@@ -0,0 +1,106 @@
+# coding=utf-8
+import threading
+
+# Maximum number of topics whose matches are remembered
+TOPIC_CACHE_MAX = 10000
+
+
+class TopicNode:
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children = {}
+        self.values = []
+
+
+class TopicTrie:
+    """
+    Index of MQTT topic filters, to find the filters that match a topic
+
+    Filters may contain the single-level (+) and multi-level (#)
+    wildcards. A topic is matched by walking its levels, so the time to
+    match doesn't grow with the number of filters. The matches of recent
+    topics are cached, as the same topics are usually received repeatedly.
+    """
+    def __init__(self):
+        self.root = TopicNode()
+        self.lock = threading.Lock()
+        self.cache = {}
+
+    def add(self, topic_filter, value):
+        """Add a value to be returned for topics matching topic_filter."""
+        with self.lock:
+            node = self.root
+            for each_level in topic_filter.split('/'):
+                node = node.children.setdefault(each_level, TopicNode())
+            node.values.append(value)
+            self.cache = {}
+
+    def remove(self, topic_filter, value):
+        """Remove a value added with add(). Return whether it was found."""
+        with self.lock:
+            path = [self.root]
+            levels = topic_filter.split('/')
+            for each_level in levels:
+                if each_level not in path[-1].children:
+                    return False
+                path.append(path[-1].children[each_level])
+            if value not in path[-1].values:
+                return False
+            path[-1].values.remove(value)
+
+            # Prune the nodes left without values or children
+            for depth in range(len(levels), 0, -1):
+                if path[depth].values or path[depth].children:
+                    break
+                del path[depth - 1].children[levels[depth - 1]]
+            self.cache = {}
+            return True
+
+    def filters(self):
+        """Return the topic filters that have values."""
+        found = []
+
+        def walk(node, levels):
+            if node.values:
+                found.append('/'.join(levels))
+            for each_level, each_node in node.children.items():
+                walk(each_node, levels + [each_level])
+
+        with self.lock:
+            for each_level, each_node in self.root.children.items():
+                walk(each_node, [each_level])
+        return found
+
+    def match(self, topic):
+        """Return the values of all filters that match topic."""
+        cache = self.cache
+        if topic in cache:
+            return cache[topic]
+
+        with self.lock:
+            levels = topic.split('/')
+            values = []
+            self._match(self.root, levels, 0, values, topic.startswith('$'))
+            if len(self.cache) >= TOPIC_CACHE_MAX:
+                self.cache = {}
+            self.cache[topic] = values
+            return values
+
+    def _match(self, node, levels, index, values, system_topic):
+        # Wildcards don't match the first level of topics beginning with $
+        wildcards = not (system_topic and index == 0)
+
+        if wildcards and '#' in node.children:
+            # Multi-level wildcard matches the parent level and any number of levels
+            values.extend(node.children['#'].values)
+
+        if index == len(levels):
+            values.extend(node.values)
+            return
+
+        child = node.children.get(levels[index])
+        if child is not None:
+            self._match(child, levels, index + 1, values, system_topic)
+        if wildcards and '+' in node.children:
+            self._match(node.children['+'], levels, index + 1, values, system_topic)
@@ -0,0 +1,287 @@
+# coding=utf-8
+import copy
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import and_
+
+from mycodo.config import MYCODO_DB_PATH, OPTION_STORE_FLUSH_SEC
+from mycodo.databases.models import Input, InputChannel, Output, OutputChannel
+from mycodo.databases.utils import session_scope
+
+logger = logging.getLogger("mycodo.option_store")
+
+
+def query_options_row(session, model, unique_id, channel=None):
+    """Return the row of a controller (or of one of its channels) that holds its custom options."""
+    if channel is None:
+        return session.query(model).filter(model.unique_id == unique_id).first()
+    if model == Output:
+        return session.query(OutputChannel).filter(and_(
+            OutputChannel.output_id == unique_id,
+            OutputChannel.channel == channel)).first()
+    if model == Input:
+        return session.query(InputChannel).filter(and_(
+            InputChannel.input_id == unique_id,
+            InputChannel.channel == channel)).first()
+    raise ValueError("controller doesn't represent Output or Input")
+
+
+def parse_options(row):
+    try:
+        return json.loads(row.custom_options)
+    except Exception:
+        return {}
+
+
+class OptionStore:
+    """
+    Custom options of one controller (or channel) held in memory
+
+    Options are read from memory, and are reloaded from the database at
+    most every flush_sec, so changes made by other processes are seen.
+    Set and deleted options are kept as pending changes until flush(),
+    which merges them into the options in the database with a single
+    write. Only the changed options are written, so options changed by
+    other processes in the meantime aren't overwritten. Once released, a
+    store no longer accepts changes, which then go to a new store.
+    """
+    def __init__(self, model, unique_id, channel=None, flush_sec=OPTION_STORE_FLUSH_SEC):
+        self.model = model
+        self.unique_id = unique_id
+        self.channel = channel
+        self.flush_sec = flush_sec
+        self.lock = threading.Lock()
+        self.options = None
+        self.loaded = None  # monotonic() time of the last load, None if never loaded
+        self.changed = {}
+        self.deleted = set()
+        self.released = False
+        self.sets = 0
+        self.flushes = 0
+
+    def _load(self):
+        """Load the options from the database, if they weren't loaded recently, and apply pending changes."""
+        if self.loaded is not None and time.monotonic() - self.loaded < self.flush_sec:
+            return
+        with session_scope(MYCODO_DB_PATH) as new_session:
+            row = query_options_row(new_session, self.model, self.unique_id, self.channel)
+            options = parse_options(row) if row else {}
+        self._apply(options)
+
+    def _apply(self, options):
+        options.update(self.changed)
+        for each_option in self.deleted:
+            options.pop(each_option, None)
+        self.options = options
+        self.loaded = time.monotonic()
+
+    def get(self, option, default_return=None):
+        with self.lock:
+            self._load()
+            if option not in self.options:
+                return default_return
+            value = self.options[option]
+        # Each caller gets its own copy, as when the options were parsed for each call
+        return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def set(self, option, value):
+        """Set an option, returning False if the store was released."""
+        value = json.loads(json.dumps(value))  # Store what would be read back from the database
+        with self.lock:
+            if self.released:
+                return False
+            if self.options is None:
+                self.options = {}
+            self.options[option] = value
+            self.changed[option] = value
+            self.deleted.discard(option)
+            self.sets += 1
+            return True
+
+    def delete(self, option):
+        """Delete an option, returning False if the store was released."""
+        with self.lock:
+            if self.released:
+                return False
+            self._load()
+            if option not in self.options and option not in self.changed:
+                return True
+            self.options.pop(option, None)
+            self.changed.pop(option, None)
+            self.deleted.add(option)
+            self.sets += 1
+            return True
+
+    def dirty(self):
+        return bool(self.changed or self.deleted)
+
+    def flush(self):
+        """Write the pending changes to the database, returning whether they were written."""
+        with self.lock:
+            if not self.dirty():
+                return True
+            changed = self.changed
+            deleted = self.deleted
+            try:
+                with session_scope(MYCODO_DB_PATH) as new_session:
+                    row = query_options_row(new_session, self.model, self.unique_id, self.channel)
+                    if row is not None:
+                        options = parse_options(row)
+                        options.update(changed)
+                        for each_option in deleted:
+                            options.pop(each_option, None)
+                        row.custom_options = json.dumps(options)
+                        new_session.commit()
+            except Exception:
+                logger.exception(
+                    f"Writing the custom options of {self.model.__name__} {self.unique_id}")
+                return False  # Try again with the next flush
+            if row is None:
+                logger.error(
+                    f"Could not write custom options: {self.model.__name__} {self.unique_id} not found")
+                options = {}
+            self.changed = {}
+            self.deleted = set()
+            self._apply(options)
+            if row is None:
+                return False
+            self.flushes += 1
+            return True
+
+
+class OptionStores:
+    """
+    The option stores of the controllers of a process, and their write-behind thread
+
+    While started (in the daemon), options set by controllers are written
+    to the database by a thread every flush_sec, so a controller that sets
+    options in each loop writes to the database at most once per flush_sec.
+    When not started, options are written when they're set and read from
+    the database each time, as other processes don't flush.
+    """
+    def __init__(self, flush_sec=OPTION_STORE_FLUSH_SEC):
+        self.flush_sec = flush_sec
+        self.lock = threading.Lock()
+        self.stores = {}
+        self.running = False
+        self.thread = None
+        self.wake = threading.Event()
+
+    def get(self, model, unique_id, channel=None):
+        key = (model.__tablename__, unique_id, channel)
+        with self.lock:
+            if key not in self.stores:
+                self.stores[key] = OptionStore(model, unique_id, channel, flush_sec=self.flush_sec)
+            return self.stores[key]
+
+    def get_option(self, model, unique_id, option, channel=None, default_return=None):
+        if not self.running:
+            with session_scope(MYCODO_DB_PATH) as new_session:
+                row = query_options_row(new_session, model, unique_id, channel)
+                return parse_options(row).get(option, default_return) if row else default_return
+        return self.get(model, unique_id, channel).get(option, default_return=default_return)
+
+    def set_option(self, model, unique_id, option, value, channel=None):
+        """Set an option, returning whether it was written or will be written."""
+        if not self.running:
+            store = OptionStore(model, unique_id, channel)
+            store.set(option, value)
+            return store.flush()
+        while not self.get(model, unique_id, channel).set(option, value):
+            pass  # Released meanwhile, set it in a new store
+        return True
+
+    def delete_option(self, model, unique_id, option, channel=None):
+        if not self.running:
+            store = OptionStore(model, unique_id, channel)
+            store.delete(option)
+            return store.flush()
+        while not self.get(model, unique_id, channel).delete(option):
+            pass  # Released meanwhile, delete it in a new store
+        return True
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.running = True
+            self.wake.clear()
+            self.thread = threading.Thread(target=self.run, name='option_store')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the write-behind thread after writing all pending changes."""
+        self.running = False
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout)
+        self.flush()
+
+    def run(self):
+        while self.running:
+            self.wake.wait(self.flush_sec)
+            self.flush()
+
+    def flush(self, unique_id=None):
+        """Write the pending changes of all controllers, or of the controller with unique_id."""
+        with self.lock:
+            stores = [each_store for each_store in self.stores.values()
+                      if unique_id is None or each_store.unique_id == unique_id]
+        for each_store in stores:
+            if each_store.dirty():
+                each_store.flush()
+
+    def release(self, unique_id):
+        """
+        Write the pending changes of a stopped controller and stop holding its options
+
+        A store is only removed if it's still clean while holding its lock,
+        so an option set after the flush isn't lost. Changes made to a store
+        after it was removed go to a new store.
+        """
+        self.flush(unique_id)
+        with self.lock:
+            for each_key, each_store in list(self.stores.items()):
+                if each_store.unique_id != unique_id:
+                    continue
+                with each_store.lock:
+                    if each_store.dirty():
+                        continue  # Set since the flush, keep it to be written
+                    each_store.released = True
+                    del self.stores[each_key]
+
+    def stats(self):
+        with self.lock:
+            stores = list(self.stores.values())
+        return {
+            'stores': len(stores),
+            'pending': sum(each_store.dirty() for each_store in stores),
+            'sets': sum(each_store.sets for each_store in stores),
+            'flushes': sum(each_store.flushes for each_store in stores)
+        }
+
+
+option_stores = OptionStores()
+
+
+def option_store_start():
+    """Keep custom options in memory and write them behind (used by the daemon)."""
+    option_stores.start()
+
+
+def option_store_stop():
+    """Write all pending custom options and stop writing them behind."""
+    option_stores.stop()
+
+
+def option_store_release(unique_id):
+    """Write the pending custom options of a stopped controller."""
+    option_stores.release(unique_id)
+
+
+def option_store_stats():
+    return option_stores.stats()
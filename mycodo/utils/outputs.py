@@ -25,11 +25,13 @@ import os
 
 from mycodo.config import PATH_OUTPUTS
 from mycodo.config import PATH_OUTPUTS_CUSTOM
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.modules import load_module_information
+from mycodo.utils.modules import module_registry_cached
 
 logger = logging.getLogger("mycodo.utils.outputs")
 
 
+@module_registry_cached(PATH_OUTPUTS, PATH_OUTPUTS_CUSTOM)
 def parse_output_information(exclude_custom=False):
     """Parses the variables assigned in each Output and return a dictionary of IDs and values."""
     def dict_has_value(dict_inp, output_cus, key, force_type=None):
@@ -68,7 +70,7 @@ def parse_output_information(exclude_custom=False):
                 continue
 
             full_path = "{}/{}".format(real_path, each_file)
-            output_custom, status = load_module_from_file(full_path, 'outputs')
+            output_custom, status = load_module_information(full_path, 'outputs', 'OUTPUT_INFORMATION')
 
             if not output_custom or not hasattr(output_custom, 'OUTPUT_INFORMATION'):
                 continue
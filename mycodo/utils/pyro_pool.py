@@ -0,0 +1,210 @@
+# coding=utf-8
+import logging
+import os
+import select
+import threading
+import time
+from bisect import bisect_left
+
+import Pyro5.errors
+from Pyro5.api import Proxy
+
+from mycodo.config import (PYRO_LATENCY_BUCKETS_MS, PYRO_POOL_IDLE_SEC,
+                           PYRO_POOL_SIZE)
+
+logger = logging.getLogger("mycodo.pyro_pool")
+
+
+class LatencyHistogram:
+    """Count the calls of a method that took up to each bucket's number of milliseconds."""
+    def __init__(self, buckets=PYRO_LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms, error=False):
+        self.counts[bisect_left(self.buckets, duration_ms)] += 1
+        self.calls += 1
+        self.errors += error
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def stats(self):
+        labels = [f'<={each_bucket}' for each_bucket in self.buckets] + [f'>{self.buckets[-1]}']
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'avg_ms': self.total_ms / self.calls if self.calls else 0.0,
+            'max_ms': self.max_ms,
+            'histogram': dict(zip(labels, self.counts))
+        }
+
+
+class ProxyPool:
+    """
+    Connected Pyro proxies to a server, shared by the threads of a process
+
+    A thread takes a proxy from the pool for each call and returns it when
+    the call is done, so each thread has its own connection while calling
+    and connections are only opened when all pooled proxies are in use.
+    Each connection holds a thread of the Pyro server, so no more than
+    size proxies are kept, and those not used for idle_sec are closed.
+
+    A pooled proxy is checked before it's used, and is replaced if the
+    server closed its connection (e.g. the daemon was restarted). A proxy
+    is not returned to the pool after a communication error or timeout,
+    since its connection could still receive the response of the call.
+    """
+    def __init__(self, uri, size=PYRO_POOL_SIZE, idle_sec=PYRO_POOL_IDLE_SEC, proxy_factory=Proxy):
+        self.uri = uri
+        self.size = size
+        self.idle_sec = idle_sec
+        self.proxy_factory = proxy_factory
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.idle = []
+        self.latency = {}
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.connections_closed = 0
+
+    def acquire(self):
+        stale = []
+        proxy = None
+        with self.lock:
+            if self.pid != os.getpid():
+                # Forked: the sockets of the pool belong to the parent process
+                self.pid = os.getpid()
+                self.idle = []
+            now = time.monotonic()
+            while self.idle:
+                each_proxy, last_used = self.idle.pop()
+                if now - last_used < self.idle_sec and self.connected(each_proxy):
+                    proxy = each_proxy
+                    self.connections_reused += 1
+                    break
+                stale.append(each_proxy)
+            if proxy is None:
+                self.connections_opened += 1
+        self.close(stale)
+
+        if proxy is None:
+            proxy = self.proxy_factory(self.uri)
+        else:
+            proxy._pyroClaimOwnership()
+        return proxy
+
+    def release(self, proxy, reuse=True):
+        stale = []
+        with self.lock:
+            now = time.monotonic()
+            while self.idle and now - self.idle[0][1] >= self.idle_sec:
+                stale.append(self.idle.pop(0)[0])
+            if reuse and self.pid == os.getpid() and len(self.idle) < self.size:
+                self.idle.append((proxy, now))
+            else:
+                stale.append(proxy)
+        self.close(stale)
+
+    def close(self, proxies):
+        for each_proxy in proxies:
+            try:
+                each_proxy._pyroClaimOwnership()
+                each_proxy._pyroRelease()
+            except Exception:
+                logger.debug(f"Closing proxy to {self.uri}", exc_info=True)
+        if proxies:
+            with self.lock:
+                self.connections_closed += len(proxies)
+
+    @staticmethod
+    def connected(proxy):
+        """Return whether the connection of an idle proxy is still open."""
+        connection = getattr(proxy, '_pyroConnection', None)
+        if connection is None:
+            return True  # Not connected yet
+        try:
+            # Nothing is sent to an idle connection, unless it was closed
+            readable, _, _ = select.select([connection], [], [], 0)
+            return not readable
+        except (OSError, ValueError):
+            return False
+
+    def call(self, method, args=(), kwargs=None, timeout=None):
+        """Call a method of the server with a pooled proxy and record its latency."""
+        proxy = self.acquire()
+        proxy._pyroTimeout = timeout
+        reuse = False
+        timer = time.perf_counter()
+        try:
+            result = getattr(proxy, method)(*args, **(kwargs or {}))
+            reuse = True
+            return result
+        except Pyro5.errors.CommunicationError:
+            raise
+        except Exception:
+            reuse = True  # Raised by the method on the server
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - timer) * 1000
+            self.release(proxy, reuse)
+            with self.lock:
+                if method not in self.latency:
+                    self.latency[method] = LatencyHistogram()
+                self.latency[method].record(duration_ms, error=not reuse)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'uri': self.uri,
+                'size': self.size,
+                'idle': len(self.idle),
+                'connections_opened': self.connections_opened,
+                'connections_reused': self.connections_reused,
+                'connections_closed': self.connections_closed,
+                'latency': {each_method: histogram.stats()
+                            for each_method, histogram in sorted(self.latency.items())}
+            }
+
+
+class PooledProxy:
+    """Stands in for a Proxy, making each call with a proxy from a ProxyPool."""
+    def __init__(self, pool, timeout=None):
+        self._pyroPool = pool
+        self._pyroTimeout = timeout
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._pyroPool.call(name, args, kwargs, timeout=self._pyroTimeout)
+        return call
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def pyro_proxy(uri, timeout=None):
+    """
+    Return a proxy to the Pyro server at uri that uses the pool of this process
+
+    :param uri: Pyro URI of the server
+    :param timeout: seconds to wait for the response of each call
+    :return: proxy
+    :rtype: PooledProxy
+    """
+    with pools_lock:
+        if uri not in pools:
+            pools[uri] = ProxyPool(uri)
+        return PooledProxy(pools[uri], timeout=timeout)
+
+
+def pyro_pool_stats():
+    """Return the connection counters and call latency histograms of each pool of this process."""
+    with pools_lock:
+        return [each_pool.stats() for each_pool in pools.values()]
@@ -0,0 +1,172 @@
+# coding=utf-8
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("mycodo.scheduler")
+
+
+class SchedulerJob:
+    """A function run by the Scheduler, and the timing of its runs."""
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.due = None
+        self.entry = None  # Counter of the heap entry that's current, older entries are skipped
+        self.running = False
+        self.woken = False
+        self.runs = 0
+        self.lateness_mean = 0.0
+        self.lateness_m2 = 0.0
+        self.lateness_max = 0.0
+        self.duration_total = 0.0
+        self.duration_max = 0.0
+
+    def record(self, lateness, duration):
+        # Welford's algorithm, for the standard deviation of lateness (jitter)
+        self.runs += 1
+        delta = lateness - self.lateness_mean
+        self.lateness_mean += delta / self.runs
+        self.lateness_m2 += delta * (lateness - self.lateness_mean)
+        self.lateness_max = max(self.lateness_max, lateness)
+        self.duration_total += duration
+        self.duration_max = max(self.duration_max, duration)
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'runs': self.runs,
+            'lateness_avg_ms': self.lateness_mean * 1000,
+            'lateness_max_ms': self.lateness_max * 1000,
+            'jitter_ms': math.sqrt(self.lateness_m2 / self.runs) * 1000 if self.runs else 0.0,
+            'duration_avg_ms': self.duration_total / self.runs * 1000 if self.runs else 0.0,
+            'duration_max_ms': self.duration_max * 1000
+        }
+
+
+class Scheduler:
+    """
+    Run jobs when they're due on a bounded pool of worker threads
+
+    A job is a function that returns the number of seconds to wait before
+    it's run again, or None when it's finished. A job is only scheduled
+    again after it returns, so it's never run by two workers at once, and
+    its period is measured from the end of one run to the start of the
+    next (as with a thread that sleeps between runs). A job can be woken to
+    run before it's due, such as when whatever it's waiting for changes.
+    Due jobs are kept in a heap, which a single dispatcher thread waits on
+    until the earliest one is due. Lateness is the time from when a job was
+    due until a worker started it, which grows if all workers are busy.
+    """
+    def __init__(self, workers, name='scheduler'):
+        self.name = name
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.condition = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.jobs = {}
+        self.busy = 0
+        self.running = True
+        self.dispatcher = threading.Thread(target=self.dispatch, name=f'{name}_dispatcher')
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+
+    def add(self, name, func, delay=0):
+        """Run func after delay seconds, then again after the number of seconds it returns."""
+        job = SchedulerJob(name, func)
+        with self.condition:
+            self.jobs[name] = job
+            self.push(job, time.monotonic() + delay)
+
+    def push(self, job, due):
+        with self.condition:
+            job.due = due
+            job.entry = next(self.counter)
+            heapq.heappush(self.heap, (due, job.entry, job))
+            self.condition.notify()
+
+    def wake(self, name):
+        """Run a job now instead of when it's next due, or as soon as it returns if it's running."""
+        with self.condition:
+            job = self.jobs.get(name)
+            if job is None:
+                return
+            if job.running:
+                job.woken = True
+            elif job.due > time.monotonic():
+                self.push(job, time.monotonic())
+
+    def dispatch(self):
+        while True:
+            with self.condition:
+                while self.running:
+                    now = time.monotonic()
+                    if self.heap and self.heap[0][0] <= now:
+                        break
+                    self.condition.wait(self.heap[0][0] - now if self.heap else None)
+                if not self.running:
+                    return
+                due, entry, job = heapq.heappop(self.heap)
+                if entry != job.entry:
+                    continue  # The job was woken, so this entry was replaced
+                job.entry = None
+                job.running = True
+            try:
+                self.executor.submit(self.run_job, job, due)
+            except RuntimeError:
+                return  # Executor shut down
+
+    def run_job(self, job, due):
+        start = time.monotonic()
+        with self.condition:
+            self.busy += 1
+        delay = None
+        try:
+            delay = job.func()
+        except Exception:
+            logger.exception(f"Job '{job.name}' raised an exception and won't be run again")
+        finally:
+            end = time.monotonic()
+            with self.condition:
+                self.busy -= 1
+                job.running = False
+                job.record(start - due, end - start)
+                if delay is not None and self.running:
+                    if job.woken:
+                        job.woken = False
+                        delay = 0
+                    self.push(job, end + delay)
+                elif self.jobs.get(job.name) is job:
+                    del self.jobs[job.name]
+
+    def stop(self):
+        """Stop dispatching jobs. Jobs that are running are left to finish."""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.dispatcher.join()
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        """Return the number of workers and jobs, and the timing of each job."""
+        with self.condition:
+            now = time.monotonic()
+            jobs = [each_job.stats() for each_job in self.jobs.values()]
+            stats = {
+                'name': self.name,
+                'workers': self.workers,
+                'workers_busy': self.busy,
+                'jobs': len(self.jobs),
+                'jobs_due': sum(1 for due, entry, job in self.heap if entry == job.entry and due <= now)
+            }
+        runs = sum(each_job['runs'] for each_job in jobs)
+        stats['lateness_avg_ms'] = sum(
+            each_job['lateness_avg_ms'] * each_job['runs'] for each_job in jobs) / runs if runs else 0.0
+        stats['lateness_max_ms'] = max([each_job['lateness_max_ms'] for each_job in jobs], default=0.0)
+        stats['job_stats'] = sorted(jobs, key=lambda each_job: each_job['name'])
+        return stats
@@ -25,11 +25,13 @@ import os
 
 from mycodo.config import PATH_WIDGETS
 from mycodo.config import PATH_WIDGETS_CUSTOM
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.modules import load_module_information
+from mycodo.utils.modules import module_registry_cached
 
 logger = logging.getLogger("mycodo.utils.widgets")
 
 
+@module_registry_cached(PATH_WIDGETS, PATH_WIDGETS_CUSTOM)
 def parse_widget_information(exclude_custom=False):
     """Parses the variables assigned in each Widget and return a dictionary of IDs and values."""
     def dict_has_value(dict_inp, widget_cus, key, force_type=None):
@@ -69,7 +71,7 @@ def parse_widget_information(exclude_custom=False):
                 continue
 
             full_path = f"{real_path}/{each_file}"
-            widget_custom, status = load_module_from_file(full_path, 'widgets')
+            widget_custom, status = load_module_information(full_path, 'widgets', 'WIDGET_INFORMATION')
 
             if not widget_custom or not hasattr(widget_custom, 'WIDGET_INFORMATION'):
                 continue
@@ -263,10 +263,10 @@ WIDGET_INFORMATION = {
                        measure_type,
                        measurement_id,
                        max_measure_age_sec) {
-    const url = '/last/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + max_measure_age_sec.toString();
-    $.ajax(url, {
-      success: function(data, responseText, jqXHR) {
-        if (jqXHR.status === 204) {
+    getMeasurementData(
+      {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id, type: 'last', period: max_measure_age_sec},
+      function(data) {
+        if (data === null) {
           widget[widget_id].series[0].points[0].update(null);
         }
         else {
@@ -276,10 +276,10 @@ WIDGET_INFORMATION = {
           //document.getElementById('timestamp-' + widget_id).innerHTML = formattedTime;
         }
       },
-      error: function(jqXHR, textStatus, errorThrown) {
+      function(jqXHR, textStatus, errorThrown) {
         widget[widget_id].series[0].points[0].update(null);
       }
-    });
+    );
   }
 
   // Repeat function for getLastDataGaugeSolid()
@@ -275,6 +275,13 @@ WIDGET_INFORMATION = {
             'name': 'Enable Auto Refresh',
             'phrase': 'Enable the graph to automatically refresh with new data every Refresh period.'
         },
+        {
+            'id': 'enable_live_push',
+            'type': 'bool',
+            'default_value': False,
+            'name': 'Enable Live Push',
+            'phrase': 'Receive new measurements as they are stored, rather than every Refresh period. Falls back to refreshing if the server is busy.'
+        },
         {
             'id': 'enable_xaxis_reset',
             'type': 'bool',
@@ -582,6 +589,8 @@ WIDGET_INFORMATION = {
 
   let note_timestamps = {};
   let last_output_time_mil = {};  // Store the time (epoch) of the last data point received
+  let last_output_cursor = {};  // Store the cursor (epoch nanoseconds string) of the last data point received
+  let initial_data_received = {};
 
   function graphMenuFunction(widget_id) {
     var x = document.getElementById("widget-graph-responsive-controls-" + widget_id);
@@ -624,12 +633,14 @@ WIDGET_INFORMATION = {
                        measurement_id,
                        past_seconds) {
     const epoch_mil = new Date().getTime();
-    const url = '/past/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + past_seconds;
     const update_id = widget_id + "-" + series + "-" + unique_id + "-" + measure_type + '-' + measurement_id;
 
-    $.getJSON(url,
-      function(data, responseText, jqXHR) {
-        if (jqXHR.status !== 204) {
+    getMeasurementData(
+      {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id, type: 'past', past_seconds: past_seconds},
+      function(data, cursor) {
+        initial_data_received[update_id] = true;
+        if (cursor !== null) last_output_cursor[update_id] = cursor;
+        if (data !== null) {
           let past_data = [];
           const note_key = widget_id + "_" + series;
 
@@ -669,6 +680,68 @@ WIDGET_INFORMATION = {
     );
   }
 
+  // Add new points to a chart, and remove the points that are older than the x-axis duration
+  function addLiveDataSynchronousGraph(widget_id,
+                       series,
+                       measure_type,
+                       update_id,
+                       xaxis_duration_min,
+                       xaxis_reset,
+                       refresh_seconds,
+                       data) {
+    let time_point;
+    const note_key = widget_id + "_" + series;
+    // The timestamp of the beginning of the graph (oldest timestamp allowed on the graph)
+    const oldest_timestamp_allowed = new Date().getTime() - (xaxis_duration_min * 60 * 1000);
+
+    // Loop through data and add points to chart
+    for (let i = 0; i < data.length; i++) {
+      const time_point_raw = new Date(data[i][0] * 1000);
+      time_point = time_point_raw.getTime();
+
+      if (measure_type === 'tag') {
+        if (!(note_key in note_timestamps)) note_timestamps[note_key] = [];
+        if (!note_timestamps[note_key].includes(time_point)) {
+          widget[widget_id].series[series].addPoint({
+              x: time_point,
+              title: data[i][1],
+              text: data[i][2].replace(/(?:\\r\\n|\\r|\\n)/g, '<br/>').replace(/  /g, '\\u2591\\u2591')
+          }, false, false);
+          note_timestamps[note_key].push(time_point);
+        }
+      }
+      else if (!(update_id in last_output_time_mil) || time_point > last_output_time_mil[update_id]) {
+        // Timestamps are truncated to milliseconds, so the last point may be received again
+        widget[widget_id].series[series].addPoint([time_point, data[i][1]], false, false);
+      }
+    }
+
+    // Store last point timestamp
+    if (measure_type === 'tag') last_output_time_mil[update_id] = time_point + 3000;
+    else last_output_time_mil[update_id] = Math.max(time_point, last_output_time_mil[update_id] || 0);
+
+    // Finally, redraw the graph
+    redrawGraph(widget_id, refresh_seconds, xaxis_duration_min, xaxis_reset);
+
+    // Remove any points before beginning of chart
+    for (let i = 0; i < widget[widget_id].series[series].options.data.length; i++) {
+      // Get stored point timestamp
+      if (measure_type === 'tag') point_ts = widget[widget_id].series[series].options.data[i].x;
+      else point_ts = widget[widget_id].series[series].options.data[i][0];
+
+      // If stored point timestamp outside graph view, delete the point
+      if (point_ts < oldest_timestamp_allowed) {
+        widget[widget_id].series[series].removePoint(i, false);
+
+        // Remove timestamp from note array
+        if (measure_type === 'tag') {
+          const index = note_timestamps[note_key].indexOf(point_ts);
+          if (index > -1) note_timestamps[note_key].splice(index, 1);
+        }
+      } else break;
+    }
+  }
+
   // Retrieve chart data for the period since the last data acquisition (refresh period set by user)
   function retrieveLiveDataSynchronousGraph(widget_id,
                             series,
@@ -678,72 +751,27 @@ WIDGET_INFORMATION = {
                             xaxis_duration_min,
                             xaxis_reset,
                             refresh_seconds) {
-    // Determine the timestamp of the last known measurement on the graph and
-    // calculate the number of seconds from then until now, then build the URL
-    // to query the measurements from that time period.
-    let url = '';
-    const epoch_mil = new Date().getTime();
+    // Query the measurements after the cursor of the last measurement on the graph
+    // (only the new points are returned), or of the past refresh period if there are none.
     let update_id = widget_id + "-" + series + "-" + unique_id + "-" + measure_type + '-' + measurement_id;
-    if (update_id in last_output_time_mil) {
-      const past_seconds = Math.floor((epoch_mil - last_output_time_mil[update_id]) / 1000);  // seconds (integer)
-      url = '/past/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + past_seconds;
+    let request_series = {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id};
+    if (update_id in last_output_cursor) {
+      request_series['type'] = 'since';
+      request_series['since_ns'] = last_output_cursor[update_id];
+    } else if (update_id in last_output_time_mil) {
+      request_series['type'] = 'since';
+      request_series['since'] = last_output_time_mil[update_id] / 1000;
     } else {
-      url = '/past/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + refresh_seconds;
+      request_series['type'] = 'past';
+      request_series['past_seconds'] = refresh_seconds;
     }
 
-    $.getJSON(url,
-      function(data, responseText, jqXHR) {
-        if (jqXHR.status !== 204) {
-          let time_point;
-          const note_key = widget_id + "_" + series;
-          // The timestamp of the beginning of the graph (oldest timestamp allowed on the graph)
-          const oldest_timestamp_allowed = epoch_mil - (xaxis_duration_min * 60 * 1000);
-
-          // Loop through data and add points to chart
-          for (let i = 0; i < data.length; i++) {
-            const time_point_raw = new Date(data[i][0] * 1000);
-            time_point = time_point_raw.getTime();
-
-            if (measure_type === 'tag') {
-              if (!(note_key in note_timestamps)) note_timestamps[note_key] = [];
-              if (!note_timestamps[note_key].includes(time_point)) {
-                widget[widget_id].series[series].addPoint({
-                    x: time_point,
-                    title: data[i][1],
-                    text: data[i][2].replace(/(?:\\r\\n|\\r|\\n)/g, '<br/>').replace(/  /g, '\\u2591\\u2591')
-                }, false, false);
-                note_timestamps[note_key].push(time_point);
-              }
-            }
-            else {
-              widget[widget_id].series[series].addPoint([time_point, data[i][1]], false, false);
-            }
-          }
-
-          // Store last point timestamp
-          if (measure_type === 'tag') last_output_time_mil[update_id] = time_point + 3000;
-          else last_output_time_mil[update_id] = time_point;
-
-          // Finally, redraw the graph
-          redrawGraph(widget_id, refresh_seconds, xaxis_duration_min, xaxis_reset);
-
-          // Remove any points before beginning of chart
-          for (let i = 0; i < widget[widget_id].series[series].options.data.length; i++) {
-            // Get stored point timestamp
-            if (measure_type === 'tag') point_ts = widget[widget_id].series[series].options.data[i].x;
-            else point_ts = widget[widget_id].series[series].options.data[i][0];
-
-            // If stored point timestamp outside graph view, delete the point
-            if (point_ts < oldest_timestamp_allowed) {
-              widget[widget_id].series[series].removePoint(i, false);
-
-              // Remove timestamp from note array
-              if (measure_type === 'tag') {
-                const index = note_timestamps[note_key].indexOf(point_ts);
-                if (index > -1) note_timestamps[note_key].splice(index, 1);
-              }
-            } else break;
-          }
+    getMeasurementData(request_series,
+      function(data, cursor) {
+        if (cursor !== null) last_output_cursor[update_id] = cursor;
+        if (data !== null) {
+          addLiveDataSynchronousGraph(widget_id, series, measure_type, update_id,
+                                      xaxis_duration_min, xaxis_reset, refresh_seconds, data);
         }
       }
     );
@@ -769,6 +797,43 @@ WIDGET_INFORMATION = {
                        refresh_seconds);
     }, refresh_seconds * 1000);
   }
+
+  // Receive new points as they're stored, after the initial data is received
+  // (refresh every refresh period if they can't be pushed, or for note tags)
+  function pushLiveDataSynchronousGraph(widget_id,
+                       series,
+                       unique_id,
+                       measure_type,
+                       measurement_id,
+                       xaxis_duration_min,
+                       xaxis_reset,
+                       refresh_seconds) {
+    const update_id = widget_id + "-" + series + "-" + unique_id + "-" + measure_type + '-' + measurement_id;
+    function poll() {
+      getLiveDataSynchronousGraph(widget_id, series, unique_id, measure_type, measurement_id,
+                                  xaxis_duration_min, xaxis_reset, refresh_seconds);
+    }
+    if (measure_type === 'tag') {
+      poll();
+      return;
+    }
+    (function subscribe() {
+      if (!(update_id in initial_data_received)) {
+        setTimeout(subscribe, 1000);  // Wait for the initial data
+        return;
+      }
+      // Without a cursor (no initial data), the points from when the stream opens are received
+      subscribeMeasurementData(
+        {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id,
+         since_ns: last_output_cursor[update_id]},
+        function(data, cursor) {
+          last_output_cursor[update_id] = cursor;
+          addLiveDataSynchronousGraph(widget_id, series, measure_type, update_id,
+                                      xaxis_duration_min, xaxis_reset, refresh_seconds, data);
+        },
+        poll);
+    })();
+  }
 """,
 
     'widget_dashboard_js_ready': """<!-- No JS ready content -->""",
@@ -801,7 +866,7 @@ WIDGET_INFORMATION = {
               {% for each_output in all_output %}
           getPastDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_output.unique_id}}', 'output', '{{measurement_id}}', {{widget_options['x_axis_minutes']*60}});
                 {% if widget_options['enable_auto_refresh'] -%}
-          getLiveDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_output.unique_id}}', 'output', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
+          {% if widget_options['enable_live_push'] %}pushLiveDataSynchronousGraph{% else %}getLiveDataSynchronousGraph{% endif %}('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_output.unique_id}}', 'output', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
                 {%- endif -%}
                 {%- do count_series.append(1) -%}
               {%- endfor -%}
@@ -816,7 +881,7 @@ WIDGET_INFORMATION = {
               {% for each_input in all_input %}
           getPastDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_input.unique_id}}', 'input', '{{measurement_id}}', {{widget_options['x_axis_minutes']*60}});
                 {% if widget_options['enable_auto_refresh'] -%}
-          getLiveDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_input.unique_id}}', 'input', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
+          {% if widget_options['enable_live_push'] %}pushLiveDataSynchronousGraph{% else %}getLiveDataSynchronousGraph{% endif %}('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_input.unique_id}}', 'input', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
                 {%- endif -%}
                 {%- do count_series.append(1) -%}
               {%- endfor -%}
@@ -831,7 +896,7 @@ WIDGET_INFORMATION = {
               {% for each_function in all_function %}
           getPastDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_function.unique_id}}', 'function', '{{measurement_id}}', {{widget_options['x_axis_minutes']*60}});
                 {% if widget_options['enable_auto_refresh'] %}
-          getLiveDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_function.unique_id}}', 'function', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
+          {% if widget_options['enable_live_push'] %}pushLiveDataSynchronousGraph{% else %}getLiveDataSynchronousGraph{% endif %}('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_function.unique_id}}', 'function', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
                 {% endif %}
                 {%- do count_series.append(1) %}
               {%- endfor -%}
@@ -843,7 +908,7 @@ WIDGET_INFORMATION = {
               {%- set measurement_id = pid_and_measurement_id.split(',')[1] -%}
           getPastDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_pid.unique_id}}', 'pid', '{{measurement_id}}', {{widget_options['x_axis_minutes']*60}});
           {% if widget_options['enable_auto_refresh'] %}
-          getLiveDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_pid.unique_id}}', 'pid', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
+          {% if widget_options['enable_live_push'] %}pushLiveDataSynchronousGraph{% else %}getLiveDataSynchronousGraph{% endif %}('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_pid.unique_id}}', 'pid', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
           {% endif %}
               {%- do count_series.append(1) %}
             {%- endfor -%}
@@ -854,7 +919,7 @@ WIDGET_INFORMATION = {
               {%- set measurement_id = tag_and_measurement_id.split(',')[1] -%}
           getPastDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_tag.unique_id}}', 'tag', '{{measurement_id}}', {{widget_options['x_axis_minutes']*60}});
           {% if widget_options['enable_auto_refresh'] %}
-          getLiveDataSynchronousGraph('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_tag.unique_id}}', 'tag', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
+          {% if widget_options['enable_live_push'] %}pushLiveDataSynchronousGraph{% else %}getLiveDataSynchronousGraph{% endif %}('{{each_widget.unique_id}}', {{count_series|count}}, '{{each_tag.unique_id}}', 'tag', '{{measurement_id}}', {{widget_options['x_axis_minutes']}}, {{widget_options['enable_xaxis_reset']|int}}, {{widget_options['refresh_seconds']}});
           {% endif %}
               {%- do count_series.append(1) %}
             {%- endfor -%}
@@ -140,10 +140,10 @@ WIDGET_INFORMATION = {
 
     // Get last measurement
     else {
-      const url = '/last/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + max_measure_age_sec.toString();
-      $.ajax(url, {
-        success: function(data, responseText, jqXHR) {
-          if (jqXHR.status === 204) {
+      getMeasurementData(
+        {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id, type: 'last', period: max_measure_age_sec},
+        function(data) {
+          if (data === null) {
             document.getElementById('value-' + widget_id).innerHTML = 'NO DATA';
           }
           else {
@@ -157,10 +157,10 @@ WIDGET_INFORMATION = {
             document.getElementById('value-' + widget_id).title = "{{_('Value')}}: " + measurement.toFixed(decimal_places);
           }
         },
-        error: function(jqXHR, textStatus, errorThrown) {
+        function(jqXHR, textStatus, errorThrown) {
           document.getElementById('value-' + widget_id).title = 'NO DATA';
         }
-      });
+      );
     }
   }
 
@@ -249,10 +249,10 @@ WIDGET_INFORMATION = {
       decimal_places = 1;
     }
 
-    const url = '/last/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + max_measure_age_sec.toString();
-    $.ajax(url, {
-      success: function(data, responseText, jqXHR) {
-        if (jqXHR.status === 204) {
+    getMeasurementData(
+      {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id, type: 'last', period: max_measure_age_sec},
+      function(data) {
+        if (data === null) {
           if (document.getElementById(measurement_num + '-value-' + widget_id)) {
             document.getElementById(measurement_num + '-value-' + widget_id).innerHTML = 'NO DATA';
           }
@@ -271,7 +271,7 @@ WIDGET_INFORMATION = {
           }
         }
       },
-      error: function(jqXHR, textStatus, errorThrown) {
+      function(jqXHR, textStatus, errorThrown) {
         if (document.getElementById(measurement_num + '-value-' + widget_id)) {
           document.getElementById(measurement_num + '-value-' + widget_id).innerHTML = 'NO DATA';
         }
@@ -279,7 +279,7 @@ WIDGET_INFORMATION = {
           document.getElementById(measurement_num + '-timestamp-' + widget_id).innerHTML = '{{_('Error')}}';
         }
       }
-    });
+    );
   }
 
   // Repeat function for getLastData()
@@ -296,10 +296,10 @@ WIDGET_INFORMATION = {
     if (decimal_places === null) {
       decimal_places = 1;
     }
-    const url = '/last/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + max_measure_age_sec.toString();
-    $.ajax(url, {
-      success: function(data, responseText, jqXHR) {
-        if (jqXHR.status === 204) {
+    getMeasurementData(
+      {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id, type: 'last', period: max_measure_age_sec},
+      function(data) {
+        if (data === null) {
           document.getElementById('value-' + measurement_id).innerHTML = 'NO DATA';
           document.getElementById('timestamp-' + measurement_id).innerHTML = 'TOO OLD';
         }
@@ -316,11 +316,11 @@ WIDGET_INFORMATION = {
           document.getElementById('timestamp-' + measurement_id).innerHTML = formattedTime;
         }
       },
-      error: function(jqXHR, textStatus, errorThrown) {
+      function(jqXHR, textStatus, errorThrown) {
         document.getElementById('value-' + measurement_id).innerHTML = 'NO DATA';
         document.getElementById('timestamp-' + measurement_id).innerHTML = '{{_('Error')}}';
       }
-    });
+    );
   }
 
   // Repeat function for getLastData()
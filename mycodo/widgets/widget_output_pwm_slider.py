@@ -241,10 +241,10 @@ WIDGET_INFORMATION = {
     if (decimal_places === null) {
       decimal_places = 1;
     }
-    const url = '/last/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + max_measure_age_sec.toString();
-    $.ajax(url, {
-      success: function(data, responseText, jqXHR) {
-        if (jqXHR.status === 204) {
+    getMeasurementData(
+      {unique_id: unique_id, measure_type: measure_type, measurement_id: measurement_id, type: 'last', period: max_measure_age_sec},
+      function(data) {
+        if (data === null) {
           document.getElementById('value-' + widget_id).innerHTML = 'NO DATA';
           document.getElementById('timestamp-' + widget_id).innerHTML = 'MAX AGE EXCEEDED';
         }
@@ -265,11 +265,11 @@ WIDGET_INFORMATION = {
           document.getElementById('timestamp-' + widget_id).innerHTML = formattedTime;
         }
       },
-      error: function(jqXHR, textStatus, errorThrown) {
+      function(jqXHR, textStatus, errorThrown) {
         document.getElementById('value-' + widget_id).innerHTML = 'NO DATA';
         document.getElementById('timestamp-' + widget_id).innerHTML = '{{_('Error')}}';
       }
-    });
+    );
   }
 
   // Repeat function for getLastData()